@@ -58,32 +58,30 @@ def ai_query():
 
     # Simple geocoding for commands like 'drive to Lagos Island'
     try:
-        import requests
+        # Shared geocoder: LRU, persistent cache and optional offline gazetteer
+        from backend.src.services.geocoding_service import geocode
+        from backend.src.services.http_client import run_sync
         if "drive to" in query.lower():
             loc = query.lower().split("drive to", 1)[1].strip()
             if loc:
                 try:
-                    r = requests.get(
-                        "https://nominatim.openstreetmap.org/search",
-                        params={"format": "json", "q": loc, "limit": 1},
-                        headers={"User-Agent": "DigitalTwin/1.0"},
-                        timeout=5,
-                    )
-                    data = r.json()
-                    if data:
-                        lat = float(data[0]["lat"])
-                        lon = float(data[0]["lon"])
+                    place = run_sync(geocode, loc)
+                    if place:
+                        # With an "origin" ({lat, lon}) the action also carries a road route
+                        from backend.src.services.road_graph import parse_point, route_action
+                        action = {"type": "drive", "lat": place["lat"], "lon": place["lon"]}
+                        action = run_sync(route_action, action, parse_point(payload.get("origin")))
                         return jsonify({
-                            "message": f"Driving to {data[0].get('display_name', loc)}",
+                            "message": f"Driving to {place['display_name']}",
                             "success": True,
-                            "action": {"type": "drive", "lat": lat, "lon": lon},
+                            "action": action,
                         })
                     else:
                         return jsonify({"message": f"Location not found: {loc}", "success": False}), 200
                 except Exception as e:
                     return jsonify({"error": str(e), "success": False}), 500
     except Exception:
-        # requests may not be available; continue to AI fallback
+        # Geocoder may not be available; continue to AI fallback
         pass
 
     if not AI_ENGINE_AVAILABLE:
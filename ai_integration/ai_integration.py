@@ -5,6 +5,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+_client = None
+
+
+def _openai_client():
+    """Create the OpenAI client once so its connection pool is reused."""
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=30.0, max_retries=2)
+    return _client
+
+
 class AIEngine:
     """
     Main AI interface for the Digital Twin.
@@ -14,7 +25,7 @@ class AIEngine:
     @staticmethod
     def process_query(query: str):
         try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            client = _openai_client()
 
             response = client.responses.create(
                 model="gpt-4.1",
@@ -2,3 +2,94 @@ import os
 
 # Default Overpass API endpoint; can be overridden via OSM_OVERPASS_URL env var
 OSM_OVERPASS_URL = os.getenv("OSM_OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+
+# Server-side physics WebSocket service (see backend/src/simulation/physics_server.py)
+PHYSICS_WS_HOST = os.getenv("PHYSICS_WS_HOST", "127.0.0.1")
+PHYSICS_WS_PORT = int(os.getenv("PHYSICS_WS_PORT", "8765"))
+PHYSICS_TICK_RATE = float(os.getenv("PHYSICS_TICK_RATE", "60"))
+# Snapshot rate (0 = every tick) and the most ticks run at once to catch up
+PHYSICS_BROADCAST_RATE = float(os.getenv("PHYSICS_BROADCAST_RATE", "0"))
+PHYSICS_MAX_CATCH_UP = int(os.getenv("PHYSICS_MAX_CATCH_UP", "5"))
+PHYSICS_SHARDS = int(os.getenv("PHYSICS_SHARDS", "1"))  # worker processes; 1 = in-process
+# Record ticks and inputs to <SIM_TRACE_DIR>/<run> (simulation/trace.py); a
+# keyframe every SIM_TRACE_KEYFRAME_INTERVAL ticks
+SIM_TRACE_DIR = os.getenv("SIM_TRACE_DIR", "")
+SIM_TRACE_KEYFRAME_INTERVAL = int(os.getenv("SIM_TRACE_KEYFRAME_INTERVAL", "300"))
+
+# Sensor telemetry ingest (services/telemetry_store.py). Each channel (sensor
+# field) keeps TELEMETRY_RAW_SAMPLES raw samples and TELEMETRY_BUCKETS rollup
+# buckets per resolution; at most TELEMETRY_MAX_CHANNELS channels are kept.
+# With TELEMETRY_MQTT_URL (mqtt://[user:pass@]host[:port]) set, messages on
+# TELEMETRY_MQTT_TOPIC are ingested too (services/mqtt_bridge.py).
+TELEMETRY_RAW_SAMPLES = int(os.getenv("TELEMETRY_RAW_SAMPLES", "2048"))
+TELEMETRY_BUCKETS = int(os.getenv("TELEMETRY_BUCKETS", "1024"))
+TELEMETRY_MAX_CHANNELS = int(os.getenv("TELEMETRY_MAX_CHANNELS", "256"))
+TELEMETRY_FLUSH_SAMPLES = int(os.getenv("TELEMETRY_FLUSH_SAMPLES", "16384"))
+TELEMETRY_MQTT_URL = os.getenv("TELEMETRY_MQTT_URL", "")
+TELEMETRY_MQTT_TOPIC = os.getenv("TELEMETRY_MQTT_TOPIC", "sensors/#")
+
+# Long-term history (services/history_store.py): with HISTORY_DIR set,
+# telemetry samples go to <HISTORY_DIR>/sensors and the physics server writes
+# entity tracks every HISTORY_ENTITY_INTERVAL s to <HISTORY_DIR>/entities.
+# Partitions of HISTORY_PARTITION_SECONDS are dropped after
+# HISTORY_RETENTION_DAYS (0 keeps everything).
+HISTORY_DIR = os.getenv("HISTORY_DIR", "")
+HISTORY_PARTITION_SECONDS = float(os.getenv("HISTORY_PARTITION_SECONDS", "86400"))
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+HISTORY_ENTITY_INTERVAL = float(os.getenv("HISTORY_ENTITY_INTERVAL", "1.0"))
+
+# On-disk Overpass tile cache used by services/osm_services.fetch_osm_objects.
+# Set OSM_CACHE_ENABLED=false to always query Overpass directly.
+OSM_CACHE_ENABLED = os.getenv("OSM_CACHE_ENABLED", "true").lower() == "true"
+OSM_CACHE_PATH = os.getenv("OSM_CACHE_PATH", "")  # default: <project>/.cache/osm_tiles.sqlite
+OSM_CACHE_ZOOM = int(os.getenv("OSM_CACHE_ZOOM", "15"))
+OSM_CACHE_TTL = float(os.getenv("OSM_CACHE_TTL", str(24 * 3600)))
+OSM_CACHE_MAX_TILES = int(os.getenv("OSM_CACHE_MAX_TILES", "4096"))
+
+# Shared outbound HTTP client (services/http_client.py)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "8"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+
+# Geocoding ("drive to <place>") cache and optional offline gazetteer.
+# GAZETTEER_PATH may point at a CSV (name,lat,lon[,population][,alternatenames][,country][,admin])
+# or a GeoNames dump such as cities15000.txt.
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "")  # default: <project>/.cache/geocode.sqlite
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "")
+
+# Satellite TLE catalog (services/satellite_orbit_service.py). TLE_PATH takes
+# precedence over downloading TLE_URL; the catalog is reloaded after TLE_TTL s.
+TLE_PATH = os.getenv("TLE_PATH", "")
+TLE_URL = os.getenv("TLE_URL", "https://celestrak.org/NORAD/elements/gp.php?GROUP=active&FORMAT=tle")
+TLE_TTL = float(os.getenv("TLE_TTL", str(6 * 3600)))
+# /api/public-data?satellites=true adds at most this many satellites, those
+# above PUBLIC_DATA_SATELLITE_MIN_ELEVATION degrees at the query point, highest first
+PUBLIC_DATA_SATELLITE_LIMIT = int(os.getenv("PUBLIC_DATA_SATELLITE_LIMIT", "100"))
+PUBLIC_DATA_SATELLITE_MIN_ELEVATION = float(os.getenv("PUBLIC_DATA_SATELLITE_MIN_ELEVATION", "0"))
+
+# Road routing (services/road_graph.py). Compiled graphs are cached under
+# ROAD_GRAPH_CACHE_DIR; ROAD_GRAPH_CH=true also builds a contraction hierarchy
+# (slower first build, much faster queries). Routes whose OSM area would need
+# a radius above ROUTE_MAX_RADIUS metres are not planned: the roads of a 12 km
+# city radius are already tens of MB from Overpass. Road data is fetched with
+# its own highway-only query, given ROUTE_OSM_TIMEOUT s.
+ROAD_GRAPH_CACHE_DIR = os.getenv("ROAD_GRAPH_CACHE_DIR", "")  # default: <project>/.cache/road_graphs
+ROAD_GRAPH_CH = os.getenv("ROAD_GRAPH_CH", "false").lower() == "true"
+ROUTE_MAX_RADIUS = float(os.getenv("ROUTE_MAX_RADIUS", "12000"))
+ROUTE_OSM_TIMEOUT = float(os.getenv("ROUTE_OSM_TIMEOUT", "90"))
+# ETA matrices (/api/routing/eta-matrix) with at least ETA_POOL_MIN_ORIGINS
+# origins are split across ETA_WORKERS processes (1 disables the pool)
+ETA_WORKERS = int(os.getenv("ETA_WORKERS", str(min(os.cpu_count() or 1, 8))))
+ETA_POOL_MIN_ORIGINS = int(os.getenv("ETA_POOL_MIN_ORIGINS", "16"))
+
+# Uploaded 3D models (services/model_assets.py) are kept in MODEL_ASSET_DIR
+# with decimated levels of detail at each of MODEL_LOD_RATIOS of the full
+# triangle count (levels under MODEL_LOD_MIN_TRIANGLES are skipped). Uploads
+# above MODEL_MAX_UPLOAD_MB are refused.
+MODEL_ASSET_DIR = os.getenv("MODEL_ASSET_DIR", "")  # default: <project>/.cache/models
+MODEL_LOD_RATIOS = tuple(float(r) for r in os.getenv("MODEL_LOD_RATIOS", "0.5,0.25,0.1").split(",") if r.strip())
+MODEL_LOD_MIN_TRIANGLES = int(os.getenv("MODEL_LOD_MIN_TRIANGLES", "64"))
+MODEL_MAX_UPLOAD_MB = float(os.getenv("MODEL_MAX_UPLOAD_MB", "200"))
@@ -5,6 +5,10 @@ from .routes import (
     telecom_router,
     simulation_router,
     health_router,
+    satellite_router,
+    routing_router,
+    sensor_router,
+    telemetry_router,
 )
 from . import assets_routes
 
@@ -14,6 +18,10 @@ __all__ = [
     "telecom_router",
     "simulation_router",
     "health_router",
+    "satellite_router",
+    "routing_router",
+    "sensor_router",
+    "telemetry_router",
     "assets_routes",
 ]
 
@@ -1,7 +1,34 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
 from pathlib import Path
+from typing import Optional
+import asyncio
 import json
 
+from ..config.env import MODEL_MAX_UPLOAD_MB
+from ..services.model_assets import check_name, get_model_assets
+
+MODEL_MEDIA_TYPES = {
+    ".glb": "model/gltf-binary",
+    ".gltf": "model/gltf+json",
+    ".stl": "model/stl",
+    ".obj": "model/obj",
+    ".ply": "application/octet-stream",
+    ".bin": "application/octet-stream",
+}
+
+
+class ModelFileResponse(FileResponse):
+    """File response streamed in 1 MiB reads (64 KiB by default); servers with pathsend send it zero-copy."""
+
+    chunk_size = 1 << 20
+
+
+def _etag_matches(header, etag):
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison, as RFC 9110 asks)."""
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
 router = APIRouter(prefix="/api/assets", tags=["Assets"])
 
 @router.get("/registry")
@@ -31,3 +58,79 @@ def assets_registry():
         out = {"models": {}}
 
     return out
+
+
+@router.get("/models")
+def list_models():
+    """Sidecars of every uploaded model: status, counts, bounds and levels of detail."""
+    assets = get_model_assets()
+    return {"models": assets.models(), "stats": assets.stats()}
+
+
+@router.put("/models/{filename}", status_code=202)
+async def upload_model(filename: str, request: Request):
+    """Store the request body as model ``filename`` (.glb/.gltf/.stl/.obj/.ply, or a .bin buffer).
+
+    The body is hashed while it streams to disk and stored once per
+    content: uploading bytes the store already holds only points the name at
+    them (``deduplicated`` in the reply). Returns as soon as the file is in
+    place; bounds and LODs are computed in the background (poll
+    ``/models/{filename}/meta`` for status "ready").
+    """
+    try:
+        check_name(filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    limit = int(MODEL_MAX_UPLOAD_MB * 2**20)
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise HTTPException(status_code=413, detail=f"Model larger than {MODEL_MAX_UPLOAD_MB:g} MB")
+    assets = get_model_assets()
+    writer = assets.writer()
+    try:
+        async for chunk in request.stream():
+            if writer.size + len(chunk) > limit:
+                raise HTTPException(status_code=413, detail=f"Model larger than {MODEL_MAX_UPLOAD_MB:g} MB")
+            writer.write(chunk)
+        if not writer.size:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        return await asyncio.to_thread(assets.commit, filename, writer)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        writer.discard()
+
+
+@router.get("/models/{filename}/meta")
+def model_metadata(filename: str):
+    meta = get_model_assets().metadata(filename)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model {filename}")
+    return meta
+
+
+@router.get("/models/{filename}")
+def model_file(
+    filename: str,
+    request: Request,
+    lod: Optional[int] = Query(None, ge=0),
+    maxTriangles: Optional[int] = Query(None, ge=1),
+):
+    """The model at level ``lod``, or the most detailed level within ``maxTriangles``; the upload by default.
+
+    The level served is in the ``X-Model-LOD`` header. Levels above 0 are
+    geometry-only GLB files (no materials or textures). The ETag is the
+    SHA-256 of the bytes served, so a client that sends it back in
+    ``If-None-Match`` gets a 304 instead of the file; ``Range`` (with
+    ``If-Range``) requests get 206 partial content.
+    """
+    found = get_model_assets().select(filename, lod, maxTriangles)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model {filename}")
+    path, level = found
+    etag = f'"{level["sha256"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Model-LOD": str(level["level"])}
+    if level.get("triangles") is not None:
+        headers["X-Model-Triangles"] = str(level["triangles"])
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return ModelFileResponse(path, media_type=MODEL_MEDIA_TYPES.get(path.suffix.lower()), headers=headers)
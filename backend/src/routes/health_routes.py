@@ -1,23 +1,38 @@
 from fastapi import APIRouter
 import socket
 
+from ..config.env import PHYSICS_WS_PORT
+
 health_router = APIRouter()
 
 @health_router.get("/health")
 def health():
     """Return basic health plus whether a WebSocket physics backend is reachable.
 
-    This performs a short TCP probe to localhost:8765 (the default physics WS...
-    backend) with a small timeout to avoid delaying the endpoint. The field
+    This performs a short TCP probe to localhost:PHYSICS_WS_PORT (8765 by
+    default, served by backend/src/simulation/physics_server.py) with a small
+    timeout to avoid delaying the endpoint. The field
     "ws" will be true only when the port is reachable; callers should treat
     a missing or false value as the backend being unavailable.
     """
     ws_available = False
     try:
         # Quick TCP connect test; don't block the health endpoint for long
-        with socket.create_connection(("127.0.0.1", 8765), timeout=0.2):
+        with socket.create_connection(("127.0.0.1", PHYSICS_WS_PORT), timeout=0.2):
             ws_available = True
     except Exception:
         ws_available = False
 
     return {"status": "ok", "service": "digital-twin-security-backend", "ws": ws_available}
+
+
+@health_router.get("/metrics/coalescing")
+def coalescing_metrics():
+    """Single-flight counters for upstream lookups (Overpass, geocoding).
+
+    ``coalescing_ratio`` is the share of calls that were answered by an
+    identical call already in flight instead of going upstream themselves.
+    """
+    from ..services.single_flight import single_flight_stats
+
+    return single_flight_stats()
@@ -1,38 +1,153 @@
-from fastapi import APIRouter, Query
-from ..services.satellite_orbit_service import compute_orbit
+import asyncio
+import json
+import time
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from ..config.env import PUBLIC_DATA_SATELLITE_LIMIT, PUBLIC_DATA_SATELLITE_MIN_ELEVATION
+from ..services.ephemeris_cache import get_ephemeris
+from ..services.geometry_lod import FULL_LOD
+from ..services.pass_prediction import look_angles, observer_frame
+from ..services.satellite_orbit_service import compute_orbit, peek_catalog, teme_to_geodetic
 
 public_data_router = APIRouter(prefix="/api/public-data", tags=["Public Data"])
 
+NDJSON = "application/x-ndjson"
+# Stream writes are batched up to about this many bytes (the first record is
+# always sent on its own so the client can start placing entities at once)
+STREAM_CHUNK_BYTES = 16 * 1024
+
+
+def _normalize(e):
+    item = {"type": e.get("type"), "id": e.get("id")}
+    # nodes tend to have lat/lon, ways/relations may include geometry
+    if e.get("lon") and e.get("lat"):
+        item.update({"lat": e.get("lat"), "lon": e.get("lon")})
+    elif e.get("geometry") and isinstance(e.get("geometry"), list) and e.get("geometry"):
+        coords = e.get("geometry")[0]
+        item.update({"lat": coords.get("lat"), "lon": coords.get("lon")})
+    return item
+
+
+def _visible_satellites(catalog, lat, lng, t):
+    """Satellites above the elevation mask at ``(lat, lng)``, highest first, capped."""
+    ephemeris = get_ephemeris(catalog)
+    r = ephemeris.teme([t])
+    elevation, azimuth, _ = look_angles(r[:, 0], t, observer_frame(lat, lng))
+    rows = np.flatnonzero(elevation >= PUBLIC_DATA_SATELLITE_MIN_ELEVATION)
+    rows = rows[np.argsort(-elevation[rows], kind="stable")][:PUBLIC_DATA_SATELLITE_LIMIT]
+    lon, sat_lat, alt = teme_to_geodetic(r[rows], np.array([t]))
+    return [
+        {
+            "type": "satellite",
+            "id": int(catalog.ids[row]),
+            "name": catalog.names[row],
+            "lon": float(lon[k, 0]),
+            "lat": float(sat_lat[k, 0]),
+            "alt": float(alt[k, 0]),
+            "elevation": round(float(elevation[row]), 3),
+            "azimuth": round(float(azimuth[row]), 3),
+        }
+        for k, row in enumerate(rows.tolist())
+    ]
+
+
+async def _satellite_items(lat, lng, t=None):
+    # The TLE catalog is never awaited here: until its background download
+    # finishes (or if it fails), a few synthetic satellites stand in
+    catalog = peek_catalog()
+    if catalog is not None and len(catalog):
+        try:
+            return await asyncio.to_thread(_visible_satellites, catalog, lat, lng, time.time() if t is None else t)
+        except Exception:
+            pass
+    items = []
+    for angle in [0.0, 1.0, 2.5, 4.0]:
+        lon, sat_lat, alt = compute_orbit(angle)
+        items.append({"type": "satellite", "lon": lon, "lat": sat_lat, "alt": alt})
+    return items
+
+
+async def _lod_records(lat, lng, radius, lod):
+    from ..services.osm_services import fetch_osm_lod
+    for record in await fetch_osm_lod(lat, lng, radius, lod):
+        yield record
+
+
+async def _osm_records(lat, lng, radius):
+    from ..services.osm_services import stream_osm_objects
+    async for e in stream_osm_objects(lat, lng, radius):
+        yield _normalize(e)
+
+
+async def _ndjson(lat, lng, radius, satellites, lod=None):
+    """One normalized record per line, written as elements arrive."""
+    pending = []
+    size = 0
+    first = True
+    records = _osm_records(lat, lng, radius) if lod is None else _lod_records(lat, lng, radius, lod)
+    try:
+        async for record in records:
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            pending.append(line)
+            size += len(line)
+            if first or size >= STREAM_CHUNK_BYTES:
+                yield "".join(pending)
+                pending, size, first = [], 0, False
+    except Exception:
+        # Same contract as the JSON mode: OSM failures just end the OSM part
+        pass
+    if satellites:
+        pending.extend(json.dumps(s, separators=(",", ":")) + "\n" for s in await _satellite_items(lat, lng))
+    if pending:
+        yield "".join(pending)
+
+
 @public_data_router.get("/")
-def public_data(lat: float, lng: float, radius: int = 500, satellites: bool = Query(False)):
-    """Return nearby OSM objects and optionally synthetic satellites.
+async def public_data(
+    request: Request,
+    lat: float,
+    lng: float,
+    radius: int = 500,
+    satellites: bool = Query(False),
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    lod: Optional[int] = Query(None, ge=0, le=FULL_LOD),
+):
+    """Return nearby OSM objects and, with ``satellites``, the satellites overhead.
+
+    Satellites are those above ``PUBLIC_DATA_SATELLITE_MIN_ELEVATION`` at
+    ``(lat, lng)`` now, highest first and at most
+    ``PUBLIC_DATA_SATELLITE_LIMIT`` of them. While the TLE catalog is still
+    downloading (in the background) a few synthetic satellites stand in.
+
+    Without ``lod`` ways and relations are reduced to their first point. With
+    ``lod`` (0 = coarsest .. FULL_LOD = unsimplified) they also carry their
+    geometry, simplified for that level of detail (see geometry_lod).
 
-    Note: import fetch_osm_objects lazily to avoid importing `requests` at module import
-    time which can slow startup in constrained environments or tests.
+    ``format=ndjson`` (or ``Accept: application/x-ndjson``) streams one
+    ``{type,id,lat,lon}`` record per line while Overpass data is still
+    arriving, instead of building the whole list first.
+
+    Note: import fetch_osm_objects lazily to avoid importing the HTTP client at module
+    import time which can slow startup in constrained environments or tests.
     """
-    osm_results = []
+    if fmt == "ndjson" or NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson(lat, lng, radius, satellites, lod), media_type=NDJSON)
+
+    results = []
     try:
-        from ..services.osm_services import fetch_osm_objects
-        osm_results = fetch_osm_objects(lat, lng, radius) or []
+        if lod is None:
+            from ..services.osm_services import fetch_osm_objects
+            results = [_normalize(e) for e in await fetch_osm_objects(lat, lng, radius) or []]
+        else:
+            from ..services.osm_services import fetch_osm_lod
+            results = list(await fetch_osm_lod(lat, lng, radius, lod))
     except Exception:
         # If OSM fails, return empty list but do not raise
-        osm_results = []
-
-    results = []
-    for e in osm_results:
-        item = {"type": e.get("type"), "id": e.get("id")}
-        # nodes tend to have lat/lon, ways/relations may include geometry
-        if e.get("lon") and e.get("lat"):
-            item.update({"lat": e.get("lat"), "lon": e.get("lon")})
-        elif e.get("geometry") and isinstance(e.get("geometry"), list) and e.get("geometry"):
-            coords = e.get("geometry")[0]
-            item.update({"lat": coords.get("lat"), "lon": coords.get("lon")})
-        results.append(item)
+        results = []
 
     if satellites:
-        # Add a small set of synthetic satellites computed from a simple orbit model
-        for angle in [0.0, 1.0, 2.5, 4.0]:
-            lon, lat, alt = compute_orbit(angle)
-            results.append({"type": "satellite", "lon": lon, "lat": lat, "alt": alt})
-
+        results.extend(await _satellite_items(lat, lng))
     return results
@@ -4,6 +4,10 @@ from .geo_routes import geo_router
 from .public_data_routes import public_data_router
 from .telecom_routes import telecom_router
 from .health_routes import health_router
+from .satellite_routes import satellite_router
+from .routing_routes import routing_router
+from .sensor_routes import sensor_router
+from .telemetry_routes import telemetry_router
 
 router = APIRouter()
 router.include_router(simulation_router)
@@ -11,3 +15,7 @@ router.include_router(geo_router)
 router.include_router(public_data_router)
 router.include_router(telecom_router)
 router.include_router(health_router)
+router.include_router(satellite_router)
+router.include_router(routing_router)
+router.include_router(sensor_router)
+router.include_router(telemetry_router)
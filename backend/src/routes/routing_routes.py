@@ -0,0 +1,54 @@
+import httpx
+import numpy as np
+from fastapi import APIRouter, HTTPException
+
+from ..services.road_graph import eta_matrix, parse_point
+
+routing_router = APIRouter(prefix="/api/routing", tags=["Routing"])
+
+# Upper bound on origins x destinations for one request
+MAX_CELLS = 250_000
+
+
+def _points(payload, name):
+    values = payload.get(name)
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail=f"{name} must be a non-empty list of points")
+    points = [parse_point(value) for value in values]
+    if None in points:
+        raise HTTPException(status_code=400, detail=f"{name}[{points.index(None)}] is not a {{lat, lon}} point")
+    return points
+
+
+def _rows(values, digits=1):
+    """Round for the wire and turn NaN (no route) into null."""
+    rounded = np.round(values, digits)
+    return [[None if v != v else v for v in row] for row in rounded.tolist()]
+
+
+@routing_router.post("/eta-matrix")
+async def eta_matrix_route(payload: dict):
+    """Travel time and distance from every origin to every destination.
+
+    The body has ``origins`` and ``destinations`` lists of ``{lat, lon}``
+    (or ``[lat, lon]``). ``durations_s[i][j]`` and ``distances_m[i][j]`` are
+    for origin i to destination j, null where either point is off the road
+    network or no route exists.
+    """
+    origins = _points(payload or {}, "origins")
+    destinations = _points(payload or {}, "destinations")
+    if len(origins) * len(destinations) > MAX_CELLS:
+        raise HTTPException(status_code=400, detail="Too many origin/destination pairs")
+    try:
+        result = await eta_matrix(origins, destinations)
+    except (httpx.HTTPError, ValueError) as exc:
+        raise HTTPException(status_code=502, detail=f"Road data unavailable: {exc}")
+    if result is None:
+        raise HTTPException(status_code=400, detail="Points are too far apart to route between")
+    seconds, metres = result
+    return {
+        "origins": len(origins),
+        "destinations": len(destinations),
+        "durations_s": _rows(seconds),
+        "distances_m": _rows(metres),
+    }
@@ -0,0 +1,183 @@
+import asyncio
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+
+from ..services.ephemeris_cache import get_ephemeris
+from ..services.pass_prediction import predict_passes
+from ..services.satellite_orbit_service import get_catalog, iso, parse_time
+
+satellite_router = APIRouter(prefix="/api/satellites", tags=["Satellites"])
+
+# Upper bound on satellites x timestamps propagated for one request
+MAX_SAMPLES = 2_000_000
+
+
+def _ids(ids):
+    if not ids:
+        return None
+    try:
+        return [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated NORAD numbers")
+
+
+def _column(values, digits=5):
+    """Round for the wire and turn NaN (failed propagation) into null."""
+    rounded = np.round(values, digits)
+    return [None if v != v else v for v in rounded.tolist()]
+
+
+async def _catalog():
+    try:
+        return await get_catalog()
+    except Exception as exc:
+        raise HTTPException(status_code=503, detail=f"TLE catalog unavailable: {exc}")
+
+
+@satellite_router.get("/")
+async def constellation(time: Optional[str] = None, ids: Optional[str] = None, limit: int = Query(0, ge=0)):
+    """Positions of every catalog satellite (or the NORAD ``ids``) at one instant."""
+    catalog = await _catalog()
+    try:
+        t = parse_time(time)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="time must be ISO-8601 or Unix seconds")
+    index = catalog.select(_ids(ids))
+    if limit:
+        index = index[:limit]
+    # Off the event loop: a cold ephemeris window takes about a second to build
+    lon, lat, alt = await asyncio.to_thread(get_ephemeris(catalog).positions, [t], index)
+    satellites = []
+    for k, row in enumerate(index.tolist()):
+        if lon[k, 0] != lon[k, 0]:
+            continue  # decayed or invalid elements
+        satellites.append({
+            "id": int(catalog.ids[row]),
+            "name": catalog.names[row],
+            "lon": round(float(lon[k, 0]), 5),
+            "lat": round(float(lat[k, 0]), 5),
+            "alt": round(float(alt[k, 0]), 1),
+        })
+    return {"time": iso(t), "count": len(satellites), "satellites": satellites}
+
+
+@satellite_router.get("/ephemeris/stats")
+async def ephemeris_stats():
+    """Window bounds and interpolated vs directly propagated sample counts."""
+    return get_ephemeris(await _catalog()).stats()
+
+
+@satellite_router.get("/track")
+async def track(
+    start: Optional[str] = None,
+    duration: float = Query(600.0, gt=0),
+    step: float = Query(60.0, gt=0),
+    ids: Optional[str] = None,
+    limit: int = Query(0, ge=0),
+):
+    """Positions over ``[start, start + duration]`` every ``step`` seconds.
+
+    The response is columnar: one shared ``times`` list and, per satellite,
+    ``lon``/``lat``/``alt`` lists aligned with it (null where propagation failed).
+    """
+    catalog = await _catalog()
+    try:
+        t0 = parse_time(start)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be ISO-8601 or Unix seconds")
+    times = t0 + np.arange(0.0, duration + step * 0.5, step)
+    index = catalog.select(_ids(ids))
+    if limit:
+        index = index[:limit]
+    if len(index) * len(times) > MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail="Too many samples; narrow ids, duration or step")
+    lon, lat, alt = await asyncio.to_thread(get_ephemeris(catalog).positions, times, index)
+    return {
+        "times": [iso(t) for t in times],
+        "satellites": [
+            {
+                "id": int(catalog.ids[row]),
+                "name": catalog.names[row],
+                "lon": _column(lon[k]),
+                "lat": _column(lat[k]),
+                "alt": _column(alt[k], 1),
+            }
+            for k, row in enumerate(index.tolist())
+        ],
+    }
+
+
+def _iso_or_none(ts):
+    return None if ts != ts else iso(ts)
+
+
+def _round_or_none(value, digits=3):
+    return None if value != value else round(float(value), digits)
+
+
+@satellite_router.get("/passes")
+async def passes(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    alt: float = 0.0,
+    start: Optional[str] = None,
+    duration: float = Query(3600.0, gt=0, le=7 * 86400),
+    step: float = Query(60.0, ge=5, le=600),
+    min_elevation: float = Query(10.0, ge=-5, le=89),
+    ids: Optional[str] = None,
+):
+    """Satellites overhead at ``start`` and every pass above ``min_elevation``.
+
+    ``rise``/``set`` are null for passes already in progress at ``start`` or
+    still up at the end of the window. Passes are ordered by culmination.
+    """
+    catalog = await _catalog()
+    try:
+        t0 = parse_time(start)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be ISO-8601 or Unix seconds")
+    index = catalog.select(_ids(ids))
+    if len(index) * (duration / step + 1) > MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail="Too many samples; narrow ids, duration or step")
+    ephemeris = get_ephemeris(catalog)
+    subset = None if ids is None else index
+    found, now = await asyncio.to_thread(
+        predict_passes, lambda times: ephemeris.teme(times, subset), len(index),
+        lat, lng, alt, t0, duration, step, min_elevation,
+    )
+
+    overhead = [
+        {
+            "id": int(catalog.ids[index[k]]),
+            "name": catalog.names[index[k]],
+            "elevation": round(float(now["elevation"][k]), 3),
+            "azimuth": round(float(now["azimuth"][k]), 3),
+        }
+        for k in np.flatnonzero(now["elevation"] >= min_elevation).tolist()
+    ]
+    overhead.sort(key=lambda sat: -sat["elevation"])
+
+    order = np.argsort(found["culmination"], kind="stable")
+    results = []
+    for p in order.tolist():
+        row = index[found["sat"][p]]
+        results.append({
+            "id": int(catalog.ids[row]),
+            "name": catalog.names[row],
+            "rise": _iso_or_none(found["rise"][p]),
+            "culmination": iso(found["culmination"][p]),
+            "set": _iso_or_none(found["set"][p]),
+            "max_elevation": _round_or_none(found["max_elevation"][p]),
+            "rise_azimuth": _round_or_none(found["rise_azimuth"][p]),
+            "set_azimuth": _round_or_none(found["set_azimuth"][p]),
+        })
+    return {
+        "observer": {"lat": lat, "lng": lng, "alt": alt},
+        "start": iso(t0),
+        "end": iso(t0 + duration),
+        "min_elevation": min_elevation,
+        "overhead": overhead,
+        "passes": results,
+    }
@@ -0,0 +1,105 @@
+import asyncio
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+
+from ..services.environment_loader import to_latlon, to_local
+from ..services.road_graph import parse_point
+from ..simulation.entity_store import DEFAULT_RADIUS, EntityStore
+from ..simulation.raycast import get_scene, scene_area
+from ..simulation.sensors import Sensor, SensorEngine
+
+sensor_router = APIRouter(prefix="/api/sensors", tags=["Sensors"])
+
+# Upper bound on rays cast for one request
+MAX_RAYS = 500_000
+_OPTIONS = ("range", "min_range", "fov", "vertical_fov", "horizontal_fov", "rows", "columns")
+
+
+def _number(value, default, name):
+    try:
+        return float(value if value is not None else default)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} must be a number")
+
+
+def _sensors(payload):
+    values = payload.get("sensors")
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail="sensors must be a non-empty list")
+    sensors = []
+    for k, value in enumerate(values):
+        point = parse_point(value) if isinstance(value, dict) else None
+        if point is None:
+            raise HTTPException(status_code=400, detail=f"sensors[{k}] needs a lat and lon")
+        options = {name: value[name] for name in _OPTIONS if value.get(name) is not None}
+        try:
+            sensor = Sensor(value.get("id", f"sensor-{k}"), value.get("type", "lidar"),
+                            heading=float(value.get("heading") or 0.0), pitch=float(value.get("pitch") or 0.0),
+                            **options)
+        except (TypeError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail=f"sensors[{k}]: {exc}")
+        sensors.append((sensor, point, _number(value.get("height"), 2.0, f"sensors[{k}].height")))
+    return sensors
+
+
+def _entities(payload, origin):
+    values = payload.get("entities") or []
+    store = EntityStore(max(1, len(values)))
+    for k, value in enumerate(values):
+        point = parse_point(value) if isinstance(value, dict) else None
+        if point is None:
+            raise HTTPException(status_code=400, detail=f"entities[{k}] needs a lat and lon")
+        x, y = to_local(origin, [point])[0]
+        velocity = value.get("velocity") or (0.0, 0.0, 0.0)
+        try:
+            store.add(value.get("id", f"entity-{k}"), value.get("type", "object"),
+                      position=(x, y, _number(value.get("height"), 0.0, f"entities[{k}].height")),
+                      velocity=[float(v) for v in velocity],
+                      radius=_number(value.get("radius"), DEFAULT_RADIUS, f"entities[{k}].radius"))
+        except (TypeError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail=f"entities[{k}]: {exc}")
+    return store
+
+
+def _scan_body(scan, origin, points):
+    body = scan.to_dict(points=False)
+    lat, lon = to_latlon(origin, scan.origin[:2])[0]
+    body["origin"] = {"lat": round(lat, 7), "lon": round(lon, 7), "height": round(float(scan.origin[2]), 3)}
+    if points:
+        latlon = np.round(to_latlon(origin, scan.points[:, :2]), 7)
+        heights = np.round(scan.points[:, 2], 3)
+        body["points"] = [[a, b, h] for (a, b), h in zip(latlon.tolist(), heights.tolist())]
+    return body
+
+
+@sensor_router.post("/scan")
+async def scan(payload: dict):
+    """Scan range sensors against the OSM buildings (and given entities) around them.
+
+    ``sensors`` is a list of ``{id, type, lat, lon, height, heading, pitch,
+    range, fov, rows, columns}`` (type ``lidar``, ``radar`` or
+    ``ultrasonic``; everything but lat/lon optional). ``entities`` may add
+    ``{id, lat, lon, height, radius, velocity}`` spheres; velocity is
+    ``[east, north, up]`` m/s. Each scan has a ``ranges`` image (null where
+    nothing was hit), ``points`` as ``[lat, lon, height]`` unless
+    ``points`` is false, and per-entity ``detections``.
+    """
+    payload = payload or {}
+    sensors = _sensors(payload)
+    if sum(sensor.rays for sensor, _, _ in sensors) > MAX_RAYS:
+        raise HTTPException(status_code=400, detail="Too many rays")
+    area = scene_area([point for _, point, _ in sensors], max(sensor.range for sensor, _, _ in sensors))
+    if area is None:
+        raise HTTPException(status_code=400, detail="Sensors are too far apart or reach too far")
+    origin = area[:2]
+    store = _entities(payload, origin)
+    scene = await get_scene(*area)
+    engine = SensorEngine(scene)
+    for sensor, point, height in sensors:
+        x, y = to_local(origin, [point])[0]
+        sensor.position = np.array([x, y, height])
+        engine.add(sensor)
+    scans = await asyncio.get_running_loop().run_in_executor(None, engine.scan, None, store)
+    points = payload.get("points", True) is not False
+    return {"scans": [_scan_body(scans[sensor.id], origin, points) for sensor, _, _ in sensors]}
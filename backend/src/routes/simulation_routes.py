@@ -1,4 +1,9 @@
-from fastapi import APIRouter
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..config.env import SIM_TRACE_DIR
 
 # Simplified simulation routes to avoid importing missing intelligence modules
 router = APIRouter(prefix="/api/simulation", tags=["Simulation"])
@@ -13,13 +18,78 @@ def zone(lat: float, lng: float, radius: int = 500):
     }
 
 @router.post("/vehicle/action")
-def vehicle_action(action: dict):
+async def vehicle_action(action: dict):
     """
     Receives AI or user actions like BRAKE, STOP, RESUME
+
+    A DRIVE action with a destination (lat/lon) and an origin ({lat, lon})
+    comes back with its road route (see services/road_graph.py).
     """
+    from ..simulation.trace import get_recorder
+
+    recorder = get_recorder()
+    if recorder is not None:
+        recorder.record_input(action, source="vehicle_action")
+    if str(action.get("type", "")).lower() == "drive":
+        from ..services.road_graph import parse_point, route_action
+        action = await route_action(dict(action), parse_point(action.get("origin")))
     return {
         "status": "ok",
         "applied_action": action
     }
 
 
+def _trace_dir(run):
+    root = Path(SIM_TRACE_DIR) if SIM_TRACE_DIR else None
+    if root is None or Path(run).name != run or not (root / run / "index.bin").exists():
+        raise HTTPException(status_code=404, detail="Unknown trace")
+    return root / run
+
+
+@router.get("/traces")
+def traces():
+    """Recorded runs under SIM_TRACE_DIR with their tick ranges."""
+    from ..simulation.trace import TraceReader
+
+    if not SIM_TRACE_DIR or not Path(SIM_TRACE_DIR).is_dir():
+        return {"traces": []}
+    runs = []
+    for path in sorted(Path(SIM_TRACE_DIR).iterdir()):
+        if (path / "index.bin").exists():
+            with TraceReader(path) as reader:
+                runs.append({"run": path.name, "first_tick": reader.first_tick, "last_tick": reader.last_tick})
+    return {"traces": runs}
+
+
+@router.get("/traces/{run}")
+def replay(run: str, tick: int = Query(..., ge=0), inputs: bool = False):
+    """Entities at ``tick`` of a recorded run (the last recorded tick at or before it).
+
+    With ``inputs=true`` the inputs recorded up to that tick are included.
+    """
+    from ..simulation.trace import TraceReader
+
+    with TraceReader(_trace_dir(run)) as reader:
+        found = reader.snapshot(tick)
+        if found is None:
+            raise HTTPException(status_code=404, detail="Tick not in trace")
+        recorded, entities = found
+        body = {"run": run, "tick": recorded, "entities": entities}
+        if inputs:
+            body["inputs"] = reader.inputs(stop=recorded)
+    return body
+
+
+@router.get("/traces/{run}/inputs")
+def trace_inputs(run: str, start: Optional[int] = None, stop: Optional[int] = None,
+                 since: Optional[float] = None, until: Optional[float] = None):
+    """Inputs recorded in a run, filtered by tick (``start``/``stop``) and Unix time (``since``/``until``).
+
+    This also covers runs without ticks, such as the API's ``api-*`` runs of
+    vehicle actions; their times line up with the physics run's inputs.
+    """
+    from ..simulation.trace import TraceReader
+
+    with TraceReader(_trace_dir(run)) as reader:
+        return {"run": run, "first_tick": reader.first_tick, "last_tick": reader.last_tick,
+                "inputs": reader.inputs(start, stop, since, until)}
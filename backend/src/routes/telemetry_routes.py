@@ -0,0 +1,131 @@
+from typing import Optional, Union
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+
+from ..services.telemetry_store import get_telemetry_store, history_name
+
+telemetry_router = APIRouter(prefix="/api/telemetry", tags=["Telemetry"])
+
+# Default window of a series query when no start is given (ms)
+DEFAULT_WINDOW_MS = 3600 * 1000.0
+
+
+@telemetry_router.websocket("/ws")
+async def telemetry_socket(websocket: WebSocket):
+    """Ingest telemetry messages sent by ``SensorRealtimeWS`` (one JSON message or batch per frame)."""
+    await websocket.accept()
+    store = get_telemetry_store()
+    try:
+        while True:
+            store.ingest_json(await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+
+
+@telemetry_router.post("/ingest")
+async def ingest(payload: Union[dict, list] = Body(...)):
+    """Ingest one telemetry message, a list of them, or a columnar batch."""
+    try:
+        samples = get_telemetry_store().ingest(payload)
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"samples": samples}
+
+
+@telemetry_router.get("/channels")
+def channels():
+    """Every sensor field with data: ``sensorId``, ``sensorType``, ``field``, sample count and last time (ms)."""
+    found = get_telemetry_store().list_channels()
+    for channel in found:
+        if channel["last"] is not None:
+            channel["last"] *= 1000.0
+    return {"channels": found}
+
+
+def _row(store, sensor_id, field):
+    row = store.find(sensor_id, field)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"No telemetry for {sensor_id}/{field}")
+    return row
+
+
+@telemetry_router.get("/series")
+def series(
+    sensorId: str,
+    field: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    points: int = Query(500, ge=1, le=10000),
+):
+    """Min/max/mean of one sensor field over ``[start, end]`` (Unix ms) in at most ``points`` buckets.
+
+    ``end`` defaults to the newest sample and ``start`` to an hour before it.
+    Only rollups are read, so any range costs the same.
+    """
+    store = get_telemetry_store()
+    row = _row(store, sensorId, field)
+    if end is None:
+        last = store.last_time(row)
+        end = last * 1000.0 if last is not None else 0.0
+    if start is None:
+        start = end - DEFAULT_WINDOW_MS
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    body = store.series(row, start / 1000.0, end / 1000.0, points)
+    body["resolution_ms"] = body.pop("resolution") * 1000.0
+    body["t"] = [t * 1000.0 for t in body["t"]]
+    return {"sensorId": sensorId, "field": field, **body}
+
+
+@telemetry_router.get("/raw")
+def raw(
+    sensorId: str,
+    field: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: int = Query(1000, ge=0),
+):
+    """The newest raw samples (at most ``limit``) of one sensor field still held in memory."""
+    store = get_telemetry_store()
+    row = _row(store, sensorId, field)
+    t, values = store.raw(row, start / 1000.0 if start is not None else float("-inf"),
+                          end / 1000.0 if end is not None else float("inf"), limit)
+    return {"sensorId": sensorId, "field": field, "t": (t * 1000.0).tolist(), "values": values.tolist()}
+
+
+@telemetry_router.get("/history")
+def history(
+    sensorId: str,
+    field: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: int = Query(10000, ge=1, le=1_000_000),
+):
+    """Raw samples of one sensor field from the on-disk history (HISTORY_DIR), oldest first.
+
+    Only the time partitions and segments overlapping ``[start, end]`` (Unix
+    ms) are read. At most ``limit`` samples are returned; ``truncated`` says
+    whether there were more. The newest samples may still be buffered in
+    memory, where ``/raw`` has them.
+    """
+    store = get_telemetry_store()
+    if store.history is None:
+        raise HTTPException(status_code=404, detail="Telemetry history is not enabled (set HISTORY_DIR)")
+    t, values = store.history.read(history_name(sensorId, field),
+                                   start / 1000.0 if start is not None else float("-inf"),
+                                   end / 1000.0 if end is not None else float("inf"))
+    return {"sensorId": sensorId, "field": field, "t": (t[:limit] * 1000.0).tolist(),
+            "values": values[:limit, 0].tolist(), "truncated": len(t) > limit}
+
+
+@telemetry_router.get("/stats")
+def stats(request: Request):
+    """Store counters and memory use, plus the MQTT bridge state when one runs."""
+    store = get_telemetry_store()
+    body = store.stats()
+    if store.history is not None:
+        body["history"] = store.history.stats()
+    bridge = getattr(request.app.state, "mqtt_bridge", None)
+    if bridge is not None:
+        body["mqtt"] = bridge.stats()
+    return body
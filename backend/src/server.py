@@ -3,9 +3,14 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse
 from pathlib import Path
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
+from .services.http_client import get_http_client, close_http_client
+from .services.geocoding_service import geocode
+from .services.road_graph import close_eta_pool, parse_point, route_action
+
 # --------------------------------------------------
 # Paths
 # --------------------------------------------------
@@ -27,7 +32,37 @@ print("🧪 TOKEN INJECTION ENABLED:", ALLOW_INJECT)
 # --------------------------------------------------
 # App
 # --------------------------------------------------
-app = FastAPI(title="Digital Twin Platform")
+@asynccontextmanager
+async def lifespan(app):
+    from .config.env import SIM_TRACE_DIR, TELEMETRY_MQTT_TOPIC, TELEMETRY_MQTT_URL
+    from .services.model_assets import close_model_assets
+    from .services.mqtt_bridge import MQTTBridge
+    from .services.telemetry_store import close_telemetry_store, get_telemetry_store
+    from .simulation.trace import TraceRecorder, run_dir, set_recorder
+
+    # Record vehicle actions next to the physics traces when tracing is on
+    recorder = TraceRecorder(run_dir(SIM_TRACE_DIR, "api")) if SIM_TRACE_DIR else None
+    if recorder is not None:
+        set_recorder(recorder)
+    # Feed telemetry published on the MQTT broker into the same store as /api/telemetry/ws
+    bridge = MQTTBridge(TELEMETRY_MQTT_URL, TELEMETRY_MQTT_TOPIC, get_telemetry_store()) if TELEMETRY_MQTT_URL else None
+    app.state.mqtt_bridge = bridge
+    if bridge is not None:
+        bridge.start()
+    yield
+    if bridge is not None:
+        await bridge.stop()
+    close_telemetry_store()
+    close_model_assets()
+    if recorder is not None:
+        set_recorder(None)
+        recorder.close()
+    # Release pooled upstream connections (Overpass, Nominatim, Cesium) and ETA workers
+    await close_http_client()
+    close_eta_pool()
+
+
+app = FastAPI(title="Digital Twin Platform", lifespan=lifespan)
 
 # --------------------------------------------------
 # Static files
@@ -90,17 +125,15 @@ def favicon():
 # Debug endpoint
 # --------------------------------------------------
 @app.get("/debug/cesium_token_check")
-def cesium_token_check():
+async def cesium_token_check():
     """
     Verify that the server-side Cesium token is valid.
     """
-    import requests
-
     if not CESIUM_ION_TOKEN:
         return {"valid": False, "reason": "CESIUM_ION_TOKEN not set"}
 
     try:
-        r = requests.get(
+        r = await get_http_client().get(
             f"https://api.cesium.com/v1/assets/2/endpoint?access_token={CESIUM_ION_TOKEN}",
             timeout=5,
         )
@@ -122,6 +155,10 @@ from .routes import (
     simulation_router,
     health_router,
     assets_router,
+    satellite_router,
+    routing_router,
+    sensor_router,
+    telemetry_router,
 )
 
 app.include_router(geo_router)
@@ -130,6 +167,10 @@ app.include_router(telecom_router)
 app.include_router(simulation_router)
 app.include_router(health_router)
 app.include_router(assets_router)
+app.include_router(satellite_router)
+app.include_router(routing_router)
+app.include_router(sensor_router)
+app.include_router(telemetry_router)
 
 
 # --------------------------------------------------
@@ -140,39 +181,35 @@ AIEngine = None
 
 
 @app.post("/ai_query")
-def ai_query(payload: dict):
+async def ai_query(payload: dict):
     msg = (payload or {}).get("message") or (payload or {}).get("query") or ""
     if not msg:
         return JSONResponse({"error": "No message provided"}, status_code=400)
 
-    # Handle 'drive to <place>' by geocoding the place name (Nominatim)
+    # With an "origin" ({lat, lon}) drive actions also carry a road route
+    origin = parse_point((payload or {}).get("origin"))
+
+    # Handle 'drive to <place>' by geocoding the place name (cached, then Nominatim)
     try:
         if "drive to" in msg.lower():
-            import requests
             loc = msg.lower().split("drive to", 1)[1].strip()
             if loc:
                 try:
-                    r = requests.get(
-                        "https://nominatim.openstreetmap.org/search",
-                        params={"format": "json", "q": loc, "limit": 1},
-                        headers={"User-Agent": "DigitalTwin/1.0"},
-                        timeout=5,
-                    )
-                    data = r.json()
-                    if data:
-                        lat = float(data[0]["lat"])
-                        lon = float(data[0]["lon"])
+                    place = await geocode(loc)
+                    if place:
                         return {
-                            "message": f"Driving to {data[0].get('display_name', loc)}",
+                            "message": f"Driving to {place['display_name']}",
                             "success": True,
-                            "action": {"type": "drive", "lat": lat, "lon": lon},
+                            "action": await route_action(
+                                {"type": "drive", "lat": place["lat"], "lon": place["lon"]}, origin
+                            ),
                         }
                     else:
                         return {"message": f"Location not found: {loc}", "success": False}
                 except Exception as e:
                     return JSONResponse({"error": str(e)}, status_code=500)
     except Exception:
-        # If requests is not available or any other failure, fall through to coordinate parsing
+        # On any other failure, fall through to coordinate parsing
         pass
 
     # Simple fallback AI (coordinate parsing)
@@ -182,11 +219,11 @@ def ai_query(payload: dict):
         return {
             "message": msg,
             "success": True,
-            "action": {
+            "action": await route_action({
                 "type": "drive",
                 "lat": float(m.group(1)),
                 "lon": float(m.group(2)),
-            },
+            }, origin),
         }
 
     return {"message": f"AI not configured. Received: {msg}", "success": False}
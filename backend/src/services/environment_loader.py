@@ -1,3 +1,105 @@
+"""Road environment compiled from OSM elements.
+
+``load_environment`` gives the flat summary (one speed zone per road, the
+police checkpoints). ``compile_environment`` builds a ``RoadEnvironment`` for
+the simulation: every ``highway`` way is projected to local metres around an
+origin (x east, y north, as in ``EntityStore.position``) and split into short
+pieces bucketed by grid cell, so that snapping every vehicle to its nearest
+road and speed limit is a few array operations per tick.
+"""
+import math
+import re
+
+import numpy as np
+
+from .osm_tile_cache import METERS_PER_DEG_LAT
+
+KMH = 1000.0 / 3600.0
+
+# Limits for roads without a usable maxspeed tag, km/h
+DEFAULT_SPEEDS = {
+    "motorway": 110.0, "motorway_link": 80.0,
+    "trunk": 90.0, "trunk_link": 60.0,
+    "primary": 60.0, "primary_link": 50.0,
+    "secondary": 50.0, "tertiary": 50.0,
+    "residential": 30.0, "living_street": 10.0, "service": 20.0,
+    "track": 30.0, "path": 10.0, "footway": 5.0, "cycleway": 20.0, "pedestrian": 5.0,
+}
+DEFAULT_SPEED = 50.0
+
+# Implicit maxspeed values ("DE:urban", "walk", ...), km/h; "none" is unlimited
+ZONE_SPEEDS = {"urban": 50.0, "rural": 100.0, "trunk": 100.0, "motorway": 130.0,
+               "living_street": 10.0, "bicycle_road": 30.0, "walk": 5.0, "none": math.inf}
+UNIT_FACTORS = {"": 1.0, "km/h": 1.0, "kmh": 1.0, "kph": 1.0, "mph": 1.609344, "knots": 1.852}
+_SPEED = re.compile(r"^\s*([\d.]+)\s*(km/h|kmh|kph|mph|knots)?\s*$")
+
+_NEIGHBOURS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+
+
+def parse_maxspeed(value):
+    """Return an OSM ``maxspeed`` value in km/h, or None when it has no limit we can use.
+
+    Handles bare numbers, unit suffixes (``mph``, ``knots``, ``km/h``), zone
+    codes such as ``DE:urban`` and lists (``"50;30"``, the lowest wins).
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    speeds = []
+    for part in str(value).split(";"):
+        part = part.strip().lower()
+        match = _SPEED.match(part)
+        if match:
+            speed = float(match.group(1)) * UNIT_FACTORS[match.group(2) or ""]
+        else:
+            speed = ZONE_SPEEDS.get(part.split(":")[-1])
+        if speed:
+            speeds.append(speed)
+    return min(speeds) if speeds else None
+
+
+def road_speed(tags):
+    """Speed limit of a ``highway`` way in km/h (``inf`` for unlimited)."""
+    speed = parse_maxspeed(tags.get("maxspeed"))
+    if speed is None:
+        speed = DEFAULT_SPEEDS.get(tags.get("highway"), DEFAULT_SPEED)
+    return speed
+
+
+def to_local(origin, latlon):
+    """Map ``(n, 2)`` (lat, lon) to ``(n, 2)`` (x east, y north) metres around ``origin``."""
+    lat0, lon0 = origin
+    latlon = np.asarray(latlon, dtype=np.float64).reshape(-1, 2)
+    xy = np.empty((len(latlon), 2), dtype=np.float64)
+    xy[:, 0] = (latlon[:, 1] - lon0) * METERS_PER_DEG_LAT * math.cos(math.radians(lat0))
+    xy[:, 1] = (latlon[:, 0] - lat0) * METERS_PER_DEG_LAT
+    return xy
+
+
+def to_latlon(origin, xy):
+    """Inverse of ``to_local``: ``(n, 2)`` local metres to (lat, lon)."""
+    lat0, lon0 = origin
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    latlon = np.empty((len(xy), 2), dtype=np.float64)
+    latlon[:, 0] = lat0 + xy[:, 1] / METERS_PER_DEG_LAT
+    latlon[:, 1] = lon0 + xy[:, 0] / (METERS_PER_DEG_LAT * math.cos(math.radians(lat0)))
+    return latlon
+
+
+def _point(el):
+    if el.get("lat") is not None and el.get("lon") is not None:
+        return el["lat"], el["lon"]
+    center = el.get("center")
+    if center:
+        return center["lat"], center["lon"]
+    geometry = [p for p in el.get("geometry") or [] if p]
+    if geometry:
+        return (sum(p["lat"] for p in geometry) / len(geometry),
+                sum(p["lon"] for p in geometry) / len(geometry))
+    return None
+
+
 def load_environment(osm_elements):
     speed_zones = []
     checkpoints = []
@@ -5,9 +107,12 @@ def load_environment(osm_elements):
     for el in osm_elements:
         tags = el.get("tags", {})
         if tags.get("highway"):
+            speed = road_speed(tags)
             speed_zones.append({
                 "type": "road",
-                "max_speed": tags.get("maxspeed", 50)
+                "id": el.get("id"),
+                # km/h; None where the road has no limit
+                "max_speed": speed if math.isfinite(speed) else None
             })
 
         if tags.get("amenity") == "police":
@@ -17,3 +122,202 @@ def load_environment(osm_elements):
         "speed_zones": speed_zones,
         "checkpoints": checkpoints
     }
+
+
+class RoadSnap:
+    """Per-position result of ``RoadEnvironment.snap``; row ``k`` is position ``k``.
+
+    ``segment`` and ``way`` are -1 (and ``speed_limit`` NaN) where no road is
+    within the snapping distance. ``speed_limit`` is in m/s.
+    """
+
+    def __init__(self, segment, way, distance, point, speed_limit):
+        self.segment = segment
+        self.way = way
+        self.distance = distance
+        self.point = point
+        self.speed_limit = speed_limit
+
+    def __len__(self):
+        return len(self.segment)
+
+
+class RoadEnvironment:
+    """Road segments, speed limits and checkpoints in local metres.
+
+    Ways are cut into pieces no longer than ``cell_size`` and each piece is
+    bucketed by the grid cell of its midpoint: pieces are stored sorted by
+    cell, with a dense CSR ``cell_start`` table over the covered extent. Any
+    piece within ``cell_size / 2`` of a point then has its midpoint in the
+    point's cell or one of the 8 around it.
+    """
+
+    def __init__(self, origin, ways, checkpoints=(), max_distance=25.0):
+        """``ways`` is ``[(way id, tags, [(lat, lon), ...])]``; ``checkpoints`` are OSM elements."""
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.max_distance = float(max_distance)
+        self.cell_size = 2.0 * self.max_distance
+        self.way_ids = []
+        self.way_tags = []
+        speeds = []
+        starts, ends, owners = [], [], []
+        for way_id, tags, coords in ways:
+            line = self.project(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+            if len(line) < 2:
+                continue
+            a, b = self._split(line[:-1], line[1:])
+            starts.append(a)
+            ends.append(b)
+            owners.append(np.full(len(a), len(self.way_ids), dtype=np.int64))
+            self.way_ids.append(way_id)
+            self.way_tags.append(tags)
+            speeds.append(road_speed(tags) * KMH)
+        self.way_speed = np.asarray(speeds, dtype=np.float64)
+        self.a = np.concatenate(starts) if starts else np.empty((0, 2))
+        self.b = np.concatenate(ends) if ends else np.empty((0, 2))
+        self.segment_way = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+
+        cells = np.floor((self.a + self.b) * 0.5 / self.cell_size).astype(np.int64)
+        # The table has a two-cell margin so the 3x3 block around any cell
+        # next to a piece stays inside it, plus one extra, always empty cell
+        # that answers lookups further out
+        low = cells.min(axis=0) if len(cells) else np.zeros(2, dtype=np.int64)
+        high = cells.max(axis=0) if len(cells) else np.zeros(2, dtype=np.int64)
+        self.cell_min = low - 2
+        self.cell_shape = high - low + 5
+        self._empty_cell = int(np.prod(self.cell_shape))
+        self._neighbours = _NEIGHBOURS[:, 0] * self.cell_shape[1] + _NEIGHBOURS[:, 1]
+        local = cells - self.cell_min
+        keys = local[:, 0] * self.cell_shape[1] + local[:, 1]
+        order = np.argsort(keys, kind="stable")
+        self.a, self.b, self.segment_way = self.a[order], self.b[order], self.segment_way[order]
+        counts = np.bincount(keys, minlength=self._empty_cell + 1)
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+        ab = self.b - self.a
+        length2 = np.einsum("ij,ij->i", ab, ab)
+        inv_length2 = np.divide(1.0, length2, out=np.zeros_like(length2), where=length2 > 0)
+        # Everything the distance test needs, gathered with one fancy index
+        self._pieces = np.column_stack((self.a, ab, inv_length2))
+
+        self.checkpoints = list(checkpoints)
+        points = [_point(el) for el in self.checkpoints]
+        self.checkpoints = [el for el, p in zip(self.checkpoints, points) if p is not None]
+        points = [p for p in points if p is not None]
+        self.checkpoint_xy = self.project(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+
+    def __len__(self):
+        return len(self.a)
+
+    def project(self, latlon):
+        """Map ``(n, 2)`` (lat, lon) to local ``(n, 2)`` (x east, y north) metres."""
+        return to_local(self.origin, latlon)
+
+    def _split(self, a, b):
+        """Cut segments into equal pieces of at most ``cell_size``."""
+        pieces = np.maximum(1, np.ceil(np.hypot(*(b - a).T) / self.cell_size)).astype(np.int64)
+        owner = np.repeat(np.arange(len(a)), pieces)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        step = (b - a)[owner] / pieces[owner, None]
+        start = a[owner] + step * k[:, None]
+        return start, start + step
+
+    def _blocks(self, xy):
+        """Flat table indices of the 3x3 cells around each position, ``(n, 9)``."""
+        local = np.floor(xy / self.cell_size).astype(np.int64) - self.cell_min
+        inside = (local[:, 0] >= 1) & (local[:, 0] < self.cell_shape[0] - 1)
+        inside &= (local[:, 1] >= 1) & (local[:, 1] < self.cell_shape[1] - 1)
+        centre = local[:, 0] * self.cell_shape[1] + local[:, 1]
+        return np.where(inside[:, None], centre[:, None] + self._neighbours, self._empty_cell)
+
+    def snap(self, positions):
+        """Snap ``(n, >=2)`` local positions (x, y used) to the nearest road piece."""
+        xy = np.asarray(positions, dtype=np.float64)[:, :2]
+        n = len(xy)
+        segment = np.full(n, -1, dtype=np.int64)
+        distance = np.full(n, np.inf)
+        point = xy.copy()
+        if n and len(self.a):
+            # Candidates are listed position-major, so each position's are contiguous
+            index = self._blocks(xy).ravel()
+            starts = self.cell_start[index]
+            counts = self.cell_start[index + 1] - starts
+            total = int(counts.sum())
+            piece = np.repeat(starts, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+            per_position = counts.reshape(n, 9).sum(axis=1)
+            owner = np.repeat(np.arange(n), per_position)
+            if total:
+                seg = self._pieces[piece]
+                px = np.repeat(xy[:, 0], per_position)
+                py = np.repeat(xy[:, 1], per_position)
+                t = np.clip(((px - seg[:, 0]) * seg[:, 2] + (py - seg[:, 1]) * seg[:, 3]) * seg[:, 4], 0.0, 1.0)
+                fx = seg[:, 0] + seg[:, 2] * t
+                fy = seg[:, 1] + seg[:, 3] * t
+                dist = np.hypot(fx - px, fy - py)
+                # Nearest candidate per position: segmented minimum, then the
+                # first candidate that reaches it
+                has = np.flatnonzero(per_position)
+                offsets = np.cumsum(per_position) - per_position
+                best = np.full(n, np.inf)
+                best[has] = np.minimum.reduceat(dist, offsets[has])
+                ties = np.flatnonzero(dist == best[owner])
+                first = ties[np.r_[True, owner[ties][1:] != owner[ties][:-1]]]
+                hit = first[dist[first] <= self.max_distance]
+                rows = owner[hit]
+                segment[rows] = piece[hit]
+                distance[rows] = dist[hit]
+                point[rows, 0] = fx[hit]
+                point[rows, 1] = fy[hit]
+        found = segment >= 0
+        way = np.full(n, -1, dtype=np.int64)
+        way[found] = self.segment_way[segment[found]]
+        speed = np.full(n, np.nan)
+        speed[found] = self.way_speed[way[found]]
+        return RoadSnap(segment, way, distance, point, speed)
+
+    def nearest_checkpoint(self, positions, radius):
+        """Index into ``checkpoints`` of the nearest one within ``radius`` metres, else -1."""
+        xy = np.asarray(positions, dtype=np.float64)[:, :2]
+        result = np.full(len(xy), -1, dtype=np.int64)
+        if not len(self.checkpoint_xy) or not len(xy):
+            return result
+        # Checkpoints are few; a dense (n, k) distance table is cheapest
+        dist = np.hypot(xy[:, None, 0] - self.checkpoint_xy[None, :, 0],
+                        xy[:, None, 1] - self.checkpoint_xy[None, :, 1])
+        best = dist.argmin(axis=1)
+        near = dist[np.arange(len(xy)), best] <= radius
+        result[near] = best[near]
+        return result
+
+
+def compile_environment(osm_elements, origin=None, max_distance=25.0):
+    """Build a ``RoadEnvironment`` from Overpass elements (``out geom``).
+
+    ``origin`` (lat, lon) anchors the local frame; by default the centre of
+    the elements' extent.
+    """
+    ways = []
+    checkpoints = []
+    for el in osm_elements:
+        tags = el.get("tags") or {}
+        if tags.get("highway") and isinstance(el.get("geometry"), list):
+            coords = [(p["lat"], p["lon"]) for p in el["geometry"] if p]
+            if len(coords) > 1:
+                ways.append((el.get("id"), tags, coords))
+        if tags.get("amenity") == "police":
+            checkpoints.append(el)
+    if origin is None:
+        points = [c for _, _, coords in ways for c in coords] + [p for p in map(_point, checkpoints) if p]
+        if points:
+            lats, lons = zip(*points)
+            origin = ((min(lats) + max(lats)) / 2.0, (min(lons) + max(lons)) / 2.0)
+        else:
+            origin = (0.0, 0.0)
+    return RoadEnvironment(origin, ways, checkpoints, max_distance)
+
+
+async def load_road_environment(lat, lng, radius, max_distance=25.0):
+    """Fetch OSM around a point and compile it with the point as origin."""
+    from .osm_services import fetch_osm_objects
+
+    elements = await fetch_osm_objects(lat, lng, radius) or []
+    return compile_environment(elements, origin=(lat, lng), max_distance=max_distance)
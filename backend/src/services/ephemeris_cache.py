@@ -0,0 +1,212 @@
+"""Precomputed satellite ephemerides served by interpolation.
+
+Running SGP4 for every satellite on every viewer request repeats the same
+work many times a second. ``EphemerisCache`` instead propagates the whole
+catalog once at coarse knots (every ``step`` seconds) over a rolling window
+and answers arbitrary timestamps by interpolating the stored TEME states:
+8-point Lagrange over neighbouring positions (default; millimetre error at
+60 s knots for LEO) or cubic Hermite from positions and velocities (about a
+metre; see scripts/bench_ephemeris.py). The interpolated TEME positions go
+through the same geodetic conversion as direct propagation.
+
+When requests start within ``margin`` seconds of the window end, the next
+window is built in a background thread and swapped in when ready; the old
+one is dropped. A cold start (or a clock past the window) builds the window
+in the calling thread, once however many threads ask -- routes call the
+cache from worker threads, never on the event loop. Windows propagate a
+private copy of the element sets, so a build never races requests.
+Timestamps the window does not cover -- e.g. a track far in the future --
+are propagated directly and leave the live window alone.
+"""
+import threading
+import time
+
+import numpy as np
+
+from .satellite_orbit_service import teme_to_geodetic
+
+
+class EphemerisWindow:
+    """TEME states of every catalog satellite at ``start + k * step``.
+
+    States are stored knot-major, ``(n_knots, n_sats, 3)``, so interpolating
+    one timestamp reads two (or ``order``) contiguous blocks.
+    """
+
+    def __init__(self, catalog, start, step, span):
+        self.catalog = catalog
+        self.start = float(start)
+        self.step = float(step)
+        self.knots = self.start + np.arange(int(np.ceil(span / step)) + 1) * self.step
+        _, r, v = catalog.propagate_teme(self.knots, private=True)
+        self.r = np.ascontiguousarray(r.transpose(1, 0, 2))
+        self.v = np.ascontiguousarray(v.transpose(1, 0, 2))
+        self.built_at = time.time()
+
+    @property
+    def end(self):
+        return float(self.knots[-1])
+
+    @staticmethod
+    def _at(states, knots, index):
+        """States at per-timestamp knots, ``(m, n, 3)``, for the ``index`` rows."""
+        block = states[knots]
+        return block if index is None else block[:, index]
+
+    def hermite(self, times, index=None):
+        """Cubic Hermite TEME positions ``(n, m, 3)``; times must be covered."""
+        k = np.minimum(((times - self.start) // self.step).astype(np.int64), len(self.knots) - 2)
+        s = ((times - self.knots[k]) / self.step)[:, None, None]
+        s2 = s * s
+        s3 = s2 * s
+        h00 = 2 * s3 - 3 * s2 + 1
+        h10 = (s3 - 2 * s2 + s) * self.step
+        h01 = 3 * s2 - 2 * s3
+        h11 = (s3 - s2) * self.step
+        out = h00 * self._at(self.r, k, index)
+        out += h01 * self._at(self.r, k + 1, index)
+        out += h10 * self._at(self.v, k, index)
+        out += h11 * self._at(self.v, k + 1, index)
+        return out.transpose(1, 0, 2)
+
+    def lagrange(self, times, index=None, order=8):
+        """Lagrange interpolation over ``order`` knots around each time."""
+        n_knots = len(self.knots)
+        order = min(order, n_knots)
+        k = ((times - self.start) // self.step).astype(np.int64)
+        first = np.clip(k - (order // 2 - 1), 0, n_knots - order)
+        # Node offsets and the time in step units relative to the first node
+        x = (times - self.knots[first]) / self.step
+        nodes = np.arange(order, dtype=np.float64)
+        diff = x[:, None] - nodes[None, :]
+        weights = np.empty((len(times), order))
+        for j in range(order):
+            others = np.delete(nodes, j)
+            weights[:, j] = np.prod(np.delete(diff, j, axis=1), axis=1) / np.prod(nodes[j] - others)
+        out = 0.0
+        for j in range(order):
+            out = out + weights[:, j, None, None] * self._at(self.r, first + j, index)
+        return out.transpose(1, 0, 2)
+
+
+class EphemerisCache:
+    """Rolling-window ephemeris for one ``TLECatalog``.
+
+    ``lead`` seconds of history are kept before the time that triggered a
+    build, and a window spans ``span`` seconds in total. ``clock`` defines
+    "the present" that windows are kept around.
+    """
+
+    def __init__(self, catalog, step=60.0, span=7200.0, lead=300.0, margin=1800.0,
+                 method="lagrange", clock=time.time):
+        self.catalog = catalog
+        self.clock = clock
+        self.step = step
+        self.span = span
+        self.lead = lead
+        self.margin = margin
+        self.method = method
+        self.window = None
+        self.builds = 0
+        self.interpolated = 0
+        self.direct = 0
+        self._lock = threading.Lock()
+        self._cold_lock = threading.Lock()
+        self._building = None
+
+    def _build(self, start):
+        window = EphemerisWindow(self.catalog, start, self.step, self.span)
+        with self._lock:
+            # A slower build for an older start must not replace a newer window
+            if self.window is None or window.start >= self.window.start:
+                self.window = window
+            self.builds += 1
+            if self._building is threading.current_thread():
+                self._building = None
+        return window
+
+    def _refresh_in_background(self, t):
+        with self._lock:
+            if self._building is not None:
+                return
+            self._building = thread = threading.Thread(
+                target=self._build, args=(t - self.lead,), name="ephemeris-build", daemon=True
+            )
+        thread.start()
+
+    def wait(self):
+        """Block until a background build in progress has finished."""
+        thread = self._building
+        if thread is not None:
+            thread.join()
+
+    def _window_for(self, t0):
+        """The window to interpolate from, or None to propagate directly."""
+        window = self.window
+        if window is None or t0 < window.start or t0 > window.end:
+            if abs(t0 - self.clock()) > self.span:
+                return None  # not about the present; do not evict the live window
+            # Cold start, or the clock moved past the window: build it now,
+            # once for every thread that is waiting on it
+            with self._cold_lock:
+                window = self.window
+                if window is None or t0 < window.start or t0 > window.end:
+                    window = self._build(t0 - self.lead)
+            return window
+        if t0 > window.end - self.margin:
+            # The present is approaching the end: roll the window forward.
+            # Later timestamps of long requests are propagated directly.
+            self._refresh_in_background(t0)
+        return window
+
+    def teme(self, times, index=None):
+        """TEME positions ``(n, m, 3)`` for Unix ``times``, interpolated where covered."""
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        window = self._window_for(float(times.min()))
+        if window is None:
+            inside = np.zeros(len(times), dtype=bool)
+        else:
+            inside = (times >= window.start) & (times <= window.end)
+        n = len(self.catalog) if index is None else len(index)
+        r = np.empty((n, len(times), 3))
+        if inside.any():
+            if self.method == "hermite":
+                r[:, inside] = window.hermite(times[inside], index)
+            else:
+                r[:, inside] = window.lagrange(times[inside], index)
+            self.interpolated += int(inside.sum())
+        if not inside.all():
+            _, r[:, ~inside], _ = self.catalog.propagate_teme(times[~inside], index)
+            self.direct += int((~inside).sum())
+        return r
+
+    def positions(self, times, index=None):
+        """Geodetic ``(lon, lat, alt)`` arrays, same contract as ``TLECatalog.positions``."""
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        return teme_to_geodetic(self.teme(times, index), times)
+
+    def stats(self):
+        window = self.window
+        return {
+            "satellites": len(self.catalog),
+            "method": self.method,
+            "step": self.step,
+            "window_start": None if window is None else window.start,
+            "window_end": None if window is None else window.end,
+            "builds": self.builds,
+            "interpolated": self.interpolated,
+            "direct": self.direct,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ephemeris(catalog):
+    """Return the process-wide cache for ``catalog``, rebuilt when the catalog changes."""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.catalog is not catalog:
+            _cache = EphemerisCache(catalog)
+        return _cache
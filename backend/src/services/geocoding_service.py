@@ -0,0 +1,333 @@
+"""Place-name geocoding for "drive to <place>" commands.
+
+Lookups go, in order, through an in-memory LRU keyed by the normalized query,
+an optional offline gazetteer (exact name match), a persistent SQLite cache
+and finally Nominatim. If Nominatim is unreachable or finds nothing, the
+gazetteer's prefix/trigram index is used as a fuzzy fallback; such guesses
+are never written to the persistent cache.
+
+"<name>, <qualifier>" matches a gazetteer place by name only if the
+qualifier is its country or region ("Paris, France" but not "Paris, Texas"
+when the gazetteer only knows the French one); otherwise it goes upstream.
+
+Results are dicts ``{"lat", "lon", "display_name", "source"}``; ``None``
+means the place could not be resolved.
+"""
+import asyncio
+import csv
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+
+from ..config.env import (
+    NOMINATIM_URL,
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_TTL,
+    GAZETTEER_PATH,
+)
+from .http_client import get_http_client
+from .single_flight import SingleFlight
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """Case-fold, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(" ", text.casefold())
+    return _SPACES.sub(" ", text).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    """Offline place index with exact, prefix and trigram lookups.
+
+    Each normalized name (including alternate names) maps to the most
+    populous place carrying it; ``homonyms`` keeps every place per name for
+    lookups qualified by country or region.
+    """
+
+    def __init__(self):
+        self.places = []  # (display_name, lat, lon, population)
+        self.regions = []  # normalized country/region names and codes per place
+        self.by_name = {}
+        self.homonyms = {}
+        self.names = []  # sorted normalized names, for prefix search
+        self.grams = {}
+
+    def __len__(self):
+        return len(self.places)
+
+    def add(self, name, lat, lon, population=0, alternates=(), regions=()):
+        idx = len(self.places)
+        self.places.append((name, float(lat), float(lon), int(population or 0)))
+        self.regions.append(frozenset(filter(None, map(normalize_query, regions))))
+        for alias in (name, *alternates):
+            key = normalize_query(alias)
+            if not key:
+                continue
+            self.homonyms.setdefault(key, []).append(idx)
+            current = self.by_name.get(key)
+            if current is None or self.places[current][3] < self.places[idx][3]:
+                self.by_name[key] = idx
+
+    def build(self):
+        """(Re)build the prefix and trigram indexes after adding places."""
+        self.names = sorted(self.by_name)
+        self.grams = {}
+        for key in self.names:
+            for gram in trigrams(key):
+                self.grams.setdefault(gram, []).append(key)
+        return self
+
+    @classmethod
+    def load(cls, path):
+        """Load a ``name,lat,lon[,population][,alternatenames][,country][,admin]``
+        CSV with a header row, or a tab-separated GeoNames dump."""
+        gaz = cls()
+        path = Path(path)
+        with open(path, "r", encoding="utf-8", newline="") as fh:
+            if path.suffix.lower() == ".csv":
+                for row in csv.DictReader(fh):
+                    alternates = [a for a in (row.get("alternatenames") or "").split(";") if a]
+                    gaz.add(row["name"], row["lat"], row["lon"], row.get("population") or 0, alternates,
+                            (row.get("country"), row.get("admin")))
+            else:
+                # GeoNames: id, name, asciiname, alternatenames, lat, lon, ..., country code (col 8),
+                # admin1/admin2 codes (cols 10-11), population (col 14)
+                for line in fh:
+                    cols = line.rstrip("\n").split("\t")
+                    if len(cols) < 15:
+                        continue
+                    alternates = [cols[2]] + [a for a in cols[3].split(",") if a]
+                    gaz.add(cols[1], cols[4], cols[5], cols[14] or 0, alternates, (cols[8], cols[10], cols[11]))
+        return gaz.build()
+
+    def _result(self, idx, source):
+        name, lat, lon, _ = self.places[idx]
+        return {"lat": lat, "lon": lon, "display_name": name, "source": source}
+
+    def exact(self, key, region=None):
+        """Most populous place named ``key`` (in ``region``, a normalized country or region, if given)."""
+        if region is None:
+            idx = self.by_name.get(key)
+        else:
+            within = [i for i in self.homonyms.get(key, ()) if region in self.regions[i]]
+            idx = max(within, key=lambda i: self.places[i][3]) if within else None
+        return None if idx is None else self._result(idx, "gazetteer")
+
+    def prefix(self, key, limit=10):
+        """Places whose normalized name starts with ``key``, most populous first."""
+        start = bisect_left(self.names, key)
+        hits = []
+        for name in self.names[start:]:
+            if not name.startswith(key):
+                break
+            hits.append(self.by_name[name])
+        hits = sorted(set(hits), key=lambda i: -self.places[i][3])[:limit]
+        return [self._result(i, "gazetteer") for i in hits]
+
+    def fuzzy(self, key, threshold=0.5):
+        """Best trigram (Jaccard) match for a misspelled or partial name."""
+        query = trigrams(key)
+        counts = {}
+        for gram in query:
+            for name in self.grams.get(gram, ()):
+                counts[name] = counts.get(name, 0) + 1
+        best, best_score = None, threshold
+        for name, shared in counts.items():
+            score = shared / (len(query) + len(trigrams(name)) - shared)
+            idx = self.by_name[name]
+            if score > best_score or (
+                score == best_score and best is not None and self.places[idx][3] > self.places[best][3]
+            ):
+                best, best_score = idx, score
+        return None if best is None else self._result(best, "gazetteer")
+
+
+class GeocodeCache:
+    """Persistent normalized-query -> result cache (SQLite)."""
+
+    def __init__(self, path, ttl=GEOCODE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode (query TEXT PRIMARY KEY, created_at REAL, result TEXT)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        """Return ``(found, result)``; ``result`` may be None for a cached miss."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT created_at, result FROM geocode WHERE query=?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return False, None
+        return True, json.loads(row[1])
+
+    def put(self, key, result):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode (query, created_at, result) VALUES (?, ?, ?)",
+                (key, time.time(), json.dumps(result)),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Geocoder:
+    def __init__(self, cache=None, gazetteer=None, lru_size=1024, url=NOMINATIM_URL):
+        self.cache = cache
+        self.gazetteer = gazetteer
+        self.url = url
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.flight = SingleFlight("geocode")
+        self.stats = {"lru": 0, "gazetteer": 0, "cache": 0, "network": 0, "fallback": 0}
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._lru[key] = result
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def lookup_memory(self, query):
+        """Resolve from the LRU and the gazetteer only; returns ``(found, result)``."""
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["lru"] += 1
+                return True, self._lru[key]
+        if self.gazetteer is not None:
+            result = self.gazetteer.exact(key)
+            name, _, qualifier = str(query).partition(",")
+            if result is None and qualifier.strip():
+                # "springfield, illinois" -> "springfield", but only one in Illinois
+                result = self.gazetteer.exact(normalize_query(name), normalize_query(qualifier))
+            if result is not None:
+                self.stats["gazetteer"] += 1
+                self._remember(key, result)
+                return True, result
+        return False, None
+
+    def lookup_cache(self, query):
+        """Resolve from the persistent cache (blocking SQLite); returns ``(found, result)``."""
+        key = normalize_query(query)
+        if self.cache is not None:
+            found, result = self.cache.get(key)
+            if found:
+                self.stats["cache"] += 1
+                self._remember(key, result)
+                return True, result
+        return False, None
+
+    def lookup_local(self, query):
+        """Resolve without the network; returns ``(found, result)``."""
+        found, result = self.lookup_memory(query)
+        return (found, result) if found else self.lookup_cache(query)
+
+    async def _nominatim(self, query):
+        response = await get_http_client().get(
+            self.url,
+            params={"format": "json", "q": query, "limit": 1},
+            timeout=5,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            return None
+        return {
+            "lat": float(data[0]["lat"]),
+            "lon": float(data[0]["lon"]),
+            "display_name": data[0].get("display_name", query),
+            "source": "nominatim",
+        }
+
+    def _fallback(self, key):
+        if self.gazetteer is None or not key:
+            return None
+        hits = self.gazetteer.prefix(key, limit=1)
+        result = hits[0] if hits else self.gazetteer.fuzzy(key)
+        if result is not None:
+            self.stats["fallback"] += 1
+        return result
+
+    async def geocode(self, query):
+        found, result = self.lookup_memory(query)
+        if not found and self.cache is not None:
+            found, result = await asyncio.to_thread(self.lookup_cache, query)
+        if found:
+            return result
+        # Concurrent lookups of the same place share one upstream request
+        return await self.flight.do(normalize_query(query), self._resolve, query)
+
+    async def _resolve(self, query):
+        key = normalize_query(query)
+        try:
+            result = await self._nominatim(query)
+        except Exception:
+            # Upstream failed: use the offline index if it has anything close,
+            # otherwise let the caller report the error. Nothing is cached.
+            result = self._fallback(key)
+            if result is None:
+                raise
+            return result
+        self.stats["network"] += 1
+        if result is None:
+            guess = self._fallback(key)
+            if guess is not None:
+                # A fuzzy guess may be wrong: keep it for this process only
+                self._remember(key, guess)
+                return guess
+        self._remember(key, result)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, result)
+        return result
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """Return the process-wide geocoder configured from the environment."""
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            path = Path(GEOCODE_CACHE_PATH) if GEOCODE_CACHE_PATH else (
+                Path(__file__).resolve().parents[3] / ".cache" / "geocode.sqlite"
+            )
+            path.parent.mkdir(parents=True, exist_ok=True)
+            gazetteer = None
+            if GAZETTEER_PATH:
+                try:
+                    gazetteer = Gazetteer.load(GAZETTEER_PATH)
+                except Exception as exc:
+                    from ..utils.logger import log
+                    log(f"Gazetteer {GAZETTEER_PATH} failed to load: {exc}")
+            _geocoder = Geocoder(cache=GeocodeCache(path), gazetteer=gazetteer)
+        return _geocoder
+
+
+async def geocode(query):
+    return await get_geocoder().geocode(query)
@@ -0,0 +1,259 @@
+"""Zoom-dependent simplification of OSM way and relation geometry.
+
+Each level of detail (LOD) corresponds to a map zoom; its tolerance is
+``PIXEL_TOLERANCE`` screen pixels at that zoom, in metres. Open polylines
+(roads, rails) are simplified with Douglas-Peucker; closed rings (building
+footprints, landuse) with Visvalingam-Whyatt, which keeps areas' shapes
+better at the same vertex budget. Geometry smaller than the tolerance
+collapses to its first point, and coordinates are rounded to the precision
+the tolerance can show, so payloads grow with visible detail rather than with
+the raw vertex count. The last LOD returns the full geometry.
+
+Simplified records are cached per map tile and LOD by ``LodTileCache``.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .osm_tile_cache import METERS_PER_DEG_LAT, distance_to_bounds, element_bounds
+
+# LOD -> map zoom it is tuned for; the last level is unsimplified
+LOD_ZOOMS = (12, 14, 16, 18)
+FULL_LOD = len(LOD_ZOOMS)
+PIXEL_TOLERANCE = 1.0
+EARTH_CIRCUMFERENCE_M = 40075016.686
+
+
+def meters_per_pixel(lat, zoom):
+    """Ground resolution of a 256 px web-mercator tile at ``zoom``."""
+    return EARTH_CIRCUMFERENCE_M * math.cos(math.radians(lat)) / (256 * (1 << zoom))
+
+
+def lod_tolerance(lod, lat):
+    """Simplification tolerance in metres for ``lod`` (0 for full detail)."""
+    if lod >= FULL_LOD:
+        return 0.0
+    return PIXEL_TOLERANCE * meters_per_pixel(lat, LOD_ZOOMS[lod])
+
+
+def _digits(tolerance_m):
+    """Decimal places of a degree needed to show ``tolerance_m``."""
+    if tolerance_m <= 0:
+        return 7
+    step_deg = tolerance_m / METERS_PER_DEG_LAT
+    return int(min(7, max(4, math.ceil(-math.log10(step_deg)) + 1)))
+
+
+def douglas_peucker(xy, tolerance):
+    """Boolean mask of the vertices of ``xy`` (n, 2) kept by Douglas-Peucker."""
+    n = len(xy)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        seg = b - a
+        pts = xy[first + 1:last] - a
+        length2 = float(seg @ seg)
+        if length2 == 0.0:
+            # Closed ring: distance to the shared endpoint
+            dist = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            dist = np.abs(pts[:, 0] * seg[1] - pts[:, 1] * seg[0]) / math.sqrt(length2)
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            split = first + 1 + k
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
+def visvalingam(xy, min_area):
+    """Boolean mask of vertices kept by Visvalingam-Whyatt effective area.
+
+    Vertices whose triangle with their neighbours is smaller than ``min_area``
+    are removed, smallest first; endpoints are always kept.
+    """
+    n = len(xy)
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    pts = xy.tolist()
+
+    def area(i):
+        (ax, ay), (bx, by), (cx, cy) = pts[prev[i]], pts[i], pts[nxt[i]]
+        return abs((bx - ax) * (cy - ay) - (cx - ax) * (by - ay)) * 0.5
+
+    current = [0.0] * n
+    heap = []
+    for i in range(1, n - 1):
+        current[i] = area(i)
+        heap.append((current[i], i))
+    heapq.heapify(heap)
+    while heap:
+        a, i = heapq.heappop(heap)
+        if not keep[i] or a != current[i]:
+            continue  # removed, or a stale entry
+        if a >= min_area:
+            break
+        keep[i] = False
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                # Monotone areas: a neighbour never drops below the removed one
+                current[j] = max(area(j), a)
+                heapq.heappush(heap, (current[j], j))
+    return keep
+
+
+def simplify_line(coords, tolerance):
+    """Simplify ``[(lon, lat), ...]``; returns the kept coordinates (ndarray)."""
+    line = np.asarray(coords, dtype=np.float64)
+    if tolerance <= 0 or len(line) < 3:
+        return line
+    lat0 = float(line[:, 1].mean())
+    xy = np.empty_like(line)
+    xy[:, 0] = (line[:, 0] - line[0, 0]) * METERS_PER_DEG_LAT * math.cos(math.radians(lat0))
+    xy[:, 1] = (line[:, 1] - line[0, 1]) * METERS_PER_DEG_LAT
+    closed = len(line) > 3 and np.array_equal(line[0], line[-1])
+    if closed:
+        keep = visvalingam(xy, tolerance * tolerance)
+        if keep.sum() < 4:
+            return line[:1]  # footprint smaller than a pixel
+    else:
+        keep = douglas_peucker(xy, tolerance)
+    return line[keep]
+
+
+def _extent_m(line):
+    lat0 = float(line[:, 1].mean())
+    dx = np.ptp(line[:, 0]) * METERS_PER_DEG_LAT * math.cos(math.radians(lat0))
+    dy = np.ptp(line[:, 1]) * METERS_PER_DEG_LAT
+    return math.hypot(dx, dy)
+
+
+def _geometry_coords(geometry):
+    return [(p["lon"], p["lat"]) for p in geometry if p and p.get("lat") is not None]
+
+
+def _encode(line, digits):
+    return np.round(line, digits).tolist()
+
+
+def simplify_element(el, lod):
+    """Normalized ``{type, id, lat, lon[, geometry | parts]}`` record at ``lod``.
+
+    Ways carry ``geometry`` as ``[[lon, lat], ...]``; relations carry
+    ``parts``, one such line per member with geometry. Nodes, and anything
+    smaller than the LOD tolerance, are reduced to ``lat``/``lon``.
+    """
+    record = {"type": el.get("type"), "id": el.get("id")}
+    if el.get("lat") is not None and el.get("lon") is not None:
+        record.update({"lat": el["lat"], "lon": el["lon"]})
+        return record
+
+    if isinstance(el.get("geometry"), list):
+        lines = [_geometry_coords(el["geometry"])]
+    else:
+        lines = [_geometry_coords(m.get("geometry") or []) for m in el.get("members") or []]
+    lines = [np.asarray(line, dtype=np.float64) for line in lines if line]
+    if not lines:
+        center = el.get("center")
+        if center:
+            record.update({"lat": center["lat"], "lon": center["lon"]})
+        return record
+
+    record.update({"lat": float(lines[0][0, 1]), "lon": float(lines[0][0, 0])})
+    tolerance = lod_tolerance(lod, record["lat"])
+    digits = _digits(tolerance)
+    parts = []
+    for line in lines:
+        if tolerance > 0 and _extent_m(line) < tolerance:
+            continue
+        simplified = simplify_line(line, tolerance)
+        if len(simplified) > 1:
+            parts.append(_encode(simplified, digits))
+    if el.get("type") == "way":
+        if parts:
+            record["geometry"] = parts[0]
+    elif parts:
+        record["parts"] = parts
+    return record
+
+
+class LodTileCache:
+    """LRU of simplified records per ``(tile x, tile y, lod)``.
+
+    Each entry keeps the element key and bounds next to the record so radius
+    queries can be answered from it. Entries expire after ``ttl`` seconds,
+    matching the raw tile cache; ``invalidate`` drops a tile's entries as
+    soon as the raw tile is refetched or evicted, so a refreshed tile is
+    re-simplified on its next use.
+    """
+
+    def __init__(self, max_entries=2048, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tile, lod, elements):
+        """Simplified ``[(key, bounds, record)]`` for a raw tile's ``elements``."""
+        cache_key = (tile[0], tile[1], lod)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+        records = []
+        for el in elements:
+            bounds = element_bounds(el)
+            if bounds is not None:
+                records.append(((el.get("type"), el.get("id")), bounds, simplify_element(el, lod)))
+        with self._lock:
+            self.misses += 1
+            self._entries[cache_key] = (now, records)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return records
+
+    def invalidate(self, tiles):
+        """Drop every level of the ``(x, y)`` tiles in ``tiles``."""
+        with self._lock:
+            for x, y in tiles:
+                for lod in range(FULL_LOD + 1):
+                    self._entries.pop((x, y, lod), None)
+
+    def query(self, tiles, lod, lat, lng, radius):
+        """Merge the simplified tiles of ``tiles`` (``{(x, y): elements}``)."""
+        seen = set()
+        results = []
+        for tile, elements in tiles.items():
+            for key, bounds, record in self.get(tile, lod, elements):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if distance_to_bounds(lat, lng, bounds) <= radius:
+                    results.append(record)
+        return results
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,470 @@
+"""Local columnar history for sensor samples and entity tracks.
+
+A history directory holds time partitions of immutable segment files::
+
+    series.jsonl                [id, name] for every series, when first seen
+    p<key>/seg-<lo>-<hi>.col    segments of partition key = floor(t / partition_seconds)
+
+A segment holds rows ``(time, series id, value per field)`` sorted by series
+then time, stored column by column after a fixed header. A block index
+(``BLOCK_DTYPE``) gives the first row and time range of every run of up to
+``BLOCK_ROWS`` rows of one series: that is the sparse time index. Reads
+``mmap`` the segment and binary-search the block index, so a query for one
+series over a time range touches only the partitions and segments that
+overlap it, and only the blocks of that series inside them.
+
+``append`` only buffers rows. Full buffers (and ``flush``) go to a writer
+thread, which writes one new segment per partition. A segment is written
+to a temporary file and renamed into place, so readers never see a partial
+one. Segments are numbered in write order; ``lo``/``hi`` in the name are
+the range of numbers a segment covers. The writer also compacts: once a
+partition has ``compact_after`` small segments, consecutive ones are merged
+into a segment covering their whole range before the sources are deleted.
+If a crash leaves both, the merged segment wins when the store is reopened.
+Partitions older than ``retention`` seconds are deleted whole.
+"""
+import json
+import mmap
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ..utils.logger import log
+
+MAGIC = b"TSEG"
+VERSION = 1
+HEADER_DTYPE = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u4"),
+    ("fields", "<u4"),
+    ("pad", "<u4"),
+    ("rows", "<u8"),
+    ("blocks", "<u8"),
+    ("t_min", "<f8"),
+    ("t_max", "<f8"),
+])
+BLOCK_DTYPE = np.dtype([
+    ("series", "<u4"),
+    ("count", "<u4"),
+    ("row", "<u8"),
+    ("t_first", "<f8"),
+    ("t_last", "<f8"),
+])
+BLOCK_ROWS = 1024
+
+
+def _aligned(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _layout(rows, blocks, fields):
+    """Byte offsets of the block index, time, series and value columns."""
+    index = HEADER_DTYPE.itemsize
+    times = _aligned(index + blocks * BLOCK_DTYPE.itemsize)
+    series = times + 8 * rows
+    values = _aligned(series + 4 * rows)
+    return index, times, series, [values + 8 * rows * k for k in range(fields)], values + 8 * rows * fields
+
+
+def write_segment(path, series, times, values):
+    """Write rows to a new segment file at ``path`` (via a temporary file); returns the rows written."""
+    order = np.lexsort((times, series))
+    series = np.ascontiguousarray(series[order], dtype="<u4")
+    times = np.ascontiguousarray(times[order], dtype="<f8")
+    values = values[order]
+    n, fields = values.shape
+
+    # One block per run of up to BLOCK_ROWS rows of a series
+    starts = np.flatnonzero(np.r_[True, series[1:] != series[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, sizes)
+    first = np.flatnonzero(rank % BLOCK_ROWS == 0)
+    blocks = np.zeros(len(first), dtype=BLOCK_DTYPE)
+    blocks["series"] = series[first]
+    blocks["count"] = np.diff(np.r_[first, n])
+    blocks["row"] = first
+    blocks["t_first"] = times[first]
+    blocks["t_last"] = times[first + blocks["count"].astype(np.int64) - 1]
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, VERSION, fields, 0, n, len(blocks), times.min(), times.max())
+    index, time_at, series_at, value_at, _ = _layout(n, len(blocks), fields)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as fh:
+        for offset, data in [(0, header), (index, blocks), (time_at, times), (series_at, series)] + [
+                (at, np.ascontiguousarray(values[:, k], dtype="<f8")) for k, at in enumerate(value_at)]:
+            fh.write(b"\0" * (offset - fh.tell()))
+            fh.write(data.tobytes())
+    os.replace(tmp, path)
+    return n
+
+
+class Segment:
+    """A memory-mapped segment file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        _, lo, hi = self.path.stem.split("-")
+        self.lo, self.hi = int(lo), int(hi)
+        self.bytes = self.path.stat().st_size
+        with open(self.path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.frombuffer(self._mm, HEADER_DTYPE, 1).copy()[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a history segment")
+        self.rows = int(header["rows"])
+        self.fields = int(header["fields"])
+        self.t_min, self.t_max = float(header["t_min"]), float(header["t_max"])
+        index, time_at, series_at, value_at, _ = _layout(self.rows, int(header["blocks"]), self.fields)
+        self.blocks = np.frombuffer(self._mm, BLOCK_DTYPE, int(header["blocks"]), index)
+        self.times = np.frombuffer(self._mm, "<f8", self.rows, time_at)
+        self.series = np.frombuffer(self._mm, "<u4", self.rows, series_at)
+        self.values = [np.frombuffer(self._mm, "<f8", self.rows, at) for at in value_at]
+
+    def read(self, series_id, start, end):
+        """Rows of ``series_id`` with ``start <= t <= end``: ``(times, values (n, fields))`` copies."""
+        ids = self.blocks["series"]
+        a, b = np.searchsorted(ids, series_id, "left"), np.searchsorted(ids, series_id, "right")
+        if a == b or end < self.t_min or start > self.t_max:
+            return None
+        own = self.blocks[a:b]
+        # Blocks of one series are in time order: the overlapping ones are a run
+        i = int(np.searchsorted(own["t_last"], start, "left"))
+        j = int(np.searchsorted(own["t_first"], end, "right"))
+        if i >= j:
+            return None
+        first, last = int(own["row"][i]), int(own["row"][j - 1]) + int(own["count"][j - 1])
+        times = self.times[first:last]
+        lo, hi = np.searchsorted(times, start, "left"), np.searchsorted(times, end, "right")
+        if lo == hi:
+            return None
+        return times[lo:hi].copy(), np.column_stack([v[first + lo:first + hi] for v in self.values])
+
+    def columns(self):
+        """All rows: ``(series, times, values)`` copies."""
+        return self.series.copy(), self.times.copy(), np.column_stack(self.values)
+
+    def close(self):
+        if self._mm is not None:
+            self.blocks = self.times = self.series = self.values = None
+            self._mm.close()
+            self._mm = None
+
+
+ENTITY_FIELDS = ("x", "y", "z", "vx", "vy", "vz")
+
+
+def open_history(name, fields=("value",)):
+    """``<HISTORY_DIR>/<name>`` configured from the environment, or None when HISTORY_DIR is unset."""
+    from ..config.env import HISTORY_DIR, HISTORY_PARTITION_SECONDS, HISTORY_RETENTION_DAYS
+
+    if not HISTORY_DIR:
+        return None
+    return HistoryStore(Path(HISTORY_DIR) / name, fields, partition_seconds=HISTORY_PARTITION_SECONDS,
+                        retention=HISTORY_RETENTION_DAYS * 86400.0 if HISTORY_RETENTION_DAYS > 0 else None)
+
+
+class HistoryStore:
+    """Append-only history under ``path``; see the module docstring.
+
+    ``fields`` names the value columns (one value per row for sensors,
+    ``x, y, z, vx, vy, vz`` for entity tracks). Times are Unix seconds
+    unless the caller uses another clock consistently; ``retention`` and
+    ``apply_retention(now)`` are in the same unit.
+    """
+
+    def __init__(self, path, fields=("value",), partition_seconds=86400.0, flush_rows=65536,
+                 segment_rows=1 << 20, compact_after=8, retention=None, max_pending=16):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.fields = tuple(fields)
+        self.partition_seconds = float(partition_seconds)
+        self.flush_rows = flush_rows
+        self.segment_rows = segment_rows
+        self.compact_after = compact_after
+        self.retention = retention
+        self.error = None
+        self._lock = threading.RLock()
+        # Serializes compaction and retention, which read segments outside _lock
+        self._maintenance = threading.Lock()
+        self._series = {}
+        self._names = []
+        self._load_series()
+        self._partitions = {}  # key -> [Segment] in write order
+        self._next_seq = 0
+        self._open_segments()
+        self._buffer = []
+        self._buffered = 0
+        # Metrics
+        self.written_rows = 0
+        self.compactions = 0
+        self.removed_partitions = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- series names -------------------------------------------------------
+
+    def _load_series(self):
+        path = self.path / "series.jsonl"
+        if path.exists():
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.endswith("\n"):
+                        series_id, name = json.loads(line)
+                        self._series[name] = series_id
+                        self._names.append(name)
+        self._series_file = open(path, "a", encoding="utf-8")
+
+    def series_id(self, name):
+        """Id of series ``name``, registered on first use."""
+        series_id = self._series.get(name)
+        if series_id is None:
+            with self._lock:
+                series_id = self._series.get(name)
+                if series_id is None:
+                    series_id = len(self._names)
+                    # The name is on disk before any segment uses the id
+                    self._series_file.write(json.dumps([series_id, name]) + "\n")
+                    self._series_file.flush()
+                    self._series[name] = series_id
+                    self._names.append(name)
+        return series_id
+
+    def series_names(self):
+        return list(self._names)
+
+    # -- segments on disk ---------------------------------------------------
+
+    def _partition_dir(self, key):
+        return self.path / f"p{key}"
+
+    def _open_segments(self):
+        for directory in sorted(self.path.glob("p*")):
+            if not directory.is_dir():
+                continue
+            key = int(directory.name[1:])
+            for tmp in directory.glob("*.tmp"):
+                tmp.unlink()
+            segments = []
+            for file in directory.glob("seg-*.col"):
+                try:
+                    segments.append(Segment(file))
+                except (OSError, ValueError) as exc:
+                    log(f"Skipping history segment {file}: {exc}")
+            # A compaction that crashed before deleting its sources leaves
+            # segments inside the range of the merged one
+            segments.sort(key=lambda s: (s.lo, -s.hi))
+            kept = []
+            for segment in segments:
+                if kept and segment.hi <= kept[-1].hi:
+                    segment.close()
+                    segment.path.unlink()
+                else:
+                    kept.append(segment)
+            if kept:
+                self._partitions[key] = kept
+                self._next_seq = max(self._next_seq, kept[-1].hi + 1)
+
+    def _segment_path(self, key, lo, hi):
+        return self._partition_dir(key) / f"seg-{lo:08d}-{hi:08d}.col"
+
+    # -- writing ------------------------------------------------------------
+
+    def append(self, name, times, values):
+        """Buffer samples of series ``name``; ``values`` is ``(n,)`` for one field or ``(n, fields)``."""
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        self.append_rows(np.full(len(times), self.series_id(name), dtype=np.uint32), times, values)
+
+    def append_rows(self, series_ids, times, values):
+        """Buffer rows of several series at once (ids from ``series_id``)."""
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        values = np.asarray(values, dtype=np.float64).reshape(len(times), len(self.fields))
+        series_ids = np.broadcast_to(np.asarray(series_ids, dtype=np.uint32), times.shape)
+        keep = np.isfinite(times)
+        if not keep.all():
+            series_ids, times, values = series_ids[keep], times[keep], values[keep]
+        if not len(times):
+            return
+        with self._lock:
+            self._buffer.append((series_ids.copy(), times.copy(), values.copy()))
+            self._buffered += len(times)
+            batch = self._take() if self._buffered >= self.flush_rows else None
+        if batch:
+            # Outside the lock: the writer takes it too, and put blocks while the queue is full
+            self._queue.put(batch)
+
+    def _take(self):
+        batch, self._buffer, self._buffered = self._buffer, [], 0
+        return batch
+
+    def flush(self):
+        """Write everything buffered so far and wait until it is on disk."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._queue.put(batch)
+        self._queue.join()
+
+    def close(self):
+        if self._thread is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            for segments in self._partitions.values():
+                for segment in segments:
+                    segment.close()
+            self._partitions.clear()
+            self._series_file.close()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                self._write(batch)
+                if self.retention is not None:
+                    self.apply_retention()
+            except Exception as exc:  # keep draining so appends never block for good
+                self.error = exc
+                log(f"History writer failed: {exc!r}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        series = np.concatenate([b[0] for b in batch])
+        times = np.concatenate([b[1] for b in batch])
+        values = np.concatenate([b[2] for b in batch])
+        keys = np.floor(times / self.partition_seconds).astype(np.int64)
+        for key in np.unique(keys).tolist():
+            rows = keys == key
+            with self._lock:
+                seq = self._next_seq
+                self._next_seq += 1
+            self._partition_dir(key).mkdir(exist_ok=True)
+            path = self._segment_path(key, seq, seq)
+            self.written_rows += write_segment(path, series[rows], times[rows], values[rows])
+            with self._lock:
+                self._partitions.setdefault(key, []).append(Segment(path))
+            small = [s for s in self._partitions[key] if s.rows < self.segment_rows]
+            if len(small) >= self.compact_after:
+                self.compact(key)
+
+    # -- maintenance --------------------------------------------------------
+
+    def compact(self, key=None):
+        """Merge runs of consecutive small segments (of partition ``key``, default all); returns merges done.
+
+        Segments under ``segment_rows`` rows are merged in write order while
+        the result stays within ``segment_rows``.
+        """
+        with self._maintenance:
+            merges = sum(self._compact(k) for k in (list(self._partitions) if key is None else [key]))
+        self.compactions += merges
+        return merges
+
+    def _compact(self, key):
+        merges = 0
+        with self._lock:
+            segments = list(self._partitions.get(key, []))
+        runs, run, rows = [], [], 0
+        for segment in segments + [None]:
+            fits = segment is not None and segment.rows < self.segment_rows and \
+                rows + segment.rows <= self.segment_rows
+            if not fits:
+                if len(run) > 1:
+                    runs.append(run)
+                run, rows = [], 0
+                if segment is None or segment.rows >= self.segment_rows:
+                    continue
+            run.append(segment)
+            rows += segment.rows
+        for run in runs:
+            columns = [segment.columns() for segment in run]
+            path = self._segment_path(key, run[0].lo, run[-1].hi)
+            write_segment(path, *(np.concatenate([c[k] for c in columns]) for k in range(3)))
+            merged = Segment(path)
+            with self._lock:
+                current = self._partitions[key]
+                at = current.index(run[0])
+                current[at:at + len(run)] = [merged]
+                for segment in run:
+                    segment.close()
+                    segment.path.unlink()
+            merges += 1
+        return merges
+
+    def apply_retention(self, now=None):
+        """Delete partitions that ended more than ``retention`` s before ``now``; returns how many."""
+        if self.retention is None:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention
+        removed = 0
+        with self._maintenance, self._lock:
+            for key in [k for k in self._partitions if (k + 1) * self.partition_seconds <= cutoff]:
+                for segment in self._partitions.pop(key):
+                    segment.close()
+                shutil.rmtree(self._partition_dir(key), ignore_errors=True)
+                removed += 1
+        self.removed_partitions += removed
+        return removed
+
+    # -- queries ------------------------------------------------------------
+
+    def read(self, name, start=-np.inf, end=np.inf):
+        """Samples of series ``name`` with ``start <= t <= end`` on disk: ``(times, values (n, fields))``.
+
+        Buffered rows are not included until they are flushed.
+        """
+        times, values = [], []
+        series_id = self._series.get(name)
+        if series_id is not None:
+            first = np.floor(start / self.partition_seconds) if np.isfinite(start) else -np.inf
+            last = np.floor(end / self.partition_seconds) if np.isfinite(end) else np.inf
+            with self._lock:
+                for key in sorted(k for k in self._partitions if first <= k <= last):
+                    for segment in self._partitions[key]:
+                        found = segment.read(series_id, start, end)
+                        if found is not None:
+                            times.append(found[0])
+                            values.append(found[1])
+        if not times:
+            return np.empty(0), np.empty((0, len(self.fields)))
+        times, values = np.concatenate(times), np.concatenate(values)
+        # Segments of a partition may overlap in time (late samples)
+        order = np.argsort(times, kind="stable")
+        return times[order], values[order]
+
+    def stats(self):
+        with self._lock:
+            segments = [s for group in self._partitions.values() for s in group]
+            return {
+                "path": str(self.path),
+                "fields": list(self.fields),
+                "series": len(self._names),
+                "partitions": len(self._partitions),
+                "segments": len(segments),
+                "rows": sum(s.rows for s in segments),
+                "bytes": sum(s.bytes for s in segments),
+                "buffered": self._buffered,
+                "written_rows": self.written_rows,
+                "compactions": self.compactions,
+                "removed_partitions": self.removed_partitions,
+                "error": repr(self.error) if self.error else None,
+            }
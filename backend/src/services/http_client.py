@@ -0,0 +1,169 @@
+"""Shared async HTTP client for outbound calls (Overpass, Nominatim, Cesium).
+
+One pooled ``httpx.AsyncClient`` is kept per event loop so connections are
+reused across requests. Each upstream host gets its own concurrency limit, so
+a slow service can only tie up its own slots, and failed attempts are retried
+with jittered exponential backoff.
+
+Async code uses ``get_http_client()``; sync code (the Flask server) uses
+``request_sync()``, which runs on a background loop sharing the same pool.
+"""
+import asyncio
+import random
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..config.env import HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_PER_HOST_LIMIT, HTTP_RETRIES
+
+USER_AGENT = "DigitalTwin/1.0"
+
+# Upstream responses worth retrying; anything else is returned to the caller
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class HTTPClient:
+    def __init__(self, max_connections=HTTP_MAX_CONNECTIONS, per_host=HTTP_PER_HOST_LIMIT,
+                 timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, backoff=0.25, transport=None):
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._hosts = {}
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout),
+            headers={"User-Agent": USER_AGENT},
+            transport=transport,
+        )
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    def _delay(self, attempt):
+        # "Full jitter": spread retries out so callers do not retry in lockstep
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def request(self, method, url, *, retries=None, timeout=None, **kwargs):
+        """Send a request, retrying transport errors and RETRY_STATUS responses.
+
+        Returns the last ``httpx.Response``; raises the last transport error
+        when every attempt failed to connect.
+        """
+        attempts = 1 + (self.retries if retries is None else retries)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        limit = self._host_limit(url)
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                async with limit:
+                    response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if last:
+                    raise
+            else:
+                if last or response.status_code not in RETRY_STATUS:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self._delay(attempt))
+
+    @asynccontextmanager
+    async def stream(self, method, url, *, retries=None, **kwargs):
+        """Open a streaming response; the host slot is held until it is closed.
+
+        Retried like ``request`` until the response headers arrive: transport
+        errors and RETRY_STATUS responses are tried again before any of the
+        body is read. Once the response is handed over nothing is retried, as
+        a body that has started arriving cannot be replayed.
+        """
+        attempts = 1 + (self.retries if retries is None else retries)
+        request = self._client.build_request(method, url, **kwargs)
+        limit = self._host_limit(url)
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            async with limit:
+                try:
+                    response = await self._client.send(request, stream=True)
+                except httpx.TransportError:
+                    if last:
+                        raise
+                else:
+                    if last or response.status_code not in RETRY_STATUS:
+                        try:
+                            yield response
+                        finally:
+                            await response.aclose()
+                        return
+                    await response.aclose()
+            await asyncio.sleep(self._delay(attempt))
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """Return the pooled client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = HTTPClient()
+    return client
+
+
+def set_http_client(client):
+    """Install ``client`` for the running loop (tests use a mock transport)."""
+    _clients[asyncio.get_running_loop()] = client
+
+
+async def close_http_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+_sync_loop = None
+_sync_lock = threading.Lock()
+
+
+def _background_loop():
+    global _sync_loop
+    with _sync_lock:
+        if _sync_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+            _sync_loop = loop
+        return _sync_loop
+
+
+def run_sync(coro_fn, *args, **kwargs):
+    """Run ``coro_fn(*args, **kwargs)`` on the shared background loop and wait."""
+    future = asyncio.run_coroutine_threadsafe(coro_fn(*args, **kwargs), _background_loop())
+    return future.result()
+
+
+def request_sync(method, url, **kwargs):
+    """Blocking wrapper around ``HTTPClient.request`` for sync callers."""
+
+    async def send():
+        return await get_http_client().request(method, url, **kwargs)
+
+    return run_sync(send)
@@ -0,0 +1,137 @@
+"""Incremental parsing of one array inside a streamed JSON document.
+
+Overpass answers are a small header object plus one large ``elements``
+array. ``iter_array_items`` walks the top-level object as bytes arrive and
+yields each item of the requested array as soon as it is complete, so the
+whole response never has to be held in memory.
+"""
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+# Characters that may follow a complete value inside an object or array
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+class _Buffer:
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk):
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+
+    def skip_ws(self):
+        text, pos = self.text, self.pos
+        while pos < len(text) and text[pos] in _WHITESPACE:
+            pos += 1
+        self.pos = pos
+        return pos < len(text)
+
+    def peek(self):
+        return self.text[self.pos] if self.skip_ws() else None
+
+    def value(self):
+        """Decode the next complete JSON value, or return ``_INCOMPLETE``.
+
+        A value is only accepted once the delimiter after it has arrived, so
+        a number split across chunks (``0.`` + ``6``) is never cut short.
+        """
+        if not self.skip_ws():
+            return _INCOMPLETE
+        try:
+            value, end = self._decoder.raw_decode(self.text, self.pos)
+        except json.JSONDecodeError:
+            if self.done:
+                raise
+            return _INCOMPLETE
+        if not self.done and (end >= len(self.text) or self.text[end] not in _DELIMITERS):
+            return _INCOMPLETE
+        self.pos = end
+        return value
+
+
+_INCOMPLETE = object()
+
+
+async def iter_array_items(chunks, key):
+    """Yield the items of ``document[key]`` from an async iterable of bytes.
+
+    Other top-level members are parsed and discarded. Raises ``ValueError``
+    (``json.JSONDecodeError`` is a subclass) on malformed or truncated input.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = _Buffer()
+    state = "start"  # start -> key -> colon -> value | array -> ... -> end
+    current = None
+    chunks = chunks.__aiter__()
+
+    while True:
+        progressed = True
+        while progressed:
+            progressed = False
+            ch = buf.peek()
+            if ch is None:
+                break
+            if state == "start":
+                if ch != "{":
+                    raise ValueError("expected a JSON object")
+                buf.pos += 1
+                state = "key"
+                progressed = True
+            elif state == "key":
+                if ch == "}":
+                    return
+                if ch == ",":
+                    buf.pos += 1
+                    progressed = True
+                    continue
+                current = buf.value()
+                if current is _INCOMPLETE:
+                    break
+                state = "colon"
+                progressed = True
+            elif state == "colon":
+                if ch != ":":
+                    raise ValueError("expected ':' after object key")
+                buf.pos += 1
+                state = "value"
+                progressed = True
+            elif state == "value":
+                if current == key and ch == "[":
+                    buf.pos += 1
+                    state = "array"
+                    progressed = True
+                    continue
+                if buf.value() is _INCOMPLETE:
+                    break
+                state = "key"
+                progressed = True
+            elif state == "array":
+                if ch == "]":
+                    buf.pos += 1
+                    state = "key"
+                    progressed = True
+                    continue
+                if ch == ",":
+                    buf.pos += 1
+                    progressed = True
+                    continue
+                item = buf.value()
+                if item is _INCOMPLETE:
+                    break
+                yield item
+                progressed = True
+
+        if buf.done:
+            raise ValueError("truncated JSON document")
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            buf.feed(decoder.decode(b"", final=True))
+            buf.done = True
+            continue
+        buf.feed(decoder.decode(chunk))
@@ -0,0 +1,618 @@
+"""Triangle meshes from model files, quadric decimation and GLB output.
+
+``load_mesh`` reads the geometry of a glTF 2.0 (``.glb``/``.gltf``), STL
+(binary or ASCII), OBJ or PLY (ASCII or binary) file into one indexed
+triangle mesh in model space: glTF node transforms are applied, STL facets
+are welded into shared vertices and polygons are fanned into triangles.
+Materials, texture coordinates and animations are not read.
+
+``decimate`` reduces a mesh to a triangle budget by quadric edge collapse
+(Garland & Heckbert): every vertex carries the summed squared-distance
+quadrics of the planes of its faces, plus stiff planes along open
+boundaries so the outline of an open mesh stays put, and an edge collapses
+to the point that minimises the quadric of its two ends. Rather than one
+collapse at a time off a heap, each NumPy pass collapses every edge that is
+the cheapest at both of its endpoints (so no two collapses share a vertex),
+moving a collapse to its next candidate point (or dropping it) when it
+would flip a face, then recomputes the costs.
+
+``glb_bytes`` stores a mesh as a minimal glTF binary (positions, normals,
+indices) that any glTF loader, Cesium included, can display.
+"""
+import base64
+import json
+import re
+import struct
+from functools import partial
+from pathlib import Path
+from urllib.parse import unquote
+
+import numpy as np
+
+MESH_FORMATS = (".glb", ".gltf", ".stl", ".obj", ".ply")
+GLB_MAGIC = b"glTF"
+_JSON_CHUNK = 0x4E4F534A
+_BIN_CHUNK = 0x004E4942
+_COMPONENTS = {5120: "i1", 5121: "u1", 5122: "<i2", 5123: "<u2", 5125: "<u4", 5126: "<f4"}
+_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+_PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+# Quadric weight of the planes that pin open boundaries, relative to face planes
+BOUNDARY_WEIGHT = 1000.0
+# Weight of the quadric pulling each vertex towards its original position,
+# relative to its share of face area
+REGULARIZATION = 1e-3
+# Collapse points further than this many edge lengths from the edge midpoint
+# (ill-conditioned quadrics) fall back to the best of the ends and midpoint
+MAX_SHIFT = 2.0
+
+
+# -- reading ------------------------------------------------------------------
+
+def load_mesh(path, resolve=None):
+    """``(positions (n, 3), triangles (m, 3), parts)`` of the model file at ``path``.
+
+    ``parts`` counts the meshes (glTF primitives) read. glTF buffers in
+    separate files are found by ``resolve(uri)`` (a path, or None if
+    missing), by default next to ``path``. Raises ValueError for files that
+    are not a readable mesh.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    data = path.read_bytes()
+    if resolve is None:
+        resolve = partial(_beside, path.parent.resolve())
+    try:
+        if suffix == ".glb":
+            positions, triangles, parts = _read_glb(data, resolve)
+        elif suffix == ".gltf":
+            positions, triangles, parts = _read_gltf(json.loads(data), resolve, None)
+        elif suffix == ".stl":
+            positions, triangles, parts = _read_stl(data)
+        elif suffix == ".obj":
+            positions, triangles, parts = _read_obj(data)
+        elif suffix == ".ply":
+            positions, triangles, parts = _read_ply(data)
+        else:
+            raise ValueError(f"unsupported model format {suffix!r}")
+    except (KeyError, IndexError, TypeError, struct.error) as exc:
+        raise ValueError(f"malformed {suffix[1:]} file: {exc!r}") from exc
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    if len(triangles) and (triangles.min() < 0 or triangles.max() >= len(positions)):
+        raise ValueError("triangle index out of range")
+    if not np.isfinite(positions).all():
+        raise ValueError("non-finite vertex position")
+    degenerate = (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | \
+        (triangles[:, 0] == triangles[:, 2])
+    return positions, triangles[~degenerate], parts
+
+
+def _beside(base, uri):
+    file = (base / uri).resolve()
+    return file if file.is_relative_to(base) and file.is_file() else None
+
+
+def _read_glb(data, resolve):
+    if len(data) < 20 or data[:4] != GLB_MAGIC:
+        raise ValueError("not a GLB file")
+    version, length = struct.unpack_from("<II", data, 4)
+    if version != 2:
+        raise ValueError(f"unsupported glTF version {version}")
+    view = memoryview(data)
+    offset, doc, binary = 12, None, None
+    while offset + 8 <= min(length, len(data)):
+        size, kind = struct.unpack_from("<II", data, offset)
+        chunk = view[offset + 8:offset + 8 + size]
+        if kind == _JSON_CHUNK:
+            doc = json.loads(bytes(chunk))
+        elif kind == _BIN_CHUNK and binary is None:
+            binary = chunk
+        offset += 8 + size
+    if doc is None:
+        raise ValueError("GLB file has no JSON chunk")
+    return _read_gltf(doc, resolve, binary)
+
+
+def _gltf_buffers(doc, resolve, binary):
+    buffers = []
+    for buffer in doc.get("buffers", []):
+        uri = buffer.get("uri")
+        if uri is None:
+            if binary is None:
+                raise ValueError("glTF buffer without uri outside a GLB file")
+            buffers.append(binary)
+        elif uri.startswith("data:"):
+            buffers.append(base64.b64decode(uri.split(",", 1)[1]))
+        else:
+            file = resolve(unquote(uri))
+            if file is None:
+                raise ValueError(f"missing glTF buffer {uri!r} (upload it before the model)")
+            buffers.append(file.read_bytes())
+    return buffers
+
+
+def _read_gltf(doc, resolve, binary):
+    required = doc.get("extensionsRequired", [])
+    if "KHR_draco_mesh_compression" in required or "EXT_meshopt_compression" in required:
+        raise ValueError("compressed glTF meshes are not supported")
+    buffers = _gltf_buffers(doc, resolve, binary)
+
+    def accessor(index):
+        acc = doc["accessors"][index]
+        dtype = np.dtype(_COMPONENTS[acc["componentType"]])
+        width, count = _WIDTHS[acc["type"]], acc["count"]
+        if "bufferView" not in acc:  # all zeros (sparse substitutions are not applied)
+            return np.zeros((count, width))
+        view = doc["bufferViews"][acc["bufferView"]]
+        buffer = buffers[view["buffer"]]
+        start = view.get("byteOffset", 0) + acc.get("byteOffset", 0)
+        stride = view.get("byteStride") or dtype.itemsize * width
+        if count and start + stride * (count - 1) + dtype.itemsize * width > len(buffer):
+            raise ValueError(f"accessor {index} overruns its buffer")
+        out = np.ndarray((count, width), dtype, buffer=buffer, offset=start, strides=(stride, dtype.itemsize))
+        out = out.astype(np.float64) if dtype.kind == "f" else out.astype(np.int64)
+        if acc.get("normalized") and dtype.kind != "f":
+            out = np.maximum(out / float(np.iinfo(dtype).max), -1.0)
+        return out
+
+    meshes, nodes = doc.get("meshes", []), doc.get("nodes", [])
+    if nodes:
+        scenes = doc.get("scenes")
+        if scenes:
+            roots = scenes[doc.get("scene", 0)].get("nodes", [])
+        else:
+            children = {child for node in nodes for child in node.get("children", [])}
+            roots = [k for k in range(len(nodes)) if k not in children]
+        instances, stack, seen = [], [(root, np.eye(4)) for root in roots], set()
+        while stack:
+            index, parent = stack.pop()
+            if index in seen:
+                continue
+            seen.add(index)
+            node = nodes[index]
+            matrix = parent @ _node_matrix(node)
+            if "mesh" in node:
+                instances.append((node["mesh"], matrix))
+            stack.extend((child, matrix) for child in node.get("children", []))
+    else:
+        instances = [(k, np.eye(4)) for k in range(len(meshes))]
+
+    positions, triangles, count, parts = [], [], 0, 0
+    for mesh, matrix in instances:
+        for primitive in meshes[mesh].get("primitives", []):
+            mode = primitive.get("mode", 4)
+            attributes = primitive.get("attributes", {})
+            if mode not in (4, 5, 6) or "POSITION" not in attributes:
+                continue  # points and lines
+            if "KHR_draco_mesh_compression" in primitive.get("extensions", {}):
+                raise ValueError("compressed glTF meshes are not supported")
+            points = accessor(attributes["POSITION"])[:, :3]
+            if "indices" in primitive:
+                indices = accessor(primitive["indices"])[:, 0]
+            else:
+                indices = np.arange(len(points))
+            faces = _primitive_triangles(indices, mode)
+            if np.linalg.det(matrix[:3, :3]) < 0:  # mirrored: keep faces front-facing
+                faces = faces[:, ::-1]
+            positions.append(points @ matrix[:3, :3].T + matrix[:3, 3])
+            triangles.append(faces + count)
+            count += len(points)
+            parts += 1
+    if not positions:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64), 0
+    return np.concatenate(positions), np.concatenate(triangles), parts
+
+
+def _node_matrix(node):
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T  # column-major
+    x, y, z, w = node.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.asarray(node.get("scale", (1.0, 1.0, 1.0)), dtype=np.float64)
+    matrix[:3, 3] = node.get("translation", (0.0, 0.0, 0.0))
+    return matrix
+
+
+def _primitive_triangles(indices, mode):
+    if mode == 4:
+        return indices[:len(indices) // 3 * 3].reshape(-1, 3)
+    if len(indices) < 3:
+        return np.empty((0, 3), dtype=np.int64)
+    if mode == 5:  # strip: every other triangle is wound the other way
+        a, b, c = indices[:-2].copy(), indices[1:-1].copy(), indices[2:]
+        a[1::2], b[1::2] = b[1::2], a[1::2].copy()
+        return np.column_stack((a, b, c))
+    return np.column_stack((np.full(len(indices) - 2, indices[0]), indices[1:-1], indices[2:]))  # fan
+
+
+def _weld(corners):
+    """Shared vertices and triangles of ``corners`` (3 per triangle) by exact position."""
+    positions, inverse = np.unique(corners, axis=0, return_inverse=True)
+    return positions, inverse.reshape(-1, 3)
+
+
+def _fan(polygons):
+    """Triangles of polygons given as index lists."""
+    return [(polygon[0], polygon[k], polygon[k + 1]) for polygon in polygons for k in range(1, len(polygon) - 1)]
+
+
+def _read_stl(data):
+    if len(data) >= 84:
+        count = struct.unpack_from("<I", data, 80)[0]
+        if len(data) == 84 + 50 * count:
+            facet = np.dtype([("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attribute", "<u2")])
+            corners = np.frombuffer(data, facet, count, 84)["corners"].reshape(-1, 3).astype(np.float64)
+            return (*_weld(corners), 1)
+    if not data.lstrip().startswith(b"solid"):
+        raise ValueError("not an STL file")
+    corners = re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", data)
+    if len(corners) % 3:
+        raise ValueError("ASCII STL facet without three vertices")
+    return (*_weld(np.array(corners, dtype=np.float64).reshape(-1, 3)), 1)
+
+
+def _read_obj(data):
+    vertices, polygons, parts = [], [], 0
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "v":
+            vertices.append(words[1:4])
+        elif words[0] == "f":
+            # v, v/vt, v//vn or v/vt/vn; negative indices count back from the last vertex
+            refs = [int(word.split("/")[0]) for word in words[1:]]
+            polygons.append([ref - 1 if ref > 0 else len(vertices) + ref for ref in refs])
+        elif words[0] in ("o", "g") and polygons:
+            parts += 1
+    return np.array(vertices, dtype=np.float64), _fan(polygons), parts + 1
+
+
+def _read_ply(data):
+    end = data.find(b"end_header")
+    if not data.startswith(b"ply") or end < 0:
+        raise ValueError("not a PLY file")
+    body = data.index(b"\n", end) + 1
+    encoding, elements = None, []
+    for line in data[:end].decode("ascii", errors="replace").splitlines()[1:]:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "format":
+            encoding = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property" and elements:
+            if words[1] == "list":  # list <count type> <item type> <name>
+                elements[-1][2].append((words[4], _PLY_TYPES[words[2]], _PLY_TYPES[words[3]]))
+            else:
+                elements[-1][2].append((words[2], None, _PLY_TYPES[words[1]]))
+    if encoding == "ascii":
+        read = _ply_ascii(data[body:], elements)
+    elif encoding in ("binary_little_endian", "binary_big_endian"):
+        read = _ply_binary(data, body, elements, "<" if encoding == "binary_little_endian" else ">")
+    else:
+        raise ValueError(f"unsupported PLY format {encoding!r}")
+    vertex = read["vertex"]
+    positions = np.column_stack([vertex[axis] for axis in ("x", "y", "z")])
+    faces = read.get("face", {})
+    faces = faces.get("vertex_indices", faces.get("vertex_index", []))
+    if isinstance(faces, np.ndarray):
+        return positions, faces, 1
+    return positions, _fan(faces), 1
+
+
+def _ply_ascii(text, elements):
+    tokens, at, read = text.split(), 0, {}
+    for name, count, props in elements:
+        if all(count_type is None for _, count_type, _ in props):
+            block = np.array(tokens[at:at + count * len(props)], dtype=np.float64).reshape(count, len(props))
+            at += count * len(props)
+            read[name] = {prop: block[:, k] for k, (prop, _, _) in enumerate(props)}
+            continue
+        columns = {prop: [] for prop, _, _ in props}
+        for _ in range(count):
+            for prop, count_type, _ in props:
+                if count_type is None:
+                    columns[prop].append(float(tokens[at]))
+                    at += 1
+                else:
+                    n = int(tokens[at])
+                    columns[prop].append([int(token) for token in tokens[at + 1:at + 1 + n]])
+                    at += 1 + n
+        read[name] = columns
+    return read
+
+
+def _ply_binary(data, offset, elements, order):
+    read = {}
+    for name, count, props in elements:
+        if all(count_type is None for _, count_type, _ in props):
+            dtype = np.dtype([(prop, order + item) for prop, _, item in props])
+            block = np.frombuffer(data, dtype, count, offset)
+            offset += dtype.itemsize * count
+            read[name] = {prop: block[prop].astype(np.float64) for prop, _, _ in props}
+            continue
+        if len(props) == 1 and count:  # faces: try "all triangles" first
+            prop, count_type, item = props[0]
+            dtype = np.dtype([("n", order + count_type), ("items", order + item, 3)])
+            if offset + dtype.itemsize * count <= len(data):
+                block = np.frombuffer(data, dtype, count, offset)
+                if (block["n"] == 3).all():
+                    read[name] = {prop: block["items"].astype(np.int64)}
+                    offset += dtype.itemsize * count
+                    continue
+        columns = {prop: [] for prop, _, _ in props}
+        for _ in range(count):
+            for prop, count_type, item in props:
+                if count_type is None:
+                    value = np.frombuffer(data, order + item, 1, offset)
+                    columns[prop].append(float(value[0]))
+                    offset += value.itemsize
+                else:
+                    n = int(np.frombuffer(data, order + count_type, 1, offset)[0])
+                    offset += np.dtype(count_type).itemsize
+                    items = np.frombuffer(data, order + item, n, offset)
+                    columns[prop].append(items.tolist())
+                    offset += items.nbytes
+        read[name] = columns
+    return read
+
+
+# -- decimation ---------------------------------------------------------------
+
+def mesh_bounds(positions):
+    """Axis-aligned box and bounding sphere (around the box centre) of ``positions``."""
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    center = (low + high) / 2.0
+    return {
+        "min": low.tolist(),
+        "max": high.tolist(),
+        "center": center.tolist(),
+        "size": (high - low).tolist(),
+        "radius": float(np.sqrt(((positions - center) ** 2).sum(axis=1).max())),
+    }
+
+
+def _face_normals(positions, triangles):
+    """Unnormalized face normals (length = twice the area)."""
+    a, b, c = (positions[triangles[:, k]] for k in range(3))
+    return np.cross(b - a, c - a)
+
+
+def _plane_quadrics(normal, point, weight):
+    """Flattened 4x4 quadrics ``weight * p p^T`` of the planes through ``point`` with unit ``normal``."""
+    plane = np.column_stack((normal, -(normal * point).sum(axis=1)))
+    return (plane[:, :, None] * plane[:, None, :] * weight[:, None, None]).reshape(-1, 16)
+
+
+def _sum_at(rows, values, n):
+    """Per-row sums of ``values`` (k, 16) scattered to ``rows`` of an (n, 16) array."""
+    return np.column_stack([np.bincount(rows, values[:, j], n) for j in range(values.shape[1])])
+
+
+def _vertex_quadrics(positions, triangles):
+    n = len(positions)
+    normal = _face_normals(positions, triangles)
+    double_area = np.linalg.norm(normal, axis=1)
+    unit = normal / np.where(double_area > 0, double_area, 1.0)[:, None]
+    faces = _plane_quadrics(unit, positions[triangles[:, 0]], double_area / 2.0)
+    quadrics = _sum_at(triangles.ravel(), np.repeat(faces, 3, axis=0), n)
+
+    # A weak pull towards each original vertex: on flat patches, where every
+    # collapse is otherwise free, short edges go first and triangles stay
+    # well shaped
+    weight = REGULARIZATION * np.bincount(triangles.ravel(), np.repeat(double_area / 6.0, 3), n)
+    point = np.zeros((n, 4, 4))
+    point[:, [0, 1, 2], [0, 1, 2]] = weight[:, None]
+    point[:, :3, 3] = point[:, 3, :3] = -weight[:, None] * positions
+    point[:, 3, 3] = weight * (positions ** 2).sum(axis=1)
+    quadrics += point.reshape(n, 16)
+
+    # Open boundaries: edges of a single face get a plane through the edge,
+    # perpendicular to the face, on both ends
+    directed = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    key = np.minimum(directed[:, 0], directed[:, 1]) * n + np.maximum(directed[:, 0], directed[:, 1])
+    _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    boundary = counts[inverse.ravel()] == 1
+    if boundary.any():
+        edge = directed[boundary]
+        start = positions[edge[:, 0]]
+        along = positions[edge[:, 1]] - start
+        side = np.cross(along, unit[np.flatnonzero(boundary) // 3])
+        length = np.linalg.norm(side, axis=1)
+        side /= np.where(length > 0, length, 1.0)[:, None]
+        planes = _plane_quadrics(side, start, BOUNDARY_WEIGHT * (along ** 2).sum(axis=1))
+        quadrics += _sum_at(edge.ravel(), np.repeat(planes, 2, axis=0), n)
+    return quadrics.reshape(n, 4, 4)
+
+
+def _edges(triangles, n):
+    pairs = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    key = np.unique(np.minimum(pairs[:, 0], pairs[:, 1]) * n + np.maximum(pairs[:, 0], pairs[:, 1]))
+    return np.column_stack((key // n, key % n))
+
+
+def _collapse_points(quadrics, positions, edges):
+    """Candidate collapse points of every edge ``(edges, 4, 3)`` and their quadric errors, best first.
+
+    The candidates are the point minimising the quadric (when it is well
+    conditioned and near the edge, otherwise the midpoint again), the two
+    ends and the midpoint.
+    """
+    q = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    a, b = positions[edges[:, 0]], positions[edges[:, 1]]
+    middle = (a + b) / 2.0
+    # Solve A x = -b (A symmetric 3x3) by the adjugate; nearly singular A
+    # (relative to its size) means no single best point
+    m = q[:, :3, :3]
+    adjugate = np.stack([np.cross(m[:, 1], m[:, 2]), np.cross(m[:, 2], m[:, 0]), np.cross(m[:, 0], m[:, 1])], axis=1)
+    det = (m[:, 0] * adjugate[:, 0]).sum(axis=1)
+    solvable = np.abs(det) > 1e-8 * (m ** 2).sum(axis=(1, 2)) ** 1.5
+    optimal = middle.copy()
+    if solvable.any():
+        optimal[solvable] = -np.einsum("eij,ej->ei", adjugate[solvable], q[solvable, :3, 3]) / det[solvable, None]
+        far = np.linalg.norm(optimal - middle, axis=1) > MAX_SHIFT * np.linalg.norm(b - a, axis=1)
+        optimal[far] = middle[far]
+    points = np.stack((optimal, a, b, middle), axis=1)
+    homogeneous = np.concatenate((points, np.ones(points.shape[:2] + (1,))), axis=2)
+    errors = np.maximum(np.einsum("eci,eij,ecj->ec", homogeneous, q, homogeneous), 0.0)
+    order = np.argsort(errors, axis=1, kind="stable")
+    return np.take_along_axis(points, order[:, :, None], axis=1), np.take_along_axis(errors, order, axis=1)
+
+
+def _locally_cheapest(edges, cost, n):
+    """Edges cheaper than every other edge at both ends, cheapest first."""
+    # Flat regions tie at zero cost: break ties by a hash of the edge, not
+    # its index, or only one edge per connected flat patch is a local minimum
+    scramble = (edges[:, 0].astype(np.uint64) << np.uint64(32)) | edges[:, 1].astype(np.uint64)
+    for shift, factor in ((30, 0xBF58476D1CE4E5B9), (27, 0x94D049BB133111EB)):  # splitmix64
+        scramble = (scramble ^ (scramble >> np.uint64(shift))) * np.uint64(factor)
+    order = np.lexsort((scramble, cost))
+    rank = np.empty(len(edges), dtype=np.int64)
+    rank[order] = np.arange(len(edges))
+    best = np.full(n, len(edges))
+    np.minimum.at(best, edges[:, 0], rank)
+    np.minimum.at(best, edges[:, 1], rank)
+    chosen = np.flatnonzero((best[edges[:, 0]] == rank) & (best[edges[:, 1]] == rank) & np.isfinite(cost))
+    return chosen[np.argsort(rank[chosen])]
+
+
+def _without_flips(positions, triangles, edges, candidates, errors):
+    """Collapse points for vertex-disjoint ``edges`` such that, together, they flip no face.
+
+    A collapse that flips a face falls back to its next candidate point, if
+    that one's error is at most twice the best; returns ``(kept mask, points)``.
+    """
+    n = len(positions)
+    rows = np.arange(len(edges))
+    choice = np.zeros(len(edges), dtype=np.int64)
+    usable = (errors <= 2.0 * errors[:, :1]).sum(axis=1)
+    owner = np.full(n, -1)
+    owner[edges[:, 0]] = owner[edges[:, 1]] = rows
+    touched = triangles[(owner[triangles] >= 0).any(axis=1)]
+    before = _face_normals(positions, touched)
+    has_area = (before ** 2).sum(axis=1) > 0
+    while True:
+        keep = choice < usable
+        on = np.flatnonzero(keep)
+        moved = positions.copy()
+        moved[edges[on, 0]] = candidates[on, choice[on]]
+        remap = np.arange(n)
+        remap[edges[on, 1]] = edges[on, 0]
+        after_faces = remap[touched]
+        alive = (after_faces[:, 0] != after_faces[:, 1]) & (after_faces[:, 1] != after_faces[:, 2]) & \
+            (after_faces[:, 0] != after_faces[:, 2])
+        flipped = alive & has_area & ((before * _face_normals(moved, after_faces)).sum(axis=1) <= 0)
+        culprits = owner[touched[flipped]]
+        culprits = np.unique(culprits[culprits >= 0])
+        culprits = culprits[keep[culprits]]
+        if not len(culprits):
+            points = candidates[rows, np.minimum(choice, candidates.shape[1] - 1)]
+            return keep, points
+        choice[culprits] += 1
+
+
+def decimate(positions, triangles, target, retries=8):
+    """Collapse edges of a mesh until it has about ``target`` triangles; returns ``(positions, triangles)``.
+
+    Only the vertices still used are returned. The result can stay above
+    ``target`` when the remaining collapses would flip faces.
+    """
+    positions = np.array(positions, dtype=np.float64)
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+    n = len(positions)
+    quadrics = _vertex_quadrics(positions, triangles)
+    while len(triangles) > target:
+        edges = _edges(triangles, n)
+        candidates, errors = _collapse_points(quadrics, positions, edges)
+        cost = errors[:, 0].copy()
+        # Each collapse removes about two faces: do no more than needed
+        wanted = max(1, (len(triangles) - target + 1) // 2)
+        for _ in range(retries):
+            chosen = _locally_cheapest(edges, cost, n)[:wanted]
+            keep, points = _without_flips(positions, triangles, edges[chosen], candidates[chosen], errors[chosen])
+            if keep.any() or not len(chosen):
+                break
+            cost[chosen] = np.inf  # every one would flip a face: try the next cheapest
+        if not keep.any():
+            break
+        chosen, points = chosen[keep], points[keep]
+        keep, drop = edges[chosen, 0], edges[chosen, 1]
+        positions[keep] = points
+        quadrics[keep] += quadrics[drop]
+        remap = np.arange(n)
+        remap[drop] = keep
+        triangles = remap[triangles]
+        alive = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & \
+            (triangles[:, 0] != triangles[:, 2])
+        triangles = triangles[alive]
+        # Faces folded onto each other around a pinched vertex
+        _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+        if len(first) < len(triangles):
+            triangles = triangles[np.sort(first)]
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return positions[used], triangles.reshape(-1, 3)
+
+
+# -- writing ------------------------------------------------------------------
+
+def vertex_normals(positions, triangles):
+    """Area-weighted unit vertex normals."""
+    faces = _face_normals(positions, triangles)
+    normals = np.column_stack([np.bincount(triangles.ravel(), np.repeat(faces[:, k], 3), len(positions))
+                               for k in range(3)])
+    length = np.linalg.norm(normals, axis=1)
+    return normals / np.where(length > 0, length, 1.0)[:, None]
+
+
+def _padded(data, fill=b"\0"):
+    return data + fill * (-len(data) % 4)
+
+
+def glb_bytes(positions, triangles, generator="digital-twin mesh_lod"):
+    """A glTF 2.0 binary with one mesh: positions, vertex normals and triangle indices."""
+    positions = np.asarray(positions, dtype=np.float64)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    index_type, index_dtype = (5123, "<u2") if len(positions) <= 0xFFFF else (5125, "<u4")
+    views = [
+        (positions.astype("<f4").tobytes(), 34962),
+        (vertex_normals(positions, triangles).astype("<f4").tobytes(), 34962),
+        (triangles.astype(index_dtype).tobytes(), 34963),
+    ]
+    binary, buffer_views = b"", []
+    for data, target in views:
+        buffer_views.append({"buffer": 0, "byteOffset": len(binary), "byteLength": len(data), "target": target})
+        binary += _padded(data)
+    doc = {
+        "asset": {"version": "2.0", "generator": generator},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2, "mode": 4}]}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": positions.min(axis=0).astype("<f4").tolist(), "max": positions.max(axis=0).astype("<f4").tolist()},
+            {"bufferView": 1, "componentType": 5126, "count": len(positions), "type": "VEC3"},
+            {"bufferView": 2, "componentType": index_type, "count": triangles.size, "type": "SCALAR"},
+        ],
+        "bufferViews": buffer_views,
+        "buffers": [{"byteLength": len(binary)}],
+    }
+    text = _padded(json.dumps(doc, separators=(",", ":")).encode("utf-8"), b" ")
+    total = 12 + 8 + len(text) + 8 + len(binary)
+    return b"".join([
+        struct.pack("<4sII", GLB_MAGIC, 2, total),
+        struct.pack("<II", len(text), _JSON_CHUNK), text,
+        struct.pack("<II", len(binary), _BIN_CHUNK), binary,
+    ])
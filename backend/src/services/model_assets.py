@@ -0,0 +1,385 @@
+"""Uploaded 3D models, stored by content, and their precomputed levels of detail.
+
+Uploads are content-addressed: the bytes go to a blob named after their
+SHA-256 (hashed while the upload streams in), and a model name only refers
+to a blob. The same mesh uploaded ten times, under one name or ten, is
+stored and processed once::
+
+    names/<name>.json             reference: name, sha256, format, bytes, uploaded
+    blobs/<ab>/<key>              the upload, served as level 0; key = <sha256>.<format>
+    blobs/<ab>/<key>.meta.json    sidecar: status, vertex/triangle counts, bounds, levels
+    blobs/<ab>/<key>.lod<k>.glb   level k, decimated to lod_ratios[k - 1] of the triangles
+
+(``<ab>`` is the first two hex digits of the hash.) A blob no name refers
+to any more is deleted along with what was derived from it.
+
+``commit`` moves a finished upload into place and returns at once; a worker
+thread parses the mesh, decimates it (services/mesh_lod.py) and replaces
+the blob's sidecar with a "ready" (or "failed") one. Blobs never change, so
+a result cannot go stale. Sidecars still "processing" when the store opens
+(the server stopped mid-way) are processed again. Until a blob is ready
+only level 0 exists, so ``select`` serves the upload itself. Every level
+records the SHA-256 of its bytes, which the routes send as a strong ETag.
+
+``.bin`` files are stored as is, for ``.gltf`` models whose buffers live
+in a separate file: upload the ``.bin``, under the name the ``.gltf`` uses,
+first. So are the COLLADA and robot description formats the Flask upload
+form accepts (``.dae``, ``.urdf``, ``.sdf``): deduplicated and served, but
+without levels of detail.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ..config.env import MODEL_ASSET_DIR, MODEL_LOD_MIN_TRIANGLES, MODEL_LOD_RATIOS
+from ..utils.logger import log
+from .mesh_lod import MESH_FORMATS, decimate, glb_bytes, load_mesh, mesh_bounds
+
+BUFFER_FORMATS = (".bin",)
+# Stored and served as is, never parsed
+RAW_FORMATS = BUFFER_FORMATS + (".dae", ".urdf", ".sdf")
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,199}$")
+_DERIVED = re.compile(r"\.(lod\d+\.glb|meta\.json)$", re.IGNORECASE)
+
+
+def check_name(name):
+    """``name`` if it is a plain file name of a supported format; raises ValueError otherwise."""
+    if not _NAME.match(name or "") or _DERIVED.search(name):
+        raise ValueError(f"invalid model file name {name!r}")
+    if Path(name).suffix.lower() not in MESH_FORMATS + RAW_FORMATS:
+        raise ValueError(f"unsupported model format {Path(name).suffix!r} "
+                         f"(expected one of {', '.join(MESH_FORMATS + RAW_FORMATS)})")
+    return name
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _key(ref):
+    return f"{ref['sha256']}.{ref['format']}"
+
+
+class BlobWriter:
+    """An upload streamed to a temporary file and hashed as it goes; see ``ModelAssets.writer``."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(path, "wb")
+
+    def write(self, data):
+        self._hash.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        """Drop the temporary file, unless ``commit`` took it."""
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class ModelAssets:
+    """Content-addressed model store under ``directory`` with LODs built by ``workers`` background threads."""
+
+    def __init__(self, directory, lod_ratios=MODEL_LOD_RATIOS, min_triangles=MODEL_LOD_MIN_TRIANGLES, workers=1):
+        self.directory = Path(directory)
+        self._names_dir = self.directory / "names"
+        self._blobs_dir = self.directory / "blobs"
+        self._names_dir.mkdir(parents=True, exist_ok=True)
+        self._blobs_dir.mkdir(exist_ok=True)
+        self.lod_ratios = tuple(sorted(lod_ratios, reverse=True))
+        self.min_triangles = min_triangles
+        self._lock = threading.Lock()
+        self._refs = {}  # name -> reference
+        self._meta = {}  # blob key -> sidecar (mesh blobs only)
+        self._jobs = {}  # blob key -> Future of its processing
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="model-assets")
+        # Metrics
+        self.processed = 0
+        self.failed = 0
+        self.deduplicated = 0
+        for tmp in [*self._names_dir.glob(".*.tmp"), *self._blobs_dir.rglob(".*.tmp")]:
+            tmp.unlink()
+        for file in sorted(self._names_dir.glob("*.json")):
+            try:
+                ref = json.loads(file.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                log(f"Skipping model reference {file}: {exc}")
+                continue
+            if self._blob(_key(ref)).is_file():
+                self._refs[ref["name"]] = ref
+        self._migrate()
+        for key in sorted({_key(ref) for ref in self._refs.values()}):
+            if Path(key).suffix in RAW_FORMATS:
+                continue
+            try:
+                meta = json.loads(self._blob(key, ".meta.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                meta = None
+            if meta is None or meta.get("status") == "processing":
+                self._submit(key)
+            else:
+                self._meta[key] = meta
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _migrate(self):
+        """Move uploads of the old flat layout (``<name>`` beside its sidecar and LODs) into blobs."""
+        for path in sorted(self.directory.iterdir()):
+            try:
+                check_name(path.name)
+            except ValueError:
+                continue
+            if not path.is_file() or path.name in self._refs:
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            ref = {"name": path.name, "sha256": digest.hexdigest(), "format": path.suffix.lower()[1:],
+                   "bytes": path.stat().st_size, "uploaded": path.stat().st_mtime}
+            blob = self._blob(_key(ref))
+            blob.parent.mkdir(exist_ok=True)
+            os.replace(path, blob)
+            self._write_ref(ref)
+            for old in self.directory.glob(f"{path.name}.*"):  # names hold no glob characters
+                if _DERIVED.search(old.name):
+                    old.unlink()
+            log(f"Moved model {path.name} into the content-addressed store")
+
+    def _blob(self, key, suffix=""):
+        return self._blobs_dir / key[:2] / f"{key}{suffix}"
+
+    def _write_ref(self, ref):
+        _write_atomic(self._names_dir / f"{ref['name']}.json", json.dumps(ref).encode("utf-8"))
+        self._refs[ref["name"]] = ref
+
+    def _write_meta(self, key, meta):
+        _write_atomic(self._blob(key, ".meta.json"), json.dumps(meta, indent=1).encode("utf-8"))
+        self._meta[key] = meta
+
+    def _submit(self, key):
+        size = self._blob(key).stat().st_size
+        self._write_meta(key, {"status": "processing", "levels": [
+            {"level": 0, "file": key, "bytes": size, "sha256": key.split(".")[0]}]})
+        self._jobs[key] = self._pool.submit(self._process, key)
+
+    # -- uploads ------------------------------------------------------------
+
+    def writer(self):
+        """A ``BlobWriter`` for one upload: ``commit`` it under a name, then ``discard`` it."""
+        return BlobWriter(self._blobs_dir / f".upload-{uuid.uuid4().hex}.tmp")
+
+    def save(self, name, data):
+        """Store ``data`` as model ``name``; see ``commit``."""
+        check_name(name)
+        writer = self.writer()
+        try:
+            writer.write(data)
+            return self.commit(name, writer)
+        finally:
+            writer.discard()
+
+    def commit(self, name, writer):
+        """Point ``name`` at the blob holding ``writer``'s bytes and queue its processing if it is new.
+
+        Returns the model's metadata, with ``deduplicated`` set when those
+        bytes were stored already (and nothing was written or processed).
+        """
+        name = check_name(name)
+        writer.close()
+        ref = {"name": name, "sha256": writer.sha256, "format": Path(name).suffix.lower()[1:],
+               "bytes": writer.size, "uploaded": time.time()}
+        key = _key(ref)
+        blob = self._blob(key)
+        with self._lock:
+            deduplicated = blob.is_file()
+            if deduplicated:
+                self.deduplicated += 1
+            else:
+                blob.parent.mkdir(exist_ok=True)
+                os.replace(writer.path, blob)
+            previous = self._refs.get(name)
+            self._write_ref(ref)
+            # A failed .gltf may only have been missing its .bin: try it again
+            if blob.suffix not in RAW_FORMATS and self._meta.get(key, {}).get("status") in (None, "failed"):
+                self._submit(key)
+            if previous is not None and _key(previous) != key:
+                self._release(_key(previous))
+        return {**self.metadata(name), "deduplicated": deduplicated}
+
+    def _release(self, key):
+        """Delete blob ``key`` and its derived files once no name refers to it (``_lock`` held)."""
+        if any(_key(ref) == key for ref in self._refs.values()):
+            return
+        self._meta.pop(key, None)
+        for file in self._blob(key).parent.glob(f"{key}*"):
+            file.unlink()
+
+    def _buffer(self, uri):
+        """Blob of the ``.bin`` uploaded under the name a ``.gltf`` refers to."""
+        ref = self._refs.get(uri)
+        return self._blob(_key(ref)) if ref is not None else None
+
+    def _process(self, key):
+        started = time.perf_counter()
+        path = self._blob(key)
+        levels = []
+        try:
+            positions, triangles, parts = load_mesh(path, resolve=self._buffer)
+            if not len(triangles):
+                raise ValueError("the model has no triangles")
+            info = {
+                "parts": parts,
+                "vertices": len(positions),
+                "triangles": len(triangles),
+                "bounds": mesh_bounds(positions),
+            }
+            mesh = positions, triangles
+            for ratio in self.lod_ratios:
+                target = int(len(triangles) * ratio)
+                if target < self.min_triangles:
+                    break
+                # Each level from the previous one: cheaper, and the levels nest
+                mesh = decimate(*mesh, target)
+                if len(mesh[1]) >= (levels[-1][2]["triangles"] if levels else len(triangles)):
+                    break  # no collapse left that keeps the surface intact
+                levels.append((glb_bytes(*mesh), ratio, {"vertices": len(mesh[0]), "triangles": len(mesh[1])}))
+            error = None
+        except Exception as exc:  # any upload can be garbage: record it, keep serving level 0
+            info, error = {}, f"{type(exc).__name__}: {exc}"
+        with self._lock:
+            if not path.is_file():
+                return  # released meanwhile
+            meta = dict(info)
+            meta["levels"] = [{"level": 0, "file": key, "bytes": path.stat().st_size, "sha256": key.split(".")[0],
+                               "vertices": info.get("vertices"), "triangles": info.get("triangles")}]
+            for k, (data, ratio, counts) in enumerate(levels, start=1):
+                file = f"{key}.lod{k}.glb"
+                _write_atomic(path.with_name(file), data)
+                meta["levels"].append({"level": k, "file": file, "bytes": len(data),
+                                       "sha256": hashlib.sha256(data).hexdigest(), "ratio": ratio, **counts})
+            meta["status"] = "failed" if error else "ready"
+            meta["error"] = error
+            meta["processed"] = time.time()
+            meta["seconds"] = round(time.perf_counter() - started, 3)
+            self._write_meta(key, meta)
+            if error:
+                self.failed += 1
+            else:
+                self.processed += 1
+        if error:
+            log(f"Model blob {key} could not be processed: {error}")
+
+    def wait(self, timeout=None):
+        """Block until every queued model is processed."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.result(timeout)
+
+    # -- serving ------------------------------------------------------------
+
+    def _levels(self, ref):
+        meta = self._meta.get(_key(ref))
+        if meta is not None:
+            return meta
+        return {"status": "stored", "levels": [
+            {"level": 0, "file": _key(ref), "bytes": ref["bytes"], "sha256": ref["sha256"]}]}
+
+    def metadata(self, name):
+        """Reference and sidecar of model ``name``, or None."""
+        with self._lock:
+            ref = self._refs.get(name)
+            return {**self._levels(ref), **ref} if ref is not None else None
+
+    def models(self):
+        with self._lock:
+            return [{**self._levels(self._refs[name]), **self._refs[name]} for name in sorted(self._refs)]
+
+    def select(self, name, level=None, max_triangles=None):
+        """``(path, level entry)`` to serve for model ``name``, or None if unknown.
+
+        ``level`` picks a level (the coarsest if it is past the last one);
+        ``max_triangles`` the most detailed level within that many triangles
+        (the coarsest if none is). Level 0 otherwise.
+        """
+        meta = self.metadata(name)
+        if meta is None:
+            return None
+        levels = meta["levels"]
+        if level is not None:
+            chosen = levels[min(level, len(levels) - 1)]
+        elif max_triangles is not None and levels[0].get("triangles") is not None:
+            within = [entry for entry in levels if entry["triangles"] <= max_triangles]
+            chosen = within[0] if within else levels[-1]
+        else:
+            chosen = levels[0]
+        return self._blobs_dir / meta["sha256"][:2] / chosen["file"], chosen
+
+    def stats(self):
+        with self._lock:
+            blobs = {_key(ref): ref["bytes"] for ref in self._refs.values()}
+            statuses = [meta.get("status") for meta in self._meta.values()]
+            return {
+                "path": str(self.directory),
+                "models": len(self._refs),
+                "blobs": len(blobs),
+                "stored_bytes": sum(blobs.values()),
+                "deduplicated_bytes": sum(ref["bytes"] for ref in self._refs.values()) - sum(blobs.values()),
+                "deduplicated_uploads": self.deduplicated,
+                "processing": statuses.count("processing"),
+                "processed": self.processed,
+                "failed": self.failed,
+            }
+
+    def close(self):
+        """Stop the workers; models still queued are processed when the store is opened again."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# -- process-wide store -----------------------------------------------------
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def get_model_assets():
+    """Return the process-wide model store configured from the environment."""
+    global _assets
+    with _assets_lock:
+        if _assets is None:
+            directory = Path(MODEL_ASSET_DIR) if MODEL_ASSET_DIR else (
+                Path(__file__).resolve().parents[3] / ".cache" / "models"
+            )
+            _assets = ModelAssets(directory)
+        return _assets
+
+
+def close_model_assets():
+    global _assets
+    with _assets_lock:
+        assets, _assets = _assets, None
+    if assets is not None:
+        assets.close()
@@ -0,0 +1,184 @@
+"""Subscribe to an MQTT broker and feed telemetry messages into a store.
+
+Speaks just enough MQTT 3.1.1 over asyncio streams for a subscriber:
+CONNECT, SUBSCRIBE (QoS 0), PUBLISH in (QoS 1 is acknowledged), and
+PINGREQ keep-alives. Payloads are the JSON telemetry messages that
+``realtime_mqtt.js`` and ``realtime_ws.js`` carry (see telemetry_store.py).
+A message without ``sensorId`` takes the last level of its topic.
+
+The bridge reconnects with a delay after any connection error, so a broker
+restart only pauses ingest.
+"""
+import asyncio
+import ssl
+import struct
+import uuid
+from urllib.parse import unquote, urlsplit
+
+from ..utils.logger import log
+
+CONNECT, CONNACK, PUBLISH, PUBACK, SUBSCRIBE, SUBACK, PINGREQ, PINGRESP = 1, 2, 3, 4, 8, 9, 12, 13
+
+
+def _string(value):
+    data = value.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def encode_packet(kind, flags, body=b""):
+    """Fixed header (type, flags, variable-length remaining length) plus ``body``."""
+    header = bytearray([(kind << 4) | flags])
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes(header) + body
+
+
+async def read_packet(reader):
+    """Next ``(type, flags, body)`` from ``reader``."""
+    first = (await reader.readexactly(1))[0]
+    length, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 21:
+            raise ValueError("Malformed MQTT remaining length")
+    return first >> 4, first & 0x0F, await reader.readexactly(length)
+
+
+def parse_publish(flags, body):
+    """``(topic, packet id or None, payload)`` of a PUBLISH body."""
+    (size,) = struct.unpack_from("!H", body)
+    topic = body[2:2 + size].decode("utf-8")
+    offset = 2 + size
+    packet_id = None
+    if (flags >> 1) & 3:
+        (packet_id,) = struct.unpack_from("!H", body, offset)
+        offset += 2
+    return topic, packet_id, body[offset:]
+
+
+class MQTTBridge:
+    """Feeds messages published on ``topic`` at the broker ``url`` into ``store``."""
+
+    def __init__(self, url, topic, store, client_id=None, keepalive=30, reconnect_delay=2.0):
+        parts = urlsplit(url)
+        if parts.scheme not in ("mqtt", "mqtts", "tcp"):
+            raise ValueError(f"Unsupported MQTT URL {url!r}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.tls = parts.scheme == "mqtts"
+        self.port = parts.port or (8883 if self.tls else 1883)
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.topic = topic
+        self.store = store
+        self.client_id = client_id or f"digital-twin-{uuid.uuid4().hex[:8]}"
+        self.keepalive = keepalive
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._task = None
+        # Metrics
+        self.messages = 0
+        self.samples = 0
+        self.connects = 0
+
+    def _connect_packet(self):
+        flags = 0x02  # clean session
+        payload = _string(self.client_id)
+        if self.username is not None:
+            flags |= 0x80
+            payload += _string(self.username)
+            if self.password is not None:
+                flags |= 0x40
+                payload += _string(self.password)
+        body = _string("MQTT") + bytes([4, flags]) + struct.pack("!H", self.keepalive) + payload
+        return encode_packet(CONNECT, 0, body)
+
+    async def _session(self):
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.tls else None)
+        read = None
+        try:
+            writer.write(self._connect_packet())
+            await writer.drain()
+            kind, _, body = await read_packet(reader)
+            if kind != CONNACK or len(body) < 2 or body[1] != 0:
+                raise ConnectionError(f"MQTT broker refused the connection ({body[1] if len(body) > 1 else '?'})")
+            writer.write(encode_packet(SUBSCRIBE, 0x02, struct.pack("!H", 1) + _string(self.topic) + b"\x00"))
+            await writer.drain()
+            self.connected = True
+            self.connects += 1
+            log(f"MQTT telemetry bridge subscribed to {self.topic} on {self.host}:{self.port}")
+            # The broker's keep-alive timer only counts packets we send, so
+            # ping after keepalive / 2 s of sending nothing, however busy the
+            # inbound stream is. The pending read is never cancelled midway.
+            loop = asyncio.get_running_loop()
+            last_sent = loop.time()
+            while True:
+                if read is None:
+                    read = loop.create_task(read_packet(reader))
+                wait = last_sent + self.keepalive / 2 - loop.time()
+                if wait <= 0 or not (await asyncio.wait({read}, timeout=wait))[0]:
+                    writer.write(encode_packet(PINGREQ, 0))
+                    await writer.drain()
+                    last_sent = loop.time()
+                    continue
+                kind, flags, body = read.result()
+                read = None
+                if kind == PUBLISH:
+                    topic, packet_id, payload = parse_publish(flags, body)
+                    if packet_id is not None:
+                        writer.write(encode_packet(PUBACK, 0, struct.pack("!H", packet_id)))
+                        last_sent = loop.time()
+                    self.handle(topic, payload)
+                elif kind == SUBACK and body[-1:] == b"\x80":
+                    raise ConnectionError(f"MQTT broker rejected the subscription to {self.topic}")
+        finally:
+            self.connected = False
+            if read is not None:
+                read.cancel()
+            writer.close()
+
+    def handle(self, topic, payload):
+        """Ingest one PUBLISH payload."""
+        self.messages += 1
+        self.samples += self.store.ingest_json(payload, sensor_id=topic.rsplit("/", 1)[-1])
+
+    async def run(self):
+        while True:
+            try:
+                await self._session()
+            except asyncio.CancelledError:
+                raise
+            except (OSError, EOFError, ConnectionError, ValueError, asyncio.IncompleteReadError) as exc:
+                log(f"MQTT telemetry bridge disconnected: {exc}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "broker": f"{self.host}:{self.port}",
+            "topic": self.topic,
+            "connected": self.connected,
+            "connects": self.connects,
+            "messages": self.messages,
+            "samples": self.samples,
+        }
@@ -1,7 +1,95 @@
-import requests
-from ..config.env import OSM_OVERPASS_URL
+import asyncio
+import threading
+import weakref
+from pathlib import Path
 
-def fetch_osm_objects(lat, lng, radius):
+import httpx
+from ..config.env import (
+    OSM_OVERPASS_URL,
+    OSM_CACHE_ENABLED,
+    OSM_CACHE_PATH,
+    OSM_CACHE_ZOOM,
+    OSM_CACHE_TTL,
+    OSM_CACHE_MAX_TILES,
+    ROUTE_OSM_TIMEOUT,
+)
+from .http_client import get_http_client
+from .single_flight import SingleFlight
+
+_tile_cache = None
+_tile_cache_lock = threading.Lock()
+_lod_cache = None
+_osm_indexes = weakref.WeakKeyDictionary()
+_flight = SingleFlight("osm_objects")
+
+
+def _bbox_query(south, west, north, east):
+    bbox = f"{south},{west},{north},{east}"
+    return f"""
+    [out:json][timeout:25];
+    (
+      node({bbox});
+      way({bbox});
+      relation({bbox});
+    );
+    out geom;
+    """
+
+
+async def stream_osm_bbox(south, west, north, east):
+    """Yield the Overpass elements inside a bbox while the response downloads. Raises on upstream failure."""
+    from .json_stream import iter_array_items
+
+    async with get_http_client().stream(
+        "POST", OSM_OVERPASS_URL, content=_bbox_query(south, west, north, east), timeout=10
+    ) as response:
+        response.raise_for_status()
+        async for el in iter_array_items(response.aiter_bytes(), "elements"):
+            yield el
+
+
+async def fetch_osm_bbox(south, west, north, east):
+    """Fetch every Overpass element inside a bbox. Raises on upstream failure."""
+    return [el async for el in stream_osm_bbox(south, west, north, east)]
+
+
+def get_tile_cache():
+    """Return the process-wide Overpass tile cache, or None when disabled."""
+    global _tile_cache
+    if not OSM_CACHE_ENABLED:
+        return None
+    with _tile_cache_lock:
+        if _tile_cache is None:
+            from .osm_tile_cache import OverpassTileCache
+
+            path = Path(OSM_CACHE_PATH) if OSM_CACHE_PATH else (
+                Path(__file__).resolve().parents[3] / ".cache" / "osm_tiles.sqlite"
+            )
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _tile_cache = OverpassTileCache(
+                path,
+                fetch_osm_bbox,
+                zoom=OSM_CACHE_ZOOM,
+                ttl=OSM_CACHE_TTL,
+                max_tiles=OSM_CACHE_MAX_TILES,
+                fetch_stream=stream_osm_bbox,
+            )
+        return _tile_cache
+
+
+def _around_query(lat, lng, radius):
+    return f"""
+    [out:json][timeout:25];
+    (
+      node(around:{radius},{lat},{lng});
+      way(around:{radius},{lat},{lng});
+      relation(around:{radius},{lat},{lng});
+    );
+    out geom;
+    """
+
+
+async def fetch_osm_objects(lat, lng, radius):
     """
     Fetch ALL publicly indexed geospatial objects:
     - buildings
@@ -9,22 +97,155 @@ def fetch_osm_objects(lat, lng, radius):
     - amenities
     - landuse
     - POIs
+
+    Served from the on-disk tile cache when enabled; only tiles that are not
+    cached yet are requested from Overpass. Once every tile of the circle has
+    been loaded, queries are answered from the in-memory spatial index
+    instead. Concurrent identical requests share one lookup.
     """
-    query = f"""
-    [out:json][timeout:25];
-    (
-      node(around:{radius},{lat},{lng});
-      way(around:{radius},{lat},{lng});
-      relation(around:{radius},{lat},{lng});
-    );
+    key = (round(float(lat), 6), round(float(lng), 6), float(radius))
+    return await _flight.do(key, _fetch_osm_objects, lat, lng, radius)
+
+
+def _roads_query(lat, lng, radius, highways, timeout):
+    pattern = "|".join(sorted(highways))
+    return f"""
+    [out:json][timeout:{int(timeout)}];
+    way(around:{radius},{lat},{lng})["highway"~"^({pattern})$"];
     out geom;
     """
+
+
+async def fetch_osm_roads(lat, lng, radius, highways, timeout=ROUTE_OSM_TIMEOUT):
+    """Fetch the ways whose ``highway`` tag is in ``highways`` within ``radius`` m. Raises on upstream failure.
+
+    Routing needs nothing else, and this query stays answerable at radii
+    where the every-object query of ``fetch_osm_objects`` would time out.
+    It bypasses the tile cache, whose z15 tiles hold every object; callers
+    cache what they build. Concurrent identical requests share one fetch.
+    """
+    key = ("roads", round(float(lat), 6), round(float(lng), 6), float(radius), frozenset(highways))
+    return await _flight.do(key, _fetch_osm_roads, lat, lng, radius, highways, timeout)
+
+
+async def _fetch_osm_roads(lat, lng, radius, highways, timeout):
+    from .json_stream import iter_array_items
+
+    query = _roads_query(lat, lng, radius, highways, timeout)
+    # Overpass gets ``timeout`` to run the query; the client a little longer to send it
+    async with get_http_client().stream("POST", OSM_OVERPASS_URL, content=query, timeout=timeout + 10) as response:
+        response.raise_for_status()
+        return [el async for el in iter_array_items(response.aiter_bytes(), "elements")]
+
+
+def get_osm_index(cache):
+    """Return the spatial index of the elements loaded through ``cache``."""
+    with _tile_cache_lock:
+        index = _osm_indexes.get(cache)
+        if index is None:
+            from .spatial_index import OSMIndex
+
+            index = _osm_indexes[cache] = OSMIndex(zoom=cache.zoom, ttl=cache.ttl)
+            # Elements leave the index with the last cached tile holding them
+            cache.evict_listeners.append(index.evict_tiles)
+        return index
+
+
+async def _fetch_osm_objects(lat, lng, radius):
+    cache = get_tile_cache()
+    if cache is not None:
+        index = get_osm_index(cache)
+        if index.covers(lat, lng, radius):
+            from .osm_tile_cache import radius_bbox, tiles_for_bbox
+
+            loop = asyncio.get_running_loop()
+            # Keep the tiles' LRU position current, or eviction would pick the hottest ones
+            keys = tiles_for_bbox(*radius_bbox(lat, lng, radius), cache.zoom)
+            touched = loop.run_in_executor(None, cache.touch, keys)
+            # The first query after new tiles rebuilds the tree; keep it off the loop
+            found = await loop.run_in_executor(None, index.radius, lat, lng, radius)
+            await touched
+            return found
+        tiles = await cache.tiles(lat, lng, radius)
+        index.add_tiles(tiles)
+        return cache.select(tiles, lat, lng, radius)
+
+    query = _around_query(lat, lng, radius)
     try:
-        response = requests.post(OSM_OVERPASS_URL, data=query, timeout=10)
+        response = await get_http_client().post(OSM_OVERPASS_URL, content=query, timeout=10)
         response.raise_for_status()
         return response.json().get("elements", [])
-    except requests.exceptions.RequestException as exc:
+    except httpx.HTTPError as exc:
         # Avoid propagating external service failures to public endpoints.
         from ..utils.logger import log
         log(f"OSM Overpass request failed: {exc}")
         return []
+
+
+def get_lod_cache():
+    """Return the process-wide cache of simplified tiles."""
+    global _lod_cache
+    with _tile_cache_lock:
+        if _lod_cache is None:
+            from .geometry_lod import LodTileCache
+
+            _lod_cache = LodTileCache(ttl=OSM_CACHE_TTL)
+        return _lod_cache
+
+
+async def fetch_osm_lod(lat, lng, radius, lod):
+    """Normalized records with way/relation geometry simplified for ``lod``.
+
+    See ``geometry_lod`` for the levels. With the tile cache enabled the
+    simplified records are cached per tile and level.
+    """
+    key = (round(float(lat), 6), round(float(lng), 6), float(radius), int(lod))
+    return await _flight.do(key, _fetch_osm_lod, lat, lng, radius, int(lod))
+
+
+async def _fetch_osm_lod(lat, lng, radius, lod):
+    from .geometry_lod import simplify_element
+
+    loop = asyncio.get_running_loop()
+    cache = get_tile_cache()
+    if cache is not None:
+        lod_cache = get_lod_cache()
+        with _tile_cache_lock:
+            # Simplified tiles go stale with their raw tile
+            if lod_cache.invalidate not in cache.store_listeners:
+                cache.store_listeners.append(lod_cache.invalidate)
+                cache.evict_listeners.append(lod_cache.invalidate)
+        tiles = await cache.tiles(lat, lng, radius)
+        # Simplification is CPU-bound; keep it off the event loop
+        return await loop.run_in_executor(None, lod_cache.query, tiles, lod, lat, lng, radius)
+    elements = await _fetch_osm_objects(lat, lng, radius)
+    return await loop.run_in_executor(None, lambda: [simplify_element(e, lod) for e in elements])
+
+
+async def stream_osm_objects(lat, lng, radius):
+    """Yield the elements of ``fetch_osm_objects`` as they become available.
+
+    The Overpass response is parsed while it downloads and elements are
+    emitted as they are parsed. With the tile cache, cached tiles are emitted
+    one at a time first; the missing tiles are still collected in full to be
+    stored. Without it, memory stays flat regardless of the radius. Upstream
+    failures end the stream early (and are logged) instead of raising.
+    """
+    cache = get_tile_cache()
+    if cache is not None:
+        async for el in cache.stream(lat, lng, radius):
+            yield el
+        return
+
+    from .json_stream import iter_array_items
+
+    try:
+        async with get_http_client().stream(
+            "POST", OSM_OVERPASS_URL, content=_around_query(lat, lng, radius), timeout=10
+        ) as response:
+            response.raise_for_status()
+            async for el in iter_array_items(response.aiter_bytes(), "elements"):
+                yield el
+    except (httpx.HTTPError, ValueError) as exc:
+        from ..utils.logger import log
+        log(f"OSM Overpass stream failed: {exc}")
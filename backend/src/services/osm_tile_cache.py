@@ -0,0 +1,349 @@
+"""Persistent, tile-keyed cache of Overpass elements.
+
+Elements are stored per slippy-map tile (z/x/y) in a local SQLite file. A
+radius query is answered by merging the cached tiles that cover the circle
+and filtering by distance; only tiles that are missing or older than the TTL
+are fetched, in one bbox query covering all of them. Least recently used
+tiles are evicted once the cache holds more than ``max_tiles``. Concurrent
+queries needing the same missing tile share one upstream fetch.
+"""
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from ..utils.logger import log
+from .single_flight import SingleFlight
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = 111320.0
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    n = 1 << zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """Return ``(south, west, north, east)`` of a tile in degrees."""
+    n = 1 << zoom
+
+    def lat_of(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat_of(y + 1), x / n * 360.0 - 180.0, lat_of(y), (x + 1) / n * 360.0 - 180.0
+
+
+def radius_bbox(lat, lng, radius):
+    dlat = radius / METERS_PER_DEG_LAT
+    dlng = radius / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def tiles_for_bbox(south, west, north, east, zoom):
+    x0, y0 = lonlat_to_tile(west, north, zoom)
+    x1, y1 = lonlat_to_tile(east, south, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def element_bounds(el):
+    """Return ``(south, west, north, east)`` for an Overpass element, or None."""
+    if el.get("lat") is not None and el.get("lon") is not None:
+        return el["lat"], el["lon"], el["lat"], el["lon"]
+    b = el.get("bounds")
+    if b:
+        return b["minlat"], b["minlon"], b["maxlat"], b["maxlon"]
+    geom = el.get("geometry")
+    if isinstance(geom, list):
+        pts = [p for p in geom if p and p.get("lat") is not None]
+        if pts:
+            lats = [p["lat"] for p in pts]
+            lons = [p["lon"] for p in pts]
+            return min(lats), min(lons), max(lats), max(lons)
+    c = el.get("center")
+    if c:
+        return c["lat"], c["lon"], c["lat"], c["lon"]
+    return None
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_to_bounds(lat, lng, bounds):
+    """Distance in metres from a point to the nearest point of a lat/lon box."""
+    south, west, north, east = bounds
+    return haversine_m(lat, lng, min(max(lat, south), north), min(max(lng, west), east))
+
+
+class OverpassTileCache:
+    """SQLite-backed cache of Overpass elements keyed by slippy tile.
+
+    ``fetch(south, west, north, east)`` is a coroutine function returning the
+    Overpass elements in that bbox (``out geom`` output); it is only called
+    for missing tiles. ``fetch_stream``, if given, is used instead: an async
+    iterator factory yielding those elements as the response is parsed, so
+    ``stream`` can emit them while they download. SQLite access runs in a
+    worker thread so large tile payloads do not block the event loop.
+    """
+
+    def __init__(self, path, fetch, zoom=15, ttl=24 * 3600, max_tiles=4096, fetch_stream=None):
+        self.path = str(path)
+        self.fetch = fetch
+        self.fetch_stream = fetch_stream
+        # Called with the (x, y) keys of evicted tiles, e.g. to evict them from an OSMIndex
+        self.evict_listeners = []
+        # Called with the (x, y) keys of tiles just (re)fetched, e.g. to drop what was derived from them
+        self.store_listeners = []
+        self.zoom = zoom
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self.hits = 0
+        self.misses = 0
+        self.flight = SingleFlight("osm_tiles")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tiles ("
+            " z INTEGER, x INTEGER, y INTEGER,"
+            " fetched_at REAL, accessed_at REAL, payload BLOB,"
+            " PRIMARY KEY (z, x, y))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS tiles_lru ON tiles (accessed_at)")
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def _load(self, keys, now):
+        """Return ``{(x, y): elements}`` for fresh cached tiles and mark them used."""
+        found = {}
+        with self._lock:
+            for x, y in keys:
+                row = self._db.execute(
+                    "SELECT fetched_at, payload FROM tiles WHERE z=? AND x=? AND y=?",
+                    (self.zoom, x, y),
+                ).fetchone()
+                if row is None or now - row[0] > self.ttl:
+                    continue
+                found[(x, y)] = json.loads(row[1])
+            if found:
+                self._db.executemany(
+                    "UPDATE tiles SET accessed_at=? WHERE z=? AND x=? AND y=?",
+                    [(now, self.zoom, x, y) for x, y in found],
+                )
+                self._db.commit()
+        return found
+
+    def touch(self, keys, now=None):
+        """Mark the cached ``(x, y)`` tiles in ``keys`` as used at ``now``.
+
+        For callers that answer from elements they already hold (an
+        ``OSMIndex``), so the LRU still sees which tiles are in use.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.executemany(
+                "UPDATE tiles SET accessed_at=? WHERE z=? AND x=? AND y=?",
+                [(now, self.zoom, x, y) for x, y in keys],
+            )
+            self._db.commit()
+
+    def _store(self, tiles, now):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tiles (z, x, y, fetched_at, accessed_at, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (self.zoom, x, y, now, now, json.dumps(elements, separators=(",", ":")))
+                    for (x, y), elements in tiles.items()
+                ],
+            )
+            evicted = self._evict(now)
+            self._db.commit()
+        if tiles:
+            for listener in self.store_listeners:
+                listener(list(tiles))
+        if evicted:
+            for listener in self.evict_listeners:
+                listener(evicted)
+
+    def _evict(self, now):
+        """Delete expired and least recently used tiles; returns their ``(x, y)`` keys."""
+        rows = self._db.execute(
+            "SELECT rowid, x, y FROM tiles WHERE fetched_at < ?", (now - self.ttl,)
+        ).fetchall()
+        count = self._db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        excess = count - len(rows) - self.max_tiles
+        if excess > 0:
+            rows += self._db.execute(
+                "SELECT rowid, x, y FROM tiles WHERE fetched_at >= ? ORDER BY accessed_at ASC LIMIT ?",
+                (now - self.ttl, excess),
+            ).fetchall()
+        self._db.execute("DELETE FROM tiles WHERE fetched_at < ?", (now - self.ttl,))
+        self._db.executemany("DELETE FROM tiles WHERE rowid=?", [(row[0],) for row in rows])
+        return [(x, y) for _, x, y in rows]
+
+    async def _elements(self, south, west, north, east):
+        if self.fetch_stream is not None:
+            async for el in self.fetch_stream(south, west, north, east):
+                yield el
+        else:
+            for el in await self.fetch(south, west, north, east):
+                yield el
+
+    async def _fetch_tiles(self, keys, emit=None):
+        """Fetch the bbox covering ``keys`` once and split it into tiles.
+
+        ``emit(element)`` is called for each element as it arrives.
+        """
+        bounds = [tile_bounds(x, y, self.zoom) for x, y in keys]
+        south = min(b[0] for b in bounds)
+        west = min(b[1] for b in bounds)
+        north = max(b[2] for b in bounds)
+        east = max(b[3] for b in bounds)
+
+        tiles = {key: [] for key in keys}
+        async for el in self._elements(south, west, north, east):
+            if emit is not None:
+                emit(el)
+            eb = element_bounds(el)
+            if eb is None:
+                continue
+            # Clip to the fetched area so huge relations do not enumerate
+            # every tile they cover
+            clipped = (max(eb[0], south), max(eb[1], west), min(eb[2], north), min(eb[3], east))
+            if clipped[0] > clipped[2] or clipped[1] > clipped[3]:
+                continue
+            for key in tiles_for_bbox(*clipped, self.zoom):
+                if key in tiles:
+                    tiles[key].append(el)
+        return tiles
+
+    async def _fetch_and_store(self, keys, emit=None):
+        fetched = await self._fetch_tiles(keys, emit)
+        await asyncio.get_running_loop().run_in_executor(None, self._store, fetched, time.time())
+        return fetched
+
+    async def tiles(self, lat, lng, radius):
+        """Return ``{(x, y): elements}`` for every tile covering the circle."""
+        keys = tiles_for_bbox(*radius_bbox(lat, lng, radius), self.zoom)
+        now = time.time()
+        found = await asyncio.get_running_loop().run_in_executor(None, self._load, keys, now)
+        missing = [key for key in keys if key not in found]
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            try:
+                # Tiles another query is already fetching are awaited, not refetched
+                fetched = await self.flight.do_many(missing, self._fetch_and_store)
+            except Exception as exc:
+                # Serve what is cached; failed tiles are retried next time
+                log(f"OSM tile fetch failed for {len(missing)} tiles: {exc}")
+                return found
+            found.update(fetched)
+        return found
+
+    async def stream(self, lat, lng, radius):
+        """Yield the elements of ``query`` tile by tile as they become available.
+
+        Cached tiles are read and emitted one at a time, so only one tile is
+        held in memory; missing tiles are then fetched (and stored) together
+        as in ``tiles``. Elements of a fetch this call starts are emitted as
+        they are parsed; tiles another query is already fetching are emitted
+        once that fetch is done. The fetched tiles are still collected in
+        full, since that is what gets stored.
+        """
+        keys = tiles_for_bbox(*radius_bbox(lat, lng, radius), self.zoom)
+        loop = asyncio.get_running_loop()
+        seen = set()
+        missing = []
+        for key in keys:
+            found = await loop.run_in_executor(None, self._load, [key], time.time())
+            if not found:
+                missing.append(key)
+                continue
+            self.hits += 1
+            for el in self._within(found[key], lat, lng, radius, seen):
+                yield el
+        if not missing:
+            return
+        self.misses += len(missing)
+        arrived = asyncio.Queue()
+
+        async def fetch(keys):
+            try:
+                return await self._fetch_and_store(keys, arrived.put_nowait)
+            finally:
+                arrived.put_nowait(None)
+
+        done = asyncio.ensure_future(self.flight.do_many(missing, fetch))
+        try:
+            while not done.done() or not arrived.empty():
+                getter = asyncio.ensure_future(arrived.get())
+                await asyncio.wait((getter, done), return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                el = getter.result()
+                if el is None:
+                    break
+                for hit in self._within((el,), lat, lng, radius, seen):
+                    yield hit
+            fetched = await done
+        except Exception as exc:
+            log(f"OSM tile fetch failed for {len(missing)} tiles: {exc}")
+            return
+        finally:
+            done.cancel()
+        # Tiles fetched by other queries (ours are already in ``seen``)
+        for elements in fetched.values():
+            for el in self._within(elements, lat, lng, radius, seen):
+                yield el
+
+    @staticmethod
+    def _within(elements, lat, lng, radius, seen):
+        for el in elements:
+            key = (el.get("type"), el.get("id"))
+            if key in seen:
+                continue
+            seen.add(key)
+            eb = element_bounds(el)
+            if eb is not None and distance_to_bounds(lat, lng, eb) <= radius:
+                yield el
+
+    @classmethod
+    def select(cls, tiles, lat, lng, radius):
+        """Elements of ``tiles`` within ``radius`` metres, de-duplicated across tiles."""
+        seen = set()
+        results = []
+        for elements in tiles.values():
+            results.extend(cls._within(elements, lat, lng, radius, seen))
+        return results
+
+    async def query(self, lat, lng, radius):
+        """Return elements within ``radius`` metres, de-duplicated across tiles."""
+        return self.select(await self.tiles(lat, lng, radius), lat, lng, radius)
+
+    def stats(self):
+        return {
+            "tiles": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "zoom": self.zoom,
+            "coalescing": self.flight.stats(),
+        }
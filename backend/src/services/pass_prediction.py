@@ -0,0 +1,206 @@
+"""Satellite look angles and pass prediction for a ground observer.
+
+The whole catalog is evaluated on a coarse time grid in one batch (TEME
+positions rotated to Earth-fixed, then projected onto the observer's local
+east/north/up frame). Horizon crossings are bracketed where the elevation
+minus the mask changes sign between grid points and refined by vectorized
+bisection; culminations are refined by golden-section search around the
+highest grid point of each pass. Refinement evaluates positions by Lagrange
+interpolation on the grid, so no extra SGP4 calls are needed.
+
+Passes shorter than the grid step can fall between two samples and be
+missed; the default 60 s step is well below LEO pass durations.
+"""
+import numpy as np
+
+from .satellite_orbit_service import WGS84_A_KM, WGS84_E2, gmst, teme_to_ecef, to_julian
+
+BISECT_ITERATIONS = 20  # 60 s bracket -> ~60 us
+GOLDEN_ITERATIONS = 24
+_GOLDEN = (np.sqrt(5.0) - 1.0) / 2.0
+
+
+def observer_frame(lat, lon, alt_m=0.0):
+    """Earth-fixed position (km) and ``(east, north, up)`` unit vectors."""
+    phi, lam = np.radians(lat), np.radians(lon)
+    sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+    sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+    n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_phi * sin_phi)
+    h = alt_m / 1000.0
+    position = np.array([
+        (n + h) * cos_phi * cos_lam,
+        (n + h) * cos_phi * sin_lam,
+        (n * (1.0 - WGS84_E2) + h) * sin_phi,
+    ])
+    east = np.array([-sin_lam, cos_lam, 0.0])
+    north = np.array([-sin_phi * cos_lam, -sin_phi * sin_lam, cos_phi])
+    up = np.array([cos_phi * cos_lam, cos_phi * sin_lam, sin_phi])
+    return position, np.stack((east, north, up))
+
+
+def look_angles(r_teme, times, observer):
+    """Elevation and azimuth (degrees) of TEME positions ``(..., 3)`` at ``times``.
+
+    ``times`` broadcasts against ``r_teme[..., 0]``; range is returned in km.
+    """
+    position, enu = observer
+    jd, fr = to_julian(times)
+    rho = teme_to_ecef(r_teme, gmst(jd, fr)) - position
+    local = rho @ enu.T
+    rng = np.linalg.norm(local, axis=-1)
+    elevation = np.degrees(np.arcsin(np.clip(local[..., 2] / rng, -1.0, 1.0)))
+    azimuth = np.mod(np.degrees(np.arctan2(local[..., 0], local[..., 1])), 360.0)
+    return elevation, azimuth, rng
+
+
+class _GridInterpolator:
+    """Pairwise Lagrange interpolation of grid positions ``(n, K, 3)``."""
+
+    def __init__(self, grid_times, r, order=6):
+        self.t0 = float(grid_times[0])
+        self.step = float(grid_times[1] - grid_times[0]) if len(grid_times) > 1 else 1.0
+        self.r = r
+        self.order = min(order, r.shape[1])
+
+    def __call__(self, sat, t):
+        n_knots = self.r.shape[1]
+        k = np.floor((t - self.t0) / self.step).astype(np.int64)
+        first = np.clip(k - (self.order // 2 - 1), 0, n_knots - self.order)
+        x = (t - self.t0) / self.step - first
+        nodes = np.arange(self.order, dtype=np.float64)
+        out = np.zeros((len(t), 3))
+        for j in range(self.order):
+            w = np.ones(len(t))
+            for m in range(self.order):
+                if m != j:
+                    w *= (x - nodes[m]) / (nodes[j] - nodes[m])
+            out += w[:, None] * self.r[sat, first + j]
+        return out
+
+
+def _bisect(f, sat, lo, hi, rising):
+    """Time of the mask crossing in ``[lo, hi]`` for each bracket."""
+    for _ in range(BISECT_ITERATIONS):
+        mid = 0.5 * (lo + hi)
+        above = f(sat, mid) >= 0.0
+        # Rising: the crossing is before mid if already above at mid
+        go_left = above if rising else ~above
+        hi = np.where(go_left, mid, hi)
+        lo = np.where(go_left, lo, mid)
+    return 0.5 * (lo + hi)
+
+
+def _golden_max(f, sat, lo, hi):
+    """Golden-section search for the maximum of ``f`` on each interval."""
+    c = hi - _GOLDEN * (hi - lo)
+    d = lo + _GOLDEN * (hi - lo)
+    fc, fd = f(sat, c), f(sat, d)
+    for _ in range(GOLDEN_ITERATIONS):
+        left = fc > fd
+        hi = np.where(left, d, hi)
+        lo = np.where(left, lo, c)
+        # One interior point survives; only the new one is evaluated
+        x = np.where(left, hi - _GOLDEN * (hi - lo), lo + _GOLDEN * (hi - lo))
+        fx = f(sat, x)
+        c, d = np.where(left, x, d), np.where(left, c, x)
+        fc, fd = np.where(left, fx, fd), np.where(left, fc, fx)
+    return 0.5 * (lo + hi)
+
+
+def _lookup(keys, values, query):
+    """``values`` at ``keys == query`` (keys unique), NaN where absent."""
+    order = np.argsort(keys)
+    keys, values = keys[order], values[order]
+    pos = np.minimum(np.searchsorted(keys, query), max(len(keys) - 1, 0))
+    out = np.full(len(query), np.nan)
+    if len(keys):
+        hit = keys[pos] == query
+        out[hit] = values[pos[hit]]
+    return out
+
+
+def predict_passes(teme, n_sats, lat, lon, alt_m=0.0, start=0.0, duration=3600.0,
+                   step=60.0, min_elevation=10.0):
+    """Find passes above ``min_elevation`` degrees within the window.
+
+    ``teme(times)`` returns TEME positions ``(n_sats, len(times), 3)`` for the
+    satellites being searched (row ``i`` of the result is satellite ``i``).
+    Returns ``(passes, now)``: ``passes`` is a dict of parallel arrays (``sat``,
+    ``rise``, ``culmination``, ``set``, ``max_elevation``, ``rise_azimuth``,
+    ``set_azimuth``), with NaN ``rise``/``set`` for passes already in progress
+    at ``start`` or still up at the end; ``now`` holds elevation and azimuth
+    ``(n_sats,)`` at ``start``.
+    """
+    observer = observer_frame(lat, lon, alt_m)
+    grid = start + np.arange(0.0, duration + step * 0.5, step)
+    r = teme(grid)
+    elevation, azimuth, _ = look_angles(r, grid[None, :], observer)
+    elevation = np.where(np.isnan(elevation), -90.0, elevation)
+    now = {"elevation": elevation[:, 0], "azimuth": azimuth[:, 0]}
+
+    interp = _GridInterpolator(grid, np.nan_to_num(r))
+
+    def margin(sat, t):
+        el, _, _ = look_angles(interp(sat, t), t, observer)
+        return el - min_elevation
+
+    above = elevation >= min_elevation
+    n_grid = len(grid)
+
+    # Horizon crossings between grid points k and k + 1
+    rise_sat, rise_k = np.nonzero(~above[:, :-1] & above[:, 1:])
+    set_sat, set_k = np.nonzero(above[:, :-1] & ~above[:, 1:])
+    rise_t = _bisect(margin, rise_sat, grid[rise_k], grid[rise_k + 1], True)
+    set_t = _bisect(margin, set_sat, grid[set_k], grid[set_k + 1], False)
+
+    # One label per run of above-mask grid points (a pass)
+    flat = above.ravel()
+    begins = flat & np.concatenate(([True], ~flat[:-1]))
+    begins.reshape(n_sats, n_grid)[:, 0] = above[:, 0]
+    cells = np.flatnonzero(flat)
+    if not len(cells):
+        empty = np.empty(0)
+        return {
+            "sat": np.empty(0, dtype=np.int64), "rise": empty, "culmination": empty, "set": empty,
+            "max_elevation": empty, "rise_azimuth": empty, "set_azimuth": empty,
+        }, now
+    label = np.cumsum(begins[cells]) - 1
+    starts = np.flatnonzero(begins[cells])
+    pass_sat = cells[starts] // n_grid
+    first_k = cells[starts] % n_grid
+    last_k = first_k + np.diff(np.append(starts, len(cells))) - 1
+
+    # Highest grid sample of each pass, refined between its neighbours
+    el_cells = elevation.ravel()[cells]
+    best = np.maximum.reduceat(el_cells, starts)
+    peak_pos = np.lexsort((-el_cells, label))[starts]
+    peak_k = cells[peak_pos] % n_grid
+    lo = grid[np.maximum(peak_k - 1, 0)]
+    hi = grid[np.minimum(peak_k + 1, n_grid - 1)]
+    culmination = _golden_max(margin, pass_sat, lo, hi)
+    peak = margin(pass_sat, culmination) + min_elevation
+    keep_grid = peak < best  # search could not beat the grid (e.g. at the window edge)
+    culmination = np.where(keep_grid, grid[peak_k], culmination)
+    peak = np.maximum(peak, best)
+
+    # Attach refined crossings: the rise just before a pass, the set at its end
+    key = pass_sat * n_grid
+    rise = _lookup(rise_sat * n_grid + rise_k + 1, rise_t, key + first_k)
+    sets = _lookup(set_sat * n_grid + set_k, set_t, key + last_k)
+
+    def azimuth_at(t):
+        valid = ~np.isnan(t)
+        az = np.full(len(t), np.nan)
+        if valid.any():
+            _, az[valid], _ = look_angles(interp(pass_sat[valid], t[valid]), t[valid], observer)
+        return az
+
+    return {
+        "sat": pass_sat,
+        "rise": rise,
+        "culmination": culmination,
+        "set": sets,
+        "max_elevation": peak,
+        "rise_azimuth": azimuth_at(rise),
+        "set_azimuth": azimuth_at(sets),
+    }, now
@@ -0,0 +1,969 @@
+"""Shortest-path routing over OSM highway ways.
+
+``RoadGraph.from_elements`` compiles drivable ways into a junction graph.
+Ways are cut at every node they share with another way. Each cut is a
+*piece*, which keeps its shape points for polylines and becomes one or two
+directed edges (``oneway`` respected) weighted by travel time at the
+piece's speed limit. Edges are stored CSR-style, sorted by source node.
+
+A query snaps both ends onto their nearest piece and searches from the
+piece's junctions. The default search is A* with a straight-line / top-speed
+heuristic. After ``build_hierarchy()`` a bidirectional upward search over a
+contraction hierarchy is used instead. The hierarchy is slower to build but
+visits only a few hundred nodes per query on a city graph.
+``RoadGraph.eta_matrix`` answers N origins x M destinations with shared
+searches (see there); ``eta_matrix`` spreads large ones over a process pool.
+
+Road data comes from a highway-only Overpass query
+(``osm_services.fetch_osm_roads``). Compiled graphs (with their hierarchy)
+are saved as ``.npz`` files under ROAD_GRAPH_CACHE_DIR, keyed by a digest of
+the ways, so a restart or a repeated area skips the build; an area routed
+within OSM_CACHE_TTL reuses its graph without fetching again.
+"""
+import hashlib
+import heapq
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from ..config.env import (
+    ETA_POOL_MIN_ORIGINS,
+    ETA_WORKERS,
+    OSM_CACHE_TTL,
+    ROAD_GRAPH_CACHE_DIR,
+    ROAD_GRAPH_CH,
+    ROUTE_MAX_RADIUS,
+)
+from .environment_loader import KMH, road_speed
+from .osm_tile_cache import EARTH_RADIUS_M, METERS_PER_DEG_LAT, haversine_m
+from .single_flight import SingleFlight
+
+DRIVABLE = {
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+    "residential", "living_street", "service", "road",
+}
+# Travel speed on roads without a limit ("maxspeed=none"), km/h
+UNLIMITED_SPEED = 130.0
+# Snapping gives up beyond this distance from any road, metres
+MAX_SNAP_DISTANCE = 2000.0
+# Points snapped within this many metres of a piece's end are at its junction
+JUNCTION_TOLERANCE = 0.01
+# Bump when the saved layout changes so old cache files are ignored
+FORMAT_VERSION = 2
+
+_ARRAYS = (
+    "node_lat", "node_lon", "indptr", "edge_target", "edge_weight", "edge_length", "edge_piece",
+    "edge_reverse", "piece_u", "piece_v", "piece_start", "piece_end", "piece_speed",
+    "piece_forward", "piece_backward", "shape_lat", "shape_lon", "shape_dist",
+)
+_HIERARCHY = ("up_indptr", "up_target", "up_weight", "up_length",
+              "down_indptr", "down_target", "down_weight", "down_length",
+              "shortcut_u", "shortcut_v", "shortcut_mid")
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in metres."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((p2 - p1) * 0.5) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(np.radians(lon2 - lon1) * 0.5) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def _direction(tags):
+    """``(forward, backward)`` travel allowed along a way's node order."""
+    oneway = str(tags.get("oneway", "")).lower()
+    if oneway in ("yes", "true", "1"):
+        return True, False
+    if oneway in ("-1", "reverse"):
+        return False, True
+    if oneway == "no":
+        return True, True
+    if tags.get("junction") in ("roundabout", "circular") or tags.get("highway") == "motorway":
+        return True, False
+    return True, True
+
+
+def _drivable_ways(elements):
+    seen = set()
+    for el in elements:
+        tags = el.get("tags") or {}
+        if el.get("type") != "way" or tags.get("highway") not in DRIVABLE or el.get("id") in seen:
+            continue
+        coords = [(p["lat"], p["lon"]) for p in el.get("geometry") or [] if p]
+        if len(coords) > 1:
+            seen.add(el.get("id"))
+            yield el.get("id"), tags, coords
+
+
+def graph_key(elements):
+    """Digest of everything in ``elements`` that affects the compiled graph."""
+    digest = hashlib.sha256(str(FORMAT_VERSION).encode())
+    for way_id, tags, coords in sorted(_drivable_ways(elements), key=lambda w: str(w[0])):
+        digest.update(repr((way_id, tags.get("highway"), tags.get("maxspeed"), tags.get("oneway"),
+                            tags.get("junction"), coords)).encode())
+    return digest.hexdigest()[:32]
+
+
+def parse_point(value):
+    """``(lat, lon)`` from ``{"lat", "lon"|"lng"}`` or ``[lat, lon]``, else None."""
+    try:
+        if isinstance(value, dict):
+            lat, lon = float(value["lat"]), float(value.get("lon", value.get("lng")))
+        elif isinstance(value, (list, tuple)) and len(value) == 2:
+            lat, lon = float(value[0]), float(value[1])
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+class RoadGraph:
+    """CSR junction graph with piece geometry; see the module docstring."""
+
+    def __init__(self, **arrays):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.max_speed = float(self.piece_speed.max()) if len(self.piece_speed) else 1.0
+        self.hierarchy = None
+        if all(name in arrays for name in _HIERARCHY):
+            self.hierarchy = {name: arrays[name] for name in _HIERARCHY}
+        self.path = None  # cache file, once saved or loaded
+        self._tree = None
+        self._lists = None
+        self._lock = threading.Lock()
+
+    @property
+    def n_nodes(self):
+        return len(self.node_lat)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_target)
+
+    # -- building ---------------------------------------------------------
+
+    @classmethod
+    def from_elements(cls, elements):
+        ways = list(_drivable_ways(elements))
+        keys = [[(round(lat * 1e7), round(lon * 1e7)) for lat, lon in coords] for _, _, coords in ways]
+        # A node is a junction where ways meet or end
+        uses = Counter(key for way_keys in keys for key in way_keys)
+        junctions = {}
+        node_lat, node_lon = [], []
+        shape_lat, shape_lon = [], []
+        piece_u, piece_v, piece_start, piece_end, piece_speed, forward, backward = [], [], [], [], [], [], []
+        for (way_id, tags, coords), way_keys in zip(ways, keys):
+            last = len(coords) - 1
+            cuts = [i for i, key in enumerate(way_keys) if i == 0 or i == last or uses[key] > 1]
+            speed = road_speed(tags)
+            speed = (speed if math.isfinite(speed) else UNLIMITED_SPEED) * KMH
+            fwd, bwd = _direction(tags)
+            for a, b in zip(cuts, cuts[1:]):
+                ends = []
+                for i in (a, b):
+                    node = junctions.get(way_keys[i])
+                    if node is None:
+                        node = junctions[way_keys[i]] = len(node_lat)
+                        node_lat.append(coords[i][0])
+                        node_lon.append(coords[i][1])
+                    ends.append(node)
+                piece_u.append(ends[0])
+                piece_v.append(ends[1])
+                piece_start.append(len(shape_lat))
+                shape_lat.extend(lat for lat, _ in coords[a:b + 1])
+                shape_lon.extend(lon for _, lon in coords[a:b + 1])
+                piece_end.append(len(shape_lat))
+                piece_speed.append(speed)
+                forward.append(fwd)
+                backward.append(bwd)
+
+        shape_lat = np.asarray(shape_lat, dtype=np.float64)
+        shape_lon = np.asarray(shape_lon, dtype=np.float64)
+        piece_start = np.asarray(piece_start, dtype=np.int64)
+        piece_end = np.asarray(piece_end, dtype=np.int64)
+        # Cumulative distance along each piece, restarting at every piece start
+        step = np.zeros(len(shape_lat))
+        if len(shape_lat) > 1:
+            step[1:] = _haversine(shape_lat[:-1], shape_lon[:-1], shape_lat[1:], shape_lon[1:])
+        step[piece_start] = 0.0
+        shape_dist = np.cumsum(step)
+        if len(piece_start):
+            shape_dist -= np.repeat(shape_dist[piece_start], piece_end - piece_start)
+        piece_length = shape_dist[piece_end - 1] if len(piece_end) else np.empty(0)
+
+        piece_u = np.asarray(piece_u, dtype=np.int64)
+        piece_v = np.asarray(piece_v, dtype=np.int64)
+        piece_speed = np.asarray(piece_speed, dtype=np.float64)
+        forward = np.asarray(forward, dtype=bool)
+        backward = np.asarray(backward, dtype=bool)
+        pieces = np.arange(len(piece_u))
+        loop = piece_u == piece_v
+        fwd = pieces[forward & ~loop]
+        bwd = pieces[backward & ~loop]
+        source = np.concatenate((piece_u[fwd], piece_v[bwd]))
+        target = np.concatenate((piece_v[fwd], piece_u[bwd]))
+        edge_piece = np.concatenate((fwd, bwd))
+        edge_reverse = np.concatenate((np.zeros(len(fwd), bool), np.ones(len(bwd), bool)))
+        order = np.argsort(source, kind="stable")
+        n = len(node_lat)
+        return cls(
+            node_lat=np.asarray(node_lat, dtype=np.float64),
+            node_lon=np.asarray(node_lon, dtype=np.float64),
+            indptr=np.concatenate(([0], np.cumsum(np.bincount(source, minlength=n)))).astype(np.int64),
+            edge_target=target[order],
+            edge_weight=(piece_length / piece_speed)[edge_piece[order]] if len(order) else np.empty(0),
+            edge_length=piece_length[edge_piece[order]] if len(order) else np.empty(0),
+            edge_piece=edge_piece[order],
+            edge_reverse=edge_reverse[order],
+            piece_u=piece_u, piece_v=piece_v, piece_start=piece_start, piece_end=piece_end,
+            piece_speed=piece_speed, piece_forward=forward, piece_backward=backward,
+            shape_lat=shape_lat, shape_lon=shape_lon, shape_dist=shape_dist,
+        )
+
+    def build_hierarchy(self, witness_limit=64):
+        """Contract every node, cheapest first, adding the shortcuts it needs.
+
+        A node's priority is its edge difference (shortcuts added minus edges
+        removed) plus its contracted neighbours and its depth in the
+        hierarchy so far, which keeps contraction spread evenly over the
+        map. Priorities are refreshed lazily when a node reaches the top of
+        the queue. Witness searches settle at most ``witness_limit`` nodes;
+        a search cut short only adds a redundant shortcut, never a wrong one.
+        """
+        n = self.n_nodes
+        out = [dict() for _ in range(n)]
+        inn = [dict() for _ in range(n)]
+        source = np.repeat(np.arange(n), np.diff(self.indptr))
+        length = {}  # metres of every edge and shortcut, by node pair
+        for u, v, w, m in zip(source.tolist(), self.edge_target.tolist(), self.edge_weight.tolist(),
+                              self.edge_length.tolist()):
+            if u != v and w < out[u].get(v, math.inf):
+                out[u][v] = w
+                inn[v][u] = w
+                length[(u, v)] = m
+        mid = {}
+        contracted_neighbours = [0] * n
+        depth = [0] * n
+        up = [None] * n
+        down = [None] * n
+
+        def witness(u, skip, targets, limit):
+            """Distances from ``u`` avoiding ``skip``, until ``targets`` are settled."""
+            dist = {u: 0.0}
+            heap = [(0.0, u)]
+            settled = 0
+            remaining = len(targets)
+            while heap and settled < witness_limit and remaining:
+                d, x = heapq.heappop(heap)
+                if d > limit:
+                    break
+                if d > dist[x]:
+                    continue
+                settled += 1
+                if x in targets:
+                    remaining -= 1
+                for y, w in out[x].items():
+                    nd = d + w
+                    if y != skip and nd < dist.get(y, math.inf):
+                        dist[y] = nd
+                        heapq.heappush(heap, (nd, y))
+            return dist
+
+        def shortcuts(x):
+            needed = []
+            outs = out[x]
+            for u, w1 in inn[x].items():
+                targets = {v: w2 for v, w2 in outs.items() if v != u}
+                if not targets:
+                    continue
+                dist = witness(u, x, targets, w1 + max(targets.values()))
+                for v, w2 in targets.items():
+                    if dist.get(v, math.inf) > w1 + w2:
+                        needed.append((u, v, w1 + w2))
+            return needed
+
+        def priority(x, needed):
+            return len(needed) - len(inn[x]) - len(out[x]) + contracted_neighbours[x] + depth[x]
+
+        heap = [(priority(x, shortcuts(x)), x) for x in range(n)]
+        heapq.heapify(heap)
+        while heap:
+            _, x = heapq.heappop(heap)
+            needed = shortcuts(x)
+            current = priority(x, needed)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, x))
+                continue
+            for u, v, w in needed:
+                if w < out[u].get(v, math.inf):
+                    out[u][v] = w
+                    inn[v][u] = w
+                    mid[(u, v)] = x
+                    length[(u, v)] = length[(u, x)] + length[(x, v)]
+            # Everything still attached to x leads to a later (higher) node
+            up[x] = out[x]
+            down[x] = inn[x]
+            for v in up[x]:
+                del inn[v][x]
+                contracted_neighbours[v] += 1
+                depth[v] = max(depth[v], depth[x] + 1)
+            for u in down[x]:
+                del out[u][x]
+                contracted_neighbours[u] += 1
+                depth[u] = max(depth[u], depth[x] + 1)
+            out[x] = inn[x] = None
+
+        def csr(adjacency, pair):
+            counts = [len(a) for a in adjacency]
+            targets = [t for a in adjacency for t in a]
+            weights = [w for a in adjacency for w in a.values()]
+            metres = [length[pair(x, t)] for x, a in enumerate(adjacency) for t in a]
+            return (np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+                    np.asarray(targets, dtype=np.int64), np.asarray(weights, dtype=np.float64),
+                    np.asarray(metres, dtype=np.float64))
+
+        up_indptr, up_target, up_weight, up_length = csr(up, lambda x, v: (x, v))
+        down_indptr, down_target, down_weight, down_length = csr(down, lambda x, u: (u, x))
+        pairs = list(mid.items())
+        self.hierarchy = {
+            "up_indptr": up_indptr, "up_target": up_target, "up_weight": up_weight, "up_length": up_length,
+            "down_indptr": down_indptr, "down_target": down_target, "down_weight": down_weight,
+            "down_length": down_length,
+            "shortcut_u": np.asarray([u for (u, _), _ in pairs], dtype=np.int64),
+            "shortcut_v": np.asarray([v for (_, v), _ in pairs], dtype=np.int64),
+            "shortcut_mid": np.asarray([m for _, m in pairs], dtype=np.int64),
+        }
+        self._lists = None
+        return self
+
+    # -- persistence ------------------------------------------------------
+
+    def save(self, path):
+        """Write the graph (and hierarchy, if built) to ``path`` atomically."""
+        path = Path(path)
+        arrays = {name: getattr(self, name) for name in _ARRAYS}
+        arrays.update(self.hierarchy or {})
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            graph = cls(**{name: data[name] for name in data.files})
+        graph.path = Path(path)
+        return graph
+
+    # -- queries ----------------------------------------------------------
+
+    @property
+    def tree(self):
+        """STR tree over shape segments (row k spans shape points k, k + 1)."""
+        with self._lock:
+            if self._tree is None:
+                from .spatial_index import STRTree
+
+                a = np.arange(max(len(self.shape_lat) - 1, 0))
+                # Drop the pseudo-segments joining one piece to the next
+                a = a[~np.isin(a + 1, self.piece_start)]
+                self._segments = a
+                lat0, lat1 = self.shape_lat[a], self.shape_lat[a + 1]
+                lon0, lon1 = self.shape_lon[a], self.shape_lon[a + 1]
+                boxes = np.column_stack((np.minimum(lat0, lat1), np.minimum(lon0, lon1),
+                                         np.maximum(lat0, lat1), np.maximum(lon0, lon1)))
+                self._tree = STRTree(boxes)
+            return self._tree
+
+    def snap(self, lat, lon):
+        """``(piece, offset along it in m, snapped lat, snapped lon)``, or None."""
+        tree = self.tree
+        if not len(tree):
+            return None
+        radius = 50.0
+        while radius <= MAX_SNAP_DISTANCE * 2:
+            rows, _ = tree.radius(lat, lon, radius)
+            if len(rows):
+                k = self._segments[rows]
+                # Exact point-to-segment distance in a local metric frame
+                scale = math.cos(math.radians(lat))
+                ax = (self.shape_lon[k] - lon) * scale
+                ay = self.shape_lat[k] - lat
+                bx = (self.shape_lon[k + 1] - lon) * scale
+                by = self.shape_lat[k + 1] - lat
+                dx, dy = bx - ax, by - ay
+                length2 = dx * dx + dy * dy
+                t = np.clip(-(ax * dx + ay * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+                dist = np.hypot(ax + t * dx, ay + t * dy) * METERS_PER_DEG_LAT
+                best = int(np.argmin(dist))
+                if dist[best] <= radius:
+                    if dist[best] > MAX_SNAP_DISTANCE:
+                        return None
+                    seg, frac = int(k[best]), float(t[best])
+                    piece = int(np.searchsorted(self.piece_start, seg, side="right") - 1)
+                    offset = self.shape_dist[seg] + frac * (self.shape_dist[seg + 1] - self.shape_dist[seg])
+                    snapped_lat = self.shape_lat[seg] + frac * (self.shape_lat[seg + 1] - self.shape_lat[seg])
+                    snapped_lon = self.shape_lon[seg] + frac * (self.shape_lon[seg + 1] - self.shape_lon[seg])
+                    return piece, float(offset), float(snapped_lat), float(snapped_lon)
+            radius *= 4.0
+        return None
+
+    def _piece_length(self, piece):
+        return float(self.shape_dist[self.piece_end[piece] - 1])
+
+    def _ends(self, snap, leaving):
+        """Junctions next to a snapped point: ``{node: (seconds, metres, offset of the node)}``.
+
+        The costs are those of driving from the point to the node when
+        ``leaving``, else from the node to the point; the offset (0 or the
+        piece length) says which end of the piece the node is.
+        """
+        piece, offset = snap[0], snap[1]
+        length = self._piece_length(piece)
+        speed = float(self.piece_speed[piece])
+        u, v = int(self.piece_u[piece]), int(self.piece_v[piece])
+        # Leaving forward ends at v; arriving forward comes from u
+        options = []
+        if self.piece_forward[piece]:
+            options.append((v, length - offset, length) if leaving else (u, offset, 0.0))
+        if self.piece_backward[piece]:
+            options.append((u, offset, 0.0) if leaving else (v, length - offset, length))
+        # A point on a junction is that junction, whichever way the piece runs
+        if offset <= JUNCTION_TOLERANCE:
+            options.append((u, 0.0, 0.0))
+        if length - offset <= JUNCTION_TOLERANCE:
+            options.append((v, 0.0, length))
+        table = {}
+        for node, metres, node_offset in options:
+            if metres / speed < table.get(node, (math.inf,))[0]:
+                table[node] = (metres / speed, metres, node_offset)
+        return table
+
+    def _endpoints(self, start, goal):
+        """``_ends`` of leaving ``start`` and of reaching ``goal``."""
+        return self._ends(start, True), self._ends(goal, False)
+
+    def _direct(self, start, goal):
+        """Seconds along one piece when both ends snap onto it and its direction allows."""
+        if start[0] != goal[0]:
+            return math.inf
+        piece = start[0]
+        gap = goal[1] - start[1]
+        if (gap >= 0 and self.piece_forward[piece]) or (gap <= 0 and self.piece_backward[piece]):
+            return abs(gap) / float(self.piece_speed[piece])
+        return math.inf
+
+    def _adjacency(self):
+        """Per-node ``[(target, weight, id), ...]`` lists; Python loops walk these fastest.
+
+        In the hierarchy's ``up`` and ``down`` lists the third item is the
+        edge's length in metres instead of its id.
+        """
+        if self._lists is None:
+            def lists(indptr, target, weight, third):
+                pairs = list(zip(target.tolist(), weight.tolist(), third))
+                bounds = indptr.tolist()
+                return [pairs[bounds[u]:bounds[u + 1]] for u in range(len(bounds) - 1)]
+
+            adj = {"out": lists(self.indptr, self.edge_target, self.edge_weight, range(self.n_edges)),
+                   "length": self.edge_length.tolist()}
+            if self.hierarchy is not None:
+                h = self.hierarchy
+                adj["up"] = lists(h["up_indptr"], h["up_target"], h["up_weight"], h["up_length"].tolist())
+                adj["down"] = lists(h["down_indptr"], h["down_target"], h["down_weight"],
+                                    h["down_length"].tolist())
+                adj["mid"] = dict(zip(zip(h["shortcut_u"].tolist(), h["shortcut_v"].tolist()),
+                                      h["shortcut_mid"].tolist()))
+                # Cheapest original edge per node pair, for unpacking shortcuts
+                best = {}
+                for u, edges in enumerate(adj["out"]):
+                    for v, w, e in edges:
+                        if w < best.get((u, v), (math.inf,))[0]:
+                            best[(u, v)] = (w, e)
+                adj["edge"] = {pair: e for pair, (_, e) in best.items()}
+            self._lists = adj
+        return self._lists
+
+    def _astar(self, sources, targets, goal_lat, goal_lon, bound):
+        """Cheapest ``(cost, source node, edges, target node)`` under ``bound``, or None."""
+        out = self._adjacency()["out"]
+        # Admissible: straight-line distance to the goal at the top speed
+        h = (_haversine(self.node_lat, self.node_lon, goal_lat, goal_lon) / self.max_speed).tolist()
+        dist = [math.inf] * self.n_nodes
+        parent = {}
+        heap = []
+        for node, (cost, _, _) in sources.items():
+            dist[node] = cost
+            heapq.heappush(heap, (cost + h[node], cost, node))
+        best, best_node = bound, None
+        while heap:
+            f, g, u = heapq.heappop(heap)
+            if f >= best:
+                break
+            if g > dist[u]:
+                continue
+            if u in targets and g + targets[u][0] < best:
+                best, best_node = g + targets[u][0], u
+            for v, w, e in out[u]:
+                ng = g + w
+                if ng < dist[v]:
+                    dist[v] = ng
+                    parent[v] = (u, e)
+                    heapq.heappush(heap, (ng + h[v], ng, v))
+        if best_node is None:
+            return None
+        edges = []
+        node = best_node
+        while node in parent:
+            node, e = parent[node]
+            edges.append(e)
+        edges.reverse()
+        return best, node, edges, best_node
+
+    @staticmethod
+    def _upward(seeds, graph, reverse, bound=math.inf, other=None):
+        """Dijkstra over one half of the hierarchy, with stall-on-demand.
+
+        ``reverse`` holds the edges coming back down into each node: when a
+        higher neighbour already offers a shorter way in, the node is
+        stalled instead of expanded. With ``other`` (the opposite search's
+        distances) the best meeting node is tracked and the search stops at
+        ``bound``. ``metres`` follows ``dist`` along the same paths.
+        """
+        dist = {node: seed[0] for node, seed in seeds.items()}
+        metres = {node: seed[1] for node, seed in seeds.items()}
+        parent = {}
+        heap = [(cost, node) for node, cost in dist.items()]
+        heapq.heapify(heap)
+        best, meet = bound, None
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if other is not None:
+                if d >= best:
+                    break
+                if u in other and d + other[u] < best:
+                    best, meet = d + other[u], u
+            if any(dist.get(x, math.inf) + w < d for x, w, _ in reverse[u]):
+                continue
+            for v, w, length in graph[u]:
+                nd = d + w
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    metres[v] = metres[u] + length
+                    parent[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, metres, parent, best, meet
+
+    def _hierarchy_search(self, sources, targets, bound):
+        adj = self._adjacency()
+        fdist, _, fparent, _, _ = self._upward(sources, adj["up"], adj["down"])
+        _, _, bparent, best, meet = self._upward(targets, adj["down"], adj["up"], bound, fdist)
+        if meet is None:
+            return None
+        nodes = [meet]
+        while nodes[-1] in fparent:
+            nodes.append(fparent[nodes[-1]])
+        nodes.reverse()
+        tail = meet
+        while tail in bparent:
+            tail = bparent[tail]
+            nodes.append(tail)
+        edges = []
+        mid, edge = adj["mid"], adj["edge"]
+        for a, b in zip(nodes, nodes[1:]):
+            stack = [(a, b)]
+            while stack:
+                x, y = stack.pop()
+                m = mid.get((x, y))
+                if m is None:
+                    edges.append(edge[(x, y)])
+                else:
+                    stack.append((m, y))
+                    stack.append((x, m))
+        return best, nodes[0], edges, nodes[-1]
+
+    def _piece_points(self, piece, start_offset, end_offset):
+        """Shape of ``piece`` between two offsets (either direction), ends interpolated."""
+        s, e = self.piece_start[piece], self.piece_end[piece]
+        dist = self.shape_dist[s:e]
+        lo, hi = sorted((start_offset, end_offset))
+        inner = np.flatnonzero((dist > lo) & (dist < hi))
+        offsets = np.concatenate(([lo], dist[inner], [hi]))
+        lat = np.interp(offsets, dist, self.shape_lat[s:e])
+        lon = np.interp(offsets, dist, self.shape_lon[s:e])
+        points = np.column_stack((lon, lat))
+        return points[::-1] if start_offset > end_offset else points
+
+    def _edge_points(self, edges):
+        """Shape points of whole edges, in travel order, as one ``(k, 2)`` lon/lat array."""
+        index = []
+        starts, ends = self.piece_start, self.piece_end
+        for p, reverse in zip(self.edge_piece[edges].tolist(), self.edge_reverse[edges].tolist()):
+            index.extend(range(ends[p] - 1, starts[p] - 1, -1) if reverse else range(starts[p], ends[p]))
+        return np.column_stack((self.shape_lon[index], self.shape_lat[index]))
+
+    def route(self, lat1, lon1, lat2, lon2):
+        """Fastest route as ``{distance_m, duration_s, polyline: [[lon, lat], ...]}``.
+
+        Returns None when either end is too far from a road or no path exists.
+        """
+        start = self.snap(lat1, lon1)
+        goal = self.snap(lat2, lon2)
+        if start is None or goal is None:
+            return None
+        direct = self._direct(start, goal)
+        sources, targets = self._endpoints(start, goal)
+        if self.hierarchy is not None:
+            found = self._hierarchy_search(sources, targets, direct)
+        else:
+            found = self._astar(sources, targets, lat2, lon2, direct)
+
+        if found is None:
+            if not math.isfinite(direct):
+                return None
+            duration = direct
+            parts = [self._piece_points(start[0], start[1], goal[1])]
+            distance = abs(goal[1] - start[1])
+        else:
+            duration, first, edges, last = found
+            edges = np.asarray(edges, dtype=np.int64)
+            # Leave the start piece towards the first junction, and enter
+            # the goal's piece from the last one
+            parts = [
+                self._piece_points(start[0], start[1], sources[first][2]),
+                self._edge_points(edges),
+                self._piece_points(goal[0], targets[last][2], goal[1]),
+            ]
+            distance = sources[first][1] + targets[last][1] + float(self.edge_length[edges].sum())
+
+        points = np.concatenate(parts)
+        keep = np.ones(len(points), dtype=bool)
+        keep[1:] = np.any(np.abs(np.diff(points, axis=0)) > 1e-9, axis=1)
+        return {
+            "distance_m": round(float(distance), 1),
+            "duration_s": round(float(duration), 1),
+            "polyline": np.round(points[keep], 6).tolist(),
+        }
+
+    # -- matrices ---------------------------------------------------------
+
+    def eta_matrix(self, origins, destinations):
+        """Fastest travel from every origin to every destination.
+
+        ``origins`` and ``destinations`` are ``(lat, lon)`` sequences. Returns
+        ``(seconds, metres)``, two ``(len(origins), len(destinations))``
+        arrays, NaN where a point is off the road network or unreachable.
+
+        Work is shared across the matrix: without a hierarchy each origin
+        runs one Dijkstra that stops once every destination's junctions are
+        settled. With one, each destination's upward search is stored once
+        in per-node buckets, and each origin's upward search scans the
+        buckets of the nodes it reaches.
+        """
+        starts = [self.snap(lat, lon) for lat, lon in origins]
+        goals = [self.snap(lat, lon) for lat, lon in destinations]
+        seconds = np.full((len(starts), len(goals)), np.nan)
+        metres = np.full((len(starts), len(goals)), np.nan)
+        # Up to two junctions lead into each destination; padding costs inf
+        arrive_node = np.zeros((len(goals), 2), dtype=np.int64)
+        arrive_cost = np.full((len(goals), 2), np.inf)
+        arrive_metres = np.zeros((len(goals), 2))
+        on_piece = {}
+        for j, goal in enumerate(goals):
+            if goal is None:
+                continue
+            on_piece.setdefault(goal[0], []).append(j)
+            for k, (node, (cost, length, _)) in enumerate(self._ends(goal, False).items()):
+                arrive_node[j, k], arrive_cost[j, k], arrive_metres[j, k] = node, cost, length
+        if self.hierarchy is not None:
+            buckets = self._buckets(arrive_node, arrive_cost, arrive_metres)
+        else:
+            targets = set(arrive_node[np.isfinite(arrive_cost)].tolist())
+
+        for i, start in enumerate(starts):
+            if start is None:
+                continue
+            sources = self._ends(start, True)
+            if self.hierarchy is not None:
+                row_seconds, row_metres = self._scan_buckets(sources, buckets, len(goals))
+            else:
+                dist, length = self._one_to_many(sources, targets)
+                cost = dist[arrive_node] + arrive_cost
+                k = np.argmin(cost, axis=1)[:, None]
+                row_seconds = np.take_along_axis(cost, k, axis=1)[:, 0]
+                row_metres = (length[arrive_node] + arrive_metres)[np.arange(len(goals)), k[:, 0]]
+            # Destinations further along the origin's own piece
+            for j in on_piece.get(start[0], ()):
+                direct = self._direct(start, goals[j])
+                if direct < row_seconds[j]:
+                    row_seconds[j] = direct
+                    row_metres[j] = abs(goals[j][1] - start[1])
+            reached = np.isfinite(row_seconds)
+            seconds[i, reached] = row_seconds[reached]
+            metres[i, reached] = row_metres[reached]
+        return seconds, metres
+
+    def _one_to_many(self, sources, targets):
+        """Seconds and metres from ``sources`` to every node, stopping once ``targets`` are settled."""
+        adj = self._adjacency()
+        out, edge_length = adj["out"], adj["length"]
+        dist = [math.inf] * self.n_nodes
+        metres = [0.0] * self.n_nodes
+        for node, (cost, length, _) in sources.items():
+            dist[node] = cost
+            metres[node] = length
+        heap = [(dist[node], node) for node in sources]
+        heapq.heapify(heap)
+        remaining = set(targets)
+        while heap and remaining:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            remaining.discard(u)
+            for v, w, e in out[u]:
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    metres[v] = metres[u] + edge_length[e]
+                    heapq.heappush(heap, (nd, v))
+        return np.asarray(dist), np.asarray(metres)
+
+    def _buckets(self, arrive_node, arrive_cost, arrive_metres):
+        """Backward upward searches of every destination, grouped by node.
+
+        Returns ``(bounds, column, seconds, metres)``: entries
+        ``bounds[u]:bounds[u + 1]`` say which destinations node ``u`` reaches
+        going down the hierarchy, and at what cost.
+        """
+        adj = self._adjacency()
+        parts = []
+        for j in range(len(arrive_node)):
+            seeds = {int(node): (cost, length) for node, cost, length
+                     in zip(arrive_node[j], arrive_cost[j], arrive_metres[j]) if math.isfinite(cost)}
+            if not seeds:
+                continue
+            dist, metres, _, _, _ = self._upward(seeds, adj["down"], adj["up"])
+            nodes = np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))
+            parts.append((nodes, np.full(len(nodes), j),
+                          np.fromiter(dist.values(), dtype=np.float64, count=len(dist)),
+                          np.fromiter((metres[u] for u in dist), dtype=np.float64, count=len(dist))))
+        if not parts:
+            return np.zeros(self.n_nodes + 1, dtype=np.int64), np.empty(0, np.int64), np.empty(0), np.empty(0)
+        nodes, column, seconds, metres = (np.concatenate(p) for p in zip(*parts))
+        order = np.argsort(nodes, kind="stable")
+        bounds = np.searchsorted(nodes[order], np.arange(self.n_nodes + 1))
+        return bounds, column[order], seconds[order], metres[order]
+
+    def _scan_buckets(self, sources, buckets, n_goals):
+        """Seconds and metres to every destination via the ``_buckets`` of the nodes reached."""
+        bounds, column, bucket_seconds, bucket_metres = buckets
+        adj = self._adjacency()
+        dist, metres, _, _, _ = self._upward(sources, adj["up"], adj["down"])
+        nodes = np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))
+        first, counts = bounds[nodes], bounds[nodes + 1] - bounds[nodes]
+        # Flat index of every bucket entry of every reached node
+        offsets = np.cumsum(counts) - counts
+        idx = np.arange(counts.sum()) - np.repeat(offsets - first, counts)
+        cost = np.repeat(np.fromiter(dist.values(), dtype=np.float64, count=len(dist)), counts) + bucket_seconds[idx]
+        length = np.repeat(np.fromiter((metres[u] for u in dist), dtype=np.float64, count=len(dist)), counts) + bucket_metres[idx]
+        # Cheapest entry per destination
+        order = np.argsort(cost, kind="stable")
+        goals, best = np.unique(column[idx][order], return_index=True)
+        row_seconds = np.full(n_goals, np.inf)
+        row_metres = np.full(n_goals, np.nan)
+        row_seconds[goals] = cost[order][best]
+        row_metres[goals] = length[order][best]
+        return row_seconds, row_metres
+
+
+# -- process-wide graphs ----------------------------------------------------
+
+_graphs = OrderedDict()
+_graphs_lock = threading.Lock()
+_flight = SingleFlight("road_graph")
+MAX_GRAPHS = 8
+_areas = OrderedDict()  # (lat, lng, radius) -> (fetched at, graph key)
+_pool = None
+_pool_lock = threading.Lock()
+_worker_graphs = OrderedDict()  # in pool workers: graphs by cache path
+
+
+def _cache_dir():
+    path = Path(ROAD_GRAPH_CACHE_DIR) if ROAD_GRAPH_CACHE_DIR else (
+        Path(__file__).resolve().parents[3] / ".cache" / "road_graphs"
+    )
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_eta_pool():
+    """Process pool for ETA matrices, started on first use; None with ETA_WORKERS <= 1."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and ETA_WORKERS > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn, not fork: the server process runs threads and event loops
+            _pool = ProcessPoolExecutor(ETA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def close_eta_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _eta_rows(path, origins, destinations):
+    """Pool task: ``eta_matrix`` rows on the graph cached at ``path``."""
+    graph = _worker_graphs.get(path)
+    if graph is None:
+        graph = _worker_graphs[path] = RoadGraph.load(path)
+        while len(_worker_graphs) > MAX_GRAPHS:
+            _worker_graphs.popitem(last=False)
+    return graph.eta_matrix(origins, destinations)
+
+
+def load_or_build(key, elements, hierarchy=None):
+    """Compiled graph for ``elements`` from the disk cache, building it if needed."""
+    hierarchy = ROAD_GRAPH_CH if hierarchy is None else hierarchy
+    path = _cache_dir() / f"{key}{'-ch' if hierarchy else ''}.npz"
+    if path.exists():
+        try:
+            return RoadGraph.load(path)
+        except Exception as exc:
+            from ..utils.logger import log
+            log(f"Road graph cache {path} unreadable, rebuilding: {exc}")
+    graph = RoadGraph.from_elements(elements)
+    if hierarchy:
+        graph.build_hierarchy()
+    graph.save(path)
+    return graph
+
+
+def route_area(points):
+    """``(lat, lon, radius)`` of the OSM area to route ``(lat, lon)`` points in, or None if too large.
+
+    The radius is rounded up to 1 km times a power of two, and the centre to
+    a grid of half that, so nearby requests share one cached graph.
+    """
+    lats, lons = [p[0] for p in points], [p[1] for p in points]
+    mid_lat, mid_lon = (min(lats) + max(lats)) / 2.0, (min(lons) + max(lons)) / 2.0
+    reach = max(haversine_m(mid_lat, mid_lon, lat, lon) for lat, lon in zip(lats, lons))
+    radius = 1000.0 * 2 ** max(0, math.ceil(math.log2(max(reach + 500.0, 1.0) / 1000.0)))
+    grid = radius / 2.0 / METERS_PER_DEG_LAT
+    lat = round(mid_lat / grid) * grid
+    lon_grid = grid / max(math.cos(math.radians(lat)), 0.01)
+    lon = round(mid_lon / lon_grid) * lon_grid
+    radius *= 1.5  # covers the snapped centre's offset
+    if radius > ROUTE_MAX_RADIUS:
+        return None
+    return lat, lon, radius
+
+
+async def get_road_graph(lat, lng, radius):
+    """Graph of the drivable ways within ``radius`` m, from memory, disk or OSM.
+
+    Raises when the road data cannot be fetched.
+    """
+    import asyncio
+
+    from .osm_services import fetch_osm_roads
+
+    area = (lat, lng, radius)
+    with _graphs_lock:
+        fetched_at, key = _areas.get(area, (0.0, None))
+        graph = _graphs.get(key)
+        if graph is not None and time.time() - fetched_at <= OSM_CACHE_TTL:
+            _graphs.move_to_end(key)
+            return graph
+    fetched_at = time.time()
+    elements = await fetch_osm_roads(lat, lng, radius, DRIVABLE) or []
+    loop = asyncio.get_running_loop()
+    key = await loop.run_in_executor(None, graph_key, elements)
+    with _graphs_lock:
+        graph = _graphs.get(key)
+    if graph is None:
+        graph = await _flight.do(key, loop.run_in_executor, None, load_or_build, key, elements)
+    with _graphs_lock:
+        _graphs[key] = graph
+        _graphs.move_to_end(key)
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.popitem(last=False)
+        _areas[area] = (fetched_at, key)
+        _areas.move_to_end(area)
+        while len(_areas) > 4 * MAX_GRAPHS:
+            _areas.popitem(last=False)
+    return graph
+
+
+async def plan_route(origin, destination):
+    """Route between two ``(lat, lon)`` points over OSM roads, or None."""
+    import asyncio
+
+    area = route_area([origin, destination])
+    if area is None:
+        return None
+    graph = await get_road_graph(*area)
+    return await asyncio.get_running_loop().run_in_executor(
+        None, graph.route, origin[0], origin[1], destination[0], destination[1]
+    )
+
+
+async def eta_matrix(origins, destinations):
+    """Travel times between ``(lat, lon)`` points over OSM roads, or None if they are too far apart.
+
+    Returns ``RoadGraph.eta_matrix``'s ``(seconds, metres)`` arrays. With at
+    least ETA_POOL_MIN_ORIGINS origins the rows are split across the ETA
+    process pool; workers load the graph from its cache file.
+    """
+    import asyncio
+
+    area = route_area(list(origins) + list(destinations))
+    if area is None:
+        return None
+    graph = await get_road_graph(*area)
+    loop = asyncio.get_running_loop()
+    pool = get_eta_pool() if len(origins) >= ETA_POOL_MIN_ORIGINS and graph.path is not None else None
+    if pool is None:
+        return await loop.run_in_executor(None, graph.eta_matrix, origins, destinations)
+    size = -(-len(origins) // ETA_WORKERS)
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(pool, _eta_rows, str(graph.path), origins[k:k + size], destinations)
+        for k in range(0, len(origins), size)
+    ))
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+async def route_action(action, origin):
+    """Add a ``route`` to a drive ``action`` (``{lat, lon, ...}``) starting at ``origin``.
+
+    The action is returned unchanged when there is no origin or destination,
+    or when no route can be planned; routing failures are logged, not raised.
+    """
+    destination = parse_point(action)
+    if origin is None or destination is None:
+        return action
+    try:
+        route = await plan_route(origin, destination)
+    except Exception as exc:
+        from ..utils.logger import log
+        log(f"Route planning failed: {exc}")
+        route = None
+    if route is not None:
+        action["route"] = route
+    return action
@@ -1,6 +1,263 @@
+"""Satellite positions from two-line element sets (TLEs).
+
+A ``TLECatalog`` parses a TLE set once into an ``sgp4`` ``SatrecArray`` and
+propagates every satellite over a vector of timestamps in one call; SGP4's
+TEME output is rotated into an Earth-fixed frame and converted to WGS84
+geodetic coordinates with NumPy. Positions come back as ``(n_sats, n_times)``
+arrays: longitude and latitude in degrees, altitude in metres.
+
+The process-wide catalog is read from ``TLE_PATH`` or downloaded from
+``TLE_URL`` (Celestrak by default) and refreshed after ``TLE_TTL`` seconds.
+``peek_catalog`` returns it without waiting, loading it in the background;
+after a failed load it waits ``RETRY_DELAY`` s before trying again, doubling
+the wait on every further failure up to ``RETRY_MAX_DELAY``.
+"""
+import asyncio
 import math
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+
+from ..config.env import TLE_PATH, TLE_URL, TLE_TTL
+from .single_flight import SingleFlight
+
+WGS84_A_KM = 6378.137
+WGS84_F = 1.0 / 298.257223563
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+
+UNIX_EPOCH_JD = 2440587.5
+J2000_JD = 2451545.0
+
 
 def compute_orbit(angle, altitude=400000):
+    """Toy circular track kept for the synthetic-satellite fallback."""
     lon = math.degrees(angle)
     lat = math.sin(angle) * 20
     return lon, lat, altitude
+
+
+def parse_tle(text):
+    """Return ``[(name, line1, line2)]`` from 2-line or 3-line TLE text."""
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    records = []
+    name = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("1 ") and i + 1 < len(lines) and lines[i + 1].startswith("2 "):
+            norad = line[2:7].strip()
+            records.append((name or norad, line, lines[i + 1]))
+            name = None
+            i += 2
+            continue
+        name = line[2:].strip() if line.startswith("0 ") else line.strip()
+        i += 1
+    return records
+
+
+def to_julian(times):
+    """Split Unix timestamps (seconds) into SGP4's ``(jd, fraction)`` pair."""
+    days = np.asarray(times, dtype=np.float64) / 86400.0
+    whole = np.floor(days)
+    return whole + UNIX_EPOCH_JD, days - whole
+
+
+def gmst(jd, fr):
+    """Greenwich mean sidereal angle (IAU 1982, as used with SGP4), radians."""
+    t = ((jd - J2000_JD) + fr) / 36525.0
+    seconds = (
+        67310.54841
+        + (876600.0 * 3600.0 + 8640184.812866) * t
+        + 0.093104 * t * t
+        - 6.2e-6 * t * t * t
+    )
+    return np.mod(np.radians(seconds / 240.0), 2.0 * np.pi)
+
+
+def teme_to_ecef(r, theta):
+    """Rotate TEME positions ``(..., 3)`` by the sidereal angle ``theta``.
+
+    Polar motion is ignored, which is well below SGP4's own error.
+    """
+    c, s = np.cos(theta), np.sin(theta)
+    x, y, z = r[..., 0], r[..., 1], r[..., 2]
+    return np.stack((c * x + s * y, c * y - s * x, z), axis=-1)
+
+
+def ecef_to_geodetic(r):
+    """Earth-fixed km ``(..., 3)`` to WGS84 ``(lon_deg, lat_deg, alt_m)``."""
+    x, y, z = r[..., 0], r[..., 1], r[..., 2]
+    p = np.hypot(x, y)
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z, p * (1.0 - WGS84_E2))
+    for _ in range(4):
+        sin_lat = np.sin(lat)
+        n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+        lat = np.arctan2(z + WGS84_E2 * n * sin_lat, p)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    alt = p * cos_lat + z * sin_lat - n * (1.0 - WGS84_E2 * sin_lat * sin_lat)
+    return np.degrees(lon), np.degrees(lat), alt * 1000.0
+
+
+def teme_to_geodetic(r, times):
+    """TEME km ``(n, m, 3)`` at Unix ``times`` ``(m,)`` to geodetic arrays."""
+    jd, fr = to_julian(times)
+    return ecef_to_geodetic(teme_to_ecef(r, gmst(jd, fr)[None, :]))
+
+
+class TLECatalog:
+    """A parsed TLE set propagated in bulk."""
+
+    def __init__(self, records):
+        sats = []
+        names = []
+        for name, line1, line2 in records:
+            try:
+                sats.append(Satrec.twoline2rv(line1, line2))
+            except Exception:
+                continue  # malformed element set
+            names.append(name)
+        self.names = names
+        self.ids = np.array([s.satnum for s in sats], dtype=np.int64)
+        self.satrecs = sats
+        # SGP4 writes its per-satellite state while propagating: the shared
+        # array is used under a lock, long runs propagate a private copy
+        self._array = SatrecArray(sats) if sats else None
+        self._array_lock = threading.Lock()
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(parse_tle(text))
+
+    @classmethod
+    def from_file(cls, path):
+        return cls.from_text(Path(path).read_text(encoding="utf-8", errors="replace"))
+
+    def __len__(self):
+        return len(self.satrecs)
+
+    def select(self, ids=None):
+        """Row indices for the NORAD ``ids`` present in the catalog (all when None)."""
+        if ids is None:
+            return np.arange(len(self))
+        return np.flatnonzero(np.isin(self.ids, np.asarray(list(ids), dtype=np.int64)))
+
+    def propagate_teme(self, times, index=None, private=False):
+        """SGP4 state in TEME: ``(error, r_km, v_km_s)`` shaped ``(n, m[, 3])``.
+
+        ``times`` are Unix seconds. Propagation failures (decayed orbits,
+        bad elements) have a non-zero ``error`` and NaN state. ``private``
+        propagates a copy of the element sets instead of holding the shared
+        array's lock (for long runs in background threads).
+        """
+        jd, fr = to_julian(np.atleast_1d(times))
+        if self._array is None:
+            n = 0 if index is None else len(index)
+            return (
+                np.zeros((n, len(jd)), dtype=np.uint8),
+                np.zeros((n, len(jd), 3)),
+                np.zeros((n, len(jd), 3)),
+            )
+        if index is None and not private:
+            with self._array_lock:
+                error, r, v = self._array.sgp4(jd, fr)
+        else:
+            # SatrecArray copies the element sets it is given
+            array = SatrecArray(self.satrecs if index is None else [self.satrecs[i] for i in index])
+            error, r, v = array.sgp4(jd, fr)
+        bad = error != 0
+        r[bad] = np.nan
+        v[bad] = np.nan
+        return error, r, v
+
+    def positions(self, times, index=None):
+        """Geodetic ``(lon, lat, alt)`` arrays shaped ``(n_sats, n_times)``."""
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        _, r, _ = self.propagate_teme(times, index)
+        return teme_to_geodetic(r, times)
+
+
+def parse_time(value, default=None):
+    """ISO-8601 string (or Unix seconds) to Unix seconds; ``default`` when empty."""
+    if value is None or value == "":
+        return time.time() if default is None else default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iso(ts):
+    return datetime.fromtimestamp(float(ts), tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+RETRY_DELAY = 30.0
+RETRY_MAX_DELAY = 1800.0
+
+_catalog = None
+_flight = SingleFlight("tle_catalog")
+_failures = 0
+_retry_at = 0.0
+
+
+async def _load_catalog():
+    if TLE_PATH:
+        return TLECatalog.from_file(TLE_PATH)
+    from .http_client import get_http_client
+
+    response = await get_http_client().get(TLE_URL, timeout=30)
+    response.raise_for_status()
+    return TLECatalog.from_text(response.text)
+
+
+async def get_catalog():
+    """Return the process-wide catalog, (re)loading it when missing or stale.
+
+    A failed refresh keeps serving the previous catalog.
+    """
+    global _catalog, _failures, _retry_at
+    if _catalog is not None and time.time() - _catalog.loaded_at < TLE_TTL:
+        return _catalog
+    try:
+        _catalog = await _flight.do("catalog", _load_catalog)
+        _failures = 0
+    except Exception as exc:
+        _failures += 1
+        _retry_at = time.time() + min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** (_failures - 1))
+        if _catalog is None:
+            raise
+        from ..utils.logger import log
+        log(f"TLE refresh failed, keeping previous catalog: {exc}")
+    return _catalog
+
+
+def peek_catalog():
+    """The loaded catalog without waiting for a download (None before the first load).
+
+    A missing or stale catalog is (re)loaded in a background task on the
+    running loop, so callers that can do without satellites never block on
+    Celestrak. After a failed load no new one starts until the backoff
+    has passed.
+    """
+    now = time.time()
+    if (_catalog is None or now - _catalog.loaded_at >= TLE_TTL) and now >= _retry_at:
+        # get_catalog is single-flight, so repeated calls share one download
+        task = asyncio.ensure_future(get_catalog())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # failures are retried next call
+    return _catalog
+
+
+def set_catalog(catalog):
+    """Install ``catalog`` as the process-wide catalog (tests, preloading)."""
+    global _catalog
+    _catalog = catalog
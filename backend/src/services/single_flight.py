@@ -0,0 +1,119 @@
+"""Single-flight deduplication of concurrent upstream calls.
+
+When many clients ask for the same thing at once (a demo audience loading
+one scene), only the first caller starts the upstream call; everyone else
+awaits the same in-flight task and gets its result or exception. Nothing is
+cached once the call finishes -- that is the job of the caches behind it.
+
+The shared work runs as its own task, so a caller that disconnects does not
+cancel the call for the others. In-flight calls are tracked per event loop
+(the FastAPI loop and the background loop used by Flask never share one).
+"""
+import asyncio
+import threading
+import weakref
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _consume(task):
+    # Mark the exception as retrieved when every caller has gone away
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key.
+
+    ``calls`` counts requested keys, ``executions`` the keys that actually
+    went upstream and ``shared`` the ones served by a call already in flight.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self._inflight = weakref.WeakKeyDictionary()
+        with _registry_lock:
+            _registry[name] = self
+
+    def _pending(self):
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(loop)
+        if pending is None:
+            pending = self._inflight[loop] = {}
+        return pending
+
+    def _launch(self, pending, keys, coro):
+        task = asyncio.ensure_future(coro)
+        for key in keys:
+            pending[key] = task
+
+        def done(t):
+            for key in keys:
+                if pending.get(key) is t:
+                    del pending[key]
+            _consume(t)
+
+        task.add_done_callback(done)
+        return task
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Return ``await fn(*args, **kwargs)``, sharing it with callers of ``key``."""
+        pending = self._pending()
+        self.calls += 1
+        task = pending.get(key)
+        if task is None:
+            self.executions += 1
+            task = self._launch(pending, (key,), fn(*args, **kwargs))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    async def do_many(self, keys, fn):
+        """Resolve several keys, fetching only those nobody is fetching yet.
+
+        ``fn(missing)`` is a coroutine function returning ``{key: value}``
+        for the keys it was given; it is called once for all of them. Keys
+        already in flight are awaited from the calls that own them. Returns
+        ``{key: value}`` for ``keys``; raises if any contributing call failed.
+        """
+        pending = self._pending()
+        keys = list(dict.fromkeys(keys))
+        self.calls += len(keys)
+        owners = {}
+        missing = []
+        for key in keys:
+            task = pending.get(key)
+            if task is None:
+                missing.append(key)
+            else:
+                owners[key] = task
+        self.shared += len(owners)
+        if missing:
+            self.executions += len(missing)
+            task = self._launch(pending, tuple(missing), fn(missing))
+            for key in missing:
+                owners[key] = task
+
+        results = {}
+        for task in set(owners.values()):
+            results.update(await asyncio.shield(task))
+        return {key: results[key] for key in keys if key in results}
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            # Fraction of calls answered by someone else's upstream call
+            "coalescing_ratio": self.shared / self.calls if self.calls else 0.0,
+        }
+
+
+def single_flight_stats():
+    """Stats of every ``SingleFlight`` created in this process, by name."""
+    with _registry_lock:
+        return {name: sf.stats() for name, sf in _registry.items()}
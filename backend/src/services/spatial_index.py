@@ -0,0 +1,300 @@
+"""Packed STR R-tree over bounding boxes, and a process-wide OSM element index.
+
+``STRTree`` is built once from an ``(n, 4)`` array of ``(south, west, north,
+east)`` boxes (the ``element_bounds`` order). Every level is packed with
+Sort-Tile-Recursive: node centres are sorted by longitude into vertical
+slices, each slice by latitude, and runs of ``node_capacity`` become one
+parent. Children are stored CSR-style, so a query descends one whole level at
+a time with NumPy instead of visiting nodes one by one.
+
+``OSMIndex`` keeps the elements of the Overpass tiles loaded so far (and
+still in the tile cache) in a few trees merged as tiles arrive;
+``fetch_osm_objects`` answers from it whenever every tile of a query is
+already indexed and fresh.
+Boxes are plain lat/lon, so queries across the antimeridian are not split.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from .osm_tile_cache import EARTH_RADIUS_M, element_bounds, radius_bbox, tiles_for_bbox
+
+SOUTH, WEST, NORTH, EAST = range(4)
+
+
+def _str_order(boxes, capacity):
+    """Sort-Tile-Recursive order of ``boxes`` for packing into ``capacity`` runs."""
+    n = len(boxes)
+    cx = (boxes[:, WEST] + boxes[:, EAST]) * 0.5
+    cy = (boxes[:, SOUTH] + boxes[:, NORTH]) * 0.5
+    groups = math.ceil(n / capacity)
+    slices = max(1, math.ceil(math.sqrt(groups)))
+    per_slice = slices * capacity
+    by_x = np.argsort(cx, kind="stable")
+    slice_id = np.arange(n) // per_slice
+    return by_x[np.lexsort((cy[by_x], slice_id))]
+
+
+def _expand(starts, counts):
+    """Concatenate the ranges ``starts[k]:starts[k] + counts[k]``."""
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def distance_to_boxes(lat, lng, boxes):
+    """Great-circle metres from a point to the nearest point of each box."""
+    near_lat = np.clip(lat, boxes[:, SOUTH], boxes[:, NORTH])
+    near_lng = np.clip(lng, boxes[:, WEST], boxes[:, EAST])
+    p1 = math.radians(lat)
+    p2 = np.radians(near_lat)
+    dl = np.radians(near_lng - lng)
+    a = np.sin((p2 - p1) * 0.5) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl * 0.5) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class STRTree:
+    """Static packed R-tree; query results are row indices into ``boxes``."""
+
+    def __init__(self, boxes, node_capacity=16):
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.node_capacity = node_capacity
+        # levels[k] = (node boxes, child pointer, child ids); level 0's children
+        # are rows of self.boxes, higher levels' are nodes of the level below
+        self.levels = []
+        below = self.boxes
+        while len(below) > 1 or not self.levels:
+            if len(below) == 0:
+                break
+            order = _str_order(below, node_capacity)
+            starts = np.arange(0, len(order), node_capacity)
+            grouped = below[order]
+            nodes = np.column_stack((
+                np.minimum.reduceat(grouped[:, SOUTH], starts),
+                np.minimum.reduceat(grouped[:, WEST], starts),
+                np.maximum.reduceat(grouped[:, NORTH], starts),
+                np.maximum.reduceat(grouped[:, EAST], starts),
+            ))
+            pointer = np.append(starts, len(order))
+            self.levels.append((nodes, pointer, order))
+            below = nodes
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _search(self, hit_test):
+        """Rows whose box passes ``hit_test(boxes) -> mask``, pruning by node boxes."""
+        if not self.levels:
+            return np.empty(0, dtype=np.int64)
+        nodes, _, _ = self.levels[-1]
+        candidates = np.arange(len(nodes))
+        for depth in range(len(self.levels) - 1, -1, -1):
+            nodes, pointer, children = self.levels[depth]
+            hit = candidates[hit_test(nodes[candidates])]
+            candidates = children[_expand(pointer[hit], pointer[hit + 1] - pointer[hit])]
+        return candidates[hit_test(self.boxes[candidates])]
+
+    def bbox(self, south, west, north, east):
+        """Rows whose box intersects the query box."""
+        def test(b):
+            return (b[:, SOUTH] <= north) & (b[:, NORTH] >= south) & (b[:, WEST] <= east) & (b[:, EAST] >= west)
+        return self._search(test)
+
+    def radius(self, lat, lng, radius_m):
+        """Rows within ``radius_m`` metres of the point, with their distances."""
+        rows = self.bbox(*radius_bbox(lat, lng, radius_m))
+        dist = distance_to_boxes(lat, lng, self.boxes[rows])
+        keep = dist <= radius_m
+        return rows[keep], dist[keep]
+
+    def nearest(self, lat, lng, k=1):
+        """The ``k`` rows nearest to the point, closest first, with distances.
+
+        Searches a radius that doubles until it holds ``k`` rows; those are
+        then guaranteed to include the true ``k`` nearest.
+        """
+        n = len(self.boxes)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        root = self.levels[-1][0][0]
+        # Start from the radius expected to hold k rows at average density
+        area = max((root[NORTH] - root[SOUTH]) * (root[EAST] - root[WEST]), 1e-12)
+        radius = max(1.0, math.sqrt(area * k / n) * 111320.0)
+        lat_m = max(abs(lat - root[SOUTH]), abs(root[NORTH] - lat)) * 111320.0
+        lng_m = max(abs(lng - root[WEST]), abs(root[EAST] - lng)) * 111320.0
+        limit = max(math.hypot(lat_m, lng_m) * 2.0, radius)
+        while True:
+            rows, dist = self.radius(lat, lng, radius)
+            if len(rows) >= k or radius >= limit:
+                break
+            radius *= 2.0
+        if len(rows) < k:
+            rows = np.arange(n)
+            dist = distance_to_boxes(lat, lng, self.boxes)
+        best = np.argpartition(dist, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        best = best[np.argsort(dist[best], kind="stable")]
+        return rows[best], dist[best]
+
+
+class OSMIndex:
+    """Overpass elements of every tile loaded so far, behind a few ``STRTree`` objects.
+
+    Tiles count as covered for ``ttl`` seconds after they were added, matching
+    the tile cache; an element present in several tiles is stored once, and
+    dropped when the last indexed tile holding it is evicted (``evict_tiles``,
+    called by the tile cache) or expires.
+
+    Trees are static, so new tiles get a small tree of their own and trees
+    of similar size are merged, largest first (as in an LSM tree): adding a
+    tile costs amortized ``O(log n)`` rebuilt boxes per element instead of a
+    rebuild of the whole index. Dropped elements are filtered out of query
+    results until a merge (or, once they outnumber the live ones, a full
+    rebuild) leaves them behind.
+    """
+
+    def __init__(self, zoom=15, ttl=24 * 3600, node_capacity=16):
+        self.zoom = zoom
+        self.ttl = ttl
+        self.node_capacity = node_capacity
+        self.elements = []  # slot -> element, None once dropped
+        self._bounds = []   # slot -> box
+        self._slots = {}    # (type, id) -> slot of its current version
+        self._refs = {}     # (type, id) -> number of indexed tiles holding it
+        self._tiles = {}    # tile -> (added at, keys)
+        self._segments = []  # [(STRTree, slots)], largest first
+        self._fresh = []    # slots not in any tree yet
+        self._dead = 0
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.rebuilt = 0  # boxes put into trees, for the amortized cost
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _kill(self, slot):
+        self.elements[slot] = None
+        self._dead += 1
+
+    def _drop_tile(self, tile):
+        _, keys = self._tiles.pop(tile)
+        for key in keys:
+            self._refs[key] -= 1
+            if not self._refs[key]:
+                del self._refs[key]
+                self._kill(self._slots.pop(key))
+
+    def add_tiles(self, tiles, now=None):
+        """Index ``{(x, y): elements}`` (tile cache output) and mark the tiles covered."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for tile in [t for t, (added, _) in self._tiles.items() if now - added > self.ttl]:
+                self._drop_tile(tile)
+            for tile, elements in tiles.items():
+                keys = set()
+                for el in elements:
+                    bounds = element_bounds(el)
+                    if bounds is None:
+                        continue
+                    key = (el.get("type"), el.get("id"))
+                    if key in keys:
+                        continue
+                    keys.add(key)
+                    self._refs[key] = self._refs.get(key, 0) + 1
+                    slot = self._slots.get(key)
+                    if slot is not None and self._bounds[slot] == bounds:
+                        self.elements[slot] = el
+                        continue
+                    if slot is not None:
+                        self._kill(slot)  # moved: its old box stays in a tree
+                    self._slots[key] = len(self.elements)
+                    self._fresh.append(len(self.elements))
+                    self.elements.append(el)
+                    self._bounds.append(bounds)
+                if tile in self._tiles:
+                    self._drop_tile(tile)
+                self._tiles[tile] = (now, keys)
+
+    def evict_tiles(self, tiles):
+        """Forget ``tiles`` (evicted from the tile cache) and the elements only they held."""
+        with self._lock:
+            for tile in tiles:
+                if tile in self._tiles:
+                    self._drop_tile(tile)
+
+    def covers(self, lat, lng, radius, now=None):
+        now = time.time() if now is None else now
+        for tile in tiles_for_bbox(*radius_bbox(lat, lng, radius), self.zoom):
+            added = self._tiles.get(tile)
+            if added is None or now - added[0] > self.ttl:
+                return False
+        return True
+
+    def _tree(self, slots):
+        slots = np.array([slot for slot in slots if self.elements[slot] is not None], dtype=np.int64)
+        boxes = np.array([self._bounds[slot] for slot in slots.tolist()], dtype=np.float64).reshape(-1, 4)
+        self.rebuilt += len(slots)
+        return STRTree(boxes, self.node_capacity), slots
+
+    def _compact(self):
+        """Renumber the live elements into one tree (with ``_lock`` held)."""
+        live = sorted(self._slots.values())
+        renumber = {old: new for new, old in enumerate(live)}
+        self.elements = [self.elements[slot] for slot in live]
+        self._bounds = [self._bounds[slot] for slot in live]
+        self._slots = {key: renumber[slot] for key, slot in self._slots.items()}
+        self._fresh = []
+        self._dead = 0
+        self._segments = [self._tree(range(len(live)))] if live else []
+
+    def segments(self):
+        """The current trees with their slot arrays, bringing in elements added since."""
+        with self._lock:
+            if self._dead > max(len(self._slots), 1024):
+                self._compact()
+            elif self._fresh:
+                self._segments.append(self._tree(self._fresh))
+                self._fresh = []
+                while len(self._segments) > 1 and 2 * len(self._segments[-1][0]) >= len(self._segments[-2][0]):
+                    (_, low), (_, high) = self._segments.pop(), self._segments.pop()
+                    self._segments.append(self._tree(np.concatenate((high, low)).tolist()))
+            return list(self._segments), self.elements
+
+    def _rows(self, query):
+        segments, elements = self.segments()
+        slots = [slots[query(tree)] for tree, slots in segments]
+        hits = np.sort(np.concatenate(slots)) if slots else np.empty(0, dtype=np.int64)
+        return [elements[i] for i in hits.tolist() if elements[i] is not None]
+
+    def radius(self, lat, lng, radius_m):
+        """Elements within ``radius_m`` metres, in index order."""
+        self.queries += 1
+        return self._rows(lambda tree: tree.radius(lat, lng, radius_m)[0])
+
+    def bbox(self, south, west, north, east):
+        self.queries += 1
+        return self._rows(lambda tree: tree.bbox(south, west, north, east))
+
+    def nearest(self, lat, lng, k=1):
+        """``[(element, distance_m)]`` for the ``k`` nearest elements."""
+        self.queries += 1
+        segments, elements = self.segments()
+        found = []
+        for tree, slots in segments:
+            want = k
+            while True:
+                rows, dist = tree.nearest(lat, lng, want)
+                live = [(float(d), int(slots[r])) for r, d in zip(rows.tolist(), dist.tolist())
+                        if elements[slots[r]] is not None]
+                if len(live) >= k or want >= len(tree):
+                    break
+                want *= 2  # dropped elements took some of the places
+            found.extend(live[:k])
+        found.sort()
+        return [(elements[slot], d) for d, slot in found[:k]]
+
+    def stats(self):
+        return {"elements": len(self._slots), "tiles": len(self._tiles), "trees": len(self._segments),
+                "dropped": self._dead, "queries": self.queries}
@@ -0,0 +1,407 @@
+"""In-memory sensor telemetry: raw ring buffers plus min/max/mean rollups.
+
+Every numeric field of a sensor is a *channel*. A channel keeps its last
+``raw_samples`` samples in a ring, and for each rollup resolution (1 s, 10 s,
+1 min, 10 min, 1 h by default) the last ``buckets`` buckets of min, max,
+sum and count. Bucket ``b`` of a level covers ``[b * res, (b + 1) * res)``
+and lives in slot ``b % buckets``. The slot's key says which bucket it holds,
+so an old bucket is simply overwritten once time moves a full ring past it.
+Memory is fixed per channel, and the number of channels is capped at
+``max_channels``.
+
+Ingest is batched: ``add``/``extend`` only stage samples, and ``flush``
+(run when enough are staged, or before any query) sorts them by channel
+and time once, then updates every level with ``reduceat``. A query picks the
+finest level that still retains the start of the range and fits in
+``points`` buckets, so it reads at most ``points`` buckets whatever the range.
+
+With a ``HistoryStore`` attached (HISTORY_DIR), every flushed sample is
+also appended to it as series ``<sensorId>/<field>`` for long-term queries.
+
+Messages follow ``frontend/static/js/sensors``: ``{sensorId, sensorType,
+timestamp, data: {field: value}}`` with Unix millisecond timestamps, a list
+of those, or a columnar batch ``{sensorId, timestamps: [...], data: {field:
+[...]}}``. Times are seconds inside the store.
+"""
+import json
+import threading
+import time
+
+import numpy as np
+
+from ..config.env import (
+    TELEMETRY_BUCKETS,
+    TELEMETRY_FLUSH_SAMPLES,
+    TELEMETRY_MAX_CHANNELS,
+    TELEMETRY_RAW_SAMPLES,
+)
+
+RESOLUTIONS = (1.0, 10.0, 60.0, 600.0, 3600.0)
+# Key of an empty bucket slot (bucket ids may be negative)
+_EMPTY = np.iinfo(np.int64).min
+
+
+class _Level:
+    """Ring of rollup buckets at one resolution, one row per channel."""
+
+    def __init__(self, resolution, buckets, channels):
+        self.resolution = resolution
+        self.buckets = buckets
+        self.key = np.full((channels, buckets), _EMPTY, dtype=np.int64)
+        self.lo = np.zeros((channels, buckets))
+        self.hi = np.zeros((channels, buckets))
+        self.total = np.zeros((channels, buckets))
+        self.count = np.zeros((channels, buckets), dtype=np.int64)
+        self.newest = np.full(channels, _EMPTY, dtype=np.int64)
+
+    def grow(self, channels):
+        for name in ("key", "lo", "hi", "total", "count"):
+            old = getattr(self, name)
+            new = np.full((channels, self.buckets), _EMPTY if name == "key" else 0, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.newest = np.concatenate((self.newest, np.full(channels - len(self.newest), _EMPTY, dtype=np.int64)))
+
+    def update(self, ch, t, v):
+        """Merge samples sorted by (channel, time) into the ring."""
+        b = np.floor(t / self.resolution).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, (ch[1:] != ch[:-1]) | (b[1:] != b[:-1])])
+        group_ch, group_b = ch[starts], b[starts]
+        lo = np.minimum.reduceat(v, starts)
+        hi = np.maximum.reduceat(v, starts)
+        total = np.add.reduceat(v, starts)
+        count = np.diff(np.r_[starts, len(v)])
+
+        # Newest bucket per channel; groups a full ring older than it are dropped
+        last = np.flatnonzero(np.r_[group_ch[1:] != group_ch[:-1], True])
+        channels = group_ch[last]
+        newest = np.maximum(self.newest[channels], group_b[last])
+        self.newest[channels] = newest
+        keep = group_b > np.repeat(newest, np.diff(np.r_[0, last + 1])) - self.buckets
+        group_ch, group_b = group_ch[keep], group_b[keep]
+        lo, hi, total, count = lo[keep], hi[keep], total[keep], count[keep]
+
+        slot = group_b % self.buckets
+        same = self.key[group_ch, slot] == group_b
+        self.lo[group_ch, slot] = np.where(same, np.minimum(self.lo[group_ch, slot], lo), lo)
+        self.hi[group_ch, slot] = np.where(same, np.maximum(self.hi[group_ch, slot], hi), hi)
+        self.total[group_ch, slot] = np.where(same, self.total[group_ch, slot], 0.0) + total
+        self.count[group_ch, slot] = np.where(same, self.count[group_ch, slot], 0) + count
+        self.key[group_ch, slot] = group_b
+
+    def retains(self, index, bucket):
+        return self.newest[index] != _EMPTY and bucket > self.newest[index] - self.buckets
+
+    def read(self, index, first, last):
+        """Buckets ``first..last`` of channel ``index`` that hold data."""
+        if self.newest[index] == _EMPTY:
+            return (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=np.int64))
+        ids = np.arange(max(first, self.newest[index] - self.buckets + 1), min(last, self.newest[index]) + 1)
+        slot = ids % self.buckets
+        found = self.key[index, slot] == ids
+        ids, slot = ids[found], slot[found]
+        return ids, self.lo[index, slot], self.hi[index, slot], self.total[index, slot], self.count[index, slot]
+
+
+class TelemetryStore:
+    """Bounded telemetry for many sensors; see the module docstring."""
+
+    def __init__(self, raw_samples=TELEMETRY_RAW_SAMPLES, buckets=TELEMETRY_BUCKETS, resolutions=RESOLUTIONS,
+                 max_channels=TELEMETRY_MAX_CHANNELS, flush_samples=TELEMETRY_FLUSH_SAMPLES, history=None):
+        self.raw_samples = raw_samples
+        self.history = history
+        self._history_ids = []  # history series id per row
+        self.max_channels = max_channels
+        self.flush_samples = flush_samples
+        self.channels = {}  # (sensor id, field) -> row
+        self.meta = []  # (sensor id, sensor type, field) per row
+        self._lock = threading.Lock()
+        capacity = min(16, max_channels)
+        self._raw_t = np.full((capacity, raw_samples), np.nan)
+        self._raw_v = np.zeros((capacity, raw_samples))
+        self._raw_count = np.zeros(capacity, dtype=np.int64)
+        self._last = np.full(capacity, np.nan)
+        self.levels = [_Level(float(res), buckets, capacity) for res in sorted(resolutions)]
+        # Staged samples: scalars from single messages, arrays from batches
+        self._rows, self._times, self._values = [], [], []
+        self._chunks = []
+        self._staged = 0
+        # Metrics
+        self.samples = 0
+        self.rejected = 0
+        self.malformed = 0
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self.meta)
+
+    def last_time(self, row):
+        """Time of the newest sample of channel ``row`` (s), or None."""
+        with self._lock:
+            self._flush()
+            last = self._last[row]
+        return float(last) if last == last else None
+
+    def channel(self, sensor_id, field, sensor_type=None):
+        """Row of ``(sensor_id, field)``, created on first use; None once the store is full."""
+        key = (sensor_id, field)
+        row = self.channels.get(key)
+        if row is None:
+            if len(self.meta) >= self.max_channels:
+                return None
+            row = len(self.meta)
+            if row == len(self._raw_count):
+                self._grow(min(row * 2, self.max_channels))
+            self.channels[key] = row
+            self.meta.append((sensor_id, sensor_type, field))
+            if self.history is not None:
+                self._history_ids.append(self.history.series_id(history_name(sensor_id, field)))
+        return row
+
+    def _grow(self, capacity):
+        extra = capacity - len(self._raw_count)
+        self._raw_t = np.concatenate((self._raw_t, np.full((extra, self.raw_samples), np.nan)))
+        self._raw_v = np.concatenate((self._raw_v, np.zeros((extra, self.raw_samples))))
+        self._raw_count = np.concatenate((self._raw_count, np.zeros(extra, dtype=np.int64)))
+        self._last = np.concatenate((self._last, np.full(extra, np.nan)))
+        for level in self.levels:
+            level.grow(capacity)
+
+    # -- ingest -------------------------------------------------------------
+
+    def add(self, sensor_id, field, t, value, sensor_type=None):
+        """Stage one sample (``t`` in seconds)."""
+        with self._lock:
+            row = self.channel(sensor_id, field, sensor_type)
+            if row is None:
+                self.rejected += 1
+                return
+            self._rows.append(row)
+            self._times.append(t)
+            self._values.append(value)
+            self._staged += 1
+            if self._staged >= self.flush_samples:
+                self._flush()
+
+    def extend(self, sensor_id, field, times, values, sensor_type=None):
+        """Stage a batch of samples of one channel."""
+        times = np.asarray(times, dtype=np.float64).ravel()
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(times) != len(values):
+            raise ValueError("times and values differ in length")
+        with self._lock:
+            row = self.channel(sensor_id, field, sensor_type)
+            if row is None:
+                self.rejected += len(values)
+                return
+            self._chunks.append((np.full(len(values), row, dtype=np.int64), times, values))
+            self._staged += len(values)
+            if self._staged >= self.flush_samples:
+                self._flush()
+
+    def ingest(self, message, now=None):
+        """Stage a telemetry message (see the module docstring); returns the samples taken."""
+        if isinstance(message, list):
+            return sum(self.ingest(item, now) for item in message)
+        if not isinstance(message, dict):
+            raise ValueError("telemetry message must be an object or a list")
+        sensor_id = message.get("sensorId")
+        data = message.get("data")
+        if sensor_id is None or not isinstance(data, dict):
+            raise ValueError("telemetry message needs sensorId and data")
+        sensor_type = message.get("sensorType")
+        sensor_id = str(sensor_id)
+        if "timestamps" in message:
+            times = np.asarray(message["timestamps"], dtype=np.float64) / 1000.0
+            taken = 0
+            for field, values in data.items():
+                if isinstance(values, list) and len(values) == len(times):
+                    try:
+                        values = np.asarray(values, dtype=np.float64)
+                    except (TypeError, ValueError):
+                        continue
+                    self.extend(sensor_id, field, times, values, sensor_type)
+                    taken += len(values)
+            return taken
+        stamp = message.get("timestamp")
+        t = float(stamp) / 1000.0 if stamp is not None else (now if now is not None else time.time())
+        taken = 0
+        for field, value in data.items():
+            # Numbers and flags (detected, inRange) become channels; anything else is skipped
+            if isinstance(value, (int, float)) and value == value:
+                self.add(sensor_id, field, t, float(value), sensor_type)
+                taken += 1
+        return taken
+
+    def ingest_json(self, text, sensor_id=None):
+        """Stage a JSON-encoded message; ``sensor_id`` fills in a missing ``sensorId``.
+
+        Malformed messages are counted and give 0 samples.
+        """
+        try:
+            message = json.loads(text)
+            if sensor_id is not None:
+                for item in message if isinstance(message, list) else [message]:
+                    if isinstance(item, dict):
+                        item.setdefault("sensorId", sensor_id)
+            return self.ingest(message)
+        except (TypeError, ValueError):
+            self.malformed += 1
+            return 0
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._staged:
+            return
+        chunks = self._chunks
+        if self._rows:
+            chunks.append((np.array(self._rows, dtype=np.int64), np.array(self._times), np.array(self._values)))
+        ch = np.concatenate([c[0] for c in chunks])
+        t = np.concatenate([c[1] for c in chunks])
+        v = np.concatenate([c[2] for c in chunks])
+        self._rows, self._times, self._values, self._chunks = [], [], [], []
+        self._staged = 0
+        finite = np.isfinite(t) & np.isfinite(v)
+        if not finite.all():
+            self.rejected += int((~finite).sum())
+            ch, t, v = ch[finite], t[finite], v[finite]
+        if not len(ch):
+            return
+        order = np.lexsort((t, ch))
+        ch, t, v = ch[order], t[order], v[order]
+
+        # Raw rings: each channel's samples go after its previous ones; only
+        # the last raw_samples of a channel can survive one flush
+        starts = np.flatnonzero(np.r_[True, ch[1:] != ch[:-1]])
+        sizes = np.diff(np.r_[starts, len(ch)])
+        rank = np.arange(len(ch)) - np.repeat(starts, sizes)
+        fits = rank >= np.repeat(sizes, sizes) - self.raw_samples
+        slot = (self._raw_count[ch] + rank) % self.raw_samples
+        self._raw_t[ch[fits], slot[fits]] = t[fits]
+        self._raw_v[ch[fits], slot[fits]] = v[fits]
+        self._raw_count[ch[starts]] += sizes
+        ends = starts + sizes - 1
+        self._last[ch[ends]] = np.fmax(self._last[ch[ends]], t[ends])
+
+        for level in self.levels:
+            level.update(ch, t, v)
+        if self.history is not None:
+            self.history.append_rows(np.asarray(self._history_ids, dtype=np.uint32)[ch], t, v)
+        self.samples += len(ch)
+        self.flushes += 1
+
+    # -- queries ------------------------------------------------------------
+
+    def find(self, sensor_id, field):
+        return self.channels.get((str(sensor_id), field))
+
+    def list_channels(self):
+        with self._lock:
+            self._flush()
+            return [
+                {"sensorId": sensor_id, "sensorType": sensor_type, "field": field,
+                 "samples": int(self._raw_count[row]),
+                 "last": float(self._last[row]) if self._last[row] == self._last[row] else None}
+                for row, (sensor_id, sensor_type, field) in enumerate(self.meta)
+            ]
+
+    def series(self, row, start, end, points=500):
+        """Rollup of channel ``row`` over ``[start, end]`` s in at most ``points`` buckets.
+
+        Returns ``{resolution, t, min, max, mean, count}`` where ``t`` is each
+        bucket's start. The finest level that retains ``start`` and fits is
+        used; if none fits, buckets of the coarsest level are merged.
+        """
+        points = max(1, int(points))
+        with self._lock:
+            self._flush()
+            chosen = self.levels[-1]
+            for level in self.levels:
+                first = int(np.floor(start / level.resolution))
+                last = int(np.floor(end / level.resolution))
+                if last - first + 1 <= points and level.retains(row, first):
+                    chosen = level
+                    break
+            first = int(np.floor(start / chosen.resolution))
+            last = int(np.floor(end / chosen.resolution))
+            ids, lo, hi, total, count = chosen.read(row, first, last)
+        resolution = chosen.resolution
+        factor = -(-(last - first + 1) // points)
+        if factor > 1 and len(ids):
+            # Merge runs of ``factor`` buckets so the answer fits in ``points``
+            group = (ids - first) // factor
+            starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+            ids = first + group[starts] * factor
+            lo, hi = np.minimum.reduceat(lo, starts), np.maximum.reduceat(hi, starts)
+            total, count = np.add.reduceat(total, starts), np.add.reduceat(count, starts)
+            resolution *= factor
+        return {
+            "resolution": resolution,
+            "t": (ids * chosen.resolution).tolist(),
+            "min": lo.tolist(),
+            "max": hi.tolist(),
+            "mean": (total / np.maximum(count, 1)).tolist(),
+            "count": count.tolist(),
+        }
+
+    def raw(self, row, start=-np.inf, end=np.inf, limit=None):
+        """Raw samples of channel ``row`` still in its ring, in time order: ``(t, values)``."""
+        with self._lock:
+            self._flush()
+            t, v = self._raw_t[row].copy(), self._raw_v[row].copy()
+        keep = (t >= start) & (t <= end)
+        t, v = t[keep], v[keep]
+        order = np.argsort(t, kind="stable")
+        if limit is not None:
+            order = order[-int(limit):] if limit > 0 else order[:0]
+        return t[order], v[order]
+
+    def stats(self):
+        with self._lock:
+            arrays = [self._raw_t, self._raw_v, self._raw_count, self._last]
+            for level in self.levels:
+                arrays += [level.key, level.lo, level.hi, level.total, level.count, level.newest]
+            return {
+                "channels": len(self.meta),
+                "max_channels": self.max_channels,
+                "samples": self.samples,
+                "staged": self._staged,
+                "rejected": self.rejected,
+                "malformed": self.malformed,
+                "flushes": self.flushes,
+                "resolutions": [level.resolution for level in self.levels],
+                "memory_bytes": sum(a.nbytes for a in arrays),
+            }
+
+
+def history_name(sensor_id, field):
+    """History series of a telemetry channel."""
+    return f"{sensor_id}/{field}"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_telemetry_store():
+    """Return the process-wide telemetry store configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from .history_store import open_history
+
+            _store = TelemetryStore(history=open_history("sensors"))
+        return _store
+
+
+def close_telemetry_store():
+    """Write staged samples to the history (if any) and close it."""
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None and store.history is not None:
+        store.flush()
+        store.history.close()
@@ -0,0 +1,243 @@
+"""Broad- and narrow-phase collision detection over an ``EntityStore``.
+
+Bodies are spheres (``EntityStore.radius``). The broad phase is a uniform
+spatial hash: every body is bucketed by the integer cell containing its
+centre, with cells at least one diameter wide, so overlapping bodies are
+always in the same or adjacent cells. Buckets are kept as one array of rows
+sorted by packed cell key, which is re-sorted from the previous tick's order
+each step. The narrow phase tests every candidate pair at once with NumPy and
+contacts are resolved in place in the store arrays.
+"""
+import itertools
+
+import numpy as np
+
+# A cell coordinate triple is packed into one int64 key, 21 bits per axis
+_AXIS_BITS = 21
+_AXIS_MASK = (1 << _AXIS_BITS) - 1
+
+# 13 of the 26 neighbour offsets: together with the body's own cell this
+# visits every unordered pair of adjacent cells exactly once.
+_HALF_NEIGHBOURS = np.array(
+    [o for o in itertools.product((-1, 0, 1), repeat=3) if o > (0, 0, 0)],
+    dtype=np.int64,
+)
+
+
+def _pack(cells):
+    return (cells[:, 0] << (2 * _AXIS_BITS)) | (cells[:, 1] << _AXIS_BITS) | cells[:, 2]
+
+
+def _expand(owner, starts, counts):
+    """Expand ``owner[k]`` against the ranges ``starts[k]:starts[k] + counts[k]``."""
+    total = int(counts.sum())
+    first = np.repeat(owner, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = np.repeat(starts, counts) + offsets
+    return first, second
+
+
+class SpatialHash:
+    """Uniform grid of body rows, rebuilt incrementally each tick."""
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.order = None
+        self.cells = None
+        self.cell_keys = None
+        self.cell_start = None
+        self.cell_count = None
+        self.wrapped = False
+
+    def update(self, positions):
+        n = len(positions)
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        if n:
+            cells -= cells.min(axis=0)
+            # A world wider than 2**21 cells aliases distant cells onto the
+            # same key; pairs() then de-duplicates its candidates.
+            self.wrapped = bool((cells.max(axis=0) > _AXIS_MASK).any())
+            cells &= _AXIS_MASK
+        keys = _pack(cells)
+
+        if self.order is not None and len(self.order) == n:
+            # Few bodies change cell between ticks, so last tick's order is
+            # nearly sorted and a stable (run-detecting) sort is close to O(n).
+            order = self.order[np.argsort(keys[self.order], kind="stable")]
+        else:
+            order = np.argsort(keys, kind="stable")
+
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.diff(sorted_keys)) + 1
+        starts = np.concatenate(([0], starts)) if n else starts
+        self.order = order
+        self.cells = cells
+        self.cell_keys = sorted_keys[starts]
+        self.cell_start = starts
+        self.cell_count = np.diff(np.append(starts, n))
+
+    def sorted_pairs(self):
+        """Candidate pairs as positions in ``self.order`` (cell-sorted space).
+
+        Bodies in one cell are contiguous in sorted space, so gathering
+        per-pair data through these indices stays cache friendly.
+        """
+        order = self.order
+        n_cells = len(self.cell_keys)
+        if n_cells == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        # Cell index and sorted position of every body
+        cell_of = np.repeat(np.arange(n_cells), self.cell_count)
+        sorted_pos = np.arange(len(order))
+        cell_cells = self.cells[order[self.cell_start]]
+
+        # Same cell: each body pairs with the bodies after it in its bucket
+        cell_end = self.cell_start + self.cell_count
+        firsts = [sorted_pos]
+        seconds = [sorted_pos + 1]
+        all_counts = [cell_end[cell_of] - sorted_pos - 1]
+
+        for offset in _HALF_NEIGHBOURS:
+            keys = _pack((cell_cells + offset) & _AXIS_MASK)
+            idx = np.searchsorted(self.cell_keys, keys)
+            np.minimum(idx, n_cells - 1, out=idx)
+            hit = self.cell_keys[idx] == keys
+            if not hit.any():
+                continue
+            neighbour = np.where(hit, idx, -1)[cell_of]
+            bodies = neighbour >= 0
+            firsts.append(sorted_pos[bodies])
+            seconds.append(self.cell_start[neighbour[bodies]])
+            all_counts.append(self.cell_count[neighbour[bodies]])
+
+        first, second = _expand(
+            np.concatenate(firsts), np.concatenate(seconds), np.concatenate(all_counts)
+        )
+        if self.wrapped:
+            lo = np.minimum(first, second)
+            hi = np.maximum(first, second)
+            n = len(order)
+            codes = np.unique(lo * n + hi)
+            first, second = codes // n, codes % n
+            keep = first != second
+            first, second = first[keep], second[keep]
+        return first, second
+
+    def pairs(self):
+        """Return candidate pairs ``(i, j)`` of rows in the same or adjacent cells."""
+        first, second = self.sorted_pairs()
+        return self.order[first], self.order[second]
+
+
+class Contacts:
+    """Overlapping pairs with unit ``normal`` pointing from ``i`` to ``j``."""
+
+    __slots__ = ("i", "j", "normal", "depth")
+
+    def __init__(self, i, j, normal, depth):
+        self.i = i
+        self.j = j
+        self.normal = normal
+        self.depth = depth
+
+    def __len__(self):
+        return len(self.i)
+
+
+def find_contacts(positions, radii, i, j):
+    """Vectorized sphere test over candidate pairs."""
+    d = positions[j] - positions[i]
+    dist2 = np.einsum("ij,ij->i", d, d)
+    reach = radii[i] + radii[j]
+    hit = dist2 < reach * reach
+    i, j, d, reach = i[hit], j[hit], d[hit], reach[hit]
+    dist = np.sqrt(dist2[hit])
+    normal = np.empty_like(d)
+    apart = dist > 0
+    normal[apart] = d[apart] / dist[apart, None]
+    # Coincident centres have no direction; separate them vertically
+    normal[~apart] = (0.0, 0.0, 1.0)
+    return Contacts(i, j, normal, reach - dist)
+
+
+def _scatter_add(target, rows, values):
+    n = len(target)
+    for axis in range(3):
+        target[:, axis] += np.bincount(rows, weights=values[:, axis], minlength=n)
+
+
+def resolve_contacts(positions, velocities, contacts, restitution=0.5):
+    """Push overlapping bodies apart and reflect their approach velocity.
+
+    Bodies are treated as equal mass; each receives half of the positional
+    correction and of the normal impulse. Arrays are updated in place.
+    """
+    if not len(contacts):
+        return
+    normal = contacts.normal
+    half = normal * (contacts.depth * 0.5)[:, None]
+    _scatter_add(positions, contacts.i, -half)
+    _scatter_add(positions, contacts.j, half)
+
+    rel = velocities[contacts.j] - velocities[contacts.i]
+    vn = np.einsum("ij,ij->i", rel, normal)
+    impulse = np.where(vn < 0, -(1.0 + restitution) * vn * 0.5, 0.0)
+    kick = normal * impulse[:, None]
+    _scatter_add(velocities, contacts.i, -kick)
+    _scatter_add(velocities, contacts.j, kick)
+
+
+def naive_pairs(positions, radii, block=None):
+    """All-pairs overlap test, O(n^2); the reference for tests and benchmarks."""
+    n = len(positions)
+    # Bound the (block, n, 3) temporary to a few tens of megabytes
+    block = block or max(1, 1_000_000 // max(n, 1))
+    out_i, out_j = [], []
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        d = positions[None, :, :] - positions[start:stop, None, :]
+        dist2 = np.einsum("abk,abk->ab", d, d)
+        reach = radii[start:stop, None] + radii[None, :]
+        a, b = np.nonzero(dist2 < reach * reach)
+        a += start
+        upper = b > a
+        out_i.append(a[upper])
+        out_j.append(b[upper])
+    if not out_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(out_i), np.concatenate(out_j)
+
+
+class CollisionWorld:
+    """Per-tick collision pass over the live rows of an ``EntityStore``."""
+
+    def __init__(self, cell_size=None, restitution=0.5):
+        self.cell_size = cell_size
+        self.restitution = restitution
+        self.grid = None
+
+    def step(self, store):
+        n = store.count
+        positions = store.position[:n]
+        velocities = store.velocity[:n]
+        radii = store.radius[:n]
+        if n < 2:
+            none = np.empty(0, dtype=np.int64)
+            return Contacts(none, none, np.empty((0, 3)), np.empty(0))
+
+        cell = max(self.cell_size or 0.0, 2.0 * float(radii.max()))
+        if self.grid is None or self.grid.cell_size != cell:
+            self.grid = SpatialHash(cell)
+        grid = self.grid
+        grid.update(positions)
+        first, second = grid.sorted_pairs()
+        # Narrow phase in cell-sorted order, then map contacts back to rows
+        order = grid.order
+        contacts = find_contacts(positions[order], radii[order], first, second)
+        contacts.i = order[contacts.i]
+        contacts.j = order[contacts.j]
+        resolve_contacts(positions, velocities, contacts, self.restitution)
+        return contacts
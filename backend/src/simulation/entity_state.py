@@ -1,7 +1,116 @@
+from collections.abc import MutableMapping
+
+from .entity_store import EntityStore, STATUS_NAMES, status_code
+
+AXES = {"x": 0, "y": 1, "z": 2}
+
+
+class VectorView(MutableMapping):
+    """Dict-like ``{"x", "y", "z"}`` view onto one row of a store array."""
+
+    __slots__ = ("_entity", "_field")
+
+    def __init__(self, entity, field):
+        self._entity = entity
+        self._field = field
+
+    def _array(self):
+        return getattr(self._entity._store, self._field)
+
+    def __getitem__(self, axis):
+        return float(self._array()[self._entity._row, AXES[axis]])
+
+    def __setitem__(self, axis, value):
+        self._array()[self._entity._row, AXES[axis]] = value
+
+    def __delitem__(self, axis):
+        raise TypeError("vector axes cannot be deleted")
+
+    def __iter__(self):
+        return iter(AXES)
+
+    def __len__(self):
+        return len(AXES)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class EntityState:
+    """A single simulation entity.
+
+    State lives in an :class:`EntityStore` row; ``position``, ``velocity`` and
+    ``acceleration`` are dict-like views onto that row. A freshly created
+    entity owns a private one-row store until it is added to a
+    ``SimulationState``, which moves it into the shared arrays.
+    """
+
     def __init__(self, entity_id, entity_type):
         self.id = entity_id
         self.type = entity_type
-        self.position = {"x": 0, "y": 0, "z": 0}
-        self.velocity = {"x": 0, "y": 0, "z": 0}
-        self.status = "idle"
+        self._store = EntityStore(capacity=1)
+        self._store.add(entity_id, entity_type)
+
+    @property
+    def _row(self):
+        return self._store.rows[self.id]
+
+    def _detach(self):
+        """Copy this entity's row into a private one-row store."""
+        store = EntityStore(capacity=1)
+        row = self._row
+        store.add(
+            self.id,
+            self.type,
+            position=self._store.position[row],
+            velocity=self._store.velocity[row],
+            acceleration=self._store.acceleration[row],
+            status=self.status,
+            radius=self.radius,
+        )
+        self._store = store
+
+    def _assign(self, field, value):
+        view = VectorView(self, field)
+        for axis, v in dict(value).items():
+            view[axis] = v
+
+    @property
+    def position(self):
+        return VectorView(self, "position")
+
+    @position.setter
+    def position(self, value):
+        self._assign("position", value)
+
+    @property
+    def velocity(self):
+        return VectorView(self, "velocity")
+
+    @velocity.setter
+    def velocity(self, value):
+        self._assign("velocity", value)
+
+    @property
+    def acceleration(self):
+        return VectorView(self, "acceleration")
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self._assign("acceleration", value)
+
+    @property
+    def status(self):
+        return STATUS_NAMES[int(self._store.status[self._row])]
+
+    @status.setter
+    def status(self, value):
+        self._store.status[self._row] = status_code(value)
+
+    @property
+    def radius(self):
+        return float(self._store.radius[self._row])
+
+    @radius.setter
+    def radius(self, value):
+        self._store.radius[self._row] = value
@@ -0,0 +1,151 @@
+import numpy as np
+
+# Status strings are stored as small integer codes so the whole column fits in
+# one uint8 array. New statuses are registered on first use.
+STATUS_CODES = {"idle": 0, "moving": 1, "braking": 2, "stopped": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Collision sphere radius; two default bodies touch at 1.5 m, the same
+# threshold physics/collision.js uses.
+DEFAULT_RADIUS = 0.75
+
+
+def status_code(name):
+    """Return the uint8 code for a status string, registering it if new."""
+    code = STATUS_CODES.get(name)
+    if code is None:
+        code = len(STATUS_CODES)
+        if code > 255:
+            raise ValueError("too many distinct entity statuses")
+        STATUS_CODES[name] = code
+        STATUS_NAMES[code] = name
+    return code
+
+
+class EntityStore:
+    """Structure-of-arrays storage for simulation entities.
+
+    Every entity owns one row in contiguous float64 ``position``, ``velocity``
+    and ``acceleration`` arrays of shape (capacity, 3), a uint8 ``status``
+    column and a float64 collision ``radius`` column. Only the first ``count``
+    rows are live; removal swaps the last row into the freed slot so the live
+    block stays dense.
+
+    ``net_ids`` gives every entity a stable uint32 number for wire formats,
+    since entity ids themselves may be arbitrary strings.
+    """
+
+    def __init__(self, capacity=64):
+        capacity = max(1, int(capacity))
+        self.count = 0
+        self.position = np.zeros((capacity, 3), dtype=np.float64)
+        self.velocity = np.zeros((capacity, 3), dtype=np.float64)
+        self.acceleration = np.zeros((capacity, 3), dtype=np.float64)
+        self.status = np.zeros(capacity, dtype=np.uint8)
+        self.radius = np.full(capacity, DEFAULT_RADIUS, dtype=np.float64)
+        self.net_ids = np.zeros(capacity, dtype=np.uint32)
+        self._next_net_id = 1
+        self.ids = []
+        self.types = []
+        self.rows = {}
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, entity_id):
+        return entity_id in self.rows
+
+    @property
+    def capacity(self):
+        return self.position.shape[0]
+
+    def _reserve(self, needed):
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in ("position", "velocity", "acceleration"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, 3), dtype=np.float64)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+        for name in ("status", "radius", "net_ids"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def add(self, entity_id, entity_type, position=(0, 0, 0), velocity=(0, 0, 0),
+            acceleration=(0, 0, 0), status="idle", radius=DEFAULT_RADIUS):
+        """Append one entity and return its row index."""
+        if entity_id in self.rows:
+            raise KeyError(f"entity {entity_id!r} already exists")
+        self._reserve(self.count + 1)
+        row = self.count
+        self.position[row] = position
+        self.velocity[row] = velocity
+        self.acceleration[row] = acceleration
+        self.status[row] = status_code(status)
+        self.radius[row] = radius
+        self.net_ids[row] = self._next_net_id
+        self._next_net_id += 1
+        self.ids.append(entity_id)
+        self.types.append(entity_type)
+        self.rows[entity_id] = row
+        self.count += 1
+        return row
+
+    def add_many(self, entity_ids, entity_type, position=None, velocity=None, status="idle",
+                 radius=DEFAULT_RADIUS):
+        """Append a batch of entities of one type; returns the first new row."""
+        entity_ids = list(entity_ids)
+        n = len(entity_ids)
+        if any(eid in self.rows for eid in entity_ids) or len(set(entity_ids)) != n:
+            raise KeyError("duplicate entity id in batch")
+        start = self.count
+        self._reserve(start + n)
+        end = start + n
+        self.position[start:end] = 0 if position is None else position
+        self.velocity[start:end] = 0 if velocity is None else velocity
+        self.acceleration[start:end] = 0
+        self.status[start:end] = status_code(status)
+        self.radius[start:end] = radius
+        self.net_ids[start:end] = np.arange(self._next_net_id, self._next_net_id + n)
+        self._next_net_id += n
+        for offset, eid in enumerate(entity_ids):
+            self.rows[eid] = start + offset
+        self.ids.extend(entity_ids)
+        self.types.extend([entity_type] * n)
+        self.count = end
+        return start
+
+    def remove(self, entity_id):
+        """Remove an entity; returns the id that moved into its row, if any."""
+        row = self.rows.pop(entity_id)
+        last = self.count - 1
+        moved = None
+        if row != last:
+            self.position[row] = self.position[last]
+            self.velocity[row] = self.velocity[last]
+            self.acceleration[row] = self.acceleration[last]
+            self.status[row] = self.status[last]
+            self.radius[row] = self.radius[last]
+            self.net_ids[row] = self.net_ids[last]
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.types[row] = self.types[last]
+            self.rows[moved] = row
+        self.ids.pop()
+        self.types.pop()
+        self.count = last
+        return moved
+
+    def integrate(self, delta):
+        """Advance every live entity by ``delta`` seconds (semi-implicit Euler)."""
+        n = self.count
+        if n == 0:
+            return
+        vel = self.velocity[:n]
+        vel += self.acceleration[:n] * delta
+        self.position[:n] += vel * delta
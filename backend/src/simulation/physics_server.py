@@ -0,0 +1,308 @@
+"""Authoritative physics WebSocket service.
+
+Runs a ``SimulationState`` on a fixed-rate asyncio loop and streams snapshots
+to every connected ``PhysicsNetwork`` client (frontend/static/js/network).
+
+Usage:
+  python -m backend.src.simulation.physics_server
+
+The service listens on PHYSICS_WS_HOST:PHYSICS_WS_PORT (default
+127.0.0.1:8765), which is the port ``/health`` probes for its ``ws`` flag.
+With PHYSICS_SHARDS > 1 the simulation runs as a ``ShardedSimulation``
+(sharding.py), one worker process per region. With SIM_TRACE_DIR set every
+tick and input is recorded to a new trace there (trace.py); with HISTORY_DIR
+set entity tracks are kept in a ``HistoryStore`` (services/history_store.py).
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+
+from ..config.env import (
+    HISTORY_ENTITY_INTERVAL,
+    PHYSICS_BROADCAST_RATE,
+    PHYSICS_MAX_CATCH_UP,
+    PHYSICS_SHARDS,
+    PHYSICS_TICK_RATE,
+    PHYSICS_WS_HOST,
+    PHYSICS_WS_PORT,
+    SIM_TRACE_DIR,
+    SIM_TRACE_KEYFRAME_INTERVAL,
+)
+from ..services.history_store import ENTITY_FIELDS, open_history
+from .entity_state import AXES
+from .scheduler import FixedStepScheduler
+from .sharding import ShardedSimulation
+from .simulation_state import SimulationState
+from .snapshot_codec import SnapshotEncoder
+from .trace import TraceRecorder, run_dir, set_recorder
+
+# Velocity impulses per key; mirrors the local prediction in
+# frontend/static/js/physics/controllers.js so client and server agree.
+KEY_IMPULSES = {
+    "w": {"y": 2.0},
+    "s": {"y": -2.0},
+    "a": {"x": -2.0},
+    "d": {"x": 2.0},
+    " ": {"z": 6.0},
+}
+
+
+def apply_input(sim, payload):
+    """Apply one client ``input`` payload (``{id, key, ts}``) to the simulation.
+
+    Unknown ids are spawned as ``player`` entities so a client can drive its
+    own body without a separate registration step.
+    """
+    entity_id = payload.get("id")
+    if entity_id is None:
+        return
+    dv = [0.0, 0.0, 0.0]
+    for axis, value in KEY_IMPULSES.get(payload.get("key"), {}).items():
+        dv[AXES[axis]] += value
+    sim.apply_impulse(entity_id, payload.get("entity_type", "player"), dv)
+
+
+class ClientChannel:
+    """A connected client and its bounded outgoing message queue.
+
+    Snapshots supersede each other, so when the queue is full the oldest
+    pending message is dropped. A slow browser therefore skips frames instead
+    of stalling the tick loop or growing server memory.
+    """
+
+    def __init__(self, websocket, max_pending=2):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.sent = 0
+        self.dropped = 0
+        # "json" (default, what PhysicsNetwork.js parses) or "binary" for the
+        # delta-compressed format in snapshot_codec.py
+        self.format = "json"
+        self.acked_tick = None
+
+    def offer(self, message):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def pump(self):
+        while True:
+            message = await self.queue.get()
+            if isinstance(message, bytes):
+                await self.websocket.send_bytes(message)
+            else:
+                await self.websocket.send_text(message)
+            self.sent += 1
+
+
+class PhysicsServer:
+    """Fixed-rate simulation loop with snapshot fan-out.
+
+    The simulation always advances in steps of ``1 / tick_rate`` seconds
+    (see scheduler.py); snapshots go out at ``broadcast_rate`` (default: the
+    tick rate). With a ``TraceRecorder`` every tick and input is recorded;
+    with a ``HistoryStore`` the position and velocity of every entity are
+    appended every ``history_interval`` s, timestamped with the wall clock.
+    """
+
+    def __init__(self, sim=None, tick_rate=PHYSICS_TICK_RATE, max_pending=2, keyframe_interval=None,
+                 broadcast_rate=PHYSICS_BROADCAST_RATE, max_catch_up=PHYSICS_MAX_CATCH_UP, recorder=None,
+                 history=None, history_interval=HISTORY_ENTITY_INTERVAL):
+        self.sim = sim if sim is not None else SimulationState()
+        self.recorder = recorder
+        self.history = history
+        self.tick_rate = float(tick_rate)
+        self.history_every = max(1, round(history_interval * self.tick_rate))
+        self.max_pending = max_pending
+        self.encoder = SnapshotEncoder(keyframe_interval or max(1, int(self.tick_rate)))
+        self.scheduler = FixedStepScheduler(
+            self._tick, self.tick_rate, lambda alpha: self.broadcast(), broadcast_rate, max_catch_up
+        )
+        self.clients = set()
+        self.tick_count = 0
+        self._inputs = []
+        self._task = None
+
+    def submit_input(self, payload):
+        # Inputs are queued and applied at the start of the next tick so the
+        # order of simulation updates does not depend on network timing.
+        self._inputs.append(payload)
+
+    def _tick(self, dt):
+        inputs, self._inputs = self._inputs, []
+        for payload in inputs:
+            if self.recorder is not None:
+                self.recorder.record_input(payload, source="physics", tick=self.tick_count + 1)
+            apply_input(self.sim, payload)
+        self.sim.tick(dt)
+        self.tick_count += 1
+        if self.recorder is not None:
+            self.recorder.record_tick(self.tick_count, self.sim.store)
+        if self.history is not None and self.tick_count % self.history_every == 0:
+            self.record_history(time.time())
+
+    def record_history(self, now):
+        """Append every entity's position and velocity at time ``now`` to the history."""
+        store = self.sim.store
+        n = store.count
+        if not n:
+            return
+        series = [self.history.series_id(entity_id) for entity_id in store.ids[:n]]
+        self.history.append_rows(series, [now] * n, np.hstack((store.position[:n], store.velocity[:n])))
+
+    def step(self):
+        """Run one tick and broadcast it, outside the scheduler."""
+        self._tick(1.0 / self.tick_rate)
+        self.broadcast()
+
+    def broadcast(self):
+        if not self.clients:
+            return
+        message = None
+        frame = None
+        for client in list(self.clients):
+            if client.format == "binary":
+                if frame is None:
+                    frame = self.encoder.capture(self.sim.store, self.tick_count)
+                # Clients acknowledging the same keyframe share one encoding
+                client.offer(self.encoder.encode(frame, client.acked_tick))
+            else:
+                if message is None:
+                    # Encode once and share the same message between clients
+                    message = json.dumps({
+                        "type": "snapshot",
+                        "tick": self.tick_count,
+                        "payload": self.sim.snapshot(),
+                    })
+                client.offer(message)
+
+    async def run(self):
+        await self.scheduler.run()
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        stats["clients"] = len(self.clients)
+        stats["dropped_messages"] = sum(client.dropped for client in self.clients)
+        if hasattr(self.sim, "stats"):
+            stats["sim"] = self.sim.stats()
+        if self.recorder is not None:
+            stats["trace"] = self.recorder.stats()
+        if self.history is not None:
+            stats["history"] = self.history.stats()
+        if getattr(self.sim, "sensors", None) is not None:
+            stats["sensors"] = self.sim.sensors.stats()
+        return stats
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def serve_client(self, websocket: WebSocket):
+        await websocket.accept()
+        client = ClientChannel(websocket, self.max_pending)
+        self.clients.add(client)
+        sender = asyncio.get_running_loop().create_task(client.pump())
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                kind = message.get("type")
+                if kind == "input" and isinstance(message.get("payload"), dict):
+                    self.submit_input(message["payload"])
+                elif kind == "subscribe" and message.get("format") in ("json", "binary"):
+                    client.format = message["format"]
+                    client.acked_tick = None
+                elif kind == "ack" and isinstance(message.get("tick"), int):
+                    client.acked_tick = message["tick"]
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+
+
+def create_app(server=None):
+    """Build the ASGI app serving ``server`` (a new ``PhysicsServer`` by default)."""
+    server = server if server is not None else PhysicsServer()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        server.start()
+        try:
+            yield
+        finally:
+            await server.stop()
+
+    app = FastAPI(title="Digital Twin Physics", lifespan=lifespan)
+    app.state.physics = server
+
+    @app.websocket("/")
+    async def physics_socket(websocket: WebSocket):
+        await server.serve_client(websocket)
+
+    @app.get("/stats")
+    def physics_stats():
+        """Tick timing, overrun and catch-up counters."""
+        return server.stats()
+
+    @app.get("/history/{entity_id}")
+    def entity_history(entity_id: str, start: Optional[float] = None, end: Optional[float] = None):
+        """Recorded track of one entity between ``start`` and ``end`` (Unix s) when HISTORY_DIR is set."""
+        if server.history is None:
+            raise HTTPException(status_code=404, detail="Entity history is not enabled (set HISTORY_DIR)")
+        times, values = server.history.read(entity_id, -np.inf if start is None else start,
+                                            np.inf if end is None else end)
+        return {"id": entity_id, "t": times.tolist(),
+                **{name: values[:, k].tolist() for k, name in enumerate(server.history.fields)}}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    # PHYSICS_SHARDS > 1 spreads the world over that many worker processes
+    sim = ShardedSimulation(PHYSICS_SHARDS) if PHYSICS_SHARDS > 1 else None
+    recorder = None
+    if SIM_TRACE_DIR:
+        recorder = TraceRecorder(run_dir(SIM_TRACE_DIR, "physics"), SIM_TRACE_KEYFRAME_INTERVAL)
+        set_recorder(recorder)
+    history = open_history("entities", ENTITY_FIELDS)
+    try:
+        server = PhysicsServer(sim, recorder=recorder, history=history)
+        uvicorn.run(create_app(server), host=PHYSICS_WS_HOST, port=PHYSICS_WS_PORT)
+    finally:
+        if history is not None:
+            history.close()
+        if recorder is not None:
+            set_recorder(None)
+            recorder.close()
+        if sim is not None:
+            sim.close()
+
+
+if __name__ == "__main__":
+    main()
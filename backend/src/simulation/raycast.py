@@ -0,0 +1,656 @@
+"""Batched ray casting against building meshes and entity spheres.
+
+Geometry is in the simulation's local frame: metres, x east, y north, z up
+(as ``EntityStore.position`` and ``RoadEnvironment``). OSM building
+footprints are extruded to prisms (walls plus an ear-clipped roof) from
+their ``height`` / ``building:levels`` tags. Entities are spheres of
+``EntityStore.radius``, and the ground is the plane z = 0.
+
+``BVH`` is a packed bounding volume hierarchy built like
+``spatial_index.STRTree``, in 3-D: primitives are sorted along a Morton
+curve, runs of ``leaf_size`` become leaves and runs of ``node_capacity``
+nodes become parents, so every node's children are one contiguous range.
+``Scene.cast`` traverses it with arbitrary rays, all together, one level at
+a time: the frontier is an array of (ray, node) pairs, slab-tested at once
+and expanded to the children of the pairs that hit. The leaves give (ray,
+primitive) candidates for the exact triangle or sphere test, and the nearest
+hit per ray wins.
+
+Sensor rays come in fans sharing an origin (``RayGrids``), which
+``Scene.cast_grids`` exploits: one range query per fan, then each candidate
+box is mapped onto the rectangle of fan rays that can hit it. That skips the
+per-ray traversal entirely and gives the same hits as ``cast``.
+"""
+import math
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ..services.environment_loader import to_local
+from ..services.osm_tile_cache import METERS_PER_DEG_LAT, haversine_m
+from ..services.single_flight import SingleFlight
+
+# Building heights when the tags do not say, metres
+LEVEL_HEIGHT = 3.0
+DEFAULT_HEIGHT = 3 * LEVEL_HEIGHT
+
+# RayHits.kind
+MISS, BUILDING, GROUND, ENTITY = range(4)
+KIND_NAMES = {MISS: "miss", BUILDING: "building", GROUND: "ground", ENTITY: "entity"}
+
+# Rays cast per traversal; bounds the size of the (ray, node) frontier
+BLOCK_RAYS = 32768
+# Distance bands (metres) in which ray fans test primitives, nearest first
+BANDS = (5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0)
+# Slack on angular bounds (radians) and node boxes (metres), so rays
+# grazing an edge still reach the exact test, which has its own tolerance
+ANGLE_SLACK = 1e-9
+BOX_PAD = 1e-6
+TWO_PI = 2.0 * np.pi
+
+_LENGTH = re.compile(r"^\s*(-?[\d.]+)\s*(m|ft|')?\s*$")
+_FEET = 0.3048
+
+
+def parse_height(value):
+    """An OSM length (``"12"``, ``"12 m"``, ``"40 ft"``) in metres, or None."""
+    if value is None:
+        return None
+    match = _LENGTH.match(str(value).strip().lower())
+    if not match:
+        return None
+    try:
+        metres = float(match.group(1))
+    except ValueError:
+        return None
+    return metres * _FEET if match.group(2) in ("ft", "'") else metres
+
+
+def building_height(tags):
+    """``(base, top)`` of a building or building part in metres above ground."""
+    top = parse_height(tags.get("height"))
+    if top is None:
+        levels = parse_height(tags.get("building:levels"))
+        top = levels * LEVEL_HEIGHT if levels else DEFAULT_HEIGHT
+    base = parse_height(tags.get("min_height"))
+    if base is None:
+        base = (parse_height(tags.get("building:min_level")) or 0.0) * LEVEL_HEIGHT
+    if top <= base:
+        top = base + LEVEL_HEIGHT
+    return base, top
+
+
+def triangulate(ring):
+    """Ear-clip a simple polygon ``(n, 2)`` (open ring) into ``(n - 2, 3)`` vertex indices.
+
+    Self-intersecting or degenerate rings fall back to a fan for whatever
+    could not be clipped, so every footprint still gets a roof.
+    """
+    n = len(ring)
+    if n < 3:
+        return np.empty((0, 3), dtype=np.int64)
+    x, y = ring[:, 0], ring[:, 1]
+    area2 = float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+    idx = list(range(n)) if area2 > 0 else list(range(n - 1, -1, -1))
+    pts = ring.tolist()
+
+    def cross(a, b, c):
+        return (pts[b][0] - pts[a][0]) * (pts[c][1] - pts[a][1]) - (pts[b][1] - pts[a][1]) * (pts[c][0] - pts[a][0])
+
+    triangles = []
+    i = 0
+    stalled = 0
+    while len(idx) > 3 and stalled <= len(idx):
+        m = len(idx)
+        a, b, c = idx[(i - 1) % m], idx[i % m], idx[(i + 1) % m]
+        ear = cross(a, b, c) > 0
+        if ear:
+            for p in idx:
+                if p in (a, b, c):
+                    continue
+                if cross(a, b, p) > 0 and cross(b, c, p) > 0 and cross(c, a, p) > 0:
+                    ear = False
+                    break
+        if ear:
+            triangles.append((a, b, c))
+            del idx[i % m]
+            stalled = 0
+        else:
+            i += 1
+            stalled += 1
+    triangles.extend((idx[0], idx[k], idx[k + 1]) for k in range(1, len(idx) - 1))
+    return np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+
+
+def _rings(el):
+    """``([outer rings], [inner rings])`` of a building way or multipolygon, as (lat, lon) lists."""
+    def closed(geometry):
+        coords = [(p["lat"], p["lon"]) for p in geometry or [] if p and p.get("lat") is not None]
+        if len(coords) > 3 and coords[0] == coords[-1]:
+            return coords[:-1]
+        return None
+
+    if el.get("type") == "relation":
+        outer, inner = [], []
+        # Only members that are closed on their own; rings split over
+        # several ways are skipped
+        for member in el.get("members") or []:
+            ring = closed(member.get("geometry"))
+            if ring:
+                (inner if member.get("role") == "inner" else outer).append(ring)
+        return outer, inner
+    ring = closed(el.get("geometry"))
+    return ([ring] if ring else []), []
+
+
+def _walls(xy, base, top):
+    a, b = xy, np.roll(xy, -1, axis=0)
+    n = len(xy)
+    lo_a = np.column_stack((a, np.full(n, base)))
+    lo_b = np.column_stack((b, np.full(n, base)))
+    hi_a = np.column_stack((a, np.full(n, top)))
+    hi_b = np.column_stack((b, np.full(n, top)))
+    return np.concatenate((np.stack((lo_a, lo_b, hi_b), axis=1), np.stack((lo_a, hi_b, hi_a), axis=1)))
+
+
+def _cap(xy, z):
+    tri = triangulate(xy)
+    return np.concatenate((xy[tri], np.full((len(tri), 3, 1), z)), axis=2)
+
+
+def building_mesh(elements, origin):
+    """Triangles ``(m, 3, 3)`` of every building in ``elements``, the building each belongs to, and the building ids.
+
+    Outer rings get walls, a roof and (for raised parts) a floor; inner
+    rings get walls only, so roofs do not have courtyard holes.
+    """
+    parts, owners, ids = [], [], []
+    for el in elements:
+        tags = el.get("tags") or {}
+        if not (tags.get("building") or tags.get("building:part")):
+            continue
+        outer, inner = _rings(el)
+        if not outer:
+            continue
+        base, top = building_height(tags)
+        pieces = []
+        for ring in outer:
+            xy = to_local(origin, ring)
+            pieces += [_walls(xy, base, top), _cap(xy, top)]
+            if base > 0:
+                pieces.append(_cap(xy, base))
+        pieces += [_walls(to_local(origin, ring), base, top) for ring in inner]
+        triangles = np.concatenate(pieces)
+        parts.append(triangles)
+        owners.append(np.full(len(triangles), len(ids), dtype=np.int64))
+        ids.append(el.get("id"))
+    if not parts:
+        return np.empty((0, 3, 3)), np.empty(0, dtype=np.int64), []
+    return np.concatenate(parts), np.concatenate(owners), ids
+
+
+def _morton(points, bits=10):
+    """Interleaved ``bits``-per-axis Morton codes of ``(n, 3)`` points."""
+    lo = points.min(axis=0)
+    span = np.maximum(points.max(axis=0) - lo, 1e-9)
+    q = ((points - lo) / span * ((1 << bits) - 1)).astype(np.uint64)
+    code = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(bits):
+        for axis in range(3):
+            code |= ((q[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + axis)
+    return code
+
+
+def _expand(starts, counts):
+    """Concatenate the ranges ``starts[k]:starts[k] + counts[k]``."""
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+class BVH:
+    """Static packed BVH over ``(n, 6)`` boxes ``(min x, y, z, max x, y, z)``; see the module docstring."""
+
+    def __init__(self, boxes, leaf_size=4, node_capacity=4):
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.float64).reshape(-1, 6)
+        n = len(self.boxes)
+        self.order = np.empty(0, dtype=np.int64)
+        # levels[k] = (lo, hi, child pointer); level 0's children are
+        # positions in self.order, higher levels' are nodes of the level below
+        self.levels = []
+        if not n:
+            return
+        self.order = np.argsort(_morton((self.boxes[:, :3] + self.boxes[:, 3:]) * 0.5), kind="stable")
+        lo, hi = self.boxes[self.order, :3] - BOX_PAD, self.boxes[self.order, 3:] + BOX_PAD
+        size = leaf_size
+        while True:
+            starts = np.arange(0, len(lo), size)
+            pointer = np.append(starts, len(lo))
+            lo = np.minimum.reduceat(lo, starts, axis=0)
+            hi = np.maximum.reduceat(hi, starts, axis=0)
+            self.levels.append((lo, hi, pointer))
+            if len(lo) == 1:
+                break
+            size = node_capacity
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def candidates(self, origins, inverse, t_max):
+        """``(ray, primitive)`` pairs whose leaf box the ray meets within ``[0, t_max]``.
+
+        ``inverse`` is ``1 / direction`` per ray, with zero components
+        replaced by a tiny value so the slab test needs no special case.
+        """
+        if not self.levels:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        ray = np.arange(len(origins))
+        node = np.zeros(len(origins), dtype=np.int64)
+        for lo, hi, pointer in reversed(self.levels):
+            o, inv = origins[ray], inverse[ray]
+            t0 = (lo[node] - o) * inv
+            t1 = (hi[node] - o) * inv
+            near = np.minimum(t0, t1).max(axis=1)
+            far = np.maximum(t0, t1).min(axis=1)
+            hit = (near <= far) & (far >= 0.0) & (near <= t_max[ray])
+            ray, node = ray[hit], node[hit]
+            counts = pointer[node + 1] - pointer[node]
+            ray = np.repeat(ray, counts)
+            node = _expand(pointer[node], counts)
+        return ray, self.order[node]
+
+    def near(self, points, radius):
+        """``(point, primitive, distance)`` for every box within ``radius[point]`` of a point."""
+        if not self.levels:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        query = np.arange(len(points))
+        node = np.zeros(len(points), dtype=np.int64)
+        for lo, hi, pointer in reversed(self.levels):
+            dist = box_distance(points[query], lo[node], hi[node])
+            hit = dist <= radius[query]
+            query, node = query[hit], node[hit]
+            counts = pointer[node + 1] - pointer[node]
+            query = np.repeat(query, counts)
+            node = _expand(pointer[node], counts)
+        primitive = self.order[node]
+        dist = box_distance(points[query], self.boxes[primitive, :3], self.boxes[primitive, 3:])
+        keep = dist <= radius[query]
+        return query[keep], primitive[keep], dist[keep]
+
+
+def box_distance(points, lo, hi):
+    """Distance from each point to its box (0 inside)."""
+    gap = np.maximum(np.maximum(lo - points, points - hi), 0.0)
+    return np.sqrt(np.einsum("ij,ij->i", gap, gap))
+
+
+def _dot(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+
+def _cross(a, b):
+    return np.column_stack((
+        a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1],
+        a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2],
+        a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0],
+    ))
+
+
+def triangle_hits(origins, directions, v0, e1, e2):
+    """Möller–Trumbore distance along each ray to its triangle (two-sided), inf on a miss."""
+    p = _cross(directions, e2)
+    det = _dot(e1, p)
+    ok = np.abs(det) > 1e-12
+    inv_det = np.divide(1.0, det, out=np.zeros_like(det), where=ok)
+    s = origins - v0
+    u = _dot(s, p) * inv_det
+    q = _cross(s, e1)
+    v = _dot(directions, q) * inv_det
+    t = _dot(e2, q) * inv_det
+    ok &= (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t >= 0.0)
+    return np.where(ok, t, np.inf)
+
+
+def sphere_hits(origins, directions, centres, radii):
+    """Distance along each (unit) ray to the front of its sphere, inf on a miss.
+
+    A ray starting inside a sphere ignores it, so a sensor mounted on an
+    entity does not see its own body.
+    """
+    oc = origins - centres
+    b = _dot(oc, directions)
+    c = _dot(oc, oc) - radii * radii
+    disc = b * b - c
+    ok = (disc >= 0.0) & (c > 0.0)
+    t = -b - np.sqrt(np.maximum(disc, 0.0))
+    return np.where(ok & (t >= 0.0), t, np.inf)
+
+
+class RayHits:
+    """Per-ray result of ``Scene.cast``; row ``k`` is ray ``k``.
+
+    ``distance`` is inf and ``kind`` MISS where nothing was hit in range.
+    ``target`` is the sphere index for ENTITY hits, the building index
+    (into ``Scene.building_ids``) for BUILDING hits and -1 otherwise.
+    """
+
+    __slots__ = ("distance", "kind", "target")
+
+    def __init__(self, distance, kind, target):
+        self.distance = distance
+        self.kind = kind
+        self.target = target
+
+    def __len__(self):
+        return len(self.distance)
+
+
+def _nearest(hits, ray, t, target, kind):
+    """Keep, per ray, the closest of ``t`` if it beats the current hit."""
+    found = np.isfinite(t)
+    ray, t, target = ray[found], t[found], target[found]
+    if not len(ray):
+        return
+    best = np.full(len(hits), np.inf)
+    np.minimum.at(best, ray, t)
+    win = (t == best[ray]) & (t < hits.distance[ray])
+    ray = ray[win]
+    hits.distance[ray] = t[win]
+    hits.kind[ray] = kind
+    hits.target[ray] = target[win]
+
+
+class RayGrids:
+    """One regular fan of rays per sensor: ``rows`` elevations by ``columns`` azimuths.
+
+    Row ``i`` points at elevation ``el_first + i * el_step`` and column ``j``
+    at compass azimuth ``az_first + j * az_step`` (radians, clockwise from
+    north). Rays are numbered sensor by sensor, row-major within a sensor.
+    """
+
+    def __init__(self, origins, el_first, el_step, rows, az_first, az_step, columns, max_range, min_range=0.0):
+        self.origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        n = len(self.origins)
+
+        def per_sensor(value, dtype=np.float64):
+            return np.broadcast_to(np.asarray(value, dtype=dtype), (n,)).copy()
+
+        self.el_first = per_sensor(el_first)
+        self.el_step = per_sensor(el_step)
+        self.rows = per_sensor(rows, np.int64)
+        self.az_first = per_sensor(az_first)
+        self.az_step = per_sensor(az_step)
+        self.columns = per_sensor(columns, np.int64)
+        self.max_range = per_sensor(max_range)
+        self.min_range = per_sensor(min_range)
+        self.sizes = self.rows * self.columns
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes)))
+        self._directions = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def sensor_of_rays(self):
+        return np.repeat(np.arange(len(self.origins)), self.sizes)
+
+    def directions(self):
+        """Unit direction of every ray, ``(len(self), 3)``; computed once."""
+        if self._directions is not None:
+            return self._directions
+        sensor = self.sensor_of_rays()
+        k = np.arange(len(self)) - self.offsets[sensor]
+        row, col = np.divmod(k, self.columns[sensor])
+        el = self.el_first[sensor] + row * self.el_step[sensor]
+        az = self.az_first[sensor] + col * self.az_step[sensor]
+        cos_el = np.cos(el)
+        self._directions = np.column_stack((cos_el * np.sin(az), cos_el * np.cos(az), np.sin(el)))
+        return self._directions
+
+    def column_of_rays(self):
+        """Index of every ray's column, numbered across all sensors."""
+        sensor = self.sensor_of_rays()
+        first = np.concatenate(([0], np.cumsum(self.columns)))
+        return first[sensor] + (np.arange(len(self)) - self.offsets[sensor]) % self.columns[sensor]
+
+    def cover(self, sensor, lo, hi, near=None, reach=None):
+        """``(ray, k)`` for every ray of ``sensor[k]`` pointing into the angular extent of box ``k``.
+
+        The extent is conservative: elevations use the box's nearest and
+        farthest horizontal distance, azimuths its footprint corners (the
+        full circle when the sensor stands inside the footprint). Given
+        ``reach`` (farthest current hit per column, see ``column_of_rays``)
+        and ``near`` (distance per box), columns that are already blocked
+        nearer than the box are skipped.
+        """
+        rel_lo, rel_hi = lo - self.origins[sensor], hi - self.origins[sensor]
+        gap = np.maximum(np.maximum(rel_lo[:, :2], -rel_hi[:, :2]), 0.0)
+        span = np.maximum(np.abs(rel_lo[:, :2]), np.abs(rel_hi[:, :2]))
+        near_xy, far_xy = np.hypot(gap[:, 0], gap[:, 1]), np.hypot(span[:, 0], span[:, 1])
+        top, bottom = rel_hi[:, 2], rel_lo[:, 2]
+        el_hi = np.arctan2(top, np.where(top >= 0.0, near_xy, far_xy)) + ANGLE_SLACK
+        el_lo = np.arctan2(bottom, np.where(bottom >= 0.0, far_xy, near_xy)) - ANGLE_SLACK
+
+        centre = np.arctan2((rel_lo[:, 0] + rel_hi[:, 0]) * 0.5, (rel_lo[:, 1] + rel_hi[:, 1]) * 0.5)
+        corners = np.stack([np.arctan2(x, y) for x in (rel_lo[:, 0], rel_hi[:, 0]) for y in (rel_lo[:, 1], rel_hi[:, 1])])
+        spread = (corners - centre + np.pi) % TWO_PI - np.pi
+        inside = near_xy == 0.0
+        start = np.where(inside, self.az_first[sensor], centre + spread.min(axis=0) - ANGLE_SLACK)
+        width = np.where(inside, TWO_PI, spread.max(axis=0) - spread.min(axis=0) + 2 * ANGLE_SLACK)
+        rel = (start - self.az_first[sensor]) % TWO_PI
+
+        rows, columns = self.rows[sensor], self.columns[sensor]
+        el_step = np.where(self.el_step[sensor] > 0, self.el_step[sensor], 1.0)
+        az_step = np.where(self.az_step[sensor] > 0, self.az_step[sensor], 1.0)
+        r0 = np.maximum(np.ceil((el_lo - self.el_first[sensor]) / el_step), 0).astype(np.int64)
+        r1 = np.minimum(np.floor((el_hi - self.el_first[sensor]) / el_step), rows - 1).astype(np.int64)
+        n_rows = np.maximum(r1 - r0 + 1, 0)
+        column_first = np.concatenate(([0], np.cumsum(self.columns)))[sensor] if reach is not None else None
+        # Azimuths wrap: the extent may also cover columns one turn earlier.
+        # Expand columns first, drop the blocked ones, then expand rows.
+        ks, cols = [], []
+        for shift in (0.0, TWO_PI):
+            c0 = np.maximum(np.ceil((rel - shift) / az_step), 0).astype(np.int64)
+            c1 = np.minimum(np.floor((rel + width - shift) / az_step), columns - 1).astype(np.int64)
+            n_cols = np.where(n_rows > 0, np.maximum(c1 - c0 + 1, 0), 0)
+            k = np.repeat(np.arange(len(sensor)), n_cols)
+            col = c0[k] + np.arange(len(k)) - np.repeat(np.cumsum(n_cols) - n_cols, n_cols)
+            if reach is not None:
+                keep = reach[column_first[k] + col] > near[k]
+                k, col = k[keep], col[keep]
+            ks.append(k)
+            cols.append(col)
+        k, col = np.concatenate(ks), np.concatenate(cols)
+        counts = n_rows[k]
+        pair = np.repeat(np.arange(len(k)), counts)
+        row = r0[k][pair] + np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts)
+        k = k[pair]
+        return self.offsets[sensor[k]] + row * columns[k] + col[pair], k
+
+
+class Scene:
+    """Static triangles (usually buildings) behind a ``BVH``, plus an optional ground plane."""
+
+    def __init__(self, triangles=None, owners=None, building_ids=(), ground=True, leaf_size=4):
+        triangles = np.empty((0, 3, 3)) if triangles is None else np.asarray(triangles, dtype=np.float64)
+        self.v0 = np.ascontiguousarray(triangles[:, 0])
+        self.e1 = triangles[:, 1] - triangles[:, 0]
+        self.e2 = triangles[:, 2] - triangles[:, 0]
+        self.owners = np.zeros(len(triangles), dtype=np.int64) if owners is None else np.asarray(owners)
+        self.building_ids = list(building_ids)
+        self.ground = ground
+        self.leaf_size = leaf_size
+        self.bvh = BVH(np.concatenate((triangles.min(axis=1), triangles.max(axis=1)), axis=1)
+                       if len(triangles) else np.empty((0, 6)), leaf_size)
+
+    @classmethod
+    def from_elements(cls, elements, origin, ground=True):
+        """Buildings of Overpass ``elements`` (``out geom``) around ``origin`` (lat, lon)."""
+        triangles, owners, ids = building_mesh(elements, origin)
+        scene = cls(triangles, owners, ids, ground)
+        scene.origin = (float(origin[0]), float(origin[1]))
+        return scene
+
+    def __len__(self):
+        return len(self.v0)
+
+    def cast(self, origins, directions, max_range, min_range=0.0, spheres=None):
+        """Nearest hit of every ray; returns ``RayHits``.
+
+        ``directions`` must be unit vectors. ``max_range`` and ``min_range``
+        are scalars or per-ray arrays; anything nearer than ``min_range``
+        still blocks the ray but is reported as a miss, like a sensor's
+        blind zone. ``spheres`` is ``(centres (k, 3), radii (k,))``.
+        """
+        origins = np.ascontiguousarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.ascontiguousarray(directions, dtype=np.float64).reshape(-1, 3)
+        n = len(origins)
+        t_max = np.broadcast_to(np.asarray(max_range, dtype=np.float64), (n,))
+        t_min = np.broadcast_to(np.asarray(min_range, dtype=np.float64), (n,))
+        hits = RayHits(np.full(n, np.inf), np.zeros(n, dtype=np.uint8), np.full(n, -1, dtype=np.int64))
+        sphere_bvh = None
+        if spheres is not None and len(spheres[0]):
+            centres = np.asarray(spheres[0], dtype=np.float64)
+            radii = np.asarray(spheres[1], dtype=np.float64)
+            sphere_bvh = BVH(np.concatenate((centres - radii[:, None], centres + radii[:, None]), axis=1))
+        for start in range(0, n, BLOCK_RAYS):
+            block = slice(start, min(start + BLOCK_RAYS, n))
+            part = RayHits(hits.distance[block], hits.kind[block], hits.target[block])
+            o, d, reach = origins[block], directions[block], t_max[block]
+            inverse = 1.0 / np.where(d == 0.0, 1e-30, d)
+            if len(self.bvh):
+                ray, tri = self.bvh.candidates(o, inverse, reach)
+                t = triangle_hits(o[ray], d[ray], self.v0[tri], self.e1[tri], self.e2[tri])
+                _nearest(part, ray, np.where(t <= reach[ray], t, np.inf), self.owners[tri], BUILDING)
+            if self.ground:
+                down = np.flatnonzero((d[:, 2] < 0.0) & (o[:, 2] >= 0.0))
+                t = -o[down, 2] / d[down, 2]
+                _nearest(part, down, np.where(t <= reach[down], t, np.inf), np.full(len(down), -1), GROUND)
+            if sphere_bvh is not None:
+                ray, sphere = sphere_bvh.candidates(o, inverse, reach)
+                t = sphere_hits(o[ray], d[ray], centres[sphere], radii[sphere])
+                _nearest(part, ray, np.where(t <= reach[ray], t, np.inf), sphere, ENTITY)
+        _blind(hits, t_min)
+        return hits
+
+    def cast_grids(self, grids, spheres=None):
+        """Nearest hit of every ray of ``RayGrids``; same result as ``cast`` on the expanded rays.
+
+        Rays of one sensor share an origin, so instead of walking the BVH
+        per ray, each sensor finds the primitives within its range once and
+        maps every primitive's box onto the rectangle of its rays that can
+        hit it. Candidates are then tested in distance bands, nearest first,
+        skipping rays that already hit something closer.
+        """
+        sensor = grids.sensor_of_rays()
+        origins = grids.origins[sensor]
+        directions = grids.directions()
+        n = len(grids)
+        t_max = grids.max_range[sensor]
+        hits = RayHits(np.full(n, np.inf), np.zeros(n, dtype=np.uint8), np.full(n, -1, dtype=np.int64))
+        if self.ground:
+            down = np.flatnonzero((directions[:, 2] < 0.0) & (origins[:, 2] >= 0.0))
+            t = -origins[down, 2] / directions[down, 2]
+            _nearest(hits, down, np.where(t <= t_max[down], t, np.inf), np.full(len(down), -1), GROUND)
+        if len(self.bvh):
+            def test(ray, tri):
+                # np.take gathers rows several times faster than fancy indexing
+                return triangle_hits(np.take(origins, ray, axis=0), np.take(directions, ray, axis=0),
+                                     np.take(self.v0, tri, axis=0), np.take(self.e1, tri, axis=0),
+                                     np.take(self.e2, tri, axis=0))
+            _cast_fans(hits, grids, self.bvh, test, t_max, self.owners, BUILDING)
+        if spheres is not None and len(spheres[0]):
+            centres = np.asarray(spheres[0], dtype=np.float64)
+            radii = np.asarray(spheres[1], dtype=np.float64)
+            bvh = BVH(np.concatenate((centres - radii[:, None], centres + radii[:, None]), axis=1))
+
+            def test(ray, sphere):
+                return sphere_hits(origins[ray], directions[ray], centres[sphere], radii[sphere])
+            _cast_fans(hits, grids, bvh, test, t_max, np.arange(len(centres)), ENTITY)
+        _blind(hits, grids.min_range[sensor])
+        return hits
+
+
+def _cast_fans(hits, grids, bvh, test, t_max, targets, kind):
+    sensor, primitive, distance = bvh.near(grids.origins, grids.max_range)
+    order = np.argsort(distance, kind="stable")
+    sensor, primitive, distance = sensor[order], primitive[order], distance[order]
+    edges = [0, *np.searchsorted(distance, BANDS).tolist(), len(distance)]
+    column = grids.column_of_rays()
+    for a, b in zip(edges[:-1], edges[1:]):
+        if a == b:
+            continue
+        boxes = bvh.boxes[primitive[a:b]]
+        reach = np.zeros(int(grids.columns.sum()))
+        np.maximum.at(reach, column, hits.distance)
+        ray, k = grids.cover(sensor[a:b], boxes[:, :3], boxes[:, 3:], distance[a:b], reach)
+        k += a
+        open_ = hits.distance[ray] > distance[k]  # else a nearer hit already blocks the ray
+        ray, k = ray[open_], k[open_]
+        t = test(ray, primitive[k])
+        _nearest(hits, ray, np.where(t <= t_max[ray], t, np.inf), targets[primitive[k]], kind)
+
+
+def _blind(hits, min_range):
+    blind = hits.distance < min_range
+    hits.distance[blind] = np.inf
+    hits.kind[blind] = MISS
+    hits.target[blind] = -1
+
+
+# -- process-wide scenes ----------------------------------------------------
+
+_scenes = OrderedDict()
+_scenes_lock = threading.Lock()
+_flight = SingleFlight("scene")
+MAX_SCENES = 8
+MAX_SCENE_RADIUS = 4000.0
+
+
+def scene_area(points, reach):
+    """``(lat, lon, radius)`` of the OSM area holding ``(lat, lon)`` points plus ``reach`` m, or None if too large.
+
+    Like ``road_graph.route_area``, the radius is rounded up to a power of
+    two (from 250 m) and the centre snapped to a grid of a quarter of it, so
+    nearby requests share one cached scene.
+    """
+    lats, lons = [p[0] for p in points], [p[1] for p in points]
+    mid_lat, mid_lon = (min(lats) + max(lats)) / 2.0, (min(lons) + max(lons)) / 2.0
+    spread = max(haversine_m(mid_lat, mid_lon, lat, lon) for lat, lon in zip(lats, lons))
+    radius = 250.0 * 2 ** max(0, math.ceil(math.log2(max(spread + reach, 1.0) / 250.0)))
+    grid = radius / 4.0 / METERS_PER_DEG_LAT
+    lat = round(mid_lat / grid) * grid
+    lon_grid = grid / max(math.cos(math.radians(lat)), 0.01)
+    lon = round(mid_lon / lon_grid) * lon_grid
+    radius *= 1.25  # covers the snapped centre's offset
+    if radius > MAX_SCENE_RADIUS:
+        return None
+    return lat, lon, radius
+
+
+async def get_scene(lat, lng, radius):
+    """Buildings within ``radius`` m of a point as a ``Scene`` with the point as origin, cached."""
+    import asyncio
+
+    from ..services.osm_services import fetch_osm_objects
+
+    key = (lat, lng, radius)
+    with _scenes_lock:
+        scene = _scenes.get(key)
+        if scene is not None:
+            _scenes.move_to_end(key)
+            return scene
+
+    async def build():
+        elements = await fetch_osm_objects(lat, lng, radius) or []
+        return await asyncio.get_running_loop().run_in_executor(None, Scene.from_elements, elements, (lat, lng))
+
+    scene = await _flight.do(key, build)
+    with _scenes_lock:
+        _scenes[key] = scene
+        while len(_scenes) > MAX_SCENES:
+            _scenes.popitem(last=False)
+    return scene
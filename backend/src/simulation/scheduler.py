@@ -0,0 +1,125 @@
+"""Fixed-timestep scheduling for the simulation loop.
+
+``FixedStepScheduler`` turns wall-clock time into whole simulation steps of
+exactly ``1 / tick_rate`` seconds using an accumulator. Every step sees the
+same delta regardless of frame timing, so replays and clients fed the same
+inputs stay deterministic. When the loop falls behind, at most
+``max_catch_up`` steps run per wake-up and the rest of the backlog is
+dropped (and counted), so a slow tick cannot snowball into ever longer
+catch-up bursts. Broadcasts run on their own, usually lower, rate.
+"""
+import asyncio
+import time
+
+# Slack when comparing accumulated time with the step, so float rounding of
+# repeated additions cannot postpone a due step by a whole wake-up
+EPSILON = 1e-9
+
+
+class FixedStepScheduler:
+    """Accumulator-driven fixed-rate ``step(dt)`` with a separate ``broadcast(alpha)`` rate.
+
+    ``alpha`` is the fraction of a step accumulated but not yet simulated
+    when a broadcast goes out; clients can use it to interpolate. Drive the
+    scheduler with :meth:`run`, or call :meth:`advance` with your own clock.
+    """
+
+    def __init__(self, step, tick_rate=60.0, broadcast=None, broadcast_rate=None, max_catch_up=5,
+                 clock=time.perf_counter):
+        if tick_rate <= 0:
+            raise ValueError("tick_rate must be positive")
+        self.step = step
+        self.broadcast = broadcast
+        self.dt = 1.0 / float(tick_rate)
+        self.broadcast_period = 1.0 / float(broadcast_rate or tick_rate)
+        self.max_catch_up = max(1, int(max_catch_up))
+        self.clock = clock
+        self.accumulator = 0.0
+        self._last = None
+        self._next_broadcast = None
+        self._ticks_since_broadcast = 0
+        # Metrics
+        self.ticks = 0
+        self.broadcasts = 0
+        self.overruns = 0
+        self.catch_up_ticks = 0
+        self.dropped_ticks = 0
+        self.tick_seconds_max = 0.0
+        self._tick_seconds_total = 0.0
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.dt
+
+    def reset(self, now=None):
+        """Start timing from ``now``, discarding any accumulated time."""
+        now = self.clock() if now is None else now
+        self._last = now
+        self._next_broadcast = now + self.broadcast_period
+        self.accumulator = 0.0
+
+    def advance(self, now=None):
+        """Run the steps (and broadcast) due by ``now``; returns the number of steps."""
+        now = self.clock() if now is None else now
+        if self._last is None:
+            self.reset(now)
+        self.accumulator += max(0.0, now - self._last)
+        self._last = now
+
+        steps = 0
+        while self.accumulator >= self.dt - EPSILON and steps < self.max_catch_up:
+            started = self.clock()
+            self.step(self.dt)
+            elapsed = self.clock() - started
+            self.accumulator = max(0.0, self.accumulator - self.dt)
+            steps += 1
+            self.ticks += 1
+            self._tick_seconds_total += elapsed
+            self.tick_seconds_max = max(self.tick_seconds_max, elapsed)
+            if elapsed > self.dt:
+                self.overruns += 1
+        if steps > 1:
+            self.catch_up_ticks += steps - 1
+        if self.accumulator >= self.dt - EPSILON:
+            # Still behind after the cap: drop whole steps, keep the fraction
+            dropped = int((self.accumulator + EPSILON) // self.dt)
+            self.dropped_ticks += dropped
+            self.accumulator = max(0.0, self.accumulator - dropped * self.dt)
+        self._ticks_since_broadcast += steps
+
+        if now >= self._next_broadcast - EPSILON:
+            self._next_broadcast += self.broadcast_period
+            if self._next_broadcast <= now:
+                self._next_broadcast = now + self.broadcast_period
+            # Nothing new to send if no step ran since the last broadcast
+            if self.broadcast is not None and self._ticks_since_broadcast:
+                self.broadcast(self.alpha)
+                self.broadcasts += 1
+                self._ticks_since_broadcast = 0
+        return steps
+
+    def next_deadline(self):
+        """Clock time of the next step or broadcast, whichever comes first."""
+        if self._last is None:
+            return self.clock()
+        return min(self._last + self.dt - self.accumulator, self._next_broadcast)
+
+    async def run(self):
+        self.reset()
+        while True:
+            self.advance()
+            await asyncio.sleep(max(0.0, self.next_deadline() - self.clock()))
+
+    def stats(self):
+        return {
+            "tick_rate": round(1.0 / self.dt, 3),
+            "broadcast_rate": round(1.0 / self.broadcast_period, 3),
+            "ticks": self.ticks,
+            "broadcasts": self.broadcasts,
+            "tick_ms_avg": round(self._tick_seconds_total / self.ticks * 1e3, 3) if self.ticks else 0.0,
+            "tick_ms_max": round(self.tick_seconds_max * 1e3, 3),
+            "overruns": self.overruns,
+            "catch_up_ticks": self.catch_up_ticks,
+            "dropped_ticks": self.dropped_ticks,
+            "lag_ms": round(self.accumulator * 1e3, 3),
+        }
@@ -0,0 +1,260 @@
+"""Simulated range sensors (LiDAR, radar, ultrasonic) scanned in one batch.
+
+Each sensor is a regular fan of rays: ``rows`` elevations across its
+vertical field of view by ``columns`` azimuths across its horizontal one,
+pointed by compass ``heading`` and ``pitch`` (degrees). A ``SensorEngine``
+scans every sensor that is due at its ``scan_rate``, casting the rays of all
+of them in a single ``Scene.cast_grids`` call against the buildings and the
+entities of an ``EntityStore``. A scan gives a range image, the point cloud
+of its returns, and per-entity detections with radial velocity.
+
+Defaults follow ``sensor_parameter_configurations.js`` (ranges and fields of
+view) and the frontend LiDAR (16 channels at 10 Hz).
+"""
+import time
+
+import numpy as np
+
+from .entity_store import DEFAULT_RADIUS
+from .raycast import ENTITY, KIND_NAMES, MISS, RayGrids, Scene
+
+SENSOR_TYPES = {
+    "lidar": {"range": 100.0, "min_range": 0.5, "vertical_fov": 10.0, "horizontal_fov": 360.0,
+              "rows": 16, "columns": 64, "scan_rate": 10.0},
+    "radar": {"range": 500.0, "min_range": 1.0, "vertical_fov": 15.0, "horizontal_fov": 15.0,
+              "rows": 4, "columns": 16, "scan_rate": 10.0},
+    "ultrasonic": {"range": 5.0, "min_range": 0.1, "vertical_fov": 30.0, "horizontal_fov": 30.0,
+                   "rows": 4, "columns": 4, "scan_rate": 10.0},
+}
+
+# Spreads the first scans of sensors added together over one scan period,
+# so equal-rate sensors do not all fall due on the same tick
+_GOLDEN = 0.6180339887498949
+
+
+class Sensor:
+    """One range sensor; see the module docstring.
+
+    ``position`` is in local metres, or an offset from the entity ``mount``
+    when the sensor rides on one. ``fov`` (the frontend's single cone angle)
+    sets the vertical field of view, and for radar and ultrasonic sensors
+    the horizontal one too.
+    """
+
+    def __init__(self, sensor_id, kind, position=(0.0, 0.0, 0.0), heading=0.0, pitch=0.0, mount=None, **options):
+        kind = str(kind).lower()
+        if kind not in SENSOR_TYPES:
+            raise ValueError(f"Unknown sensor type {kind!r}")
+        config = dict(SENSOR_TYPES[kind])
+        fov = options.pop("fov", None)
+        if fov is not None:
+            config["vertical_fov"] = fov
+            if kind != "lidar":
+                config["horizontal_fov"] = fov
+        unknown = set(options) - set(config)
+        if unknown:
+            raise ValueError(f"Unknown sensor options {sorted(unknown)}")
+        config.update(options)
+        self.id = sensor_id
+        self.kind = kind
+        self.position = np.asarray(position, dtype=np.float64).reshape(3)
+        self.heading = float(heading)
+        self.pitch = float(pitch)
+        self.mount = mount
+        self.range = float(config["range"])
+        self.min_range = float(config["min_range"])
+        self.vertical_fov = float(config["vertical_fov"])
+        self.horizontal_fov = min(float(config["horizontal_fov"]), 360.0)
+        self.rows = max(1, int(config["rows"]))
+        self.columns = max(1, int(config["columns"]))
+        self.scan_rate = float(config["scan_rate"])
+        if self.range <= 0 or self.scan_rate <= 0:
+            raise ValueError("range and scan_rate must be positive")
+        self.next_scan = 0.0
+
+    @property
+    def rays(self):
+        return self.rows * self.columns
+
+    def grid(self):
+        """``(el_first, el_step, az_first, az_step)`` of the ray fan, radians."""
+        vertical = np.radians(self.vertical_fov)
+        pitch = np.radians(self.pitch)
+        if self.rows > 1:
+            el_first, el_step = pitch - vertical / 2.0, vertical / (self.rows - 1)
+        else:
+            el_first, el_step = pitch, 0.0
+        heading = np.radians(self.heading)
+        if self.horizontal_fov >= 360.0:
+            az_first, az_step = heading, 2.0 * np.pi / self.columns
+        elif self.columns > 1:
+            horizontal = np.radians(self.horizontal_fov)
+            az_first, az_step = heading - horizontal / 2.0, horizontal / (self.columns - 1)
+        else:
+            az_first, az_step = heading, 0.0
+        return el_first, el_step, az_first, az_step
+
+
+class SensorScan:
+    """One sensor's returns.
+
+    ``ranges`` is ``(rows, columns)`` metres, NaN where nothing was hit in
+    range; ``kinds`` holds the ``raycast`` hit kind per ray. ``points`` are
+    the returns in local metres. ``detections`` has one entry per entity
+    seen: its nearest return and the radial velocity (m/s, positive when
+    moving away from the sensor).
+    """
+
+    def __init__(self, sensor, time, origin, ranges, kinds, points, detections):
+        self.sensor = sensor
+        self.time = time
+        self.origin = origin
+        self.ranges = ranges
+        self.kinds = kinds
+        self.points = points
+        self.detections = detections
+
+    @property
+    def nearest(self):
+        """Closest return in metres, or None."""
+        found = self.ranges[np.isfinite(self.ranges)]
+        return float(found.min()) if len(found) else None
+
+    def to_dict(self, points=True):
+        ranges = np.round(self.ranges, 3).tolist()
+        body = {
+            "id": self.sensor.id,
+            "type": self.sensor.kind,
+            "time": self.time,
+            "origin": self.origin.tolist(),
+            "rows": self.sensor.rows,
+            "columns": self.sensor.columns,
+            "ranges": [[None if v != v else v for v in row] for row in ranges],
+            "nearest": self.nearest,
+            "hits": {KIND_NAMES[k]: int(c) for k, c in enumerate(np.bincount(self.kinds.ravel(), minlength=4)) if k != MISS},
+            "detections": self.detections,
+        }
+        if points:
+            body["points"] = np.round(self.points, 3).tolist()
+        return body
+
+
+class SensorEngine:
+    """Sensors scanned against a ``Scene`` and the live entities of a store."""
+
+    def __init__(self, scene=None):
+        self.scene = scene if scene is not None else Scene()
+        self.sensors = {}
+        self.time = 0.0
+        self.latest = {}
+        # Metrics
+        self.batches = 0
+        self.scans = 0
+        self.rays = 0
+        self.scan_seconds = 0.0
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def add(self, sensor):
+        phase = (len(self.sensors) * _GOLDEN) % 1.0
+        sensor.next_scan = self.time + phase / sensor.scan_rate
+        self.sensors[sensor.id] = sensor
+        return sensor
+
+    def remove(self, sensor_id):
+        self.latest.pop(sensor_id, None)
+        return self.sensors.pop(sensor_id)
+
+    def step(self, delta, store=None):
+        """Advance the sensor clock by ``delta`` s and scan the sensors that fell due."""
+        self.time += delta
+        due = [s for s in self.sensors.values() if s.next_scan <= self.time + 1e-9]
+        for sensor in due:
+            sensor.next_scan += 1.0 / sensor.scan_rate
+            if sensor.next_scan <= self.time:
+                sensor.next_scan = self.time + 1.0 / sensor.scan_rate
+        return self.scan(due, store) if due else {}
+
+    def scan(self, sensors=None, store=None):
+        """Scan ``sensors`` (default: all) now, in one batch; returns ``{sensor id: SensorScan}``.
+
+        Sensors mounted on an entity that is not in ``store`` are skipped.
+        """
+        started = time.perf_counter()
+        sensors = list(self.sensors.values()) if sensors is None else list(sensors)
+        n = store.count if store is not None else 0
+        positions = store.position[:n] if n else np.empty((0, 3))
+        velocities = store.velocity[:n] if n else np.empty((0, 3))
+        radii = store.radius[:n] if n and hasattr(store, "radius") else np.full(n, DEFAULT_RADIUS)
+
+        active, origins, motion = [], [], []
+        for sensor in sensors:
+            if sensor.mount is None:
+                origins.append(sensor.position)
+                motion.append(np.zeros(3))
+            else:
+                row = store.rows.get(sensor.mount) if store is not None else None
+                if row is None:
+                    continue
+                origins.append(positions[row] + sensor.position)
+                motion.append(velocities[row])
+            active.append(sensor)
+        if not active:
+            return {}
+        grids = [s.grid() for s in active]
+        rays = RayGrids(
+            np.array(origins),
+            [g[0] for g in grids], [g[1] for g in grids], [s.rows for s in active],
+            [g[2] for g in grids], [g[3] for g in grids], [s.columns for s in active],
+            [s.range for s in active], [s.min_range for s in active],
+        )
+        hits = self.scene.cast_grids(rays, (positions, radii) if n else None)
+        directions = rays.directions()
+
+        scans = {}
+        for k, sensor in enumerate(active):
+            part = slice(rays.offsets[k], rays.offsets[k + 1])
+            distance, kinds, target = hits.distance[part], hits.kind[part], hits.target[part]
+            seen = np.isfinite(distance)
+            ranges = np.where(seen, distance, np.nan).astype(np.float32)
+            points = rays.origins[k] + directions[part][seen] * distance[seen, None]
+            detections = self._detections(store, sensor, directions[part], distance, kinds, target,
+                                          velocities, motion[k])
+            scans[sensor.id] = SensorScan(sensor, self.time, rays.origins[k], ranges.reshape(sensor.rows, sensor.columns),
+                                          kinds.reshape(sensor.rows, sensor.columns), points, detections)
+        self.latest.update(scans)
+        self.batches += 1
+        self.scans += len(scans)
+        self.rays += len(rays)
+        self.scan_seconds += time.perf_counter() - started
+        return scans
+
+    @staticmethod
+    def _detections(store, sensor, directions, distance, kinds, target, velocities, motion):
+        on_entity = np.flatnonzero(kinds == ENTITY)
+        if not len(on_entity):
+            return []
+        # Nearest return per entity: sort by (entity, distance), keep the firsts
+        order = on_entity[np.lexsort((distance[on_entity], target[on_entity]))]
+        first = order[np.r_[True, target[order][1:] != target[order][:-1]]]
+        rows = target[first]
+        d = directions[first]
+        radial = np.round(np.einsum("ij,ij->i", velocities[rows] - motion, d), 3)
+        azimuth = np.round(np.degrees(np.arctan2(d[:, 0], d[:, 1])) % 360.0, 2)
+        elevation = np.round(np.degrees(np.arcsin(np.clip(d[:, 2], -1.0, 1.0))), 2)
+        return [
+            {"id": store.ids[row], "range": r, "azimuth": a, "elevation": e, "radial_velocity": v}
+            for row, r, a, e, v in zip(rows.tolist(), np.round(distance[first], 3).tolist(), azimuth.tolist(),
+                                       elevation.tolist(), radial.tolist())
+        ]
+
+    def stats(self):
+        return {
+            "sensors": len(self.sensors),
+            "batches": self.batches,
+            "scans": self.scans,
+            "rays": self.rays,
+            "batch_ms_avg": round(self.scan_seconds / self.batches * 1e3, 3) if self.batches else 0.0,
+            "triangles": len(self.scene),
+        }
@@ -0,0 +1,423 @@
+"""Multi-process simulation, sharded by region.
+
+``ShardedSimulation`` splits the world into strips along x and runs each
+strip's ``SimulationState`` in its own worker process, so a tick uses one
+core per shard. Strip edges follow the entity distribution (quantiles of x)
+and are recomputed whenever the busiest shard drifts too far above the mean.
+
+Every tick the parent sends each worker its strip, the entities arriving in
+it, removals and velocity impulses. The workers tick in parallel, write their
+rows into one shared-memory snapshot block at offsets the parent assigned,
+and reply with the entities that have left their strip. Those are handed to
+their new shard with the next tick, so each entity is simulated by exactly
+one shard per tick and appears in the snapshot exactly once.
+
+``ShardedSimulation.store`` is a read-only ``EntityStore``-shaped view of the
+shared block, so ``SnapshotEncoder`` and ``PhysicsServer`` work unchanged.
+Collisions and road snapping run per shard: bodies touching across a strip
+edge do not collide.
+"""
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .entity_store import DEFAULT_RADIUS, STATUS_NAMES, status_code
+from .simulation_state import SimulationState
+
+# Snapshot block columns, widest dtype first so every column stays aligned
+BLOCK_FIELDS = (
+    ("position", np.float64, 3),
+    ("velocity", np.float64, 3),
+    ("net_ids", np.uint32, 1),
+    ("status", np.uint8, 1),
+)
+# Entity columns carried by a handoff batch (plus "ids" and "types" lists)
+BATCH_FIELDS = ("position", "velocity", "acceleration", "status", "radius", "net_ids")
+
+
+class SharedSnapshot:
+    """``capacity`` snapshot rows in one shared-memory block.
+
+    Created by the parent (``name=None``) and attached by name in workers.
+    """
+
+    def __init__(self, capacity, name=None):
+        self.capacity = int(capacity)
+        size = sum(self.capacity * width * np.dtype(dtype).itemsize for _, dtype, width in BLOCK_FIELDS)
+        self.shm = SharedMemory(name=name, create=name is None, size=max(size, 1))
+        offset = 0
+        for field, dtype, width in BLOCK_FIELDS:
+            shape = (self.capacity, width) if width > 1 else (self.capacity,)
+            setattr(self, field, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+            offset += self.capacity * width * np.dtype(dtype).itemsize
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self, unlink=False):
+        # Views must go before the mapping can be closed
+        for field, _, _ in BLOCK_FIELDS:
+            setattr(self, field, None)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _take(sim, rows):
+    """Remove ``rows`` from ``sim`` and return them as a handoff batch."""
+    store = sim.store
+    batch = {field: getattr(store, field)[rows].copy() for field in BATCH_FIELDS}
+    batch["ids"] = [store.ids[row] for row in rows.tolist()]
+    batch["types"] = [store.types[row] for row in rows.tolist()]
+    for entity_id in batch["ids"]:
+        # Nothing in a worker holds on to the views, so skip detaching them
+        del sim.entities[entity_id]
+        store.remove(entity_id)
+    return batch
+
+
+def _put(sim, batch):
+    """Add a handoff batch to ``sim``, keeping every column (net ids included)."""
+    store = sim.store
+    types = np.asarray(batch["types"], dtype=object)
+    for entity_type in dict.fromkeys(batch["types"]):
+        rows = np.flatnonzero(types == entity_type)
+        start = store.count
+        sim.add_entities([batch["ids"][row] for row in rows.tolist()], entity_type)
+        end = store.count
+        for field in BATCH_FIELDS:
+            getattr(store, field)[start:end] = batch[field][rows]
+
+
+def _split(batch, shard):
+    """``{shard: sub-batch}`` for a batch and each row's destination shard."""
+    parts = {}
+    for k in np.unique(shard).tolist():
+        rows = np.flatnonzero(shard == k)
+        part = {field: batch[field][rows] for field in BATCH_FIELDS}
+        part["ids"] = [batch["ids"][row] for row in rows.tolist()]
+        part["types"] = [batch["types"][row] for row in rows.tolist()]
+        parts[k] = part
+    return parts
+
+
+def _worker(conn, collisions, environment):
+    """Shard process: apply the parent's commands, tick, publish, hand off."""
+    sim = SimulationState(collisions=collisions, environment=environment)
+    block = None
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if block is None or block.name != message["block"]:
+                if block is not None:
+                    block.close()
+                block = SharedSnapshot(message["capacity"], name=message["block"])
+            # Arrivals first: a removal or impulse may target an entity in transit
+            for batch in message["arrivals"]:
+                _put(sim, batch)
+            for entity_id in message["removals"]:
+                sim.remove_entity(entity_id)
+            store = sim.store
+            for entity_id, dv in message["impulses"]:
+                store.velocity[store.rows[entity_id]] += dv
+
+            started = time.perf_counter()
+            sim.tick(message["delta"])
+            elapsed = time.perf_counter() - started
+
+            n, offset = store.count, message["offset"]
+            for field, _, _ in BLOCK_FIELDS:
+                getattr(block, field)[offset:offset + n] = getattr(store, field)[:n]
+            x = store.position[:n, 0]
+            lo, hi = message["strip"]
+            leaving = np.flatnonzero((x < lo) | (x >= hi))
+            departures = _take(sim, leaving) if len(leaving) else None
+            conn.send((store.count, departures, elapsed))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if block is not None:
+            block.close()
+        conn.close()
+
+
+class _RowNames:
+    """Lazy ``ids`` / ``types`` list over the snapshot rows."""
+
+    def __init__(self, sim, index):
+        self._sim = sim
+        self._index = index
+
+    def __len__(self):
+        return self._sim._live
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            names, net_ids = self._sim.names, self._sim.block.net_ids[:self._sim._live][row].tolist()
+            return [names[net_id][self._index] for net_id in net_ids]
+        if not 0 <= row < self._sim._live:
+            raise IndexError(row)
+        return self._sim.names[int(self._sim.block.net_ids[row])][self._index]
+
+    def __iter__(self):
+        names, net_ids = self._sim.names, self._sim.block.net_ids[:self._sim._live].tolist()
+        return (names[net_id][self._index] for net_id in net_ids)
+
+
+class ShardedStore:
+    """Read-only ``EntityStore``-shaped view of the shared snapshot block.
+
+    Rows are valid between ticks; their order changes as entities move
+    between shards, but every entity keeps its net id.
+    """
+
+    def __init__(self, sim):
+        self._sim = sim
+        self.ids = _RowNames(sim, 0)
+        self.types = _RowNames(sim, 1)
+
+    @property
+    def count(self):
+        return self._sim._live
+
+    def __len__(self):
+        return self._sim._live
+
+    def __contains__(self, entity_id):
+        return entity_id in self._sim.owner
+
+    def __getattr__(self, field):
+        if field in ("position", "velocity", "net_ids", "status"):
+            return getattr(self._sim.block, field)
+        raise AttributeError(field)
+
+
+class ShardedSimulation:
+    """``SimulationState`` work split across ``shards`` worker processes.
+
+    Supports the subset of the ``SimulationState`` API that does not need
+    per-entity views: ``add_entities``, ``remove_entity``, ``apply_impulse``,
+    ``tick``, ``snapshot`` and ``store``. Call ``close()`` (or use it as a
+    context manager) to stop the workers and free the shared block.
+    """
+
+    def __init__(self, shards=2, collisions=False, environment=None, capacity=1024, rebalance_ratio=1.25):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.rebalance_ratio = rebalance_ratio
+        self.block = SharedSnapshot(capacity)
+        self.store = ShardedStore(self)
+        self.cuts = np.zeros(shards - 1)  # x edges between neighbouring strips
+        self.counts = [0] * shards
+        self.owner = {}  # entity id -> shard
+        self.names = {}  # net id -> (entity id, type)
+        self.net_id = {}  # entity id -> net id
+        self.tick_count = 0
+        self.handoffs = 0
+        self.tick_times = [0.0] * shards
+        self._live = 0
+        self._next_net_id = 1
+        self._arrivals = [[] for _ in range(shards)]
+        self._removals = [[] for _ in range(shards)]
+        self._impulses = [[] for _ in range(shards)]
+        self._retired = []
+        self._dropped = []
+
+        # spawn, not fork: the server process runs threads and event loops
+        context = multiprocessing.get_context("spawn")
+        self._conns, self._procs = [], []
+        for k in range(shards):
+            parent_conn, child_conn = context.Pipe()
+            proc = context.Process(target=_worker, args=(child_conn, collisions, environment),
+                                   name=f"sim-shard-{k}", daemon=True)
+            proc.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._procs.append(proc)
+
+    @property
+    def shards(self):
+        return len(self._conns)
+
+    def __len__(self):
+        return len(self.owner)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.owner
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- regions ----------------------------------------------------------
+
+    def strips(self):
+        """``[(lo, hi), ...]`` x range of each shard."""
+        edges = [-np.inf, *self.cuts.tolist(), np.inf]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def shard_of(self, x):
+        return np.searchsorted(self.cuts, x, side="right")
+
+    def rebalance(self, x=None):
+        """Move the strip edges to the quantiles of ``x`` (default: the snapshot).
+
+        Entities outside their shard's new strip are handed off after the
+        next tick.
+        """
+        if x is None:
+            x = self.block.position[:self._live, 0]
+        x = x[np.isfinite(x)]
+        if len(x) and self.shards > 1:
+            self.cuts = np.quantile(x, np.arange(1, self.shards) / self.shards)
+
+    def _route(self, batch):
+        for k, part in _split(batch, self.shard_of(batch["position"][:, 0])).items():
+            self._arrivals[k].append(part)
+            for entity_id in part["ids"]:
+                self.owner[entity_id] = k
+
+    # -- entities ---------------------------------------------------------
+
+    def add_entities(self, entity_ids, entity_type, position=None, velocity=None, status="idle",
+                     radius=DEFAULT_RADIUS):
+        """Bulk-create entities of one type; they join their shard on the next tick."""
+        entity_ids = list(entity_ids)
+        n = len(entity_ids)
+        if any(eid in self.owner for eid in entity_ids) or len(set(entity_ids)) != n:
+            raise KeyError("duplicate entity id in batch")
+        net_ids = np.arange(self._next_net_id, self._next_net_id + n, dtype=np.uint32)
+        self._next_net_id += n
+        batch = {
+            "ids": entity_ids,
+            "types": [entity_type] * n,
+            "position": np.zeros((n, 3)) + (0 if position is None else np.asarray(position, dtype=np.float64)),
+            "velocity": np.zeros((n, 3)) + (0 if velocity is None else np.asarray(velocity, dtype=np.float64)),
+            "acceleration": np.zeros((n, 3)),
+            "status": np.full(n, status_code(status), dtype=np.uint8),
+            "radius": np.zeros(n) + radius,
+            "net_ids": net_ids,
+        }
+        for entity_id, net_id in zip(entity_ids, net_ids.tolist()):
+            self.names[net_id] = (entity_id, entity_type)
+            self.net_id[entity_id] = net_id
+        if not self.owner:
+            self.rebalance(batch["position"][:, 0])
+        self._route(batch)
+
+    def remove_entity(self, entity_id):
+        shard = self.owner.pop(entity_id)
+        # The name stays until the next tick: the current snapshot still has the row
+        self._dropped.append(self.net_id.pop(entity_id))
+        self._removals[shard].append(entity_id)
+
+    def apply_impulse(self, entity_id, entity_type, dv):
+        """Add ``dv`` (x, y, z) to an entity's velocity, spawning it first if unknown."""
+        if entity_id not in self.owner:
+            self.add_entities([entity_id], entity_type)
+        self._impulses[self.owner[entity_id]].append((entity_id, np.asarray(dv, dtype=np.float64)))
+
+    # -- ticking ----------------------------------------------------------
+
+    def _receive(self, k):
+        try:
+            return self._conns[k].recv()
+        except EOFError:
+            raise RuntimeError(f"simulation shard {k} exited (code {self._procs[k].exitcode})") from None
+
+    def tick(self, delta):
+        # Rows each shard will hold when it writes the snapshot
+        sizes = [
+            self.counts[k] + sum(len(batch["ids"]) for batch in self._arrivals[k]) - len(self._removals[k])
+            for k in range(self.shards)
+        ]
+        total = sum(sizes)
+        if total > self.block.capacity:
+            self._retired.append(self.block)
+            self.block = SharedSnapshot(max(total, 2 * self.block.capacity))
+        offset = 0
+        for k, ((lo, hi), conn) in enumerate(zip(self.strips(), self._conns)):
+            conn.send({
+                "block": self.block.name,
+                "capacity": self.block.capacity,
+                "offset": offset,
+                "strip": (lo, hi),
+                "delta": delta,
+                "arrivals": self._arrivals[k],
+                "removals": self._removals[k],
+                "impulses": self._impulses[k],
+            })
+            offset += sizes[k]
+            self._arrivals[k], self._removals[k], self._impulses[k] = [], [], []
+
+        departures = []
+        for k in range(self.shards):
+            self.counts[k], leaving, self.tick_times[k] = self._receive(k)
+            if leaving is not None:
+                departures.append(leaving)
+        self._live = total
+        for net_id in self._dropped:
+            del self.names[net_id]
+        self._dropped = []
+        for block in self._retired:
+            block.close(unlink=True)
+        self._retired = []
+        for batch in departures:
+            self.handoffs += len(batch["ids"])
+            self._route(batch)
+        self.tick_count += 1
+
+        mean = total / self.shards
+        if total and max(self.counts) > self.rebalance_ratio * mean + 1:
+            self.rebalance()
+
+    def snapshot(self):
+        """Return ``[{id, type, position, velocity, status}, ...]`` as of the last tick."""
+        n = self._live
+        block = self.block
+        positions = block.position[:n].tolist()
+        velocities = block.velocity[:n].tolist()
+        statuses = block.status[:n].tolist()
+        return [
+            {
+                "id": eid,
+                "type": etype,
+                "position": {"x": p[0], "y": p[1], "z": p[2]},
+                "velocity": {"x": v[0], "y": v[1], "z": v[2]},
+                "status": STATUS_NAMES[s],
+            }
+            for eid, etype, p, v, s in zip(self.store.ids, self.store.types, positions, velocities, statuses)
+        ]
+
+    def stats(self):
+        return {
+            "shards": self.shards,
+            "entities": list(self.counts),
+            "cuts": self.cuts.tolist(),
+            "handoffs": self.handoffs,
+            "tick_ms": [round(t * 1e3, 3) for t in self.tick_times],
+        }
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        self._conns, self._procs = [], []
+        if self.block is not None:
+            self.block.close(unlink=True)
+            self.block = None
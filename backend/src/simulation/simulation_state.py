@@ -1,10 +1,108 @@
+from .collision import CollisionWorld
+from .entity_state import EntityState
+from .entity_store import DEFAULT_RADIUS, EntityStore, STATUS_NAMES
+
+
 class SimulationState:
-    def __init__(self):
+    """Authoritative simulation world.
+
+    Entity data is held column-wise in ``self.store`` so a tick is a handful of
+    array operations regardless of entity count. ``self.entities`` keeps the
+    ``EntityState`` view objects keyed by id for callers that work per entity.
+
+    With ``collisions=True`` (or a ``CollisionWorld`` instance) every tick
+    also resolves sphere contacts; the last tick's contacts are kept in
+    ``self.contacts``.
+
+    With an ``environment`` (a compiled ``RoadEnvironment``) every tick also
+    snaps all entities to their nearest road; ``self.road`` holds the result
+    (nearest segment, snapped point, speed limit) row for row.
+
+    With ``sensors`` (a ``SensorEngine``) every tick also scans the sensors
+    that are due; ``self.scans`` holds that tick's ``{sensor id: SensorScan}``.
+    """
+
+    def __init__(self, capacity=1024, collisions=False, environment=None, sensors=None):
+        self.store = EntityStore(capacity)
         self.entities = {}
+        if collisions is True:
+            collisions = CollisionWorld()
+        self.collisions = collisions or None
+        self.contacts = None
+        self.environment = environment
+        self.road = None
+        self.sensors = sensors
+        self.scans = {}
 
     def add_entity(self, entity):
+        old = entity._store
+        row = old.rows[entity.id]
+        self.store.add(
+            entity.id,
+            entity.type,
+            position=old.position[row],
+            velocity=old.velocity[row],
+            acceleration=old.acceleration[row],
+            status=entity.status,
+            radius=entity.radius,
+        )
+        entity._store = self.store
         self.entities[entity.id] = entity
 
+    def add_entities(self, entity_ids, entity_type, position=None, velocity=None, status="idle",
+                     radius=DEFAULT_RADIUS):
+        """Bulk-create entities of one type directly in the store.
+
+        ``position`` and ``velocity`` may be (n, 3) arrays or anything NumPy
+        broadcasts to that shape. Returns the new ``EntityState`` views.
+        """
+        entity_ids = list(entity_ids)
+        self.store.add_many(entity_ids, entity_type, position, velocity, status, radius)
+        created = []
+        for eid in entity_ids:
+            entity = EntityState.__new__(EntityState)
+            entity.id = eid
+            entity.type = entity_type
+            entity._store = self.store
+            self.entities[eid] = entity
+            created.append(entity)
+        return created
+
+    def remove_entity(self, entity_id):
+        entity = self.entities.pop(entity_id)
+        entity._detach()
+        self.store.remove(entity_id)
+        return entity
+
+    def apply_impulse(self, entity_id, entity_type, dv):
+        """Add ``dv`` (x, y, z) to an entity's velocity, spawning it first if unknown."""
+        if entity_id not in self.entities:
+            self.add_entity(EntityState(entity_id, entity_type))
+        self.store.velocity[self.store.rows[entity_id]] += dv
+
     def tick(self, delta):
-        for entity in self.entities.values():
-            entity.position["x"] += entity.velocity["x"] * delta
+        self.store.integrate(delta)
+        if self.collisions is not None:
+            self.contacts = self.collisions.step(self.store)
+        if self.environment is not None:
+            self.road = self.environment.snap(self.store.position[:self.store.count])
+        if self.sensors is not None:
+            self.scans = self.sensors.step(delta, self.store)
+
+    def snapshot(self):
+        """Return ``[{id, type, position, velocity, status}, ...]`` for every entity."""
+        store = self.store
+        n = store.count
+        positions = store.position[:n].tolist()
+        velocities = store.velocity[:n].tolist()
+        statuses = store.status[:n].tolist()
+        return [
+            {
+                "id": eid,
+                "type": etype,
+                "position": {"x": p[0], "y": p[1], "z": p[2]},
+                "velocity": {"x": v[0], "y": v[1], "z": v[2]},
+                "status": STATUS_NAMES[s],
+            }
+            for eid, etype, p, v, s in zip(store.ids, store.types, positions, velocities, statuses)
+        ]
@@ -0,0 +1,311 @@
+"""Packed binary, delta-compressed snapshots of an ``EntityStore``.
+
+Wire layout (little-endian)::
+
+    header   magic "SN", version u8, flags u8, tick u32, baseline u32,
+             n_updated u32, n_removed u32, names_len u32
+    names    UTF-8 JSON ``[[net_id, id, type], ...]`` (names_len bytes)
+    removed  u32[n_removed]                net ids gone since the baseline
+    ids      u32[n_updated]                net ids, ascending
+    position f32[n_updated, 3]
+    velocity f32[n_updated, 3]
+    status   u8 codes, two per byte when FLAG_STATUS_4BIT is set
+
+A keyframe (FLAG_KEYFRAME) carries every entity. Any other frame is a delta
+against ``baseline``, the last keyframe the client acknowledged, and carries
+only entities whose quantized state differs from that keyframe. Because a
+delta never depends on an earlier delta, a client can skip frames safely.
+Names are sent once per entity: for ids newer than the client's baseline.
+"""
+import json
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from .entity_store import STATUS_NAMES
+
+MAGIC = b"SN"
+VERSION = 1
+FLAG_KEYFRAME = 0x01
+FLAG_STATUS_4BIT = 0x02
+
+HEADER = struct.Struct("<2sBBIIIII")
+
+
+class Frame:
+    """State of every entity at one tick, sorted by net id."""
+
+    __slots__ = ("tick", "keyframe", "baseline", "net_ids", "position", "velocity", "status", "_encoded")
+
+    def __init__(self, tick, net_ids, position, velocity, status, keyframe=False, baseline=0):
+        self.tick = tick
+        self.keyframe = keyframe
+        self.baseline = baseline
+        self.net_ids = net_ids
+        self.position = position
+        self.velocity = velocity
+        self.status = status
+        self._encoded = {}
+
+    def __len__(self):
+        return len(self.net_ids)
+
+    @property
+    def max_net_id(self):
+        return int(self.net_ids[-1]) if len(self.net_ids) else 0
+
+
+def pack_status(status):
+    """Pack uint8 status codes into nibbles when they all fit in 4 bits."""
+    if len(status) and int(status.max()) > 15:
+        return status.tobytes(), 0
+    padded = status if len(status) % 2 == 0 else np.append(status, np.uint8(0))
+    return ((padded[0::2] << 4) | padded[1::2]).astype(np.uint8).tobytes(), FLAG_STATUS_4BIT
+
+
+def unpack_status(buf, count, flags):
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    if not flags & FLAG_STATUS_4BIT:
+        return raw[:count].copy()
+    out = np.empty(len(raw) * 2, dtype=np.uint8)
+    out[0::2] = raw >> 4
+    out[1::2] = raw & 0x0F
+    return out[:count]
+
+
+def encode_frame(tick, baseline, flags, net_ids, position, velocity, status, removed=None, names=None):
+    """Serialize one frame; the arrays must already be in wire order."""
+    names_blob = json.dumps(names, separators=(",", ":")).encode("utf-8") if names else b""
+    removed = np.asarray(removed if removed is not None else (), dtype="<u4")
+    status_blob, status_flag = pack_status(np.asarray(status, dtype=np.uint8))
+    header = HEADER.pack(
+        MAGIC, VERSION, flags | status_flag, tick, baseline,
+        len(net_ids), len(removed), len(names_blob),
+    )
+    return b"".join((
+        header,
+        names_blob,
+        removed.tobytes(),
+        np.asarray(net_ids, dtype="<u4").tobytes(),
+        np.asarray(position, dtype="<f4").tobytes(),
+        np.asarray(velocity, dtype="<f4").tobytes(),
+        status_blob,
+    ))
+
+
+def parse_frame(data):
+    """Split raw bytes into header fields and NumPy arrays (no baseline merge)."""
+    magic, version, flags, tick, baseline, n, n_removed, names_len = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a snapshot frame")
+    offset = HEADER.size
+    names = json.loads(data[offset:offset + names_len]) if names_len else []
+    offset += names_len
+    removed = np.frombuffer(data, dtype="<u4", count=n_removed, offset=offset)
+    offset += 4 * n_removed
+    net_ids = np.frombuffer(data, dtype="<u4", count=n, offset=offset)
+    offset += 4 * n
+    position = np.frombuffer(data, dtype="<f4", count=3 * n, offset=offset).reshape(n, 3)
+    offset += 12 * n
+    velocity = np.frombuffer(data, dtype="<f4", count=3 * n, offset=offset).reshape(n, 3)
+    offset += 12 * n
+    status = unpack_status(data[offset:], n, flags)
+    return {
+        "tick": tick,
+        "baseline": baseline,
+        "keyframe": bool(flags & FLAG_KEYFRAME),
+        "names": names,
+        "removed": removed,
+        "net_ids": net_ids,
+        "position": position,
+        "velocity": velocity,
+        "status": status,
+    }
+
+
+class SnapshotEncoder:
+    """Builds keyframes and per-baseline deltas from an ``EntityStore``.
+
+    Call :meth:`capture` once per tick, then :meth:`encode` for each client
+    with the keyframe tick that client last acknowledged. Encodings are
+    memoized per frame and baseline, so clients sharing a baseline share bytes.
+
+    The last ``history`` scheduled keyframes are kept as baselines. A client
+    without a usable baseline is sent the current frame in full; such
+    promoted frames are kept apart, for ``ack_window`` ticks (two keyframe
+    intervals by default), so an acknowledgement that takes longer than
+    ``history`` ticks still finds its baseline and a new subscriber never
+    evicts the keyframes other clients are using.
+    """
+
+    def __init__(self, keyframe_interval=60, history=4, ack_window=None):
+        self.keyframe_interval = keyframe_interval
+        self.history = history
+        self.ack_window = ack_window if ack_window is not None else 2 * keyframe_interval
+        self.keyframes = OrderedDict()
+        self.promoted = OrderedDict()
+        self.names = {}
+        self._max_named = 0
+        self._last_keyframe_tick = None
+
+    def capture(self, store, tick):
+        n = store.count
+        net_ids = store.net_ids[:n]
+        order = np.argsort(net_ids, kind="stable")
+        frame = Frame(
+            tick,
+            net_ids[order],
+            store.position[:n][order].astype(np.float32),
+            store.velocity[:n][order].astype(np.float32),
+            store.status[:n][order],
+        )
+        # Net ids are allocated monotonically, so anything above the largest
+        # id seen so far is new and needs a name entry.
+        fresh = np.nonzero(net_ids > self._max_named)[0]
+        for row in fresh.tolist():
+            self.names[int(net_ids[row])] = (store.ids[row], store.types[row])
+        if len(frame):
+            self._max_named = max(self._max_named, frame.max_net_id)
+
+        due = (
+            self._last_keyframe_tick is None
+            or tick - self._last_keyframe_tick >= self.keyframe_interval
+        )
+        while self.promoted and next(iter(self.promoted)) < tick - self.ack_window:
+            self.promoted.popitem(last=False)
+        if due:
+            frame.keyframe = True
+            self._last_keyframe_tick = tick
+            self.keyframes[tick] = frame
+            while len(self.keyframes) > self.history:
+                self.keyframes.popitem(last=False)
+            self._prune_names(frame)
+        return frame
+
+    def _prune_names(self, frame):
+        # Drop names of entities that no longer exist in any retained keyframe
+        if len(self.names) > 2 * max(1, len(frame)):
+            live = set()
+            for kf in (*self.keyframes.values(), *self.promoted.values()):
+                live.update(kf.net_ids.tolist())
+            self.names = {nid: v for nid, v in self.names.items() if nid in live}
+
+    def baseline(self, tick):
+        """The retained keyframe (scheduled or promoted) at ``tick``, or None."""
+        if tick is None:
+            return None
+        frame = self.keyframes.get(tick)
+        return frame if frame is not None else self.promoted.get(tick)
+
+    def _names_after(self, frame, floor):
+        fresh = frame.net_ids[frame.net_ids > floor]
+        return [[nid, *self.names[nid]] for nid in fresh.tolist()]
+
+    def encode(self, frame, acked_tick=None):
+        base = self.baseline(acked_tick)
+        key = base.tick if base is not None else None
+        cached = frame._encoded.get(key)
+        if cached is not None:
+            return cached
+
+        floor = base.max_net_id if base is not None else 0
+        if base is None and not frame.keyframe:
+            # The client has no usable baseline: send this frame in full and
+            # keep it so the client can acknowledge it. Memoization makes this
+            # one promotion per tick however many clients need it.
+            frame.keyframe = True
+            self.promoted[frame.tick] = frame
+        if frame.keyframe:
+            data = encode_frame(
+                frame.tick, 0, FLAG_KEYFRAME,
+                frame.net_ids, frame.position, frame.velocity, frame.status,
+                names=self._names_after(frame, floor),
+            )
+        else:
+            data = self._encode_delta(frame, base, floor)
+        frame._encoded[key] = data
+        return data
+
+    def _encode_delta(self, frame, base, floor):
+        cur_ids = frame.net_ids
+        idx = np.searchsorted(base.net_ids, cur_ids)
+        np.minimum(idx, max(len(base) - 1, 0), out=idx)
+        if len(base):
+            found = base.net_ids[idx] == cur_ids
+            changed = ~found
+            changed |= np.any(frame.position != base.position[idx], axis=1)
+            changed |= np.any(frame.velocity != base.velocity[idx], axis=1)
+            changed |= frame.status != base.status[idx]
+        else:
+            changed = np.ones(len(cur_ids), dtype=bool)
+        removed = base.net_ids[~np.isin(base.net_ids, cur_ids, assume_unique=True)]
+        return encode_frame(
+            frame.tick, base.tick, 0,
+            cur_ids[changed], frame.position[changed], frame.velocity[changed], frame.status[changed],
+            removed=removed,
+            names=self._names_after(frame, floor),
+        )
+
+
+class SnapshotDecoder:
+    """Client-side reconstruction of full state from keyframes and deltas.
+
+    Keyframes are kept until a delta refers to a newer one (the server never
+    goes back to an older baseline), at most ``history`` of them: while its
+    first acknowledgement is in flight a client receives a keyframe per tick.
+    """
+
+    def __init__(self, history=64):
+        self.history = history
+        self.keyframes = OrderedDict()
+        self.names = {}
+
+    def decode(self, data):
+        """Decode one frame and return the full reconstructed ``Frame``."""
+        parts = parse_frame(data)
+        for nid, entity_id, entity_type in parts["names"]:
+            self.names[nid] = (entity_id, entity_type)
+
+        if parts["keyframe"]:
+            frame = Frame(
+                parts["tick"], parts["net_ids"], parts["position"], parts["velocity"],
+                parts["status"], keyframe=True,
+            )
+            self.keyframes[frame.tick] = frame
+            while len(self.keyframes) > self.history:
+                self.keyframes.popitem(last=False)
+            return frame
+
+        base = self.keyframes.get(parts["baseline"])
+        if base is None:
+            raise KeyError(f"missing keyframe {parts['baseline']}")
+        while next(iter(self.keyframes)) < base.tick:
+            self.keyframes.popitem(last=False)
+        upd_ids = parts["net_ids"]
+        keep = ~np.isin(base.net_ids, parts["removed"]) & ~np.isin(base.net_ids, upd_ids)
+        net_ids = np.concatenate((base.net_ids[keep], upd_ids))
+        order = np.argsort(net_ids, kind="stable")
+        return Frame(
+            parts["tick"],
+            net_ids[order],
+            np.concatenate((base.position[keep], parts["position"]))[order],
+            np.concatenate((base.velocity[keep], parts["velocity"]))[order],
+            np.concatenate((base.status[keep], parts["status"]))[order],
+            baseline=base.tick,
+        )
+
+    def entities(self, frame):
+        """Expand a decoded frame to the JSON snapshot shape used by the client."""
+        out = []
+        for nid, p, v, s in zip(frame.net_ids.tolist(), frame.position.tolist(),
+                                frame.velocity.tolist(), frame.status.tolist()):
+            entity_id, entity_type = self.names.get(nid, (nid, None))
+            out.append({
+                "id": entity_id,
+                "type": entity_type,
+                "position": {"x": p[0], "y": p[1], "z": p[2]},
+                "velocity": {"x": v[0], "y": v[1], "z": v[2]},
+                "status": STATUS_NAMES.get(s, s),
+            })
+        return out
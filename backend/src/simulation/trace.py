@@ -0,0 +1,453 @@
+"""Append-only simulation traces: record every tick, replay from any tick.
+
+A trace is a directory of append-only files::
+
+    chunks.bin    zlib-compressed chunks, back to back
+    index.bin     one fixed-size INDEX_DTYPE record per chunk
+    names.jsonl   [net_id, id, type] for every entity, when first seen
+    inputs.jsonl  {"tick", "time", "source", "payload"} per recorded input
+
+A chunk covers up to ``keyframe_interval`` consecutive ticks. Its first tick
+is a keyframe holding every entity; each later tick holds only the entities
+whose position, velocity or status changed, plus the net ids removed, so a
+chunk never depends on another one. Columns (``position``, ``velocity``,
+``status``, ``net_ids``) are stored for all ticks of a chunk together.
+
+Recording must not slow the tick loop: ``TraceRecorder.record_tick`` only
+copies the live columns into a queue holding at most ``max_pending`` ticks.
+A background thread computes deltas, compresses and appends. A chunk's bytes
+are written before its index record, so a crash never leaves an index entry
+pointing at a partial chunk. If ``max_pending`` ticks are already waiting the
+tick is skipped and counted; deltas are always against the previous
+*recorded* tick, so the trace stays consistent. Inputs are small, rare and
+cannot be re-derived, so they never count against that bound and never wait.
+
+``TraceReader`` memory-maps the index and chunk files. Seeking to a tick
+decompresses one chunk and applies at most ``keyframe_interval`` deltas.
+"""
+import io
+import json
+import mmap
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from .entity_store import STATUS_NAMES
+
+INDEX_DTYPE = np.dtype([
+    ("first_tick", "<u8"),
+    ("last_tick", "<u8"),
+    ("offset", "<u8"),
+    ("length", "<u8"),
+    ("rows", "<u8"),
+])
+COMPRESSION_LEVEL = 3
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def set_recorder(recorder):
+    """Make ``recorder`` the process-wide recorder (None to clear); returns the previous one."""
+    global _active
+    with _active_lock:
+        previous, _active = _active, recorder
+    return previous
+
+
+def get_recorder():
+    return _active
+
+
+def _sorted_state(net_ids, position, velocity, status):
+    order = np.argsort(net_ids, kind="stable")
+    return net_ids[order], position[order], velocity[order], status[order]
+
+
+def _delta(prev, cur):
+    """Rows of ``cur`` that are new or changed since ``prev``, and the net ids removed."""
+    p_ids, p_pos, p_vel, p_status = prev
+    c_ids, c_pos, c_vel, c_status = cur
+    where = np.searchsorted(p_ids, c_ids)
+    where = np.minimum(where, max(len(p_ids) - 1, 0))
+    known = (p_ids[where] == c_ids) if len(p_ids) else np.zeros(len(c_ids), dtype=bool)
+    changed = ~known
+    same = np.flatnonzero(known)
+    rows = where[same]
+    changed[same] = (
+        np.any(c_pos[same] != p_pos[rows], axis=1)
+        | np.any(c_vel[same] != p_vel[rows], axis=1)
+        | (c_status[same] != p_status[rows])
+    )
+    removed = np.setdiff1d(p_ids, c_ids, assume_unique=True)
+    return np.flatnonzero(changed), removed
+
+
+def _apply(state, ids, position, velocity, status, removed):
+    """``state`` with ``removed`` dropped and the given rows inserted or replaced."""
+    s_ids, s_pos, s_vel, s_status = state
+    keep = ~np.isin(s_ids, removed) & ~np.isin(s_ids, ids)
+    merged = (
+        np.concatenate((s_ids[keep], ids)),
+        np.concatenate((s_pos[keep], position)),
+        np.concatenate((s_vel[keep], velocity)),
+        np.concatenate((s_status[keep], status)),
+    )
+    return _sorted_state(*merged)
+
+
+class _ChunkBuilder:
+    def __init__(self):
+        self.ticks, self.counts, self.removed_counts = [], [], []
+        self.parts, self.removed = [], []
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def add(self, tick, rows, removed):
+        self.ticks.append(tick)
+        self.counts.append(len(rows[0]))
+        self.removed_counts.append(len(removed))
+        self.parts.append(rows)
+        self.removed.append(removed)
+
+    def encode(self):
+        columns = list(zip(*self.parts))
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            ticks=np.asarray(self.ticks, dtype=np.uint64),
+            counts=np.asarray(self.counts, dtype=np.uint32),
+            removed_counts=np.asarray(self.removed_counts, dtype=np.uint32),
+            net_ids=np.concatenate(columns[0]),
+            position=np.concatenate(columns[1]),
+            velocity=np.concatenate(columns[2]),
+            status=np.concatenate(columns[3]),
+            removed=np.concatenate(self.removed).astype(np.uint32),
+        )
+        return zlib.compress(buf.getvalue(), COMPRESSION_LEVEL)
+
+
+class TraceRecorder:
+    """Background writer for one trace directory; see the module docstring."""
+
+    def __init__(self, path, keyframe_interval=300, max_pending=64):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.last_tick = None
+        self.recorded_ticks = 0
+        self.dropped_ticks = 0
+        self.recorded_inputs = 0
+        self.error = None
+        self._max_named = 0
+        self._queue = queue.SimpleQueue()
+        # Ticks waiting for the writer; inputs are queued without a bound
+        self._tick_slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._chunks = open(self.path / "chunks.bin", "ab")
+        self._index = open(self.path / "index.bin", "ab")
+        self._names = open(self.path / "names.jsonl", "a", encoding="utf-8")
+        self._inputs = open(self.path / "inputs.jsonl", "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- tick thread ------------------------------------------------------
+
+    def record_tick(self, tick, store):
+        """Queue the live state of ``store`` (an ``EntityStore`` or compatible view) as ``tick``."""
+        # Take the slot first, so a dropped tick costs no copying
+        if not self._tick_slots.acquire(blocking=False):
+            self.dropped_ticks += 1
+            return False
+        try:
+            n = store.count
+            net_ids = store.net_ids[:n].copy()
+            # Names are read here, while the rows still match the ids
+            fresh = np.flatnonzero(net_ids > self._max_named)
+            names = [[int(net_ids[row]), store.ids[row], store.types[row]] for row in fresh.tolist()]
+            item = ("tick", int(tick), names, net_ids, store.position[:n].copy(),
+                    store.velocity[:n].copy(), store.status[:n].copy())
+        except BaseException:
+            self._tick_slots.release()
+            raise
+        self._queue.put(item)
+        if len(fresh):
+            self._max_named = max(self._max_named, int(net_ids[fresh].max()))
+        self.last_tick = int(tick)
+        return True
+
+    def record_input(self, payload, source="input", tick=None):
+        """Queue an input; ``tick`` defaults to the last recorded tick."""
+        record = {
+            "tick": self.last_tick if tick is None else int(tick),
+            "time": time.time(),
+            "source": source,
+            "payload": payload,
+        }
+        self._queue.put(("input", record))
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        for fh in (self._chunks, self._index, self._names, self._inputs):
+            fh.close()
+
+    def stats(self):
+        return {
+            "path": str(self.path),
+            "last_tick": self.last_tick,
+            "recorded_ticks": self.recorded_ticks,
+            "dropped_ticks": self.dropped_ticks,
+            "recorded_inputs": self.recorded_inputs,
+            "pending": self._queue.qsize(),
+            "error": repr(self.error) if self.error else None,
+        }
+
+    # -- writer thread ----------------------------------------------------
+
+    def _run(self):
+        builder = _ChunkBuilder()
+        prev = None
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    if len(builder):
+                        self._flush(builder)
+                    return
+                if item[0] == "input":
+                    self._inputs.write(json.dumps(item[1], default=str) + "\n")
+                    self._inputs.flush()
+                    self.recorded_inputs += 1
+                    continue
+                self._tick_slots.release()
+                _, tick, names, *columns = item
+                for name in names:
+                    self._names.write(json.dumps(name, default=str) + "\n")
+                if names:
+                    self._names.flush()
+                cur = _sorted_state(*columns)
+                if not len(builder):
+                    builder.add(tick, cur, np.empty(0, dtype=np.uint32))
+                else:
+                    rows, removed = _delta(prev, cur)
+                    builder.add(tick, tuple(column[rows] for column in cur), removed)
+                prev = cur
+                self.recorded_ticks += 1
+                if len(builder) >= self.keyframe_interval:
+                    self._flush(builder)
+                    builder = _ChunkBuilder()
+            except Exception as exc:  # keep draining so the tick loop never blocks
+                self.error = exc
+
+    def _flush(self, builder):
+        blob = builder.encode()
+        offset = self._chunks.tell()
+        self._chunks.write(blob)
+        self._chunks.flush()
+        record = np.array([(builder.ticks[0], builder.ticks[-1], offset, len(blob), sum(builder.counts))],
+                          dtype=INDEX_DTYPE)
+        self._index.write(record.tobytes())
+        self._index.flush()
+
+
+class TraceReader:
+    """Random access to a recorded trace; see the module docstring."""
+
+    def __init__(self, path, cache_chunks=2):
+        self.path = Path(path)
+        self.cache_chunks = cache_chunks
+        self._cache = OrderedDict()
+        self._data = None
+        self.refresh()
+
+    def refresh(self):
+        """Pick up chunks and names appended since the reader was opened."""
+        self.close()
+        index_path = self.path / "index.bin"
+        size = index_path.stat().st_size if index_path.exists() else 0
+        n = size // INDEX_DTYPE.itemsize
+        self.index = (np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(n,)) if n
+                      else np.zeros(0, dtype=INDEX_DTYPE))
+        chunks_path = self.path / "chunks.bin"
+        if n and chunks_path.stat().st_size:
+            with open(chunks_path, "rb") as fh:
+                self._data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.names = {}
+        names_path = self.path / "names.jsonl"
+        if names_path.exists():
+            with open(names_path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.endswith("\n"):
+                        net_id, entity_id, entity_type = json.loads(line)
+                        self.names[net_id] = (entity_id, entity_type)
+        self._cache.clear()
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def first_tick(self):
+        return int(self.index["first_tick"][0]) if len(self.index) else None
+
+    @property
+    def last_tick(self):
+        return int(self.index["last_tick"][-1]) if len(self.index) else None
+
+    def _chunk(self, k):
+        chunk = self._cache.get(k)
+        if chunk is None:
+            record = self.index[k]
+            start = int(record["offset"])
+            raw = zlib.decompress(self._data[start:start + int(record["length"])])
+            with np.load(io.BytesIO(raw)) as data:
+                chunk = {name: data[name] for name in data.files}
+            chunk["row_bounds"] = np.concatenate(([0], np.cumsum(chunk["counts"], dtype=np.int64)))
+            chunk["removed_bounds"] = np.concatenate(([0], np.cumsum(chunk["removed_counts"], dtype=np.int64)))
+            self._cache[k] = chunk
+            while len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(k)
+        return chunk
+
+    @staticmethod
+    def _step(chunk, state, j):
+        a, b = chunk["row_bounds"][j], chunk["row_bounds"][j + 1]
+        columns = (chunk["net_ids"][a:b], chunk["position"][a:b], chunk["velocity"][a:b], chunk["status"][a:b])
+        if state is None:
+            return columns
+        ra, rb = chunk["removed_bounds"][j], chunk["removed_bounds"][j + 1]
+        return _apply(state, *columns, chunk["removed"][ra:rb])
+
+    def replay(self, start=None, stop=None):
+        """Yield ``(tick, state)`` for every recorded tick in ``[start, stop]``.
+
+        ``state`` is ``(net_ids, position, velocity, status)`` sorted by net id.
+        """
+        if not len(self.index):
+            return
+        start = self.first_tick if start is None else start
+        stop = self.last_tick if stop is None else stop
+        k = max(0, int(np.searchsorted(self.index["last_tick"], start)))
+        while k < len(self.index) and int(self.index["first_tick"][k]) <= stop:
+            chunk = self._chunk(k)
+            state = None
+            for j, tick in enumerate(chunk["ticks"].tolist()):
+                if tick > stop:
+                    return
+                state = self._step(chunk, state, j)
+                if tick >= start:
+                    yield tick, state
+            k += 1
+
+    def state(self, tick):
+        """``(recorded tick, state)`` for the last recorded tick at or before ``tick``, or None."""
+        if not len(self.index) or tick < self.first_tick:
+            return None
+        k = int(np.searchsorted(self.index["first_tick"], tick, side="right")) - 1
+        chunk = self._chunk(k)
+        ticks = chunk["ticks"]
+        last = int(np.searchsorted(ticks, tick, side="right")) - 1
+        state = None
+        for j in range(last + 1):
+            state = self._step(chunk, state, j)
+        return int(ticks[last]), state
+
+    def snapshot(self, tick):
+        """``SimulationState.snapshot()``-style entities at ``tick``, or None."""
+        found = self.state(tick)
+        if found is None:
+            return None
+        recorded, (net_ids, position, velocity, status) = found
+        entities = []
+        for net_id, p, v, s in zip(net_ids.tolist(), position.tolist(), velocity.tolist(), status.tolist()):
+            entity_id, entity_type = self.names.get(net_id, (net_id, None))
+            entities.append({
+                "id": entity_id,
+                "type": entity_type,
+                "position": {"x": p[0], "y": p[1], "z": p[2]},
+                "velocity": {"x": v[0], "y": v[1], "z": v[2]},
+                "status": STATUS_NAMES.get(s, str(s)),
+            })
+        return recorded, entities
+
+    def restore(self, tick, **sim_options):
+        """A new ``SimulationState`` holding the recorded entities at ``tick`` (None if before the trace)."""
+        from .simulation_state import SimulationState
+
+        found = self.state(tick)
+        if found is None:
+            return None
+        _, (net_ids, position, velocity, status) = found
+        sim = SimulationState(capacity=max(1, len(net_ids)), **sim_options)
+        store = sim.store
+        names = [self.names.get(net_id, (net_id, None)) for net_id in net_ids.tolist()]
+        types = np.asarray([entity_type for _, entity_type in names], dtype=object)
+        for entity_type in dict.fromkeys(types.tolist()):
+            rows = np.flatnonzero(types == entity_type)
+            start = store.count
+            sim.add_entities([names[row][0] for row in rows.tolist()], entity_type,
+                             position=position[rows], velocity=velocity[rows])
+            store.status[start:store.count] = status[rows]
+            store.net_ids[start:store.count] = net_ids[rows]
+        # Keep net ids stable: new entities continue after the recorded ones
+        store._next_net_id = int(net_ids.max()) + 1 if len(net_ids) else 1
+        return sim
+
+    def inputs(self, start=None, stop=None, since=None, until=None):
+        """Recorded inputs with ``start <= tick <= stop`` and ``since <= time <= until`` (Unix s).
+
+        Inputs recorded before the first tick, or by a process with no ticks
+        (the API's ``api-*`` runs), have tick None and pass any tick bounds.
+        """
+        path = self.path / "inputs.jsonl"
+        if not path.exists():
+            return []
+        found = []
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.endswith("\n"):
+                    continue  # still being written
+                record = json.loads(line)
+                tick = record.get("tick")
+                if tick is not None and ((start is not None and tick < start) or (stop is not None and tick > stop)):
+                    continue
+                at = record.get("time")
+                if (since is not None and at < since) or (until is not None and at > until):
+                    continue
+                found.append(record)
+        return found
+
+
+def run_dir(root, prefix="run"):
+    """A fresh ``<root>/<prefix>-<UTC timestamp>`` trace directory path."""
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    path = Path(root) / f"{prefix}-{stamp}"
+    suffix = 1
+    while path.exists():
+        suffix += 1
+        path = Path(root) / f"{prefix}-{stamp}-{suffix}"
+    return path
@@ -0,0 +1,11 @@
+import logging
+
+logger = logging.getLogger("digital_twin")
+
+
+def log(message, level=logging.WARNING):
+    """Log a backend message without letting logging failures reach callers."""
+    try:
+        logger.log(level, message)
+    except Exception:
+        pass
@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.src.services.environment_loader import (
+    KMH,
+    compile_environment,
+    load_environment,
+    parse_maxspeed,
+)
+from backend.src.simulation.simulation_state import SimulationState
+
+ORIGIN = (40.7580, -73.9855)
+
+
+def _way(way_id, tags, coords):
+    return {"type": "way", "id": way_id, "tags": tags,
+            "geometry": [{"lat": lat, "lon": lon} for lat, lon in coords]}
+
+
+# An east-west avenue through the origin, a north-south street 200 m east of
+# it (~0.00237 deg of longitude at this latitude) and a police station
+ELEMENTS = [
+    _way(1, {"highway": "primary", "maxspeed": "25 mph"}, [(40.7580, -73.9900), (40.7580, -73.9800)]),
+    _way(2, {"highway": "residential"}, [(40.7560, -73.98313), (40.7600, -73.98313)]),
+    _way(3, {"building": "yes"}, [(40.7581, -73.9856), (40.7582, -73.9857)]),
+    {"type": "node", "id": 9, "lat": 40.7585, "lon": -73.9855, "tags": {"amenity": "police"}},
+]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("50", 50.0), ("30 mph", 48.28032), ("20mph", 32.18688), ("10 knots", 18.52),
+    ("DE:urban", 50.0), ("walk", 5.0), ("50;30", 30.0), ("none", math.inf),
+    ("signals", None), ("", None), (None, None), (70, 70.0),
+])
+def test_parse_maxspeed(value, expected):
+    assert parse_maxspeed(value) == (pytest.approx(expected) if expected is not None else None)
+
+
+def test_load_environment_summary():
+    env = load_environment(ELEMENTS)
+    assert env["speed_zones"] == [
+        {"type": "road", "id": 1, "max_speed": pytest.approx(40.2336)},
+        {"type": "road", "id": 2, "max_speed": 30.0},  # residential default
+    ]
+    assert [c["id"] for c in env["checkpoints"]] == [9]
+
+
+def test_snap_positions_to_roads():
+    env = compile_environment(ELEMENTS, origin=ORIGIN)
+    positions = np.array([
+        [0.0, 10.0, 0.0],     # 10 m north of the avenue
+        [195.0, 100.0, 0.0],  # 5 m west of the street, away from the avenue
+        [60.0, 60.0, 0.0],    # off road
+        [5000.0, 0.0, 0.0],   # outside the compiled area
+    ])
+    snap = env.snap(positions)
+    assert [env.way_ids[w] if w >= 0 else None for w in snap.way] == [1, 2, None, None]
+    assert snap.distance[:2] == pytest.approx([10.0, 5.0], abs=0.5)
+    assert snap.point[0] == pytest.approx([0.0, 0.0], abs=0.5)
+    assert snap.speed_limit[:2] == pytest.approx([25 * 1.609344 * KMH, 30 * KMH])
+    assert np.isnan(snap.speed_limit[2:]).all()
+    assert env.checkpoints[0]["id"] == 9
+    assert env.nearest_checkpoint(positions, 100.0).tolist() == [0, -1, 0, -1]
+
+
+def test_snap_matches_brute_force():
+    rng = np.random.default_rng(5)
+    ways = []
+    for k in range(60):
+        lat, lon = ORIGIN[0] + rng.uniform(-0.01, 0.01), ORIGIN[1] + rng.uniform(-0.01, 0.01)
+        steps = rng.normal(scale=0.001, size=(rng.integers(2, 8), 2)).cumsum(axis=0)
+        ways.append(_way(k, {"highway": "service"}, (steps + (lat, lon)).tolist()))
+    env = compile_environment(ways, origin=ORIGIN)
+    positions = rng.uniform(-1200, 1200, size=(2000, 2))
+    snap = env.snap(positions)
+
+    a, b = env.a, env.b
+    ab = b - a
+    t = np.clip(np.einsum("pij,ij->pi", positions[:, None] - a[None], ab) / (ab ** 2).sum(axis=1), 0, 1)
+    dist = np.linalg.norm(positions[:, None] - (a[None] + ab[None] * t[..., None]), axis=2).min(axis=1)
+    expected = np.where(dist <= env.max_distance, dist, np.inf)
+    assert np.allclose(snap.distance, expected)
+    assert (snap.segment >= 0).sum() > 100
+
+
+def test_simulation_tick_snaps_every_entity():
+    sim = SimulationState(environment=compile_environment(ELEMENTS, origin=ORIGIN))
+    sim.add_entities(["car-1", "car-2"], "vehicle",
+                     position=[[0.0, 3.0, 0.0], [60.0, 60.0, 0.0]], velocity=[[10.0, 0.0, 0.0], [0, 0, 0]])
+    sim.tick(0.1)
+    assert sim.road.way.tolist() == [0, -1]
+    assert sim.road.point[0] == pytest.approx([1.0, 0.0], abs=0.1)
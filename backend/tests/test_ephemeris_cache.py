@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from backend.src.services.ephemeris_cache import EphemerisCache
+from backend.tests.test_satellite_orbit_service import T0, TLE
+from backend.src.services.satellite_orbit_service import TLECatalog
+
+
+@pytest.mark.parametrize("method", ["hermite", "lagrange"])
+def test_interpolation_matches_direct_propagation(method):
+    catalog = TLECatalog.from_text(TLE)
+    cache = EphemerisCache(catalog, step=60.0, method=method, clock=lambda: T0)
+    times = T0 + np.linspace(-200, 2400, 37)
+
+    _, direct, _ = catalog.propagate_teme(times)
+    error_m = np.linalg.norm(cache.teme(times) - direct, axis=-1) * 1000.0
+    assert error_m.max() < 5.0
+    assert cache.interpolated == len(times) and cache.direct == 0
+
+    lon, lat, alt = cache.positions(times[:3], catalog.select([33591]))
+    expected = catalog.positions(times[:3], catalog.select([33591]))
+    np.testing.assert_allclose(lat, expected[1], atol=1e-4)
+    assert lon.shape == (1, 3)
+
+
+def test_window_rolls_forward_in_background():
+    catalog = TLECatalog.from_text(TLE)
+    cache = EphemerisCache(catalog, step=60.0, span=1200.0, lead=60.0, margin=300.0, clock=lambda: T0)
+    cache.teme([T0])
+    first = cache.window
+    assert cache.builds == 1
+
+    # Close to the end of the window: still served, next window built aside
+    cache.teme([first.end - 100.0])
+    cache.wait()
+    assert cache.builds == 2
+    assert cache.window.start > first.start
+    assert cache.window.end > first.end
+
+    # A request far from the present is propagated without evicting the window
+    live = cache.window
+    cache.teme([T0 + 30 * 86400.0])
+    assert cache.window is live and cache.direct == 1
+
+
+def test_concurrent_cold_requests_build_one_window():
+    catalog = TLECatalog.from_text(TLE)
+    cache = EphemerisCache(catalog, step=60.0, clock=lambda: T0)
+    _, direct, _ = catalog.propagate_teme([T0 + 30.0])
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda k: cache.teme([T0 + 30.0]), range(8)))
+    assert cache.builds == 1
+    for r in results:
+        assert np.linalg.norm(r - direct, axis=-1).max() < 5e-3
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+
+from backend.src.services.geocoding_service import (
+    Gazetteer,
+    GeocodeCache,
+    Geocoder,
+    normalize_query,
+)
+from backend.src.services.http_client import HTTPClient, set_http_client
+
+GAZETTEER_CSV = """name,lat,lon,population,alternatenames
+Lagos,6.4550,3.3941,8048430,Eko;Lagos City
+Lagos Island,6.4541,3.3947,209437,
+Lagoa,37.1350,-8.4530,22975,
+Abuja,9.0579,7.4951,590400,
+"""
+
+
+def _gazetteer(tmp_path):
+    path = tmp_path / "places.csv"
+    path.write_text(GAZETTEER_CSV, encoding="utf-8")
+    return Gazetteer.load(path)
+
+
+def _run_with_transport(handler, coro_fn):
+    async def run():
+        client = HTTPClient(retries=0, transport=httpx.MockTransport(handler))
+        set_http_client(client)
+        try:
+            return await coro_fn()
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_normalize_and_gazetteer_lookups(tmp_path):
+    assert normalize_query("  Saõ  Paulo, BR! ") == "sao paulo br"
+    gaz = _gazetteer(tmp_path)
+    assert gaz.exact("eko")["display_name"] == "Lagos"
+    assert [p["display_name"] for p in gaz.prefix("lago")] == ["Lagos", "Lagos Island", "Lagoa"]
+    assert gaz.fuzzy("lagos islnd")["display_name"] == "Lagos Island"
+    assert gaz.fuzzy("zzzz") is None
+
+
+def test_cached_queries_skip_the_network(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["q"])
+        return httpx.Response(200, json=[{"lat": "48.8566", "lon": "2.3522", "display_name": "Paris"}])
+
+    cache = GeocodeCache(tmp_path / "geocode.sqlite")
+    geocoder = Geocoder(cache=cache, gazetteer=_gazetteer(tmp_path), url="https://nominatim.test/search")
+
+    async def lookups():
+        return [
+            await geocoder.geocode("Lagos Island"),  # gazetteer
+            await geocoder.geocode("Paris"),          # network
+            await geocoder.geocode("  PARIS "),       # LRU
+        ]
+
+    island, paris, again = _run_with_transport(handler, lookups)
+    assert island["source"] == "gazetteer"
+    assert paris == again and paris["lat"] == 48.8566
+    assert calls == ["Paris"]
+
+    # A fresh process reuses the persistent cache
+    cold = Geocoder(cache=cache, url="https://nominatim.test/search")
+    assert _run_with_transport(handler, lambda: cold.geocode("paris")) == paris
+    assert calls == ["Paris"] and cold.stats["cache"] == 1
+
+
+def test_upstream_failure_falls_back_to_gazetteer(tmp_path):
+    def handler(request):
+        raise httpx.ConnectError("offline", request=request)
+
+    geocoder = Geocoder(gazetteer=_gazetteer(tmp_path), url="https://nominatim.test/search")
+    result = _run_with_transport(handler, lambda: geocoder.geocode("abuj"))
+    assert result["display_name"] == "Abuja"
+    assert geocoder.stats["fallback"] == 1
+
+
+def test_qualified_names_and_fuzzy_guesses_are_not_trusted(tmp_path):
+    path = tmp_path / "places.csv"
+    path.write_text("name,lat,lon,population,alternatenames,country,admin\n"
+                    "Paris,48.8566,2.3522,2140526,,France,Ile-de-France\n"
+                    "Abuja,9.0579,7.4951,590400,,Nigeria,FCT\n", encoding="utf-8")
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["q"])
+        if request.url.params["q"] == "Paris, Texas":
+            return httpx.Response(200, json=[{"lat": "33.66", "lon": "-95.55", "display_name": "Paris, TX"}])
+        return httpx.Response(200, json=[])
+
+    cache = GeocodeCache(tmp_path / "geocode.sqlite")
+    geocoder = Geocoder(cache=cache, gazetteer=Gazetteer.load(path), url="https://nominatim.test/search")
+
+    async def lookups():
+        return [await geocoder.geocode(q) for q in ("Paris, France", "Paris, Texas", "abuj")]
+
+    france, texas, guess = _run_with_transport(handler, lookups)
+    assert france["source"] == "gazetteer" and texas["display_name"] == "Paris, TX"
+    assert guess["display_name"] == "Abuja" and calls == ["Paris, Texas", "abuj"]
+    assert cache.get("paris texas")[0] and not cache.get("abuj")[0]
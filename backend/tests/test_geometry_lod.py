@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import numpy as np
+
+from backend.src.services import osm_services
+from backend.src.services.geometry_lod import (
+    FULL_LOD,
+    LodTileCache,
+    douglas_peucker,
+    simplify_element,
+    visvalingam,
+)
+from backend.src.services.osm_tile_cache import OverpassTileCache
+from backend.tests import test_osm_tile_cache
+from backend.tests.test_osm_tile_cache import ELEMENTS, overpass_stub  # noqa: F401 (fixture)
+
+
+def _way(coords, way_id=1):
+    return {"type": "way", "id": way_id, "geometry": [{"lat": lat, "lon": lon} for lon, lat in coords]}
+
+
+def test_douglas_peucker_keeps_corners_and_drops_noise():
+    x = np.linspace(0, 100, 51)
+    line = np.column_stack((x, np.where(x <= 50, 0.0, x - 50)))  # an L-bend
+    line[1:-1:2, 1] += 0.05  # sub-tolerance jitter
+    keep = douglas_peucker(line, tolerance=1.0)
+    assert np.flatnonzero(keep).tolist() == [0, 25, 50]
+
+
+def test_visvalingam_removes_small_notches_only():
+    square = np.array([[0, 0], [5, 0], [5, 0.1], [5.1, 0.1], [5.1, 0], [10, 0], [10, 10], [0, 10], [0, 0]], float)
+    keep = visvalingam(square, min_area=1.0)
+    assert square[keep].tolist() == [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+
+
+def test_payload_grows_with_level_of_detail():
+    # A 2 km wiggly road and a 6 m building footprint
+    lon = -73.99 + np.linspace(0, 0.024, 2000)
+    lat = 40.75 + 0.0005 * np.sin(np.linspace(0, 40, 2000)) + 0.00002 * np.sin(np.linspace(0, 900, 2000))
+    road = _way(np.column_stack((lon, lat)), 1)
+    house = _way([(-73.99, 40.75), (-73.98993, 40.75), (-73.98993, 40.75005), (-73.99, 40.75005), (-73.99, 40.75)], 2)
+
+    sizes = []
+    for lod in range(FULL_LOD + 1):
+        records = [simplify_element(road, lod), simplify_element(house, lod)]
+        sizes.append(len(json.dumps(records)))
+        assert records[0]["lat"] == road["geometry"][0]["lat"]
+    assert sizes == sorted(sizes) and sizes[0] * 5 < sizes[-1]
+
+    assert "geometry" not in simplify_element(house, 0)  # sub-pixel at z12
+    assert len(simplify_element(house, FULL_LOD)["geometry"]) == 5
+    assert len(simplify_element(road, FULL_LOD)["geometry"]) == 2000
+
+
+def test_relation_members_become_parts():
+    relation = {"type": "relation", "id": 5, "members": [
+        {"type": "way", "geometry": [{"lat": 40.75, "lon": -73.99}, {"lat": 40.76, "lon": -73.98}]},
+        {"type": "way", "geometry": [{"lat": 40.76, "lon": -73.98}, {"lat": 40.77, "lon": -73.97}]},
+    ]}
+    record = simplify_element(relation, FULL_LOD)
+    assert record["lat"] == 40.75 and len(record["parts"]) == 2
+
+
+def test_lod_tiles_are_cached(tmp_path, overpass_stub, monkeypatch):  # noqa: F811
+    tiles = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+    lod_cache = LodTileCache()
+    monkeypatch.setattr(osm_services, "_tile_cache", tiles)
+    monkeypatch.setattr(osm_services, "_lod_cache", lod_cache)
+    monkeypatch.setattr(osm_services, "OSM_CACHE_ENABLED", True)
+
+    first = asyncio.run(osm_services.fetch_osm_lod(40.7450, -73.9900, 2500, FULL_LOD))
+    way = next(r for r in first if r["id"] == 10)
+    assert way["geometry"] == [[-73.995, 40.73], [-73.994, 40.731]]
+    misses = lod_cache.misses
+
+    again = asyncio.run(osm_services.fetch_osm_lod(40.7450, -73.9900, 2500, FULL_LOD))
+    assert again == first
+    assert lod_cache.misses == misses and lod_cache.hits == misses
+    assert len(overpass_stub) == 1
+
+
+def test_refetched_tiles_are_simplified_again(tmp_path, overpass_stub, monkeypatch):  # noqa: F811
+    tiles = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+    lod_cache = LodTileCache()
+    monkeypatch.setattr(osm_services, "_tile_cache", tiles)
+    monkeypatch.setattr(osm_services, "_lod_cache", lod_cache)
+    monkeypatch.setattr(osm_services, "OSM_CACHE_ENABLED", True)
+
+    first = asyncio.run(osm_services.fetch_osm_lod(40.7450, -73.9900, 2500, FULL_LOD))
+    assert next(r for r in first if r["id"] == 10)["geometry"][-1] == [-73.994, 40.731]
+
+    # The way moves upstream and its raw tile expires: the LOD entry must not outlive it
+    moved = dict(ELEMENTS[3], geometry=[{"lat": 40.7300, "lon": -73.9950}, {"lat": 40.7305, "lon": -73.9941}])
+    monkeypatch.setattr(test_osm_tile_cache, "ELEMENTS", [*ELEMENTS[:3], moved])
+    tiles.ttl = 0
+    again = asyncio.run(osm_services.fetch_osm_lod(40.7450, -73.9900, 2500, FULL_LOD))
+    assert len(overpass_stub) == 2
+    assert next(r for r in again if r["id"] == 10)["geometry"][-1] == [-73.9941, 40.7305]
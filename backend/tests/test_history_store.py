@@ -0,0 +1,137 @@
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from backend.src.routes import telemetry_routes
+from backend.src.server import app
+from backend.src.services import history_store
+from backend.src.services.history_store import ENTITY_FIELDS, HistoryStore, Segment
+from backend.src.services.telemetry_store import TelemetryStore
+from backend.src.simulation.physics_server import PhysicsServer, create_app
+from backend.src.simulation.simulation_state import SimulationState
+
+DAY = 86400.0
+
+
+def _samples(rng, n, days=5):
+    names = [f"sensor-{k}" for k in range(7)]
+    which = rng.integers(0, len(names), n)
+    times = rng.uniform(0, days * DAY, n)
+    return names, which, times, rng.normal(size=n)
+
+
+def test_reads_match_appends_and_touch_only_overlapping_segments(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    names, which, times, values = _samples(rng, 30000)
+    store = HistoryStore(tmp_path / "h", partition_seconds=DAY, flush_rows=4000, compact_after=100)
+    for k in range(0, len(times), 1000):  # arrives in batches, out of time order
+        part = slice(k, k + 1000)
+        store.append_rows([store.series_id(names[w]) for w in which[part]], times[part], values[part])
+    store.flush()
+    stats = store.stats()
+    assert stats["partitions"] == 5 and stats["segments"] > 5 and stats["rows"] == 30000
+
+    touched = []
+    read = Segment.read
+    monkeypatch.setattr(Segment, "read", lambda self, *a: touched.append(self.path.parent.name) or read(self, *a))
+    start, end = 2.25 * DAY, 2.75 * DAY
+    t, v = store.read("sensor-3", start, end)
+    expected = (which == 3) & (times >= start) & (times <= end)
+    order = np.argsort(times[expected])
+    np.testing.assert_array_equal(t, times[expected][order])
+    np.testing.assert_array_equal(v[:, 0], values[expected][order])
+    assert set(touched) == {"p2"}
+
+    t, _ = store.read("sensor-5")
+    assert len(t) == (which == 5).sum() and (np.diff(t) >= 0).all()
+    assert len(store.read("missing")[0]) == 0
+    next_seq = store._next_seq
+    store.close()
+
+    # Everything is back after reopening, and new segments continue the numbering
+    with HistoryStore(tmp_path / "h", partition_seconds=DAY) as reopened:
+        assert reopened.series_names() == store.series_names()
+        assert len(reopened.read("sensor-3", start, end)[0]) == expected.sum()
+        reopened.append("sensor-3", [2.5 * DAY], [42.0])
+        reopened.flush()
+        assert 42.0 in reopened.read("sensor-3", start, end)[1][:, 0]
+        assert reopened._next_seq == next_seq + 1
+        assert len(reopened.read("sensor-3", start, end)[0]) == expected.sum() + 1
+
+
+def test_compaction_merges_small_segments_and_survives_a_crash(tmp_path):
+    rng = np.random.default_rng(1)
+    store = HistoryStore(tmp_path / "h", fields=ENTITY_FIELDS, flush_rows=10**9, segment_rows=5000, compact_after=4)
+    rows = []
+    for k in range(10):
+        t = rng.uniform(0, 100, 300)
+        v = rng.normal(size=(300, 6))
+        store.append("car-1", t, v)
+        store.flush()
+        rows.append((t, v))
+    # Compacted automatically every 4 small segments
+    assert store.stats()["compactions"] >= 1
+    store.compact()
+    segments = store._partitions[0]
+    assert len(segments) == 1 and (segments[0].lo, segments[0].hi) == (0, 9)
+    t, v = store.read("car-1")
+    all_t = np.concatenate([r[0] for r in rows])
+    order = np.argsort(all_t, kind="stable")
+    np.testing.assert_array_equal(t, all_t[order])
+    np.testing.assert_array_equal(v, np.concatenate([r[1] for r in rows])[order])
+    store.close()
+
+    # A crash after writing a merged segment but before deleting its sources
+    part = tmp_path / "h" / "p0"
+    merged = next(part.glob("*.col"))
+    source = part / "seg-00000003-00000003.col"
+    history_store.write_segment(source, np.zeros(2, dtype=np.uint32), np.array([1.0, 2.0]), np.zeros((2, 6)))
+    (part / "seg-00000010-00000010.tmp").write_bytes(b"partial")
+    with HistoryStore(tmp_path / "h", fields=ENTITY_FIELDS) as reopened:
+        assert [p.name for p in part.iterdir()] == [merged.name]
+        assert len(reopened.read("car-1")[0]) == 3000
+        assert reopened._next_seq == 10
+
+
+def test_retention_drops_whole_old_partitions(tmp_path):
+    base = np.floor(time.time() / DAY) * DAY - 4 * DAY
+    store = HistoryStore(tmp_path / "h", partition_seconds=DAY, retention=2 * DAY)
+    for day in range(5):
+        store.append("baro", [base + day * DAY + 10.0], [1000.0 + day])
+    # The writer applies retention after each write: the first two days have
+    # ended more than two days ago
+    store.flush()
+    assert store.read("baro")[1][:, 0].tolist() == [1002.0, 1003.0, 1004.0]
+    assert store.stats()["removed_partitions"] == 2
+    assert store.apply_retention(now=base + 6 * DAY) == 2
+    assert [p.name for p in (tmp_path / "h").glob("p*")] == [f"p{int(base / DAY) + 4}"]
+    assert store.read("baro")[1][:, 0].tolist() == [1004.0]
+    store.close()
+
+
+def test_telemetry_and_entity_history(tmp_path, monkeypatch):
+    history = HistoryStore(tmp_path / "sensors", flush_rows=10)
+    store = TelemetryStore(history=history, flush_samples=4)
+    monkeypatch.setattr(telemetry_routes, "get_telemetry_store", lambda: store)
+    client = TestClient(app)
+    for k in range(20):
+        client.post("/api/telemetry/ingest", json={"sensorId": "t1", "timestamp": 1000 * k, "data": {"temp": k}})
+    store.flush()
+    history.flush()
+    r = client.get("/api/telemetry/history", params={"sensorId": "t1", "field": "temp", "start": 5000, "limit": 3})
+    assert r.json() == {"sensorId": "t1", "field": "temp", "t": [5000.0, 6000.0, 7000.0],
+                        "values": [5.0, 6.0, 7.0], "truncated": True}
+    assert client.get("/api/telemetry/stats").json()["history"]["rows"] == 20
+    history.close()
+
+    tracks = HistoryStore(tmp_path / "entities", fields=ENTITY_FIELDS)
+    sim = SimulationState()
+    sim.add_entities(["car-1"], "vehicle", position=[0.0, 0.0, 0.0], velocity=[1.0, 0.0, 0.0])
+    server = PhysicsServer(sim, tick_rate=10, history=tracks, history_interval=0.5)
+    for _ in range(20):
+        server.step()
+    tracks.flush()
+    body = TestClient(create_app(server)).get("/history/car-1").json()
+    assert len(body["t"]) == 4 and body["x"] == sorted(body["x"]) and body["vx"] == [1.0] * 4
+    tracks.close()
@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+
+from backend.src.services.http_client import HTTPClient, request_sync
+
+
+def test_retries_with_backoff_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        client = HTTPClient(retries=2, backoff=0.001, transport=httpx.MockTransport(handler))
+        try:
+            return await client.get("https://overpass.test/api")
+        finally:
+            await client.aclose()
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_per_host_limit_isolates_slow_upstream():
+    active = {"slow.test": 0, "fast.test": 0}
+    peak = {"slow.test": 0, "fast.test": 0}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.05 if host == "slow.test" else 0)
+        active[host] -= 1
+        return httpx.Response(200)
+
+    async def run():
+        client = HTTPClient(per_host=2, transport=httpx.MockTransport(handler))
+        try:
+            slow = [asyncio.ensure_future(client.get("https://slow.test/")) for _ in range(6)]
+            await asyncio.sleep(0.01)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await client.get("https://fast.test/")
+            fast_latency = loop.time() - start
+            await asyncio.gather(*slow)
+            return fast_latency
+        finally:
+            await client.aclose()
+
+    fast_latency = asyncio.run(run())
+    assert peak["slow.test"] == 2
+    # The fast host is not queued behind the slow host's requests
+    assert fast_latency < 0.05
+
+
+def test_request_sync_returns_transport_errors():
+    try:
+        request_sync("GET", "http://127.0.0.1:9/", retries=0, timeout=0.5)
+    except httpx.TransportError:
+        pass
+    else:
+        raise AssertionError("expected a transport error")
+
+
+def test_stream_retries_until_the_headers_arrive():
+    calls = []
+
+    def handler(request):
+        calls.append(request.content)
+        if len(calls) == 1:
+            return httpx.Response(429)
+        if len(calls) == 2:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, content=b'{"elements": []}')
+
+    async def run():
+        client = HTTPClient(retries=2, backoff=0.001, transport=httpx.MockTransport(handler))
+        try:
+            async with client.stream("POST", "https://overpass.test/api", content=b"query") as response:
+                return response.status_code, b"".join([chunk async for chunk in response.aiter_bytes()])
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == (200, b'{"elements": []}')
+    # The request body is sent again on every attempt
+    assert calls == [b"query"] * 3
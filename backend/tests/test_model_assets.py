@@ -0,0 +1,329 @@
+import base64
+import hashlib
+import io
+import json
+import struct
+import threading
+
+import numpy as np
+from fastapi.testclient import TestClient
+from flask import Flask
+
+import routes.objects as objects
+from backend.src.routes import assets_routes
+from backend.src.server import app
+from backend.src.services import model_assets
+from backend.src.services.mesh_lod import decimate, glb_bytes, load_mesh, mesh_bounds, vertex_normals
+from backend.src.services.model_assets import ModelAssets
+
+
+def _sphere(nu, nv):
+    """UV sphere of radius 1, outward-facing triangles."""
+    theta = np.linspace(0, np.pi, nv + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, nu, endpoint=False)
+    t, p = np.meshgrid(theta, phi, indexing="ij")
+    positions = np.column_stack((np.sin(t).ravel() * np.cos(p).ravel(), np.sin(t).ravel() * np.sin(p).ravel(),
+                                 np.cos(t).ravel()))
+    positions = np.vstack((positions, [[0, 0, 1], [0, 0, -1]]))
+    top, bottom, last = len(positions) - 2, len(positions) - 1, (nv - 2) * nu
+    triangles = []
+    for i in range(nv - 2):
+        for j in range(nu):
+            a, b = i * nu + j, i * nu + (j + 1) % nu
+            triangles += [(a, a + nu, b), (b, a + nu, b + nu)]
+    for j in range(nu):
+        triangles += [(top, j, (j + 1) % nu), (bottom, last + (j + 1) % nu, last + j)]
+    return positions, np.array(triangles)
+
+
+def _grid(n, noise, rng):
+    x, y = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1))
+    positions = np.column_stack((x.ravel(), y.ravel(), noise * rng.normal(size=x.size)))
+    a = (np.arange(n)[:, None] * (n + 1) + np.arange(n)).ravel()
+    triangles = np.concatenate([np.column_stack((a, a + 1, a + n + 2)), np.column_stack((a, a + n + 2, a + n + 1))])
+    return positions, triangles
+
+
+def test_readers_agree_across_formats(tmp_path):
+    positions, triangles = _sphere(12, 8)
+    corners = positions.astype("<f4")[triangles]
+    glb = glb_bytes(positions, triangles)
+    (tmp_path / "a.glb").write_bytes(glb)
+    (tmp_path / "a.stl").write_bytes(b"\0" * 80 + struct.pack("<I", len(triangles)) + b"".join(
+        b"\0" * 12 + c.tobytes() + b"\0\0" for c in corners))
+    (tmp_path / "b.stl").write_text("solid s\n" + "".join(
+        "facet normal 0 0 0\nouter loop\n" + "".join(f"vertex {x!r} {y!r} {z!r}\n" for x, y, z in c.tolist())
+        + "endloop\nendfacet\n" for c in corners) + "endsolid s\n")
+    # Quads where two triangles share a diagonal, plus v/vt/vn and negative references
+    obj = ["v {} {} {}".format(*p) for p in positions.tolist()]
+    obj += [f"f {a + 1}/1/1 {b + 1}//2 {c - len(positions)}" for a, b, c in triangles.tolist()]
+    (tmp_path / "a.obj").write_text("\n".join(obj))
+    header = (f"ply\nformat {{}} 1.0\nelement vertex {len(positions)}\nproperty float x\nproperty float y\n"
+              f"property float z\nelement face {len(triangles)}\nproperty list uchar int vertex_indices\nend_header\n")
+    (tmp_path / "a.ply").write_text(header.format("ascii") + "".join(
+        "{} {} {}\n".format(*p) for p in positions.astype("<f4").tolist()) + "".join(
+        "3 {} {} {}\n".format(*t) for t in triangles.tolist()))
+    (tmp_path / "b.ply").write_bytes(header.format("binary_little_endian").encode() + positions.astype("<f4").tobytes()
+                                     + b"".join(struct.pack("<B3i", 3, *t) for t in triangles.tolist()))
+    # glTF with nested node transforms and an embedded buffer
+    size = struct.unpack_from("<I", glb, 12)[0]
+    doc = json.loads(glb[20:20 + size])
+    doc["buffers"] = [{"byteLength": len(glb) - 28 - size,
+                       "uri": "data:application/octet-stream;base64," + base64.b64encode(glb[28 + size:]).decode()}]
+    doc["nodes"] = [{"children": [1], "translation": [10, 0, 0]}, {"mesh": 0, "scale": [2, 2, 2]}]
+    doc["scenes"] = [{"nodes": [0]}]
+    (tmp_path / "c.gltf").write_text(json.dumps(doc))
+
+    for name in ("a.glb", "a.stl", "b.stl", "a.obj", "a.ply", "b.ply"):
+        read, faces, _ = load_mesh(tmp_path / name)
+        assert (len(read), len(faces)) == (len(positions), len(triangles)), name
+        bounds = mesh_bounds(read)
+        np.testing.assert_allclose(bounds["min"], [-1, -1, -1], atol=1e-6)
+        np.testing.assert_allclose(bounds["radius"], 1.0, atol=1e-6)
+    read, faces, _ = load_mesh(tmp_path / "c.gltf")
+    np.testing.assert_allclose(mesh_bounds(read)["min"], [8, -2, -2], atol=1e-5)
+    np.testing.assert_allclose(mesh_bounds(read)["max"], [12, 2, 2], atol=1e-5)
+
+
+def test_decimation_keeps_surface_and_outline():
+    positions, triangles = _sphere(64, 48)
+    low_p, low_t = decimate(positions, triangles, len(triangles) // 10)
+    assert len(low_t) <= len(triangles) // 10 and len(low_t) > len(triangles) // 12
+    radius = np.linalg.norm(low_p, axis=1)
+    assert radius.max() < 1.02 and radius.min() > 0.99
+    # No flipped faces: every normal still points out of the sphere
+    a, b, c = (low_p[low_t[:, k]] for k in range(3))
+    assert (np.einsum("ij,ij->i", np.cross(b - a, c - a), a + b + c) > 0).all()
+    assert (np.einsum("ij,ij->i", vertex_normals(low_p, low_t), low_p) > 0).all()
+
+    # Open, exactly flat and slightly rough sheets keep their square outline
+    rng = np.random.default_rng(0)
+    for noise in (0.0, 0.001):
+        positions, triangles = _grid(60, noise, rng)
+        low_p, low_t = decimate(positions, triangles, 50)
+        assert len(low_t) <= 50
+        np.testing.assert_allclose(low_p[:, :2].min(axis=0), [0, 0], atol=2e-3)
+        np.testing.assert_allclose(low_p[:, :2].max(axis=0), [1, 1], atol=2e-3)
+
+
+def test_upload_returns_at_once_and_serves_levels_of_detail(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_assets, "log", lambda *a, **k: None)
+    assets = ModelAssets(tmp_path / "models", lod_ratios=(0.5, 0.1), min_triangles=50)
+    monkeypatch.setattr(assets_routes, "get_model_assets", lambda: assets)
+    release = threading.Event()
+    load = model_assets.load_mesh
+    monkeypatch.setattr(model_assets, "load_mesh", lambda path, **kw: release.wait(10) and load(path, **kw))
+    client = TestClient(app)
+    positions, triangles = _sphere(40, 30)
+    glb = glb_bytes(positions, triangles)
+
+    r = client.put("/api/assets/models/ball.glb", content=glb)
+    assert r.status_code == 202 and r.json()["status"] == "processing"
+    # Served unchanged until the levels exist
+    r = client.get("/api/assets/models/ball.glb", params={"maxTriangles": 100})
+    assert r.content == glb and r.headers["x-model-lod"] == "0"
+    assert r.headers["content-type"] == "model/gltf-binary"
+
+    release.set()
+    assets.wait(30)
+    meta = client.get("/api/assets/models/ball.glb/meta").json()
+    assert meta["status"] == "ready" and meta["triangles"] == len(triangles)
+    np.testing.assert_allclose(meta["bounds"]["max"], [1, 1, 1], atol=1e-6)
+    counts = [level["triangles"] for level in meta["levels"]]
+    assert counts[0] == len(triangles) and counts[1] <= len(triangles) // 2 and counts[2] <= len(triangles) // 10
+
+    r = client.get("/api/assets/models/ball.glb", params={"lod": 2})
+    assert r.headers["x-model-lod"] == "2"
+    (tmp_path / "lod.glb").write_bytes(r.content)
+    assert len(load_mesh(tmp_path / "lod.glb")[1]) == counts[2]
+    r = client.get("/api/assets/models/ball.glb", params={"maxTriangles": counts[1]})
+    assert r.headers["x-model-lod"] == "1"
+    assert client.get("/api/assets/models/ball.glb", params={"maxTriangles": 1}).headers["x-model-lod"] == "2"
+    assert client.get("/api/assets/models/ball.glb", params={"lod": 9}).headers["x-model-lod"] == "2"
+
+    assert client.put("/api/assets/models/junk.stl", content=b"not a mesh").status_code == 202
+    assets.wait(30)
+    assert client.get("/api/assets/models/junk.stl/meta").json()["status"] == "failed"
+    assert client.get("/api/assets/models/junk.stl").content == b"not a mesh"
+    assert client.put("/api/assets/models/..%2Fescape.glb", content=glb).status_code in (400, 404)
+    assert client.put("/api/assets/models/ball.glb.lod1.glb", content=glb).status_code == 400
+    assert client.put("/api/assets/models/notes.txt", content=b"x").status_code == 400
+    assert client.get("/api/assets/models/missing.glb").status_code == 404
+    listed = client.get("/api/assets/models").json()
+    assert [m["name"] for m in listed["models"]] == ["ball.glb", "junk.stl"] and listed["stats"]["failed"] == 1
+    assets.close()
+
+    # A model whose processing was cut short is processed when the store reopens
+    key = f"{meta['sha256']}.glb"
+    (tmp_path / "models" / "blobs" / key[:2] / f"{key}.meta.json").write_text(json.dumps({**meta, "status": "processing"}))
+    with ModelAssets(tmp_path / "models", lod_ratios=(0.5,), min_triangles=50) as reopened:
+        reopened.wait(30)
+        meta = reopened.metadata("ball.glb")
+        assert meta["status"] == "ready" and len(meta["levels"]) == 2
+
+
+def test_uploads_are_deduplicated_and_served_with_etags_and_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_assets, "log", lambda *a, **k: None)
+    assets = ModelAssets(tmp_path / "models", lod_ratios=(0.5,), min_triangles=50)
+    monkeypatch.setattr(assets_routes, "get_model_assets", lambda: assets)
+    client = TestClient(app)
+    glb = glb_bytes(*_sphere(40, 30))
+
+    first = client.put("/api/assets/models/ball.glb", content=glb).json()
+    again = client.put("/api/assets/models/copy.glb", content=glb).json()
+    assert not first["deduplicated"] and again["deduplicated"] and again["sha256"] == first["sha256"]
+    assets.wait(30)
+    stats = assets.stats()
+    assert (stats["models"], stats["blobs"], stats["processed"]) == (2, 1, 1)
+    assert stats["deduplicated_bytes"] == len(glb)
+    assert client.get("/api/assets/models/copy.glb/meta").json()["status"] == "ready"
+
+    r = client.get("/api/assets/models/copy.glb")
+    etag = r.headers["etag"]
+    assert r.content == glb and etag == f'"{first["sha256"]}"' and r.headers["cache-control"] == "no-cache"
+    r = client.get("/api/assets/models/copy.glb", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert r.status_code == 304 and not r.content and r.headers["etag"] == etag
+    r = client.get("/api/assets/models/copy.glb", params={"lod": 1}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] not in (etag, None)
+
+    r = client.get("/api/assets/models/ball.glb", headers={"Range": "bytes=4-11"})
+    assert r.status_code == 206 and r.content == glb[4:12]
+    assert r.headers["content-range"] == f"bytes 4-11/{len(glb)}"
+    r = client.get("/api/assets/models/ball.glb", headers={"Range": "bytes=4-11", "If-Range": '"stale"'})
+    assert r.status_code == 200 and r.content == glb
+    r = client.get("/api/assets/models/ball.glb", headers={"Range": f"bytes={len(glb)}-"})
+    assert r.status_code == 416
+
+    # A blob goes when the last name stops referring to it
+    blob = tmp_path / "models" / "blobs" / first["sha256"][:2] / f"{first['sha256']}.glb"
+    client.put("/api/assets/models/ball.glb", content=b"solid empty\nendsolid empty\n")
+    assert blob.is_file()
+    client.put("/api/assets/models/copy.glb", content=glb[:-4] + b"    ")
+    assets.wait(30)
+    assert not list(blob.parent.glob(f"{first['sha256']}*"))
+    assert client.get("/api/assets/models/ball.glb").content.startswith(b"solid")
+
+    # A .gltf finds its .bin among the uploads by the name it refers to
+    size = struct.unpack_from("<I", glb, 12)[0]
+    doc = json.loads(glb[20:20 + size])
+    doc["buffers"] = [{"byteLength": len(glb) - 28 - size, "uri": "ball.bin"}]
+    client.put("/api/assets/models/ball.gltf", content=json.dumps(doc))
+    assets.wait(30)
+    assert client.get("/api/assets/models/ball.gltf/meta").json()["status"] == "failed"
+    assert client.put("/api/assets/models/ball.bin", content=glb[28 + size:]).json()["status"] == "stored"
+    assert client.put("/api/assets/models/ball.gltf", content=json.dumps(doc)).json()["deduplicated"]
+    assets.wait(30)
+    assert client.get("/api/assets/models/ball.gltf/meta").json()["status"] == "ready"
+    assets.close()
+
+    # Uploads of the old flat layout move into the store when it opens
+    (tmp_path / "old").mkdir()
+    (tmp_path / "old" / "old.glb").write_bytes(glb)
+    (tmp_path / "old" / "old.glb.meta.json").write_text("{}")
+    with ModelAssets(tmp_path / "old", lod_ratios=(0.5,), min_triangles=50) as migrated:
+        migrated.wait(30)
+        assert migrated.metadata("old.glb")["status"] == "ready"
+        assert sorted(p.name for p in (tmp_path / "old").iterdir()) == ["blobs", "names"]
+
+
+def test_flask_upload_form_builds_and_serves_levels_of_detail(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_assets, "log", lambda *a, **k: None)
+    flask_app = Flask(__name__)
+    flask_app.config["UPLOAD_FOLDER"] = str(tmp_path / "uploads")
+    flask_app.register_blueprint(objects.objects_bp)
+    client = flask_app.test_client()
+    positions, triangles = _sphere(40, 30)
+    glb = glb_bytes(positions, triangles)
+
+    r = client.post("/upload-model", data={"model": (io.BytesIO(glb), "ball.glb")})
+    assert r.status_code == 302
+    assets = objects._stores[(tmp_path / "uploads").resolve()]
+    try:
+        (stored,) = [m["name"] for m in assets.models()]
+        assert objects.display_name_from_stored(stored) == "ball.glb"
+        assets.wait(30)
+        assert "3 LODs" in client.get("/models").get_data(as_text=True)
+
+        r = client.get(f"/models/{stored}")
+        assert r.data == glb and r.headers["X-Model-LOD"] == "0"
+        assert r.headers["X-Model-Triangles"] == str(len(triangles))
+        r = client.get(f"/models/{stored}", query_string={"maxTriangles": len(triangles) // 4})
+        assert r.headers["X-Model-LOD"] == "2"
+        (tmp_path / "lod.glb").write_bytes(r.data)
+        assert len(load_mesh(tmp_path / "lod.glb")[1]) == int(r.headers["X-Model-Triangles"])
+        assert client.get(f"/models/{stored}", query_string={"lod": 9}).headers["X-Model-LOD"] == "3"
+        assert client.get(f"/models/{stored}", query_string={"lod": -1}).status_code == 400
+
+        # Formats without levels are stored and served as they are
+        r = client.post("/upload-model", data={"model": (io.BytesIO(b"<robot/>"), "arm.urdf")})
+        assert r.status_code == 302
+        (urdf,) = [m["name"] for m in assets.models() if m["name"].endswith(".urdf")]
+        assert client.get(f"/models/{urdf}").data == b"<robot/>"
+        assert client.post("/upload-model", data={"model": (io.BytesIO(b"x"), "notes.txt")}).status_code == 400
+        assert client.get("/models/missing.glb").status_code == 404
+    finally:
+        objects._stores.pop((tmp_path / "uploads").resolve()).close()
+
+
+def test_flask_uploads_are_named_by_content_and_served_with_etags_and_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_assets, "log", lambda *a, **k: None)
+    flask_app = Flask(__name__)
+    flask_app.config["UPLOAD_FOLDER"] = str(tmp_path / "uploads")
+    flask_app.register_blueprint(objects.objects_bp)
+    client = flask_app.test_client()
+    glb = glb_bytes(*_sphere(40, 30))
+
+    for name in ("ball.glb", "ball.glb", "copy.glb"):
+        assert client.post("/upload-model", data={"model": (io.BytesIO(glb), name)}).status_code == 302
+    client.post("/upload-model", data={"model": (io.BytesIO(glb[:-4] + b"    "), "ball.glb")})
+    assets = objects._stores[(tmp_path / "uploads").resolve()]
+    try:
+        names = [m["name"] for m in assets.models()]
+        digest = hashlib.sha256(glb).hexdigest()
+        # The same bytes under the same name are one model; under two names one blob
+        assert len(names) == 3 and f"ball__{digest[:16]}.glb" in names and f"copy__{digest[:16]}.glb" in names
+        assert assets.stats()["blobs"] == 2 and assets.deduplicated == 2
+
+        r = client.get(f"/models/ball__{digest[:16]}.glb")
+        etag = r.headers["ETag"]
+        assert r.data == glb and etag == f'"{digest}"' and r.headers["Cache-Control"] == "no-cache"
+        r = client.get(f"/models/copy__{digest[:16]}.glb", headers={"If-None-Match": f'"other", {etag}'})
+        assert r.status_code == 304 and not r.data and r.headers["ETag"] == etag
+
+        r = client.get(f"/models/ball__{digest[:16]}.glb", headers={"Range": "bytes=4-11"})
+        assert r.status_code == 206 and r.data == glb[4:12]
+        assert r.headers["Content-Range"] == f"bytes 4-11/{len(glb)}"
+        r = client.get(f"/models/ball__{digest[:16]}.glb", headers={"Range": "bytes=4-11", "If-Range": '"stale"'})
+        assert r.status_code == 200 and r.data == glb
+        r = client.get(f"/models/ball__{digest[:16]}.glb", headers={"Range": f"bytes={len(glb)}-"})
+        assert r.status_code == 416
+    finally:
+        objects._stores.pop((tmp_path / "uploads").resolve()).close()
+
+
+def test_flask_gltf_finds_its_external_buffer(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_assets, "log", lambda *a, **k: None)
+    flask_app = Flask(__name__)
+    flask_app.config["UPLOAD_FOLDER"] = str(tmp_path / "uploads")
+    flask_app.register_blueprint(objects.objects_bp)
+    client = flask_app.test_client()
+    positions, triangles = _sphere(40, 30)
+    glb = glb_bytes(positions, triangles)
+    size = struct.unpack_from("<I", glb, 12)[0]
+    doc = json.loads(glb[20:20 + size])
+    buffer = glb[28 + size:]
+    doc["buffers"] = [{"byteLength": len(buffer), "uri": "scene.bin"}]
+
+    for name, data in (("scene.bin", buffer), ("scene.gltf", json.dumps(doc).encode())):
+        assert client.post("/upload-model", data={"model": (io.BytesIO(data), name)}).status_code == 302
+    assets = objects._stores[(tmp_path / "uploads").resolve()]
+    try:
+        assets.wait(30)
+        (gltf,) = [m for m in assets.models() if m["name"].endswith(".gltf")]
+        assert gltf["name"].startswith("scene__") and gltf["status"] == "ready"
+        assert gltf["triangles"] == len(triangles)
+        # The browser resolves the buffer relative to the .gltf URL
+        assert client.get("/models/scene.bin").data == buffer
+        assert client.get(f"/models/{gltf['name']}", query_string={"lod": 1}).headers["X-Model-LOD"] == "1"
+    finally:
+        objects._stores.pop((tmp_path / "uploads").resolve()).close()
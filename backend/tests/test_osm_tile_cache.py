@@ -0,0 +1,108 @@
+import asyncio
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import unquote_plus
+
+import pytest
+
+from backend.src.services import osm_services
+from backend.src.services.osm_tile_cache import OverpassTileCache
+
+# A few nodes around Times Square plus one way ~3 km away
+ELEMENTS = [
+    {"type": "node", "id": 1, "lat": 40.7580, "lon": -73.9855, "tags": {"amenity": "cafe"}},
+    {"type": "node", "id": 2, "lat": 40.7585, "lon": -73.9850},
+    {"type": "node", "id": 3, "lat": 40.7620, "lon": -73.9800},
+    {
+        "type": "way", "id": 10, "tags": {"highway": "primary"},
+        "bounds": {"minlat": 40.7300, "minlon": -73.9950, "maxlat": 40.7310, "maxlon": -73.9940},
+        "geometry": [{"lat": 40.7300, "lon": -73.9950}, {"lat": 40.7310, "lon": -73.9940}],
+    },
+]
+
+BBOX = re.compile(r"node\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)")
+
+
+@pytest.fixture
+def overpass_stub(monkeypatch):
+    """Local stand-in for the Overpass API answering bbox queries."""
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = unquote_plus(self.rfile.read(int(self.headers["Content-Length"])).decode())
+            s, w, n, e = map(float, BBOX.search(body).groups())
+            calls.append((s, w, n, e))
+            hits = []
+            for el in ELEMENTS:
+                lat = el.get("lat", el.get("bounds", {}).get("minlat"))
+                lon = el.get("lon", el.get("bounds", {}).get("minlon"))
+                if s <= lat <= n and w <= lon <= e:
+                    hits.append(el)
+            payload = json.dumps({"elements": hits}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(osm_services, "OSM_OVERPASS_URL", f"http://127.0.0.1:{server.server_port}/")
+    yield calls
+    server.shutdown()
+
+
+def test_radius_query_reuses_cached_tiles(tmp_path, overpass_stub):
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+
+    first = asyncio.run(cache.query(40.7580, -73.9855, 200))
+    assert {e["id"] for e in first} == {1, 2}
+    assert len(overpass_stub) == 1
+
+    # Same spot and a small pan are answered from cache
+    asyncio.run(cache.query(40.7580, -73.9855, 200))
+    panned = asyncio.run(cache.query(40.7582, -73.9853, 200))
+    assert len(overpass_stub) == 1
+    assert {e["id"] for e in panned} == {1, 2}
+
+    # The cache survives a restart
+    cache.close()
+    reopened = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+    assert {e["id"] for e in asyncio.run(reopened.query(40.7580, -73.9855, 200))} == {1, 2}
+    assert len(overpass_stub) == 1
+
+
+def test_only_missing_tiles_are_fetched(tmp_path, overpass_stub):
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+    asyncio.run(cache.query(40.7580, -73.9855, 100))
+    cached = len(cache)
+    result = asyncio.run(cache.query(40.7450, -73.9900, 2500))
+    assert len(overpass_stub) == 2
+    assert {e["id"] for e in result} == {1, 2, 3, 10}
+    # Tiles from the first query were reused, the rest fetched in one call
+    assert cache.hits == cached
+    assert len(cache) == cache.misses
+
+
+def test_ttl_and_lru_eviction(tmp_path, overpass_stub):
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox, ttl=0, max_tiles=2)
+    asyncio.run(cache.query(40.7580, -73.9855, 50))
+    asyncio.run(cache.query(40.7580, -73.9855, 50))
+    assert len(overpass_stub) == 2  # expired immediately, so fetched again
+    assert len(cache) <= 2
+
+
+def test_fetch_osm_objects_uses_tile_cache(tmp_path, overpass_stub, monkeypatch):
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+    monkeypatch.setattr(osm_services, "_tile_cache", cache)
+    monkeypatch.setattr(osm_services, "OSM_CACHE_ENABLED", True)
+    assert {e["id"] for e in asyncio.run(osm_services.fetch_osm_objects(40.7580, -73.9855, 200))} == {1, 2}
+    asyncio.run(osm_services.fetch_osm_objects(40.7580, -73.9855, 200))
+    assert len(overpass_stub) == 1
@@ -0,0 +1,60 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from skyfield.api import EarthSatellite, load, wgs84
+
+from backend.src.server import app
+from backend.src.services import satellite_orbit_service
+from backend.src.services.pass_prediction import predict_passes
+from backend.src.services.satellite_orbit_service import TLECatalog, iso
+from backend.tests.test_satellite_orbit_service import T0, TLE
+
+# Observer in New York
+LAT, LNG = 40.7128, -74.0060
+
+
+def test_passes_match_skyfield_events():
+    catalog = TLECatalog.from_text(TLE)
+    duration = 12 * 3600.0
+    found, _ = predict_passes(
+        lambda times: catalog.propagate_teme(times)[1], len(catalog),
+        LAT, LNG, 0.0, T0, duration, 60.0, 10.0,
+    )
+    assert len(found["sat"]) > 0
+
+    ts = load.timescale()
+    observer = wgs84.latlon(LAT, LNG)
+    t0 = ts.utc(2024, 1, 1, 12)
+    t1 = ts.utc(2024, 1, 1, 12, 0, duration)
+    for k, satrec in enumerate(catalog.satrecs):
+        sat = EarthSatellite.from_satrec(satrec, ts)
+        times, events = sat.find_events(observer, t0, t1, altitude_degrees=10.0)
+        # Unix seconds from skyfield's UTC (no leap seconds in the window)
+        expected = {0: [], 1: [], 2: []}
+        for t, event in zip(times, events):
+            expected[int(event)].append(T0 + (t.tt - t0.tt) * 86400.0)
+        mine = found["sat"] == k
+        for key, event in (("rise", 0), ("culmination", 1), ("set", 2)):
+            got = found[key][mine]
+            got = got[~np.isnan(got)]
+            assert len(got) == len(expected[event])
+            np.testing.assert_allclose(got, expected[event], atol=2.0)
+
+
+def test_passes_endpoint(monkeypatch):
+    monkeypatch.setattr(satellite_orbit_service, "_catalog", TLECatalog.from_text(TLE))
+    client = TestClient(app)
+    r = client.get("/api/satellites/passes", params={
+        "lat": LAT, "lng": LNG, "start": iso(T0), "duration": 12 * 3600, "min_elevation": 10,
+    })
+    assert r.status_code == 200
+    body = r.json()
+    assert body["passes"]
+    culminations = [p["culmination"] for p in body["passes"]]
+    assert culminations == sorted(culminations)
+    for p in body["passes"]:
+        assert p["max_elevation"] >= 10
+        assert p["rise"] is None or p["rise"] < p["culmination"]
+        assert p["set"] is None or p["culmination"] < p["set"]
+
+    r = client.get("/api/satellites/passes", params={"lat": LAT, "lng": LNG, "ids": "25544", "start": T0})
+    assert {p["id"] for p in r.json()["passes"]} <= {25544}
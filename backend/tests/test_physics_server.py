@@ -0,0 +1,67 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.src.simulation.physics_server import ClientChannel, PhysicsServer, create_app
+
+
+def test_slow_client_queue_drops_oldest_snapshot():
+    async def run():
+        client = ClientChannel(websocket=None, max_pending=2)
+        for i in range(5):
+            client.offer(f"snapshot-{i}")
+        return client.dropped, [client.queue.get_nowait() for _ in range(client.queue.qsize())]
+
+    dropped, pending = asyncio.run(run())
+    assert dropped == 3
+    assert pending == ["snapshot-3", "snapshot-4"]
+
+
+def test_step_applies_queued_inputs():
+    server = PhysicsServer(tick_rate=10)
+    server.submit_input({"id": "p1", "key": "d", "ts": 0})
+    server.step()
+    player = server.sim.entities["p1"]
+    assert player.velocity["x"] == 2.0
+    assert abs(player.position["x"] - 0.2) < 1e-9
+
+
+def test_websocket_streams_snapshots_with_player_input():
+    server = PhysicsServer(tick_rate=200)
+    with TestClient(create_app(server)) as client:
+        with client.websocket_connect("/") as ws:
+            ws.send_json({"type": "input", "payload": {"id": "p1", "key": "w", "ts": 0}})
+            for _ in range(200):
+                msg = ws.receive_json()
+                assert msg["type"] == "snapshot"
+                bodies = {b["id"]: b for b in msg["payload"]}
+                if "p1" in bodies:
+                    break
+            assert bodies["p1"]["velocity"]["y"] == 2.0
+    assert not server.clients
+
+
+def test_binary_subscription_switches_to_deltas_after_ack():
+    from backend.src.simulation.snapshot_codec import SnapshotDecoder
+
+    server = PhysicsServer(tick_rate=200, keyframe_interval=1000)
+    server.sim.add_entities(["a", "b"], "vehicle")
+    dec = SnapshotDecoder()
+    with TestClient(create_app(server)) as client:
+        with client.websocket_connect("/") as ws:
+            ws.send_json({"type": "subscribe", "format": "binary"})
+            while True:
+                msg = ws.receive()
+                if msg.get("bytes"):
+                    frame = dec.decode(msg["bytes"])
+                    break
+            assert frame.keyframe and len(frame) == 2
+            ws.send_json({"type": "ack", "tick": frame.tick})
+            for _ in range(200):
+                msg = ws.receive()
+                if msg.get("bytes"):
+                    frame = dec.decode(msg["bytes"])
+                    if not frame.keyframe:
+                        break
+            assert not frame.keyframe and frame.baseline in dec.keyframes
+            assert len(frame) == 2
@@ -1,5 +1,12 @@
+import asyncio
+
+import numpy as np
 from fastapi.testclient import TestClient
+
+from backend.src.routes import public_data_routes
 from backend.src.server import app
+from backend.src.services import satellite_orbit_service
+from backend.src.services.satellite_orbit_service import TLECatalog
 
 client = TestClient(app)
 
@@ -11,3 +18,23 @@ def test_public_data_with_satellites_returns_items():
     assert isinstance(data, list)
     # Ensure at least one satellite or osm item present (satellites param should add items)
     assert any(item.get("type") == "satellite" for item in data)
+
+
+def test_satellites_are_those_overhead_and_capped(monkeypatch):
+    T0 = 1704110400.0
+    TLE = ("ISS (ZARYA)\n1 25544U 98067A   24001.50000000  .00016717  00000-0  30159-3 0  9993\n"
+           "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.49815350432195\n"
+           "NOAA 19\n1 33591U 09005A   24001.52000000  .00000201  00000-0  13371-3 0  9991\n"
+           "2 33591  99.0967  78.4012 0013420 206.0123 154.0345 14.12901248764012\n")
+    monkeypatch.setattr(satellite_orbit_service, "_catalog", TLECatalog.from_text(TLE))
+    monkeypatch.setattr(public_data_routes, "PUBLIC_DATA_SATELLITE_MIN_ELEVATION", -90.0)
+    monkeypatch.setattr(public_data_routes, "PUBLIC_DATA_SATELLITE_LIMIT", 1)
+    catalog = satellite_orbit_service._catalog
+    lon, lat, _ = catalog.positions([T0])
+    # Right under the ISS: it is the one satellite returned, at the zenith
+    items = asyncio.run(public_data_routes._satellite_items(float(lat[0, 0]), float(lon[0, 0]), T0))
+    assert [item["id"] for item in items] == [25544] and items[0]["elevation"] > 89
+    monkeypatch.setattr(public_data_routes, "PUBLIC_DATA_SATELLITE_MIN_ELEVATION", 0.0)
+    antipode = asyncio.run(public_data_routes._satellite_items(-float(lat[0, 0]), float(lon[0, 0]) + 180, T0))
+    assert 25544 not in [item.get("id") for item in antipode]
+    assert np.isfinite([item["lat"] for item in items]).all()
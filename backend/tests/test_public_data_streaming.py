@@ -0,0 +1,151 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.server import app
+from backend.src.services import osm_services
+from backend.src.services.http_client import HTTPClient, set_http_client
+from backend.src.services.json_stream import iter_array_items
+from backend.src.services.osm_tile_cache import OverpassTileCache
+from backend.tests.test_osm_tile_cache import ELEMENTS, overpass_stub  # noqa: F401 (fixture)
+
+DOCUMENT = {
+    "version": 0.6,
+    "osm3s": {"copyright": "data [elements] ]"},
+    "elements": [
+        {"type": "node", "id": i, "lat": 40.758 + i * 1e-6, "lon": -73.9855, "tags": {"name": "Café \"]}\""}}
+        for i in range(200)
+    ] + [{"type": "way", "id": 900, "geometry": [{"lat": 40.7581, "lon": -73.9851}, {"lat": 40.7582, "lon": -73.985}]}],
+    "remark": 1.25e-3,
+}
+
+
+def _parse(data, size):
+    async def chunks():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+
+    async def run():
+        return [item async for item in iter_array_items(chunks(), "elements")]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_incremental_parser_handles_any_chunking(size):
+    raw = json.dumps(DOCUMENT).encode()
+    assert _parse(raw, size) == DOCUMENT["elements"]
+
+
+def test_incremental_parser_rejects_truncated_input():
+    raw = json.dumps(DOCUMENT).encode()
+    with pytest.raises(ValueError):
+        _parse(raw[:-40], 64)
+
+
+@pytest.fixture
+def chunked_overpass(monkeypatch):
+    """Overpass stand-in that sends its answer in small chunks."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            payload = json.dumps(DOCUMENT).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(payload), 512):
+                part = payload[i:i + 512]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(osm_services, "OSM_OVERPASS_URL", f"http://127.0.0.1:{server.server_port}/")
+    monkeypatch.setattr(osm_services, "OSM_CACHE_ENABLED", False)
+    yield
+    server.shutdown()
+
+
+def test_ndjson_mode_streams_normalized_records(chunked_overpass):
+    client = TestClient(app)
+    params = {"lat": 40.758, "lng": -73.9855, "radius": 300}
+    with client.stream("GET", "/api/public-data/", params={**params, "format": "ndjson"}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in r.iter_lines() if line]
+    assert len(records) == 201
+    assert records[0] == {"type": "node", "id": 0, "lat": 40.758, "lon": -73.9855}
+    assert records[-1] == {"type": "way", "id": 900, "lat": 40.7581, "lon": -73.9851}
+
+    # Same records as the buffered JSON mode
+    assert client.get("/api/public-data/", params=params).json() == records
+
+
+def test_tile_cache_stream_matches_query(tmp_path, overpass_stub):  # noqa: F811
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+
+    async def collect():
+        return [el async for el in cache.stream(40.7580, -73.9855, 200)]
+
+    cold = asyncio.run(collect())
+    warm = asyncio.run(collect())
+    assert {e["id"] for e in cold} == {e["id"] for e in warm} == {1, 2}
+    assert len(overpass_stub) == 1
+    assert sorted(e["id"] for e in asyncio.run(cache.query(40.7580, -73.9855, 200))) == [1, 2]
+
+
+def test_tile_cache_stream_emits_missing_tiles_while_they_download(tmp_path):
+    calls = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def fetch_stream(south, west, north, east):
+            calls.append((south, west, north, east))
+            yield ELEMENTS[0]
+            await release.wait()
+            yield ELEMENTS[1]
+
+        cache = OverpassTileCache(tmp_path / "tiles.sqlite", None, fetch_stream=fetch_stream)
+        first = cache.stream(40.7580, -73.9855, 200)
+        # The first element arrives before the download has finished
+        assert (await first.__anext__())["id"] == 1
+        # A concurrent query for the same tiles shares the fetch
+        other = asyncio.ensure_future(cache.query(40.7580, -73.9855, 200))
+        await asyncio.sleep(0)
+        release.set()
+        rest = [el["id"] async for el in first]
+        return rest, sorted(el["id"] for el in await other)
+
+    rest, shared = asyncio.run(run())
+    assert rest == [2] and shared == [1, 2] and len(calls) == 1
+
+
+def test_overpass_fetches_are_retried_before_streaming(monkeypatch):
+    statuses = [429, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        return httpx.Response(status, content=json.dumps(DOCUMENT).encode() if status == 200 else b"busy")
+
+    async def run():
+        client = HTTPClient(retries=2, backoff=0.001, transport=httpx.MockTransport(handler))
+        set_http_client(client)
+        try:
+            return await osm_services.fetch_osm_bbox(40.75, -73.99, 40.76, -73.98)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == DOCUMENT["elements"] and not statuses
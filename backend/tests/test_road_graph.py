@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.server import app
+from backend.src.services import osm_services, road_graph
+from backend.src.services.http_client import HTTPClient, set_http_client
+from backend.src.services.road_graph import (
+    RoadGraph,
+    close_eta_pool,
+    graph_key,
+    load_or_build,
+    parse_point,
+    route_action,
+)
+
+ORIGIN = (40.7580, -73.9855)
+STEP = 0.001  # ~111 m north-south, ~84 m east-west
+
+
+def _way(way_id, tags, coords):
+    return {"type": "way", "id": way_id, "tags": tags,
+            "geometry": [{"lat": lat, "lon": lon} for lat, lon in coords]}
+
+
+def _grid(n=8, seed=0):
+    """n x n street grid with randomly mixed speed limits and a oneway avenue."""
+    rng = np.random.default_rng(seed)
+    ways = []
+    for i in range(n):
+        lat = ORIGIN[0] + i * STEP
+        for j in range(n - 1):
+            tags = {"highway": "residential", "maxspeed": str(rng.integers(20, 70))}
+            if i == 3:
+                tags["oneway"] = "yes"  # westbound traffic must detour
+            lon = ORIGIN[1] + j * STEP
+            ways.append(_way(len(ways), tags, [(lat, lon), (lat, lon + STEP / 2), (lat, lon + STEP)]))
+    for j in range(n):
+        lon = ORIGIN[1] + j * STEP
+        coords = [(ORIGIN[0] + i * STEP, lon) for i in range(n)]
+        ways.append(_way(len(ways), {"highway": "tertiary"}, coords))
+    ways.append(_way(len(ways), {"building": "yes"}, [(ORIGIN[0], ORIGIN[1]), (ORIGIN[0] + STEP, ORIGIN[1])]))
+    return ways
+
+
+def _dijkstra(graph, source):
+    dist = [float("inf")] * graph.n_nodes
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(graph.indptr[u], graph.indptr[u + 1]):
+            v, nd = int(graph.edge_target[e]), d + float(graph.edge_weight[e])
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return RoadGraph.from_elements(_grid())
+
+
+def test_compiles_junctions_and_oneways(grid):
+    assert grid.n_nodes == 64  # mid-block shape points are not junctions
+    # 8 rows x 7 blocks (one direction on the oneway row) + 8 columns x 7 blocks, both ways
+    assert grid.n_edges == 2 * (7 * 7) + 7 + 2 * (8 * 7)
+
+
+def test_node_routes_match_dijkstra(grid):
+    reference = _dijkstra(grid, 0)
+    hierarchy = RoadGraph.from_elements(_grid())
+    hierarchy.build_hierarchy()
+    lat, lon = grid.node_lat, grid.node_lon
+    for target in range(1, grid.n_nodes, 5):
+        for g in (grid, hierarchy):
+            route = g.route(lat[0], lon[0], lat[target], lon[target])
+            assert route["duration_s"] == pytest.approx(reference[target], abs=0.05)
+            assert route["polyline"][0] == pytest.approx([lon[0], lat[0]])
+            assert route["polyline"][-1] == pytest.approx([lon[target], lat[target]])
+
+
+def test_oneway_forces_a_detour(grid):
+    lat = ORIGIN[0] + 3 * STEP
+    east = grid.route(lat, ORIGIN[1] + 0.2 * STEP, lat, ORIGIN[1] + 2.8 * STEP)
+    west = grid.route(lat, ORIGIN[1] + 2.8 * STEP, lat, ORIGIN[1] + 0.2 * STEP)
+    assert east["distance_m"] == pytest.approx(2.6 * STEP * 111_320 * np.cos(np.radians(lat)), rel=0.01)
+    assert west["distance_m"] > east["distance_m"] + 150  # around the block
+    assert grid.route(0.0, 0.0, lat, ORIGIN[1]) is None  # nowhere near a road
+
+
+def test_disk_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(road_graph, "ROAD_GRAPH_CACHE_DIR", str(tmp_path))
+    elements = _grid(4)
+    key = graph_key(elements)
+    built = load_or_build(key, elements, hierarchy=True)
+    assert (tmp_path / f"{key}-ch.npz").exists()
+    cached = load_or_build(key, [], hierarchy=True)  # no rebuild from the (empty) elements
+    assert cached.n_edges == built.n_edges
+    a, b = (ORIGIN[0], ORIGIN[1] + 0.5 * STEP), (ORIGIN[0] + 3 * STEP, ORIGIN[1] + 2.5 * STEP)
+    assert cached.route(*a, *b) == built.route(*a, *b)
+
+
+def test_eta_matrix_matches_single_routes(grid):
+    rng = np.random.default_rng(1)
+    hierarchy = RoadGraph.from_elements(_grid()).build_hierarchy()
+    origins = [tuple(np.add(ORIGIN, rng.uniform(0, 7 * STEP, 2))) for _ in range(12)]
+    destinations = [tuple(np.add(ORIGIN, rng.uniform(0, 7 * STEP, 2))) for _ in range(9)] + [(0.0, 0.0)]
+    destinations.append((origins[0][0], origins[0][1] + 1e-5))  # same piece as an origin
+    expected = [[grid.route(*a, *b) for b in destinations] for a in origins]
+    for g in (grid, hierarchy):
+        seconds, metres = g.eta_matrix(origins, destinations)
+        assert seconds.shape == (12, 11)
+        assert np.isnan(seconds[:, 9]).all() and np.isnan(metres[:, 9]).all()
+        for i, row in enumerate(expected):
+            for j, route in enumerate(row):
+                if route is not None:
+                    assert seconds[i, j] == pytest.approx(route["duration_s"], abs=0.05)
+                    assert metres[i, j] == pytest.approx(route["distance_m"], abs=0.05)
+
+
+def test_parse_point():
+    assert parse_point({"lat": "40.5", "lng": -73}) == (40.5, -73.0)
+    assert parse_point([40.5, -73.0]) == (40.5, -73.0)
+    assert parse_point({"lat": 91, "lon": 0}) is None
+    assert parse_point(None) is None
+
+
+@pytest.fixture
+def osm_grid(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_fetch(lat, lng, radius, highways, timeout=None):
+        calls.append((lat, lng, radius))
+        return _grid()
+
+    monkeypatch.setattr(osm_services, "fetch_osm_roads", fake_fetch)
+    monkeypatch.setattr(road_graph, "ROAD_GRAPH_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(road_graph, "_graphs", type(road_graph._graphs)())
+    monkeypatch.setattr(road_graph, "_areas", type(road_graph._areas)())
+    return calls
+
+
+def test_route_action_adds_a_route(osm_grid):
+    start, goal = (ORIGIN[0] + 0.5 * STEP, ORIGIN[1]), (ORIGIN[0] + 6 * STEP, ORIGIN[1] + 5.5 * STEP)
+    action = asyncio.run(route_action({"type": "drive", "lat": goal[0], "lon": goal[1]}, start))
+    assert action["route"]["duration_s"] > 0
+    assert action["route"]["polyline"][-1] == pytest.approx([goal[1], goal[0]])
+    again = asyncio.run(route_action({"type": "drive", "lat": goal[0], "lon": goal[1]}, start))
+    assert again["route"] == action["route"]
+    assert len(osm_grid) == 1 and len(road_graph._graphs) == 1  # fetched and compiled once
+
+    far = asyncio.run(route_action({"type": "drive", "lat": 0.0, "lon": 0.0}, start))
+    assert "route" not in far and len(osm_grid) == 1
+
+
+def test_vehicle_action_endpoint(osm_grid):
+    client = TestClient(app)
+    body = {"type": "drive", "lat": ORIGIN[0] + 7 * STEP, "lon": ORIGIN[1] + 7 * STEP,
+            "origin": {"lat": ORIGIN[0], "lon": ORIGIN[1]}}
+    r = client.post("/api/simulation/vehicle/action", json=body)
+    assert r.status_code == 200
+    assert r.json()["applied_action"]["route"]["distance_m"] > 0
+    r = client.post("/api/simulation/vehicle/action", json={"type": "brake"})
+    assert r.json() == {"status": "ok", "applied_action": {"type": "brake"}}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_eta_matrix_endpoint(osm_grid, monkeypatch, workers):
+    monkeypatch.setattr(road_graph, "ETA_WORKERS", workers)
+    monkeypatch.setattr(road_graph, "ETA_POOL_MIN_ORIGINS", 2)
+    client = TestClient(app)
+    origins = [{"lat": ORIGIN[0] + i * STEP, "lon": ORIGIN[1]} for i in range(3)]
+    destinations = [[ORIGIN[0], ORIGIN[1] + 6 * STEP], [0.0, 0.0]]
+    try:
+        r = client.post("/api/routing/eta-matrix", json={"origins": origins, "destinations": destinations[:1]})
+        body = r.json()
+        assert r.status_code == 200 and body["origins"] == 3 and body["destinations"] == 1
+        assert (road_graph._pool is not None) == (workers > 1)
+        graph = RoadGraph.from_elements(_grid())
+        for i, origin in enumerate(origins):
+            route = graph.route(origin["lat"], origin["lon"], *destinations[0])
+            assert body["durations_s"][i] == [route["duration_s"]]
+            assert body["distances_m"][i] == [route["distance_m"]]
+    finally:
+        close_eta_pool()
+    r = client.post("/api/routing/eta-matrix", json={"origins": origins, "destinations": destinations})
+    assert r.status_code == 400  # (0, 0) is far outside any routable area
+    r = client.post("/api/routing/eta-matrix", json={"origins": origins, "destinations": [{"lat": 1}]})
+    assert r.status_code == 400
+
+
+def test_road_data_comes_from_a_highway_only_query(monkeypatch):
+    bodies = []
+
+    def handler(request):
+        bodies.append(request.content.decode())
+        return httpx.Response(200, json={"elements": _grid()})
+
+    async def run():
+        client = HTTPClient(transport=httpx.MockTransport(handler))
+        set_http_client(client)
+        try:
+            return await osm_services.fetch_osm_roads(40.75, -73.99, 6000.0, road_graph.DRIVABLE, timeout=60)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == _grid()
+    (query,) = bodies
+    assert "[timeout:60]" in query and 'way(around:6000.0,40.75,-73.99)["highway"~"^(' in query
+    assert "node(" not in query and "relation(" not in query and "|residential|" in query
+    # The largest area route_area accepts by default
+    assert road_graph.route_area([(40.70, -74.00), (40.76, -73.94)])[2] == 12000.0
+    assert road_graph.route_area([(40.65, -74.05), (40.80, -73.90)]) is None
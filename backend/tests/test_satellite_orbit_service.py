@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+from skyfield.api import EarthSatellite, load, wgs84
+
+from backend.src.server import app
+from backend.src.services import satellite_orbit_service
+from backend.src.services.satellite_orbit_service import TLECatalog, parse_tle
+
+TLE = """ISS (ZARYA)
+1 25544U 98067A   24001.50000000  .00016717  00000-0  30159-3 0  9993
+2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.49815350432195
+NOAA 19
+1 33591U 09005A   24001.52000000  .00000201  00000-0  13371-3 0  9991
+2 33591  99.0967  78.4012 0013420 206.0123 154.0345 14.12901248764012
+"""
+
+T0 = 1704110400.0  # 2024-01-01T12:00:00Z
+
+
+def test_parse_tle_accepts_named_and_bare_sets():
+    records = parse_tle(TLE + "1 25544U 98067A   24001.50000000  .00016717  00000-0  30159-3 0  9993\n"
+                              "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.49815350432195\n")
+    assert [r[0] for r in records] == ["ISS (ZARYA)", "NOAA 19", "25544"]
+
+
+def test_batch_propagation_matches_skyfield():
+    catalog = TLECatalog.from_text(TLE)
+    times = T0 + np.arange(0, 5400, 900.0)
+    lon, lat, alt = catalog.positions(times)
+    assert lon.shape == (2, len(times))
+
+    ts = load.timescale()
+    for k, (name, line1, line2) in enumerate(parse_tle(TLE)):
+        sat = EarthSatellite(line1, line2, name, ts)
+        point = wgs84.geographic_position_of(sat.at(ts.utc(2024, 1, 1, 12, 0, times - T0)))
+        # Skyfield adds UT1 and nutation terms the SGP4 convention leaves out
+        dlon = (lon[k] - point.longitude.degrees + 180.0) % 360.0 - 180.0
+        assert np.abs(dlon).max() < 1e-3
+        assert np.abs(lat[k] - point.latitude.degrees).max() < 1e-3
+        assert np.abs(alt[k] - point.elevation.m).max() < 100.0
+
+    sub = catalog.positions(times, catalog.select([33591]))
+    np.testing.assert_allclose(sub[1][0], lat[1])
+
+
+def test_constellation_and_track_endpoints(monkeypatch):
+    monkeypatch.setattr(satellite_orbit_service, "_catalog", TLECatalog.from_text(TLE))
+    client = TestClient(app)
+
+    r = client.get("/api/satellites/", params={"time": "2024-01-01T12:00:00Z"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 2
+    assert {s["id"] for s in body["satellites"]} == {25544, 33591}
+
+    r = client.get("/api/satellites/track", params={"start": T0, "duration": 600, "step": 60, "ids": "25544"})
+    assert r.status_code == 200
+    body = r.json()
+    assert len(body["times"]) == 11
+    assert [s["id"] for s in body["satellites"]] == [25544]
+    assert len(body["satellites"][0]["lat"]) == 11
+    assert 350e3 < body["satellites"][0]["alt"][0] < 450e3
+
+
+def test_peek_catalog_backs_off_after_failed_downloads(monkeypatch):
+    attempts = []
+
+    async def failing():
+        attempts.append(time.time())
+        raise OSError("celestrak unreachable")
+
+    monkeypatch.setattr(satellite_orbit_service, "_catalog", None)
+    monkeypatch.setattr(satellite_orbit_service, "_failures", 0)
+    monkeypatch.setattr(satellite_orbit_service, "_retry_at", 0.0)
+    monkeypatch.setattr(satellite_orbit_service, "_load_catalog", failing)
+
+    async def run(calls):
+        for _ in range(calls):
+            assert satellite_orbit_service.peek_catalog() is None
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run(5))
+    assert len(attempts) == 1 and satellite_orbit_service._failures == 1
+    # Once the backoff has passed the next call tries again, and the wait doubles
+    monkeypatch.setattr(satellite_orbit_service, "_retry_at", 0.0)
+    asyncio.run(run(3))
+    assert len(attempts) == 2
+    delay = satellite_orbit_service._retry_at - attempts[-1]
+    assert 2 * satellite_orbit_service.RETRY_DELAY - 1 < delay <= 2 * satellite_orbit_service.RETRY_DELAY + 1
+
+    # A successful load resets the backoff
+    monkeypatch.setattr(satellite_orbit_service, "_retry_at", 0.0)
+    monkeypatch.setattr(satellite_orbit_service, "_load_catalog", lambda: asyncio.sleep(0, TLECatalog.from_text(TLE)))
+    asyncio.run(run(1))
+    assert satellite_orbit_service._failures == 0 and len(satellite_orbit_service._catalog) == 2
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.simulation.physics_server import PhysicsServer, create_app
+from backend.src.simulation.scheduler import FixedStepScheduler
+from backend.src.simulation.simulation_state import SimulationState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler(clock, **kwargs):
+    steps, broadcasts = [], []
+    scheduler = FixedStepScheduler(steps.append, broadcast=broadcasts.append, clock=clock, **kwargs)
+    scheduler.reset()
+    return scheduler, steps, broadcasts
+
+
+def test_uneven_frames_give_fixed_steps():
+    clock = FakeClock()
+    scheduler, steps, broadcasts = _scheduler(clock, tick_rate=60, broadcast_rate=20)
+    rng = np.random.default_rng(0)
+    while clock.now < 1.0 - 1e-9:
+        clock.now = min(1.0, clock.now + rng.uniform(0.001, 0.03))
+        scheduler.advance()
+    assert len(steps) == 60 and set(steps) == {1 / 60}
+    assert len(broadcasts) == 20
+    assert all(0 <= alpha < 1 for alpha in broadcasts)
+    assert scheduler.stats()["dropped_ticks"] == 0
+
+
+def test_catch_up_is_capped_after_a_stall():
+    clock = FakeClock()
+    scheduler, steps, _ = _scheduler(clock, tick_rate=50, max_catch_up=4)
+    clock.now = 0.5 + 0.005  # 25 ticks due at once, plus a quarter tick
+    assert scheduler.advance() == 4
+    stats = scheduler.stats()
+    assert stats["catch_up_ticks"] == 3 and stats["dropped_ticks"] == 21
+    assert scheduler.alpha == pytest.approx(0.25)
+    assert scheduler.next_deadline() == pytest.approx(0.52)
+    clock.now = 0.52
+    assert scheduler.advance() == 1 and len(steps) == 5
+
+
+def test_overruns_are_counted():
+    clock = FakeClock()
+
+    def slow_step(dt):
+        clock.now += 0.015  # longer than the 10 ms step
+
+    scheduler = FixedStepScheduler(slow_step, tick_rate=100, max_catch_up=3, clock=clock)
+    scheduler.reset()
+    for _ in range(10):
+        clock.now += 0.01
+        scheduler.advance()
+    stats = scheduler.stats()
+    assert stats["overruns"] == stats["ticks"] > 0
+    assert stats["tick_ms_max"] == pytest.approx(15.0)
+    assert stats["dropped_ticks"] > 0  # bounded work instead of an ever-growing backlog
+
+
+def test_frame_timing_does_not_change_the_outcome():
+    results = []
+    for seed in (1, 2):
+        sim = SimulationState(collisions=True)
+        sim.add_entities(range(50), "vehicle", position=np.random.default_rng(0).uniform(-5, 5, (50, 3)),
+                         velocity=np.random.default_rng(1).normal(size=(50, 3)))
+        states = []
+
+        def step(dt):
+            sim.tick(dt)
+            states.append(sim.store.position[:50].copy())
+
+        clock = FakeClock()
+        scheduler = FixedStepScheduler(step, tick_rate=60, clock=clock)
+        scheduler.reset()
+        rng = np.random.default_rng(seed)
+        while len(states) < 120:
+            clock.now += rng.uniform(0.0, 0.05)
+            scheduler.advance()
+        results.append(states[119])
+    assert np.array_equal(results[0], results[1])
+
+
+def test_physics_server_reports_scheduler_stats():
+    server = PhysicsServer(tick_rate=200, broadcast_rate=50)
+    with TestClient(create_app(server)) as client:
+        with client.websocket_connect("/") as ws:
+            ws.receive_json()
+        stats = client.get("/stats").json()
+    assert stats["tick_rate"] == 200 and stats["broadcast_rate"] == 50
+    assert stats["ticks"] >= stats["broadcasts"] > 0
@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.server import app
+from backend.src.services import osm_services
+from backend.src.services.environment_loader import to_latlon
+from backend.src.simulation import raycast
+from backend.src.simulation.raycast import (
+    BUILDING,
+    ENTITY,
+    GROUND,
+    MISS,
+    RayGrids,
+    Scene,
+    building_height,
+    building_mesh,
+    triangulate,
+)
+from backend.src.simulation.sensors import Sensor, SensorEngine
+from backend.src.simulation.simulation_state import SimulationState
+
+ORIGIN = (40.7580, -73.9855)
+
+
+def _building(way_id, xy, tags=None):
+    """Closed building way over local (x, y) corners."""
+    latlon = to_latlon(ORIGIN, np.asarray(xy, dtype=np.float64)).tolist()
+    latlon.append(latlon[0])
+    return {"type": "way", "id": way_id, "tags": {"building": "yes", **(tags or {})},
+            "geometry": [{"lat": lat, "lon": lon} for lat, lon in latlon]}
+
+
+def _box(x0, y0, x1, y1):
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+
+
+def _city(seed=0, blocks=6):
+    rng = np.random.default_rng(seed)
+    elements = []
+    for i in range(blocks):
+        for j in range(blocks):
+            x, y = i * 30.0 - 90.0, j * 30.0 - 90.0
+            elements.append(_building(len(elements), _box(x, y, x + 18, y + 18), {"height": str(rng.uniform(4, 30))}))
+    # A concave L-shaped building and a raised part overhanging the street
+    elements.append(_building(100, [(95, 0), (120, 0), (120, 10), (105, 10), (105, 30), (95, 30)], {"building:levels": "4"}))
+    elements.append(_building(101, _box(-75, -80, -63, -68), {"building:part": "yes", "min_height": "4", "height": "8"}))
+    return elements
+
+
+def test_triangulate_concave_and_heights():
+    ring = np.array([(0, 0), (4, 0), (4, 1), (1, 1), (1, 3), (0, 3)], dtype=np.float64)
+    tri = triangulate(ring[::-1])  # clockwise input
+    assert tri.shape == (4, 3)
+    a, b, c = ring[::-1][tri].transpose(1, 0, 2)
+    area = 0.5 * np.abs((b - a)[:, 0] * (c - a)[:, 1] - (b - a)[:, 1] * (c - a)[:, 0])
+    assert area.sum() == pytest.approx(6.0)
+
+    assert building_height({"height": "12 m"}) == (0.0, 12.0)
+    assert building_height({"height": "40 ft"})[1] == pytest.approx(12.192)
+    assert building_height({"building:levels": "5"}) == (0.0, 15.0)
+    assert building_height({"min_height": "4", "height": "3"}) == (4.0, 7.0)
+    assert building_height({}) == (0.0, raycast.DEFAULT_HEIGHT)
+
+
+def test_rays_hit_walls_roofs_and_ground():
+    triangles, owners, ids = building_mesh([_building(7, _box(10, -5, 20, 5), {"height": "10"})], ORIGIN)
+    scene = Scene(triangles, owners, ids)
+    origins = [(0, 0, 2), (15, 0, 30), (0, 0, 2), (0, 0, 2)]
+    directions = [(1, 0, 0), (0, 0, -1), (0, 0.6, -0.8), (0, 1, 0)]
+    hits = scene.cast(origins, directions, 100.0)
+    assert hits.distance[:3] == pytest.approx([10.0, 20.0, 2.5], abs=1e-6)
+    assert hits.kind.tolist() == [BUILDING, BUILDING, GROUND, MISS]
+    assert [ids[t] for t in hits.target[:2]] == [7, 7]
+    # Inside the blind zone: blocked and reported as a miss
+    assert scene.cast(origins[:1], directions[:1], 100.0, min_range=12.0).kind.tolist() == [MISS]
+
+
+def test_ray_fans_match_single_rays():
+    scene = Scene.from_elements(_city(), ORIGIN)
+    rng = np.random.default_rng(1)
+    centres = np.column_stack((rng.uniform(-100, 100, (200, 2)), rng.uniform(0, 3, 200)))
+    radii = rng.uniform(0.3, 2.0, 200)
+    origins = [(-6, -6, 2), (100, 15, 1.5), (-69, -74, 2), (0, 0, 40), (-81, -81, 5)]
+    grids = RayGrids(
+        origins,
+        el_first=np.radians([-10, -5, -20, -60, -8]), el_step=np.radians([1.0, 2.5, 5.0, 6.0, 0.0]),
+        rows=[21, 5, 9, 21, 1],
+        # full circle, a cone straddling north, a cone due south
+        az_first=np.radians([3, -20, 170, 0, 0]), az_step=np.radians([360 / 90, 40 / 15, 2.0, 360 / 72, 360 / 45]),
+        columns=[90, 16, 11, 72, 45],
+        max_range=[120, 60, 30, 100, 25], min_range=[0.5, 1.0, 0.1, 0.0, 0.0],
+    )
+    fans = scene.cast_grids(grids, (centres, radii))
+    sensor = grids.sensor_of_rays()
+    single = scene.cast(grids.origins[sensor], grids.directions(), grids.max_range[sensor],
+                        grids.min_range[sensor], (centres, radii))
+    np.testing.assert_array_equal(fans.distance, single.distance)
+    np.testing.assert_array_equal(fans.kind, single.kind)
+    np.testing.assert_array_equal(fans.target, single.target)
+    assert {BUILDING, GROUND, ENTITY, MISS} <= set(fans.kind.tolist())
+
+
+def test_engine_scans_at_scan_rate_with_detections():
+    sim = SimulationState(sensors=SensorEngine(Scene.from_elements([_building(1, _box(30, -10, 40, 10))], ORIGIN)))
+    sim.add_entities(["ego"], "vehicle", position=[0.0, 0.0, 1.0], velocity=[2.0, 0.0, 0.0])
+    sim.add_entities(["other"], "vehicle", position=[15.0, 0.0, 1.0], velocity=[-3.0, 0.0, 0.0], radius=1.0)
+    engine = sim.sensors
+    engine.add(Sensor("front", "radar", position=(0, 0, 0.5), heading=90, mount="ego", range=60))
+    engine.add(Sensor("roof", "lidar", position=(0, 0, 1.0), mount="ego", rows=8, columns=36))
+    engine.add(Sensor("mast", "ultrasonic", position=(14, 2, 1), heading=180, scan_rate=5))
+    counts = {"front": 0, "roof": 0, "mast": 0}
+    for _ in range(59):  # just under one second
+        sim.tick(1 / 60)
+        for sensor_id in sim.scans:
+            counts[sensor_id] += 1
+    assert counts == {"front": 10, "roof": 10, "mast": 5}
+
+    radar = engine.scan([engine.sensors["front"]], sim.store)["front"]
+    assert radar.ranges.shape == (4, 16)
+    (detection,) = radar.detections
+    assert detection["id"] == "other"
+    assert detection["radial_velocity"] == pytest.approx(-5.0, abs=0.3)  # closing at 2 + 3 m/s
+    gap = sim.store.position[1, 0] - sim.store.position[0, 0] - 1.0
+    assert radar.nearest == pytest.approx(gap, abs=0.05)
+
+    lidar = engine.latest["roof"]
+    assert len(lidar.points) == np.isfinite(lidar.ranges).sum()
+    assert (lidar.kinds == BUILDING).any() and (lidar.kinds == ENTITY).any()
+    assert engine.latest["mast"].nearest < 5.0  # looking down at the ground
+    assert engine.stats()["scans"] == 26
+
+
+def test_unknown_sensor_options():
+    with pytest.raises(ValueError):
+        Sensor("s", "sonar")
+    with pytest.raises(ValueError):
+        Sensor("s", "lidar", beams=3)
+    assert Sensor("s", "Radar", fov=20).horizontal_fov == 20.0
+
+
+def test_scan_endpoint(monkeypatch):
+    calls = []
+
+    async def fake_fetch(lat, lng, radius):
+        calls.append((lat, lng, radius))
+        return [_building(1, _box(10, -5, 20, 5), {"height": "10"})]
+
+    monkeypatch.setattr(osm_services, "fetch_osm_objects", fake_fetch)
+    monkeypatch.setattr(raycast, "_scenes", type(raycast._scenes)())
+    client = TestClient(app)
+    body = {
+        "sensors": [{"id": "u1", "type": "Ultrasonic", "lat": ORIGIN[0], "lon": ORIGIN[1], "height": 1.0,
+                     "heading": 90, "range": 10, "rows": 1, "columns": 1},
+                    {"id": "l1", "type": "LiDAR", "lat": ORIGIN[0], "lon": ORIGIN[1], "height": 2.0}],
+        "entities": [{"id": "car", "lat": ORIGIN[0], "lon": ORIGIN[1], "height": 1.0, "radius": 1.0}],
+    }
+    r = client.post("/api/sensors/scan", json=body)
+    assert r.status_code == 200
+    scans = r.json()["scans"]
+    assert [s["id"] for s in scans] == ["u1", "l1"]
+    # The ultrasonic sits inside the car's sphere, so it sees past it to the wall 10 m east
+    assert scans[0]["ranges"] == [[pytest.approx(10.0, abs=0.05)]]
+    assert scans[0]["detections"] == [] and scans[1]["detections"] == []
+    lidar = scans[1]
+    assert lidar["hits"]["building"] > 0 and len(lidar["points"]) == sum(lidar["hits"].values())
+    lat, lon, height = lidar["points"][0]
+    assert abs(lat - ORIGIN[0]) < 0.001 and abs(lon - ORIGIN[1]) < 0.002
+    assert len(calls) == 1
+    client.post("/api/sensors/scan", json=body)
+    assert len(calls) == 1  # scene cached
+
+    assert client.post("/api/sensors/scan", json={"sensors": [{"type": "lidar"}]}).status_code == 400
+    assert client.post("/api/sensors/scan", json={"sensors": [{**body["sensors"][1], "type": "sonar"}]}).status_code == 400
+    far = {"sensors": [{**body["sensors"][1], "lat": 0.0, "lon": 0.0}, body["sensors"][1]]}
+    assert client.post("/api/sensors/scan", json=far).status_code == 400
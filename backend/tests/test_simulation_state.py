@@ -0,0 +1,51 @@
+import numpy as np
+
+from backend.src.simulation.entity_state import EntityState
+from backend.src.simulation.simulation_state import SimulationState
+
+
+def test_tick_integrates_all_axes():
+    sim = SimulationState()
+    car = EntityState("car-1", "vehicle")
+    car.position = {"x": 1, "y": 2, "z": 3}
+    car.velocity["x"] = 2.0
+    car.velocity["y"] = -1.0
+    car.velocity["z"] = 0.5
+    sim.add_entity(car)
+
+    sim.tick(0.5)
+
+    assert dict(car.position) == {"x": 2.0, "y": 1.5, "z": 3.25}
+    assert sim.store.position[sim.store.rows["car-1"]].tolist() == [2.0, 1.5, 3.25]
+
+
+def test_acceleration_and_status_round_trip():
+    sim = SimulationState()
+    drone = EntityState("drone-1", "drone")
+    drone.acceleration["z"] = 2.0
+    drone.status = "moving"
+    sim.add_entity(drone)
+
+    sim.tick(1.0)
+
+    assert drone.velocity["z"] == 2.0
+    assert drone.position["z"] == 2.0
+    assert drone.status == "moving"
+
+
+def test_bulk_add_and_remove_keep_views_consistent():
+    sim = SimulationState(capacity=4)
+    n = 1000
+    vel = np.tile([1.0, 0.0, 0.0], (n, 1))
+    sim.add_entities(range(n), "vehicle", velocity=vel)
+    sim.tick(2.0)
+    assert np.allclose(sim.store.position[:n, 0], 2.0)
+
+    last = sim.entities[n - 1]
+    removed = sim.remove_entity(0)
+    # The removed entity keeps its last known state
+    assert removed.position["x"] == 2.0
+    # The entity swapped into the freed row still reads its own data
+    last.position["y"] = 7.0
+    assert sim.store.position[sim.store.rows[n - 1], 1] == 7.0
+    assert len(sim.store) == n - 1
@@ -0,0 +1,88 @@
+import asyncio
+
+from backend.src.services import osm_services
+from backend.src.services.osm_tile_cache import OverpassTileCache
+from backend.src.services.single_flight import SingleFlight, single_flight_stats
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", slow, 21) for _ in range(10)))
+
+    assert asyncio.run(run()) == [42] * 10
+    assert calls == [21]
+    assert flight.stats() == {"calls": 10, "executions": 1, "shared": 9, "coalescing_ratio": 0.9}
+    assert single_flight_stats()["test"]["shared"] == 9
+
+
+def test_errors_propagate_and_cancelled_callers_do_not_cancel_others():
+    flight = SingleFlight("test-errors")
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def ok():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("a", boom) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        first = asyncio.ensure_future(flight.do("b", ok))
+        second = asyncio.ensure_future(flight.do("b", ok))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_overlapping_tile_queries_fetch_each_tile_once(tmp_path, monkeypatch):
+    fetches = []
+
+    async def fetch(south, west, north, east):
+        fetches.append((south, west, north, east))
+        await asyncio.sleep(0.02)
+        return [{"type": "node", "id": 1, "lat": 40.7580, "lon": -73.9855}]
+
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", fetch)
+
+    async def run():
+        # Tile-equivalent (same tiles, slightly different centre) and identical requests
+        return await asyncio.gather(
+            cache.query(40.7580, -73.9855, 100),
+            cache.query(40.7580, -73.9855, 100),
+            cache.query(40.75801, -73.98551, 100),
+        )
+
+    results = asyncio.run(run())
+    assert len(fetches) == 1
+    assert all([e["id"] for e in r] == [1] for r in results)
+    assert cache.stats()["coalescing"]["shared"] > 0
+
+
+def test_fetch_osm_objects_coalesces_identical_requests(monkeypatch):
+    calls = []
+
+    async def fake_fetch(lat, lng, radius):
+        calls.append((lat, lng, radius))
+        await asyncio.sleep(0.01)
+        return [{"type": "node", "id": 7}]
+
+    monkeypatch.setattr(osm_services, "_fetch_osm_objects", fake_fetch)
+
+    async def run():
+        return await asyncio.gather(*(osm_services.fetch_osm_objects(1.0, 2.0, 500) for _ in range(8)))
+
+    assert all(r == [{"type": "node", "id": 7}] for r in asyncio.run(run()))
+    assert len(calls) == 1
@@ -0,0 +1,83 @@
+import numpy as np
+
+from backend.src.simulation.simulation_state import SimulationState
+from backend.src.simulation.snapshot_codec import SnapshotDecoder, SnapshotEncoder, parse_frame
+
+
+def make_sim(n=100):
+    sim = SimulationState()
+    vel = np.zeros((n, 3))
+    vel[: n // 10, 0] = 1.0  # only 10% of entities move
+    sim.add_entities([f"veh-{i}" for i in range(n)], "vehicle", velocity=vel)
+    return sim
+
+
+def test_keyframe_then_delta_round_trip():
+    sim = make_sim()
+    enc = SnapshotEncoder(keyframe_interval=10)
+    dec = SnapshotDecoder()
+
+    key = enc.encode(enc.capture(sim.store, 1))
+    frame = dec.decode(key)
+    assert frame.keyframe and len(frame) == 100
+
+    sim.tick(0.5)
+    sim.remove_entity("veh-99")
+    delta = enc.encode(enc.capture(sim.store, 2), acked_tick=1)
+    parts = parse_frame(delta)
+    assert not parts["keyframe"]
+    assert len(parts["net_ids"]) == 10  # only the moving entities
+    assert len(parts["removed"]) == 1
+    assert len(delta) < len(key) / 5
+
+    state = dec.decode(delta)
+    entities = {e["id"]: e for e in dec.entities(state)}
+    assert len(entities) == 99 and "veh-99" not in entities
+    assert entities["veh-0"]["position"]["x"] == 0.5
+    assert entities["veh-50"]["position"]["x"] == 0.0
+
+
+def test_spawned_entities_are_named_in_delta_and_status_packs():
+    sim = make_sim(3)
+    enc = SnapshotEncoder(keyframe_interval=10)
+    dec = SnapshotDecoder()
+    dec.decode(enc.encode(enc.capture(sim.store, 1)))
+
+    sim.add_entities(["drone-1"], "drone", status="moving")
+    state = dec.decode(enc.encode(enc.capture(sim.store, 2), acked_tick=1))
+    entities = {e["id"]: e for e in dec.entities(state)}
+    assert entities["drone-1"]["type"] == "drone"
+    assert entities["drone-1"]["status"] == "moving"
+
+
+def test_unknown_baseline_gets_full_keyframe():
+    sim = make_sim(10)
+    enc = SnapshotEncoder(keyframe_interval=100)
+    enc.capture(sim.store, 1)
+    frame = enc.capture(sim.store, 2)
+    assert parse_frame(enc.encode(frame, acked_tick=999))["keyframe"]
+    # The promoted frame can now serve as a baseline
+    assert parse_frame(enc.encode(enc.capture(sim.store, 3), acked_tick=2))["baseline"] == 2
+
+
+def test_slow_acks_settle_into_deltas_without_evicting_keyframes():
+    sim = make_sim(10)
+    enc = SnapshotEncoder(keyframe_interval=60, history=4)
+    dec = SnapshotDecoder()
+    lag = 6  # acks arrive more than ``history`` ticks late
+    enc.encode(enc.capture(sim.store, 1))
+    sent = {}
+    acked = None
+    for tick in range(2, 40):
+        sim.tick(0.1)
+        frame = enc.capture(sim.store, tick)
+        # Another client stuck on the scheduled keyframe of tick 1
+        assert not parse_frame(enc.encode(frame, acked_tick=1))["keyframe"]
+        parts = parse_frame(enc.encode(frame, acked))
+        dec.decode(enc.encode(frame, acked))
+        sent[tick] = parts
+        if tick - lag in sent and sent[tick - lag]["keyframe"]:
+            acked = tick - lag
+    kinds = [sent[t]["keyframe"] for t in sorted(sent)]
+    assert all(kinds[:lag + 1]) and not any(kinds[lag + 1:])
+    assert list(enc.keyframes) == [1]
@@ -0,0 +1,123 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.src.services import osm_services
+from backend.src.services.geolocation_services import resolve_location
+from backend.src.services.osm_tile_cache import OverpassTileCache, radius_bbox
+from backend.src.services.spatial_index import OSMIndex, STRTree, distance_to_boxes
+from backend.tests.test_osm_tile_cache import overpass_stub  # noqa: F401 (fixture)
+
+
+@pytest.fixture(scope="module")
+def boxes():
+    rng = np.random.default_rng(3)
+    lat = rng.uniform(40.6, 40.8, 20000)
+    lon = rng.uniform(-74.1, -73.9, 20000)
+    size = rng.uniform(0.0, 0.002, (20000, 2))
+    return np.column_stack((lat, lon, lat + size[:, 0], lon + size[:, 1]))
+
+
+def test_queries_match_linear_scan(boxes):
+    tree = STRTree(boxes, node_capacity=8)
+    rng = np.random.default_rng(4)
+    for lat, lng in zip(rng.uniform(40.55, 40.85, 20), rng.uniform(-74.15, -73.85, 20)):
+        s, w, n, e = radius_bbox(lat, lng, 800)
+        expected = (boxes[:, 0] <= n) & (boxes[:, 2] >= s) & (boxes[:, 1] <= e) & (boxes[:, 3] >= w)
+        assert sorted(tree.bbox(s, w, n, e).tolist()) == np.flatnonzero(expected).tolist()
+
+        dist = distance_to_boxes(lat, lng, boxes)
+        rows, found = tree.radius(lat, lng, 300)
+        assert sorted(rows.tolist()) == np.flatnonzero(dist <= 300).tolist()
+        assert np.allclose(found, dist[rows])
+
+        rows, found = tree.nearest(lat, lng, 7)
+        assert np.allclose(found, np.sort(dist)[:7])
+
+
+def test_nearest_and_empty_edge_cases(boxes):
+    tree = STRTree(boxes[:3])
+    rows, _ = tree.nearest(0.0, 0.0, 10)  # far outside, more than there are
+    assert sorted(rows.tolist()) == [0, 1, 2]
+    empty = STRTree(np.empty((0, 4)))
+    assert len(empty.bbox(-90, -180, 90, 180)) == 0
+    assert len(empty.nearest(0.0, 0.0, 3)[0]) == 0
+
+
+def test_index_deduplicates_and_tracks_coverage():
+    index = OSMIndex(zoom=15, ttl=60)
+    node = {"type": "node", "id": 1, "lat": 40.758, "lon": -73.9855}
+    index.add_tiles({(0, 0): [node], (0, 1): [dict(node), {"type": "node", "id": 2}]}, now=100.0)
+    assert len(index) == 1  # same element in two tiles; one without geometry
+    assert index.radius(40.758, -73.9855, 10) == [node]
+    assert index.nearest(40.7581, -73.9855)[0][0] == node
+    assert not index.covers(40.758, -73.9855, 10, now=100.0)
+
+
+def test_covered_areas_are_served_from_the_index(tmp_path, overpass_stub, monkeypatch):  # noqa: F811
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox)
+    monkeypatch.setattr(osm_services, "_tile_cache", cache)
+    monkeypatch.setattr(osm_services, "OSM_CACHE_ENABLED", True)
+
+    cold = asyncio.run(resolve_location(40.7580, -73.9855, 3500))
+    index = osm_services.get_osm_index(cache)
+    assert index.queries == 0 and len(index) == 4
+
+    warm = asyncio.run(resolve_location(40.7580, -73.9855, 3500))
+    inner = asyncio.run(resolve_location(40.7580, -73.9855, 100))
+    assert index.queries == 2
+    assert sorted(e["id"] for e in warm["elements"]) == sorted(e["id"] for e in cold["elements"]) == [1, 2, 3, 10]
+    assert [e["id"] for e in inner["elements"]] == [1, 2]
+    assert len(overpass_stub) == 1
+
+
+def test_index_merges_small_trees_and_drops_evicted_tiles():
+    rng = np.random.default_rng(3)
+    index = OSMIndex(zoom=15, ttl=60)
+    nodes = [{"type": "node", "id": i, "lat": 40.0 + rng.random() * 0.01, "lon": -74.0 + rng.random() * 0.01}
+             for i in range(2000)]
+    for t in range(100):
+        index.add_tiles({(t, 0): nodes[20 * t:20 * t + 20]}, now=100.0)
+        index.radius(40.005, -73.995, 100)
+    # Merged like an LSM tree: a few trees, not one rebuild per tile
+    assert len(index.segments()[0]) <= 8 and index.rebuilt < 2000 * 12
+    ids = sorted(e["id"] for e in index.bbox(39, -75, 41, -73))
+    assert ids == list(range(2000))
+
+    moved = dict(nodes[0], lat=41.5)
+    index.add_tiles({(0, 0): [moved] + nodes[1:20]}, now=100.0)
+    assert index.bbox(41.4, -75, 41.6, -73) == [moved]
+    assert 0 not in [e["id"] for e in index.bbox(39, -75, 41, -73)]
+    index.evict_tiles([(t, 0) for t in range(50)])
+    assert len(index) == 1000
+    near = index.nearest(40.005, -73.995, 5)
+    assert len(near) == 5 and all(e["id"] >= 1000 for e, _ in near)
+    # Tiles past the TTL are dropped by the next add
+    index.add_tiles({(500, 0): []}, now=1000.0)
+    assert len(index) == 0 and index.radius(40.005, -73.995, 5000) == []
+
+
+def test_tile_cache_eviction_reaches_the_index(tmp_path, overpass_stub, monkeypatch):  # noqa: F811
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox, max_tiles=1)
+    index = osm_services.get_osm_index(cache)
+    index.add_tiles(asyncio.run(cache.tiles(40.7580, -73.9855, 10)))
+    assert len(index) == 2
+    asyncio.run(cache.tiles(40.7305, -73.9945, 10))  # another tile pushes the first out
+    assert len(index) == 0 and not index.covers(40.7580, -73.9855, 10)
+
+
+def test_queries_served_by_the_index_keep_their_tiles_cached(tmp_path, overpass_stub, monkeypatch):  # noqa: F811
+    cache = OverpassTileCache(tmp_path / "tiles.sqlite", osm_services.fetch_osm_bbox, max_tiles=2)
+    monkeypatch.setattr(osm_services, "_tile_cache", cache)
+    monkeypatch.setattr(osm_services, "OSM_CACHE_ENABLED", True)
+    index = osm_services.get_osm_index(cache)
+
+    asyncio.run(osm_services.fetch_osm_objects(40.7580, -73.9855, 10))  # tile A
+    asyncio.run(osm_services.fetch_osm_objects(40.7305, -73.9945, 10))  # tile B
+    hot = asyncio.run(osm_services.fetch_osm_objects(40.7580, -73.9855, 5))  # A again, from the index
+    assert index.queries == 1 and [e["id"] for e in hot] == [1]
+    asyncio.run(osm_services.fetch_osm_objects(40.7620, -73.9800, 10))  # tile C evicts the LRU tile
+    # B was the least recently used tile, not A
+    assert index.covers(40.7580, -73.9855, 10) and not index.covers(40.7305, -73.9945, 10)
+    assert len(overpass_stub) == 3
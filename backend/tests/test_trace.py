@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from backend.src.routes import simulation_routes
+from backend.src.server import app
+from backend.src.simulation import trace
+from backend.src.simulation.physics_server import PhysicsServer
+from backend.src.simulation.simulation_state import SimulationState
+from backend.src.simulation.trace import TraceReader, TraceRecorder, run_dir
+
+
+def _live(store):
+    n = store.count
+    order = np.argsort(store.net_ids[:n])
+    return (store.net_ids[:n][order].copy(), store.position[:n][order].copy(),
+            store.velocity[:n][order].copy(), store.status[:n][order].copy())
+
+
+def _record(path, ticks=23, keyframe_interval=5):
+    """Run a small world for ``ticks`` ticks, adding, removing and parking entities."""
+    rng = np.random.default_rng(0)
+    sim = SimulationState()
+    sim.add_entities([f"car-{i}" for i in range(20)], "vehicle", position=rng.uniform(-50, 50, (20, 3)),
+                     velocity=rng.uniform(-5, 5, (20, 3)))
+    sim.add_entities([f"ped-{i}" for i in range(10)], "pedestrian", position=rng.uniform(-50, 50, (10, 3)))
+    live = {}
+    with TraceRecorder(path, keyframe_interval=keyframe_interval) as recorder:
+        for tick in range(1, ticks + 1):
+            if tick == 7:
+                sim.remove_entity("car-3")
+                sim.add_entities(["bus-0"], "bus", position=[1.0, 2.0, 3.0], velocity=[1.0, 0.0, 0.0])
+            if tick == 12:
+                sim.remove_entity("ped-4")
+                sim.store.status[sim.store.rows["car-5"]] = 2
+            if tick == 15:
+                recorder.record_input({"type": "brake"}, source="test")
+            sim.tick(0.1)
+            recorder.record_tick(tick, sim.store)
+            live[tick] = _live(sim.store)
+        assert recorder.stats()["dropped_ticks"] == 0
+    return sim, live
+
+
+def _assert_state(state, expected):
+    for got, want in zip(state, expected):
+        np.testing.assert_array_equal(got, want)
+
+
+def test_replay_matches_every_recorded_tick(tmp_path):
+    sim, live = _record(tmp_path)
+    reader = TraceReader(tmp_path)
+    assert len(reader.index) == 5  # 23 ticks in chunks of 5
+    assert (reader.first_tick, reader.last_tick) == (1, 23)
+    replayed = dict(reader.replay())
+    assert sorted(replayed) == list(range(1, 24))
+    for tick, expected in live.items():
+        _assert_state(replayed[tick], expected)
+    for tick in (1, 6, 7, 13, 23):
+        recorded, state = reader.state(tick)
+        assert recorded == tick
+        _assert_state(state, live[tick])
+    assert [tick for tick, _ in reader.replay(9, 12)] == [9, 10, 11, 12]
+    assert reader.state(0) is None and reader.state(99)[0] == 23
+    reader.close()
+
+
+def test_keyframes_hold_all_entities_and_deltas_only_changes(tmp_path):
+    _record(tmp_path)
+    with TraceReader(tmp_path) as reader:
+        chunk = reader._chunk(1)  # ticks 6-10
+        assert chunk["ticks"].tolist() == [6, 7, 8, 9, 10]
+        assert chunk["counts"][0] == 30
+        # Parked pedestrians are not stored again; moving cars (and the new bus) are
+        assert chunk["counts"][1:].tolist() == [20, 20, 20, 20]
+        assert chunk["removed_counts"].tolist() == [0, 1, 0, 0, 0]
+
+
+def test_snapshot_restore_and_inputs(tmp_path):
+    sim, live = _record(tmp_path)
+    with TraceReader(tmp_path) as reader:
+        tick, entities = reader.snapshot(23)
+        assert tick == 23
+        assert sorted(entities, key=lambda e: e["id"]) == sorted(sim.snapshot(), key=lambda e: e["id"])
+
+        restored = reader.restore(23)
+        _assert_state(_live(restored.store), live[23])
+        assert set(restored.entities) == set(sim.entities)
+        # Both continue identically from the restored tick
+        sim.tick(0.1)
+        restored.tick(0.1)
+        _assert_state(_live(restored.store), _live(sim.store))
+
+        inputs = reader.inputs()
+        assert [(r["tick"], r["source"], r["payload"]) for r in inputs] == [(14, "test", {"type": "brake"})]
+        assert reader.inputs(start=15) == []
+
+
+def test_full_queue_drops_ticks_but_keeps_the_trace_consistent(tmp_path, monkeypatch):
+    sim = SimulationState()
+    sim.add_entities(["a", "b"], "vehicle", velocity=[1.0, 0.0, 0.0])
+    gate = threading.Event()
+    recorder = TraceRecorder(tmp_path, keyframe_interval=4, max_pending=2)
+    flush = recorder._flush
+    monkeypatch.setattr(recorder, "_flush", lambda builder: (gate.wait(), flush(builder)))
+    live = {}
+    for tick in range(1, 13):
+        sim.tick(0.1)
+        if recorder.record_tick(tick, sim.store):
+            live[tick] = _live(sim.store)
+        # Inputs never wait for the stalled writer and are never dropped
+        started = time.perf_counter()
+        recorder.record_input({"key": "w"}, tick=tick)
+        assert time.perf_counter() - started < 0.5
+    # A dropped tick does not even read the store
+    dropped = recorder.dropped_ticks
+    assert recorder.record_tick(13, None) is False and recorder.dropped_ticks == dropped + 1
+    gate.set()
+    recorder.close()
+    assert recorder.dropped_ticks > 0
+    assert recorder.recorded_inputs == 12
+    assert recorder.recorded_ticks == len(live) == 13 - recorder.dropped_ticks
+    with TraceReader(tmp_path) as reader:
+        replayed = dict(reader.replay())
+        assert sorted(replayed) == sorted(live)
+        for tick, expected in live.items():
+            _assert_state(replayed[tick], expected)
+
+
+def test_physics_server_records_ticks_and_inputs(tmp_path):
+    recorder = TraceRecorder(tmp_path)
+    server = PhysicsServer(recorder=recorder)
+    server.submit_input({"id": "car-1", "entity_type": "vehicle", "key": "w"})
+    server.step()
+    server.step()
+    assert server.stats()["trace"]["last_tick"] == 2
+    recorder.close()
+    with TraceReader(tmp_path) as reader:
+        assert [tick for tick, _ in reader.replay()] == [1, 2]
+        assert reader.names[1] == ("car-1", "vehicle")
+        assert [r["tick"] for r in reader.inputs()] == [1]
+
+
+def test_trace_endpoints(tmp_path, monkeypatch):
+    root = tmp_path / "traces"
+    _record(run_dir(root, "physics"))
+    monkeypatch.setattr(simulation_routes, "SIM_TRACE_DIR", str(root))
+    client = TestClient(app)
+    runs = client.get("/api/simulation/traces").json()["traces"]
+    assert len(runs) == 1 and runs[0]["first_tick"] == 1 and runs[0]["last_tick"] == 23
+    run = runs[0]["run"]
+
+    r = client.get(f"/api/simulation/traces/{run}", params={"tick": 14, "inputs": True})
+    body = r.json()
+    assert r.status_code == 200 and body["tick"] == 14
+    assert len(body["entities"]) == 29
+    assert body["inputs"][0]["payload"] == {"type": "brake"}
+    assert client.get(f"/api/simulation/traces/{run}", params={"tick": 0}).status_code == 404
+    assert client.get("/api/simulation/traces/..", params={"tick": 1}).status_code == 404
+    assert client.get("/api/simulation/traces/nope", params={"tick": 1}).status_code == 404
+
+
+def test_vehicle_actions_are_recorded(tmp_path, monkeypatch):
+    path = run_dir(tmp_path, "api")
+    recorder = TraceRecorder(path)
+    previous = trace.set_recorder(recorder)
+    try:
+        client = TestClient(app)
+        before = time.time()
+        assert client.post("/api/simulation/vehicle/action", json={"type": "brake"}).status_code == 200
+    finally:
+        trace.set_recorder(previous)
+        recorder.close()
+    lines = (path / "inputs.jsonl").read_text().splitlines()
+    record = json.loads(lines[0])
+    assert record["source"] == "vehicle_action" and record["payload"] == {"type": "brake"}
+
+    # The API run has no ticks; its inputs are still readable, by time
+    monkeypatch.setattr(simulation_routes, "SIM_TRACE_DIR", str(tmp_path))
+    body = client.get(f"/api/simulation/traces/{path.name}/inputs", params={"since": before}).json()
+    assert body["first_tick"] is None and [r["payload"] for r in body["inputs"]] == [{"type": "brake"}]
+    assert client.get(f"/api/simulation/traces/{path.name}/inputs", params={"until": before - 1}).json()["inputs"] == []
+    assert client.get(f"/api/simulation/traces/{path.name}", params={"tick": 1}).status_code == 404
@@ -121,6 +121,19 @@ export class SensorTelemetryPanel {
         `;
     }
 
+    /**
+     * Fetch min/max/mean history of one sensor field from the backend rollups.
+     * start/end are Unix ms (default: the hour up to the newest sample).
+     */
+    async fetchHistory(sensorId, field, { start, end, points = 200 } = {}) {
+        const params = new URLSearchParams({ sensorId, field, points: String(points) });
+        if (start != null) params.set('start', String(start));
+        if (end != null) params.set('end', String(end));
+        const response = await fetch(`/api/telemetry/series?${params}`);
+        if (!response.ok) return null;
+        return response.json(); // { resolution_ms, t, min, max, mean, count }
+    }
+
     /**
      * Clear all telemetry data
      */
@@ -1,13 +1,15 @@
 # 3d_objects.py
+import threading
 from pathlib import Path
-from uuid import uuid4
 
 from flask import (
     Blueprint, request, redirect, url_for,
-    send_from_directory, abort, render_template_string, make_response, current_app
+    send_file, abort, render_template_string, make_response, current_app
 )
 from werkzeug.utils import secure_filename
 
+from backend.src.services.model_assets import RAW_FORMATS, ModelAssets
+
 # --------------------
 # Configuration
 # --------------------
@@ -25,6 +27,7 @@ ALLOWED_EXTENSIONS = {
     ".ply",   # Point clouds / meshes
     ".urdf",  # Robot description
     ".sdf",   # Simulation description
+    ".bin",   # Buffers of a .gltf (upload them first)
 }
 
 objects_bp = Blueprint("objects", __name__)
@@ -42,32 +45,59 @@ def _upload_folder() -> Path:
     return DEFAULT_UPLOAD_FOLDER
 
 
+# One model store (services/model_assets.py) per upload folder
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _model_assets() -> ModelAssets:
+    """
+    The model store kept in the upload folder. Files are stored once per
+    content (by SHA-256) and processed into bounds and decimated levels of
+    detail in its background thread. Files saved by older versions of this
+    blueprint are moved into it the first time it opens.
+    """
+    folder = _upload_folder().resolve()
+    with _stores_lock:
+        store = _stores.get(folder)
+        if store is None:
+            store = _stores[folder] = ModelAssets(folder)
+        return store
+
+
 def allowed_file(filename: str) -> bool:
     suffix = Path(filename).suffix.lower()
     return suffix in ALLOWED_EXTENSIONS
 
 
-def make_unique_filename(original_name: str) -> str:
+def make_unique_filename(original_name: str, sha256: str) -> str:
     """
-    Take a sanitized original filename and append a GUID so that
-    multiple uploads with the same name don't overwrite each other.
+    Take a sanitized original filename and append the start of the file's
+    SHA-256 so that uploads with the same name but different contents
+    don't overwrite each other, while uploading the same file again gives
+    the same name (and the store keeps its bytes once).
+
+    Files that other files refer to by name (.bin buffers of a .gltf,
+    .dae/.urdf/.sdf) keep the sanitized name, so those references still
+    resolve; uploading one again replaces it.
 
     Example:
       original_name = 'arm.gltf'
-      -> 'arm__d41d8cd98f00b204e9800998ecf8427e.gltf'
+      -> 'arm__e3b0c44298fc1c14.gltf'
     """
     original_name = secure_filename(original_name)
     p = Path(original_name)
-    stem = p.stem
+    if p.suffix.lower() in RAW_FORMATS:
+        return original_name
+    stem = p.stem.lstrip("._-")[:100] or "model"
     suffix = p.suffix.lower()
-    uid = uuid4().hex
-    return f"{stem}__{uid}{suffix}"
+    return f"{stem}__{sha256[:16]}{suffix}"
 
 
 def display_name_from_stored(stored_name: str) -> str:
     """
     Derive a user-friendly display name from the stored filename.
-    If stored as 'arm__GUID.gltf', display 'arm.gltf'.
+    If stored as 'arm__<hash>.gltf', display 'arm.gltf'.
     """
     p = Path(stored_name)
     stem = p.stem
@@ -83,8 +113,13 @@ def display_name_from_stored(stored_name: str) -> str:
 @objects_bp.route("/upload-model", methods=["POST"])
 def upload_model():
     """
-    Accepts a 3D model file and stores it in UPLOAD_FOLDER with a unique name.
+    Accepts a 3D model file and stores it in UPLOAD_FOLDER under a name
+    derived from its contents (see make_unique_filename).
     Expected form field: 'model'
+
+    The redirect happens as soon as the file is stored; meshes (.glb, .gltf,
+    .stl, .obj, .ply) are then decimated into levels of detail in the
+    background (see /models/<filename>).
     """
     if "model" not in request.files:
         return "No file part 'model' in request", 400
@@ -100,11 +135,18 @@ def upload_model():
             + ", ".join(sorted(ALLOWED_EXTENSIONS))
         ), 400
 
-    upload_folder = _upload_folder()
-
-    stored_filename = make_unique_filename(file.filename)
-    save_path = upload_folder / stored_filename
-    file.save(save_path)
+    assets = _model_assets()
+    writer = assets.writer()
+    try:
+        for chunk in iter(lambda: file.stream.read(1 << 20), b""):
+            writer.write(chunk)
+        if not writer.size:
+            return "Empty file", 400
+        assets.commit(make_unique_filename(file.filename, writer.sha256), writer)
+    except ValueError as exc:
+        return str(exc), 400
+    finally:
+        writer.discard()
 
     return redirect(url_for("objects.list_models"))
 
@@ -115,28 +157,35 @@ def upload_model():
 @objects_bp.route("/models/<filename>")
 def serve_model_file(filename):
     """
-    Serves a file from UPLOAD_FOLDER by filename only.
+    Serves an uploaded model by its stored filename only.
     No directories/paths are allowed or exposed.
-    """
-    upload_folder = _upload_folder()
 
-    safe_name = secure_filename(filename)
-    file_path = (upload_folder / safe_name).resolve()
+    Query parameters pick a level of detail: ?lod=<k> serves level k (the
+    coarsest if there are fewer), ?maxTriangles=<n> the most detailed level
+    within n triangles. Without them, or until the levels are built, the
+    upload itself (level 0) is served. Levels above 0 are geometry-only GLB
+    files. The level served is in the X-Model-LOD header.
 
-    # Ensure the file is exactly inside UPLOAD_FOLDER
-    try:
-        file_path.relative_to(upload_folder)
-    except ValueError:
-        abort(404)
+    The ETag is the SHA-256 of the bytes served: a client sending it back in
+    If-None-Match gets a 304, and Range (with If-Range) requests get 206
+    partial content.
+    """
+    lod = request.args.get("lod", type=int)
+    max_triangles = request.args.get("maxTriangles", type=int)
+    if (lod is not None and lod < 0) or (max_triangles is not None and max_triangles < 1):
+        abort(400)
 
-    if not file_path.exists() or not file_path.is_file():
+    found = _model_assets().select(secure_filename(filename), lod, max_triangles)
+    if found is None or not found[0].is_file():
         abort(404)
+    path, level = found
 
-    return send_from_directory(
-        directory=str(upload_folder),
-        path=safe_name,
-        as_attachment=False
-    )
+    response = send_file(path, as_attachment=False, etag=level["sha256"], conditional=True)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Model-LOD"] = str(level["level"])
+    if level.get("triangles") is not None:
+        response.headers["X-Model-Triangles"] = str(level["triangles"])
+    return response
 
 
 # --------------------
@@ -148,17 +197,16 @@ def list_models():
     Returns an HTML page listing model files in UPLOAD_FOLDER.
     - Only files in the models directory are shown (no recursion).
     - No directory structure or real paths are exposed.
-    - Filenames on disk have GUIDs; users see original-like names.
+    - Stored names carry a content hash; users see original-like names.
     """
-    upload_folder = _upload_folder()
-
     file_entries = []
-    for p in upload_folder.iterdir():
-        if p.is_file() and allowed_file(p.name):
-            file_entries.append({
-                "stored_name": p.name,
-                "display_name": display_name_from_stored(p.name),
-            })
+    for model in _model_assets().models():
+        file_entries.append({
+            "stored_name": model["name"],
+            "display_name": display_name_from_stored(model["name"]),
+            "status": model["status"],
+            "levels": len(model["levels"]),
+        })
 
     file_entries.sort(key=lambda e: e["display_name"].lower())
 
@@ -188,7 +236,7 @@ def list_models():
               <a href="{{ url_for('objects.serve_model_file', filename=entry.stored_name) }}" target="_blank">
                 {{ entry.display_name }}
               </a>
-              <span class="filename-small">(id: {{ entry.stored_name }})</span>
+              <span class="filename-small">(id: {{ entry.stored_name }}, {{ entry.status }}{% if entry.levels > 1 %}, {{ entry.levels - 1 }} LODs{% endif %})</span>
             </li>
           {% endfor %}
         </ul>
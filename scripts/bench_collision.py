@@ -0,0 +1,64 @@
+"""
+Benchmark the spatial-hash collision pass against the naive all-pairs test.
+
+Bodies are spread at a constant density (about ten neighbours each) so the
+number of true contacts grows linearly with n. The naive reference is only
+run up to 20k bodies; beyond that it is extrapolated from its O(n^2) cost.
+Run from the repo root:
+    python scripts/bench_collision.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.simulation.collision import CollisionWorld, naive_pairs
+from backend.src.simulation.simulation_state import SimulationState
+
+NAIVE_LIMIT = 20000
+
+
+def build(n, rng):
+    # 8 m^3 per body keeps density constant as n grows
+    side = (8.0 * n) ** (1.0 / 3.0)
+    sim = SimulationState(capacity=n, collisions=CollisionWorld())
+    sim.add_entities(range(n), "vehicle",
+                     position=rng.uniform(0, side, size=(n, 3)),
+                     velocity=rng.normal(scale=1.0, size=(n, 3)))
+    return sim
+
+
+def main(sizes=(1000, 10000, 100000)):
+    rng = np.random.default_rng(0)
+    print(f"{'bodies':>8}{'contacts':>10}{'hash ms/tick':>14}{'naive ms':>12}{'speedup':>10}")
+    naive_ref = None
+    for n in sizes:
+        sim = build(n, rng)
+        sim.tick(1 / 60)  # first tick builds the grid from scratch
+        t0 = time.perf_counter()
+        ticks = 5
+        for _ in range(ticks):
+            sim.tick(1 / 60)
+        hash_ms = (time.perf_counter() - t0) / ticks * 1e3
+
+        store = sim.store
+        if n <= NAIVE_LIMIT:
+            t0 = time.perf_counter()
+            naive_pairs(store.position[:n], store.radius[:n])
+            naive_ms = (time.perf_counter() - t0) * 1e3
+            naive_ref = (n, naive_ms)
+            naive_txt = f"{naive_ms:>12.1f}"
+        else:
+            ref_n, ref_ms = naive_ref
+            naive_ms = ref_ms * (n / ref_n) ** 2
+            naive_txt = f"{'~%.0f' % naive_ms:>12}"
+        print(f"{n:>8}{len(sim.contacts):>10}{hash_ms:>14.1f}{naive_txt}{naive_ms / hash_ms:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark the interpolated ephemeris cache against direct SGP4 propagation.
+
+A synthetic LEO/MEO catalog is propagated directly and through
+EphemerisCache (Hermite and Lagrange, 60 s knots) at random timestamps in
+the window. Accuracy is the 3-D position error against direct SGP4;
+throughput is satellite-samples per second for one request. Window builds
+are timed separately since they run in the background in the server.
+Run from the repo root:
+    python scripts/bench_ephemeris.py [n_satellites]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.ephemeris_cache import EphemerisCache
+from backend.src.services.satellite_orbit_service import TLECatalog
+
+
+def _checksum(line):
+    return str(sum(int(c) if c.isdigit() else c == "-" for c in line) % 10)
+
+
+def synthetic_catalog(n, rng):
+    records = []
+    for k in range(n):
+        inc = rng.uniform(0, 110)
+        raan, argp, ma = rng.uniform(0, 360, size=3)
+        ecc = rng.uniform(0, 0.02)
+        mm = rng.uniform(2.0, 15.8)  # revs/day: MEO .. low LEO
+        l1 = f"1 {k + 1:05d}U 24001A   24001.50000000  .00000000  00000-0  00000-0 0  999"
+        l2 = f"2 {k + 1:05d} {inc:8.4f} {raan:8.4f} {int(ecc * 1e7):07d} {argp:8.4f} {ma:8.4f} {mm:11.8f}    1"
+        records.append((f"SAT {k + 1}", l1 + _checksum(l1), l2 + _checksum(l2)))
+    return TLECatalog(records)
+
+
+def main(n=10000, samples=20, step=60.0):
+    rng = np.random.default_rng(0)
+    catalog = synthetic_catalog(n, rng)
+    now = time.time()
+    times = np.sort(now + rng.uniform(0, 2400, size=samples))
+
+    t0 = time.perf_counter()
+    _, reference, _ = catalog.propagate_teme(times)
+    direct_s = time.perf_counter() - t0
+    print(f"{n} satellites x {samples} timestamps, knots every {step:.0f} s")
+    print(f"{'method':>10}{'build s':>10}{'max err m':>12}{'p99 err m':>12}"
+          f"{'samples/s':>14}{'speedup':>10}")
+    print(f"{'direct':>10}{'-':>10}{0.0:>12.3f}{0.0:>12.3f}{n * samples / direct_s:>14,.0f}{1.0:>9.1f}x")
+
+    for method in ("hermite", "lagrange"):
+        cache = EphemerisCache(catalog, step=step, method=method)
+        t0 = time.perf_counter()
+        cache.teme(times[:1])  # cold build of the window
+        build_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        interpolated = cache.teme(times)
+        interp_s = time.perf_counter() - t0
+        err = np.linalg.norm(interpolated - reference, axis=-1) * 1000.0
+        err = err[np.isfinite(err)]
+        print(f"{method:>10}{build_s:>10.2f}{err.max():>12.3f}{np.percentile(err, 99):>12.3f}"
+              f"{n * samples / interp_s:>14,.0f}{direct_s / interp_s:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
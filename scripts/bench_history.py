@@ -0,0 +1,60 @@
+"""
+Benchmark the on-disk history store.
+
+Writes ``days`` days of 1 Hz samples from ``sensors`` sensors into day
+partitions (appended as one batch per minute, as a live ingest would),
+compacts, then times range reads of one sensor: an hour, a day, and the
+whole history. Run from the repo root:
+    python scripts/bench_history.py [sensors] [days]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.history_store import HistoryStore
+
+DAY = 86400.0
+
+
+def main(n_sensors=50, days=7):
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(Path(tmp) / "history", partition_seconds=DAY, flush_rows=1 << 18)
+        ids = np.array([store.series_id(f"sensor-{k}") for k in range(n_sensors)], dtype=np.uint32)
+        minute = np.repeat(np.arange(60.0), n_sensors)
+        series = np.tile(ids, 60)
+        t0 = time.perf_counter()
+        for start in np.arange(0.0, days * DAY, 60.0):
+            store.append_rows(series, start + minute, rng.normal(size=len(minute)))
+        store.flush()
+        elapsed = time.perf_counter() - t0
+        stats = store.stats()
+        print(f"write:   {stats['rows']} rows in {elapsed:.1f} s ({stats['rows'] / elapsed / 1e6:.2f}M rows/s), "
+              f"{stats['segments']} segments after {stats['compactions']} compactions, "
+              f"{stats['bytes'] / 2**20:.0f} MiB")
+
+        t0 = time.perf_counter()
+        merges = store.compact()
+        print(f"compact: {merges} merges in {time.perf_counter() - t0:.2f} s, {store.stats()['segments']} segments")
+
+        middle = days // 2 * DAY
+        for label, start, end in (("1 hour", middle, middle + 3600), ("1 day", middle, middle + DAY),
+                                  ("all", -np.inf, np.inf)):
+            repeats = 50 if label != "all" else 5
+            t0 = time.perf_counter()
+            for k in range(repeats):
+                times, _ = store.read(f"sensor-{k % n_sensors}", start, end)
+            elapsed = (time.perf_counter() - t0) / repeats
+            print(f"read {label:>6}: {elapsed * 1e3:8.2f} ms for {len(times)} samples of one sensor")
+        store.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,88 @@
+"""
+Benchmark model processing: parsing, quadric decimation and LOD output.
+
+Builds a bumpy sphere of about ``triangles`` triangles, stores it as a GLB
+upload through ``ModelAssets`` and times how long the upload call takes
+(it only writes the file) and how long the background processing takes
+per level. Run from the repo root:
+    python scripts/bench_model_lod.py [triangles]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.mesh_lod import decimate, glb_bytes, load_mesh
+from backend.src.services.model_assets import ModelAssets
+
+
+def surface(theta, phi):
+    return 1.0 + 0.02 * np.sin(8 * theta) * np.cos(12 * phi)
+
+
+def surface_error(positions):
+    """Largest radial distance of ``positions`` from the bumpy surface."""
+    r = np.linalg.norm(positions, axis=1)
+    theta, phi = np.arccos(np.clip(positions[:, 2] / r, -1, 1)), np.arctan2(positions[:, 1], positions[:, 0])
+    return np.abs(r - surface(theta, phi)).max()
+
+
+def bumpy_sphere(triangles):
+    """Lat/long sphere with surface detail, about ``triangles`` triangles."""
+    nv = int(np.sqrt(triangles / 2.0 / 1.5))
+    nu = int(1.5 * nv)
+    theta = np.linspace(0, np.pi, nv + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, nu, endpoint=False)
+    t, p = np.meshgrid(theta, phi, indexing="ij")
+    r = surface(t, p)
+    positions = np.column_stack(((r * np.sin(t) * np.cos(p)).ravel(), (r * np.sin(t) * np.sin(p)).ravel(),
+                                 (r * np.cos(t)).ravel()))
+    positions = np.vstack((positions, [[0, 0, 1], [0, 0, -1]]))
+    a = (np.arange(nv - 2)[:, None] * nu + np.arange(nu)).ravel()
+    b = (np.arange(nv - 2)[:, None] * nu + (np.arange(nu) + 1) % nu).ravel()
+    ring = np.arange(nu)
+    last = (nv - 2) * nu
+    top, bottom = len(positions) - 2, len(positions) - 1
+    triangles = np.concatenate([
+        np.column_stack((a, a + nu, b)), np.column_stack((b, a + nu, b + nu)),
+        np.column_stack((np.full(nu, top), ring, (ring + 1) % nu)),
+        np.column_stack((np.full(nu, bottom), last + (ring + 1) % nu, last + ring)),
+    ])
+    return positions, triangles
+
+
+def main(triangles=200_000):
+    positions, faces = bumpy_sphere(triangles)
+    data = glb_bytes(positions, faces)
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "probe.glb").write_bytes(data)
+        t0 = time.perf_counter()
+        load_mesh(Path(tmp) / "probe.glb")
+        print(f"parse:    {len(faces)} triangles, {len(data) / 2**20:.1f} MiB GLB in "
+              f"{(time.perf_counter() - t0) * 1e3:.0f} ms")
+        mesh = positions, faces
+        for ratio in (0.5, 0.25, 0.1):
+            t0 = time.perf_counter()
+            mesh = decimate(*mesh, int(len(faces) * ratio))
+            print(f"lod {ratio:4}: {len(mesh[1]):7d} triangles in {time.perf_counter() - t0:.2f} s, "
+                  f"surface error {surface_error(mesh[0]):.4f} (radius 1)")
+
+        with ModelAssets(Path(tmp) / "models") as assets:
+            t0 = time.perf_counter()
+            assets.save("bumpy.glb", data)
+            print(f"upload:   returned in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+            t0 = time.perf_counter()
+            assets.wait()
+            meta = assets.metadata("bumpy.glb")
+            print(f"process:  {meta['status']} after {time.perf_counter() - t0:.2f} s, levels "
+                  + ", ".join(f"{level['triangles']} tris/{level['bytes'] / 2**10:.0f} KiB" for level in meta["levels"]))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
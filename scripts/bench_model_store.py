@@ -0,0 +1,59 @@
+"""
+Benchmark the content-addressed model store and conditional model downloads.
+
+Uploads the same ``triangles``-triangle GLB under ``copies`` names through the
+API (the first is stored and processed, the rest only hashed and
+referenced), then times a full download against a revalidation that
+answers 304 from the ETag. Run from the repo root:
+    python scripts/bench_model_store.py [triangles] [copies]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fastapi.testclient import TestClient
+
+from backend.src.routes import assets_routes
+from backend.src.server import app
+from backend.src.services.mesh_lod import glb_bytes
+from backend.src.services.model_assets import ModelAssets
+from scripts.bench_model_lod import bumpy_sphere
+
+
+def main(triangles=200_000, copies=20):
+    data = glb_bytes(*bumpy_sphere(triangles))
+    with tempfile.TemporaryDirectory() as tmp, ModelAssets(Path(tmp) / "models") as assets:
+        assets_routes.get_model_assets = lambda: assets
+        client = TestClient(app)
+        times = []
+        for k in range(copies):
+            t0 = time.perf_counter()
+            client.put(f"/api/assets/models/scene-{k}.glb", content=data)
+            times.append(time.perf_counter() - t0)
+        assets.wait()
+        stats = assets.stats()
+        print(f"upload:   {len(data) / 2**20:.1f} MiB x {copies}: first {times[0] * 1e3:.0f} ms, "
+              f"repeats {sum(times[1:]) / max(1, copies - 1) * 1e3:.0f} ms each; {stats['blobs']} blob, "
+              f"{stats['stored_bytes'] / 2**20:.1f} MiB stored, {stats['processed']} processed")
+
+        repeats = 20
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            r = client.get("/api/assets/models/scene-0.glb")
+        full = (time.perf_counter() - t0) / repeats
+        etag = r.headers["etag"]
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            status = client.get("/api/assets/models/scene-0.glb", headers={"If-None-Match": etag}).status_code
+        cached = (time.perf_counter() - t0) / repeats
+        print(f"download: full {full * 1e3:.1f} ms ({len(r.content) / 2**20:.1f} MiB), "
+              f"revalidated {cached * 1e3:.2f} ms ({status})")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
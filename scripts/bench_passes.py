@@ -0,0 +1,46 @@
+"""
+Benchmark pass prediction over a synthetic catalog.
+
+Times one /api/satellites/passes-style query (one hour, 60 s grid, 10 deg
+mask) with grid positions from the warm ephemeris cache and from direct
+SGP4. Run from the repo root:
+    python scripts/bench_passes.py [n_satellites]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.ephemeris_cache import EphemerisCache
+from backend.src.services.pass_prediction import predict_passes
+from scripts.bench_ephemeris import synthetic_catalog
+
+
+def main(n=10000, repeats=3):
+    catalog = synthetic_catalog(n, np.random.default_rng(0))
+    now = time.time()
+    ephemeris = EphemerisCache(catalog)
+    ephemeris.teme([now])  # warm window, as in a running server
+
+    sources = {
+        "ephemeris": lambda times: ephemeris.teme(times),
+        "direct": lambda times: catalog.propagate_teme(times)[1],
+    }
+    print(f"{n} satellites, 1 h window, 60 s grid, 10 deg mask")
+    for name, teme in sources.items():
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            found, current = predict_passes(teme, n, 40.7128, -74.0060, 0.0, now, 3600.0, 60.0, 10.0)
+            best = min(best, time.perf_counter() - t0)
+        overhead = int((current["elevation"] >= 10.0).sum())
+        print(f"{name:>10}: {best * 1e3:7.1f} ms  passes={len(found['sat'])}  overhead now={overhead}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
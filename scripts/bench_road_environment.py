@@ -0,0 +1,61 @@
+"""
+Benchmark snapping vehicles to a compiled road environment.
+
+Compiles a synthetic Manhattan-style grid (streets every 80 m, avenues every
+250 m, about 10 x 10 km) and times one ``RoadEnvironment.snap`` of every
+vehicle, i.e. the per-tick cost in ``SimulationState``. Run from the repo root:
+    python scripts/bench_road_environment.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.environment_loader import RoadEnvironment
+from backend.src.services.osm_tile_cache import METERS_PER_DEG_LAT
+
+ORIGIN = (40.75, -73.98)
+SIZE_M = 10000.0
+
+
+def grid_ways():
+    lat0, lon0 = ORIGIN
+    dlat = SIZE_M / 2 / METERS_PER_DEG_LAT
+    dlon = dlat / np.cos(np.radians(lat0))
+    ways = []
+    for k, y in enumerate(np.arange(-SIZE_M / 2, SIZE_M / 2, 80.0)):
+        lat = lat0 + y / METERS_PER_DEG_LAT
+        # Streets as many short ways, the way OSM splits them at junctions
+        lons = np.linspace(lon0 - dlon, lon0 + dlon, 41)
+        for j in range(40):
+            ways.append((k * 100 + j, {"highway": "residential", "maxspeed": "25 mph"},
+                         [(lat, lons[j]), (lat, lons[j + 1])]))
+    for k, x in enumerate(np.arange(-SIZE_M / 2, SIZE_M / 2, 250.0)):
+        lon = lon0 + x / METERS_PER_DEG_LAT / np.cos(np.radians(lat0))
+        ways.append((10 ** 6 + k, {"highway": "primary"}, [(lat0 - dlat, lon), (lat0 + dlat, lon)]))
+    return ways
+
+
+def main(sizes=(1000, 10000, 100000), repeats=5):
+    t0 = time.perf_counter()
+    env = RoadEnvironment(ORIGIN, grid_ways())
+    print(f"compiled {len(env)} road pieces in {time.perf_counter() - t0:.2f} s")
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        positions = rng.uniform(-SIZE_M / 2, SIZE_M / 2, size=(n, 3))
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            snap = env.snap(positions)
+            best = min(best, time.perf_counter() - t0)
+        on_road = float(np.mean(snap.segment >= 0))
+        print(f"{n:>7} vehicles: {best * 1e3:7.2f} ms/tick  on a road: {on_road:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark route queries on a compiled road graph.
+
+Compiles a synthetic grid of two-way streets (every 100 m, with random speed
+limits and every fifth street oneway) and times random A* routes and an
+ETA matrix between their ends, then builds the contraction hierarchy and
+times both again. Run from the repo root:
+    python scripts/bench_road_graph.py [blocks_per_side]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.osm_tile_cache import METERS_PER_DEG_LAT
+from backend.src.services.road_graph import RoadGraph
+
+ORIGIN = (40.75, -73.98)
+BLOCK_M = 100.0
+
+
+def grid_ways(n, rng):
+    lat0, lon0 = ORIGIN
+    dlat = BLOCK_M / METERS_PER_DEG_LAT
+    dlon = dlat / np.cos(np.radians(lat0))
+    ways = []
+    for i in range(n + 1):
+        for j in range(n):
+            for coords in (
+                [(lat0 + i * dlat, lon0 + j * dlon), (lat0 + i * dlat, lon0 + (j + 1) * dlon)],
+                [(lat0 + j * dlat, lon0 + i * dlon), (lat0 + (j + 1) * dlat, lon0 + i * dlon)],
+            ):
+                tags = {"highway": "residential", "maxspeed": str(rng.choice([20, 30, 50, 70]))}
+                if i % 5 == 0:
+                    tags["oneway"] = "yes"
+                ways.append({"type": "way", "id": len(ways), "tags": tags,
+                             "geometry": [{"lat": lat, "lon": lon} for lat, lon in coords]})
+    return ways, n * dlat, n * dlon
+
+
+def _time_routes(graph, pairs):
+    t0 = time.perf_counter()
+    durations = [graph.route(*a, *b)["duration_s"] for a, b in pairs]
+    return (time.perf_counter() - t0) / len(pairs), durations
+
+
+def _time_matrix(graph, name, pairs):
+    origins = [a for a, _ in pairs]
+    destinations = [b for _, b in pairs]
+    t0 = time.perf_counter()
+    graph.eta_matrix(origins, destinations)
+    elapsed = time.perf_counter() - t0
+    cells = len(origins) * len(destinations)
+    print(f"{name:>9}: {len(origins)}x{len(destinations)} matrix {elapsed * 1e3:7.1f} ms"
+          f"  ({elapsed / cells * 1e3:.3f} ms / cell)")
+
+
+def main(n=60, queries=50):
+    rng = np.random.default_rng(0)
+    ways, height, width = grid_ways(n, rng)
+    t0 = time.perf_counter()
+    graph = RoadGraph.from_elements(ways)
+    print(f"{graph.n_nodes} nodes, {graph.n_edges} edges: compile {time.perf_counter() - t0:.2f} s")
+
+    corner = np.array(ORIGIN)
+    pairs = [(tuple(corner + rng.uniform(0, 1, 2) * (height, width)), tuple(corner + rng.uniform(0, 1, 2) * (height, width)))
+             for _ in range(queries)]
+    t_astar, expected = _time_routes(graph, pairs)
+    print(f"A*:        {t_astar * 1e3:7.2f} ms / route")
+    _time_matrix(graph, "Dijkstra", pairs)
+
+    t0 = time.perf_counter()
+    graph.build_hierarchy()
+    print(f"hierarchy: build {time.perf_counter() - t0:.1f} s")
+    t_ch, durations = _time_routes(graph, pairs)
+    assert np.allclose(durations, expected, atol=0.1)
+    print(f"hierarchy: {t_ch * 1e3:7.2f} ms / route  ({t_astar / t_ch:.1f}x)")
+    _time_matrix(graph, "buckets", pairs)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60)
@@ -0,0 +1,92 @@
+"""
+Benchmark batched sensor scans against a synthetic city.
+
+Builds a grid of extruded buildings (20 m footprints, 12 m streets, random
+heights) with vehicles on the streets, mounts a LiDAR on the first
+``sensors`` of them and times one batched scan of all LiDARs, the same rays
+cast one by one through the BVH, and a second of 60 Hz ticks with the
+sensors at their 10 Hz scan rate. Run from the repo root:
+    python scripts/bench_sensors.py [sensors] [vehicles]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.environment_loader import to_latlon
+from backend.src.simulation.raycast import Scene
+from backend.src.simulation.sensors import Sensor, SensorEngine
+from backend.src.simulation.simulation_state import SimulationState
+
+ORIGIN = (40.75, -73.98)
+BLOCK_M = 32.0
+BLOCKS = 30
+
+
+def city(rng):
+    elements = []
+    for i in range(BLOCKS):
+        for j in range(BLOCKS):
+            x, y = i * BLOCK_M, j * BLOCK_M
+            ring = to_latlon(ORIGIN, [(x, y), (x + 20, y), (x + 20, y + 20), (x, y + 20), (x, y)])
+            elements.append({"type": "way", "id": len(elements),
+                             "tags": {"building": "yes", "height": f"{rng.uniform(6, 40):.1f}"},
+                             "geometry": [{"lat": lat, "lon": lon} for lat, lon in ring.tolist()]})
+    return elements
+
+
+def main(n_sensors=100, n_vehicles=2000):
+    rng = np.random.default_rng(0)
+    t0 = time.perf_counter()
+    scene = Scene.from_elements(city(rng), ORIGIN)
+    print(f"{len(scene)} triangles: build {time.perf_counter() - t0:.2f} s")
+
+    sim = SimulationState(capacity=n_vehicles, sensors=SensorEngine(scene))
+    # Vehicles drive along the north-south streets
+    streets = rng.integers(0, BLOCKS, n_vehicles) * BLOCK_M - 6.0
+    position = np.column_stack((streets, rng.uniform(0, BLOCKS * BLOCK_M, n_vehicles), np.full(n_vehicles, 0.75)))
+    velocity = np.column_stack((np.zeros(n_vehicles), rng.choice([-10.0, 10.0], n_vehicles), np.zeros(n_vehicles)))
+    sim.add_entities([f"car-{i}" for i in range(n_vehicles)], "vehicle", position=position, velocity=velocity)
+    engine = sim.sensors
+    for i in range(n_sensors):
+        engine.add(Sensor(f"lidar-{i}", "lidar", position=(0, 0, 1.2), mount=f"car-{i}"))
+
+    engine.scan(store=sim.store)  # warm up
+    t0 = time.perf_counter()
+    scans = engine.scan(store=sim.store)
+    batched = time.perf_counter() - t0
+    rays = sum(s.ranges.size for s in scans.values())
+    print(f"batched:  {n_sensors} LiDARs, {rays} rays: {batched * 1e3:7.1f} ms  ({batched / rays * 1e9:.0f} ns / ray)")
+
+    # The same rays through the per-ray BVH traversal, on a sample of sensors
+    sample = list(scans.values())[:10]
+    origins = np.concatenate([np.repeat(s.origin[None], s.ranges.size, axis=0) for s in sample])
+    sensor = sample[0].sensor
+    el_first, el_step, az_first, az_step = sensor.grid()
+    el, az = np.meshgrid(el_first + np.arange(sensor.rows) * el_step, az_first + np.arange(sensor.columns) * az_step,
+                         indexing="ij")
+    fan = np.column_stack(((np.cos(el) * np.sin(az)).ravel(), (np.cos(el) * np.cos(az)).ravel(), np.sin(el).ravel()))
+    n = sim.store.count
+    t0 = time.perf_counter()
+    scene.cast(origins, np.tile(fan, (len(sample), 1)), sensor.range, sensor.min_range,
+               (sim.store.position[:n], sim.store.radius[:n]))
+    per_ray = (time.perf_counter() - t0) / len(origins)
+    print(f"per ray:  {per_ray * 1e9:7.0f} ns / ray  ({per_ray / (batched / rays):.0f}x slower)")
+
+    ticks = 60
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        sim.tick(1 / 60)
+    elapsed = time.perf_counter() - t0
+    stats = engine.stats()
+    print(f"1 s of 60 Hz ticks: {elapsed * 1e3:.0f} ms ({elapsed / ticks * 1e3:.2f} ms / tick), "
+          f"{stats['scans'] - 2 * n_sensors} scans, {stats['batch_ms_avg']:.1f} ms / batch")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,64 @@
+"""
+Benchmark tick throughput of a sharded simulation against a single process.
+
+Spreads vehicles with random velocities and collisions enabled over a
+10 x 10 km area and times ticks of one in-process ``SimulationState``
+and of ``ShardedSimulation`` with 1, 2, 4, ... shards (up to the core
+count, or the counts given). Run from the repo root:
+    python scripts/bench_sharding.py [n_entities] [shards ...]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.simulation.sharding import ShardedSimulation
+from backend.src.simulation.simulation_state import SimulationState
+
+
+def populate(sim, n, rng):
+    position = np.column_stack((rng.uniform(-5000, 5000, (n, 2)), np.zeros(n)))
+    velocity = np.column_stack((rng.normal(0, 15, (n, 2)), np.zeros(n)))
+    sim.add_entities(range(n), "vehicle", position=position, velocity=velocity)
+
+
+def time_ticks(sim, ticks=30, warmup=5):
+    for _ in range(warmup):
+        sim.tick(1 / 60)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        sim.tick(1 / 60)
+    return (time.perf_counter() - t0) / ticks
+
+
+def main(n=400_000, shard_counts=None):
+    cores = os.cpu_count() or 1
+    if not shard_counts:
+        shard_counts = [1]
+        while shard_counts[-1] * 2 <= cores:
+            shard_counts.append(shard_counts[-1] * 2)
+    print(f"{n} entities, {cores} cores")
+
+    single = SimulationState(capacity=n, collisions=True)
+    populate(single, n, np.random.default_rng(0))
+    base = time_ticks(single)
+    print(f"in-process: {base * 1e3:8.1f} ms / tick")
+
+    for shards in shard_counts:
+        with ShardedSimulation(shards, collisions=True, capacity=n) as sim:
+            populate(sim, n, np.random.default_rng(0))
+            t = time_ticks(sim)
+            stats = sim.stats()
+        print(f"{shards:2d} shards:  {t * 1e3:8.1f} ms / tick  ({base / t:4.1f}x)"
+              f"  last tick: slowest shard {max(stats['tick_ms']):7.1f} ms, {stats['handoffs']} handoffs")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+    main(n, [int(arg) for arg in sys.argv[2:]])
@@ -0,0 +1,73 @@
+"""
+Benchmark the binary snapshot codec against the JSON snapshot broadcast.
+
+Reports bytes per tick and encode time per 10k entities for a keyframe, a
+delta (10% of entities moving) and the JSON payload physics_server sends by
+default. Run from the repo root:
+    python scripts/bench_snapshot_codec.py [n_entities]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.simulation.simulation_state import SimulationState
+from backend.src.simulation.snapshot_codec import SnapshotDecoder, SnapshotEncoder
+
+
+def timed(fn, repeat=20):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main(n=10000, moving_fraction=0.1):
+    rng = np.random.default_rng(0)
+    sim = SimulationState(capacity=n)
+    vel = np.zeros((n, 3))
+    moving = int(n * moving_fraction)
+    vel[:moving] = rng.normal(size=(moving, 3))
+    sim.add_entities([f"veh-{i}" for i in range(n)], "vehicle",
+                     position=rng.uniform(-5000, 5000, size=(n, 3)), velocity=vel)
+    per_10k = 10000.0 / n
+
+    enc = SnapshotEncoder(keyframe_interval=10 ** 9)
+    # A client with no acknowledged keyframe gets a full frame with every name
+    key_bytes, key_time = timed(lambda: enc.encode(enc.capture(sim.store, 1)))
+
+    sim.tick(1 / 60)
+    tick = [1]
+
+    def delta_once():
+        tick[0] += 1
+        return enc.encode(enc.capture(sim.store, tick[0]), acked_tick=1)
+
+    delta_bytes, delta_time = timed(delta_once)
+    json_bytes, json_time = timed(
+        lambda: json.dumps({"type": "snapshot", "tick": 2, "payload": sim.snapshot()}).encode()
+    )
+
+    dec = SnapshotDecoder()
+    dec.decode(key_bytes)
+    _, decode_time = timed(lambda: dec.decode(delta_bytes))
+
+    print(f"entities: {n}  moving: {moving}")
+    print(f"{'format':<16}{'bytes/tick':>14}{'encode us/10k':>16}")
+    print(f"{'json':<16}{len(json_bytes):>14}{json_time * 1e6 * per_10k:>16.0f}")
+    print(f"{'binary keyframe':<16}{len(key_bytes):>14}{key_time * 1e6 * per_10k:>16.0f}")
+    print(f"{'binary delta':<16}{len(delta_bytes):>14}{delta_time * 1e6 * per_10k:>16.0f}")
+    print(f"delta decode us/10k: {decode_time * 1e6 * per_10k:.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
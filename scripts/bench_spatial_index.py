@@ -0,0 +1,82 @@
+"""
+Benchmark the STR R-tree against a linear NumPy scan.
+
+Builds a tree over random building-sized boxes spread across New York and
+times bbox, radius (500 m) and 10-nearest queries. Run from the repo root:
+    python scripts/bench_spatial_index.py [n_elements]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.osm_tile_cache import radius_bbox
+from backend.src.services.spatial_index import STRTree, distance_to_boxes
+
+
+def synthetic_boxes(n, rng):
+    lat = rng.uniform(40.5, 41.0, n)
+    lon = rng.uniform(-74.3, -73.7, n)
+    size = rng.uniform(0.0, 0.0005, (n, 2))
+    return np.column_stack((lat, lon, lat + size[:, 0], lon + size[:, 1]))
+
+
+def _scan_bbox(boxes, s, w, n, e):
+    return np.flatnonzero((boxes[:, 0] <= n) & (boxes[:, 2] >= s) & (boxes[:, 1] <= e) & (boxes[:, 3] >= w))
+
+
+def _scan_radius(boxes, lat, lng, radius):
+    return np.flatnonzero(distance_to_boxes(lat, lng, boxes) <= radius)
+
+
+def _scan_nearest(boxes, lat, lng, k):
+    dist = distance_to_boxes(lat, lng, boxes)
+    best = np.argpartition(dist, k - 1)[:k]
+    return best[np.argsort(dist[best])]
+
+
+def _best(fn, points, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for lat, lng in points:
+            fn(lat, lng)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(points)
+
+
+def main(n=1_000_000, queries=50):
+    rng = np.random.default_rng(0)
+    boxes = synthetic_boxes(n, rng)
+    t0 = time.perf_counter()
+    tree = STRTree(boxes)
+    print(f"{n} boxes: build {time.perf_counter() - t0:.2f} s, {len(tree.levels)} levels")
+
+    points = list(zip(rng.uniform(40.55, 40.95, queries), rng.uniform(-74.25, -73.75, queries)))
+    cases = {
+        "bbox 1 km": (
+            lambda lat, lng: tree.bbox(*radius_bbox(lat, lng, 500)),
+            lambda lat, lng: _scan_bbox(boxes, *radius_bbox(lat, lng, 500)),
+        ),
+        "radius 500 m": (
+            lambda lat, lng: tree.radius(lat, lng, 500),
+            lambda lat, lng: _scan_radius(boxes, lat, lng, 500),
+        ),
+        "10 nearest": (
+            lambda lat, lng: tree.nearest(lat, lng, 10),
+            lambda lat, lng: _scan_nearest(boxes, lat, lng, 10),
+        ),
+    }
+    for name, (indexed, scan) in cases.items():
+        t_tree = _best(indexed, points)
+        t_scan = _best(scan, points[:10])
+        print(f"{name:>13}: tree {t_tree * 1e3:7.3f} ms  scan {t_scan * 1e3:8.2f} ms  ({t_scan / t_tree:5.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,82 @@
+"""
+Benchmark telemetry ingest and rollup queries.
+
+Feeds ``sensors`` sensors with two fields each, sampled at 100 Hz, through
+``TelemetryStore.ingest_json`` as columnar batches (one JSON message per
+sensor per second) and as single frontend-style messages, then times series
+queries over an hour and over a day of data. Run from the repo root:
+    python scripts/bench_telemetry.py [sensors] [seconds]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure repo root is on sys.path when running as a script
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.src.services.telemetry_store import TelemetryStore
+
+RATE_HZ = 100
+START_MS = 1_700_000_000_000
+
+
+def batches(n_sensors, seconds, rng):
+    """One columnar message per sensor per second."""
+    messages = []
+    for second in range(seconds):
+        stamps = (START_MS + second * 1000 + np.arange(RATE_HZ) * (1000 // RATE_HZ)).tolist()
+        for s in range(n_sensors):
+            messages.append(json.dumps({
+                "sensorId": f"imu-{s}", "sensorType": "IMU", "timestamps": stamps,
+                "data": {"accel": np.round(rng.normal(0, 1, RATE_HZ), 4).tolist(),
+                         "temperature": np.round(rng.normal(20, 0.1, RATE_HZ), 3).tolist()},
+            }))
+    return messages
+
+
+def main(n_sensors=100, seconds=120):
+    rng = np.random.default_rng(0)
+    store = TelemetryStore(max_channels=2 * n_sensors + 3)
+
+    messages = batches(n_sensors, seconds, rng)
+    t0 = time.perf_counter()
+    samples = sum(store.ingest_json(message) for message in messages)
+    store.flush()
+    elapsed = time.perf_counter() - t0
+    print(f"columnar: {samples} samples in {elapsed * 1e3:.0f} ms ({samples / elapsed / 1e3:.0f}k samples/s, "
+          f"JSON decode included)")
+
+    singles = [json.dumps({"sensorId": "lidar-0", "sensorType": "LiDAR", "timestamp": START_MS + k * 10,
+                           "data": {"minDistance": float(k % 100), "detectionCount": k % 7}})
+               for k in range(100_000)]
+    t0 = time.perf_counter()
+    samples = sum(store.ingest_json(message) for message in singles)
+    store.flush()
+    elapsed = time.perf_counter() - t0
+    print(f"single:   {samples} samples in {elapsed * 1e3:.0f} ms ({samples / elapsed / 1e3:.0f}k samples/s)")
+
+    # A day of 1 Hz data on one more channel, for the long-range query
+    day = np.arange(86_400.0) + START_MS / 1000.0
+    store.extend("baro", "pressure", day, 1013.0 + np.sin(day / 3600.0))
+    store.flush()
+    row = store.find("imu-0", "accel")
+    start = START_MS / 1000.0
+    for label, channel, end in (("1 min", row, start + 60), ("2 min", row, start + seconds),
+                                ("1 day", store.find("baro", "pressure"), start + 86_400)):
+        t0 = time.perf_counter()
+        for _ in range(100):
+            result = store.series(channel, start, end, points=500)
+        elapsed = (time.perf_counter() - t0) / 100
+        print(f"series {label:>5}: {elapsed * 1e6:6.0f} us, {len(result['t'])} buckets of {result['resolution']:.0f} s")
+
+    stats = store.stats()
+    print(f"{stats['channels']} channels, {stats['memory_bytes'] / 2**20:.1f} MiB "
+          f"({stats['memory_bytes'] / stats['channels'] / 1024:.0f} KiB per channel, fixed)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
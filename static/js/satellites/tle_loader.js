@@ -21,3 +21,19 @@ export function propagateSatellites(satRecs) {
     );
   });
 }
+
+// Positions propagated server-side (SGP4 over the whole catalog in one batch).
+// Prefer this over propagateSatellites for large constellations.
+export async function fetchSatellitePositions(ids = null, time = null) {
+  const params = new URLSearchParams();
+  if (ids && ids.length) params.set("ids", ids.join(","));
+  if (time) params.set("time", time.toISOString());
+  const res = await fetch(`/api/satellites/?${params}`);
+  if (!res.ok) throw new Error(`Satellite positions unavailable (${res.status})`);
+  const data = await res.json();
+  return data.satellites.map(s => ({
+    id: s.id,
+    name: s.name,
+    position: Cesium.Cartesian3.fromDegrees(s.lon, s.lat, s.alt),
+  }));
+}